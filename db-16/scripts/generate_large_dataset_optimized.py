@@ -3,12 +3,20 @@
 Generate large dataset for db-16 to reach ~2 GB
 Optimized version that writes data incrementally to avoid memory issues
 Data is distributed across all 50 US states plus DC for comprehensive nationwide coverage
+Use --compress gzip|zstd to write data.sql.gz / data.sql.zst as a compressed stream
 """
 
+import sys
 import random
+import argparse
 from pathlib import Path
 from datetime import datetime, timedelta
 
+# Add root scripts to path (shared compressed_io helpers)
+sys.path.append(str(Path(__file__).parent.parent.parent / 'scripts'))
+
+from compressed_io import CODECS, compressed_path, open_compressed
+
 # All 50 US states plus DC
 US_STATES = ['AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA', 
              'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MD',
@@ -636,17 +644,24 @@ def write_intersections(f, count=3000000):
 
 def main():
     """Generate large dataset incrementally"""
-    output_file = Path(__file__).parent.parent / 'data' / 'data.sql'
+    parser = argparse.ArgumentParser(description='Generate the db-16 large dataset')
+    parser.add_argument('--compress', choices=sorted(CODECS), default='none',
+                        help='Write data.sql as a gzip (.gz) or zstd (.zst) stream (default: none)')
+    parser.add_argument('--compress-level', type=int, default=None,
+                        help='Compression level (default: gzip 6, zstd 3)')
+    args = parser.parse_args()
+    output_file = compressed_path(Path(__file__).parent.parent / 'data' / 'data.sql', args.compress)
     
     print("="*70)
     print("Generating Large Dataset for db-16 (~2 GB)")
     print("Optimized incremental writing to avoid memory issues")
+    print(f"Output: {output_file}")
     print("="*70)
     print()
     
     total_records = {}
     
-    with open(output_file, 'w') as f:
+    with open_compressed(output_file, 'w', args.compress, args.compress_level) as f:
         f.write("-- Sample Data for Flood Risk Assessment Database\n")
         f.write("-- Compatible with PostgreSQL\n")
         f.write("-- Production sample data for physical climate risk assessment system\n")
@@ -89,6 +89,15 @@ CREATE TABLE IF NOT EXISTS weather_alerts (
     alert_geometry GEOGRAPHY  -- Polygon geometry for alert area
 );
 
+-- Alert bounding boxes, precomputed from alert_geometry at ingestion, so joins
+-- to boundaries and policy areas can prune with a cheap box-overlap test
+-- before exact geometry checks; alert_sent tracks the alert's last version
+ALTER TABLE weather_alerts ADD COLUMN IF NOT EXISTS alert_sent TIMESTAMP_NTZ;
+ALTER TABLE weather_alerts ADD COLUMN IF NOT EXISTS bbox_west NUMERIC(10, 6);
+ALTER TABLE weather_alerts ADD COLUMN IF NOT EXISTS bbox_south NUMERIC(10, 6);
+ALTER TABLE weather_alerts ADD COLUMN IF NOT EXISTS bbox_east NUMERIC(10, 6);
+ALTER TABLE weather_alerts ADD COLUMN IF NOT EXISTS bbox_north NUMERIC(10, 6);
+
 -- Model Forecast Comparison Table
 -- Compares forecasts from different models
 CREATE TABLE IF NOT EXISTS model_forecast_comparison (
@@ -135,6 +144,8 @@ CREATE INDEX IF NOT EXISTS idx_weather_alerts_event_time
     ON weather_alerts(event_type, effective_time);
 CREATE INDEX IF NOT EXISTS idx_weather_alerts_geom
     ON weather_alerts USING GIST(alert_geometry);
+CREATE INDEX IF NOT EXISTS idx_weather_alerts_bbox
+    ON weather_alerts(bbox_south, bbox_north, bbox_west, bbox_east);
 CREATE INDEX IF NOT EXISTS idx_model_forecast_comparison_time
     ON model_forecast_comparison(forecast_time, parameter_name);
 CREATE INDEX IF NOT EXISTS idx_data_source_statistics_date
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Asyncio fetch engine for bulk S3 backfills
+Months of HRRR/GFS are tens of thousands of small range requests, each bound by
+round-trip latency rather than bandwidth. AsyncS3Fetcher keeps many of them in
+flight with a concurrency limit per bucket, retries throttling and transient
+network errors with full-jitter exponential backoff, streams bodies to disk
+(into the ObjectCache when one is given) in fixed-size chunks, and keeps
+progress and throughput metrics.
+
+The transport runs a boto3-compatible client's blocking calls on a thread pool,
+so the engine works unchanged against S3, local_s3.LocalS3Client or any
+in-process fake that implements get_object/head_object.
+"""
+
+import asyncio
+import random
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from object_cache import CachingS3Client, ObjectCache
+
+DEFAULT_BUCKET_CONCURRENCY = 16
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 20.0
+
+STREAM_CHUNK_BYTES = 1024 * 1024
+PROGRESS_SECONDS = 10.0
+
+# S3 error codes (and HTTP statuses) worth retrying; anything else, e.g. NoSuchKey, fails at once
+RETRYABLE_ERROR_CODES = {
+    'SlowDown', 'Throttling', 'ThrottlingException', 'RequestLimitExceeded', 'RequestTimeout',
+    'InternalError', 'ServiceUnavailable', '500', '502', '503', '504'
+}
+
+# botocore transport exceptions, matched by name so botocore stays optional here
+TRANSIENT_EXCEPTIONS = {
+    'EndpointConnectionError', 'ConnectTimeoutError', 'ReadTimeoutError', 'ConnectionClosedError',
+    'IncompleteReadError', 'ResponseStreamingError'
+}
+
+
+class FetchRequest(NamedTuple):
+    """One object (or byte range) to fetch; etag skips a HEAD when the cache needs it"""
+    bucket: str
+    key: str
+    byte_range: Optional[str] = None
+    etag: Optional[str] = None
+    destination: Optional[Path] = None
+
+
+class FetchResult(NamedTuple):
+    """Where a fetch landed; path is None when it failed (error says why)"""
+    request: FetchRequest
+    path: Optional[Path]
+    size: int
+    attempts: int
+    from_cache: bool
+    seconds: float
+    error: Optional[str] = None
+
+
+def is_retryable(error: BaseException) -> bool:
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        return str(response.get('Error', {}).get('Code')) in RETRYABLE_ERROR_CODES
+    if isinstance(error, (OSError, asyncio.TimeoutError)):
+        return True
+    return any(cls.__name__ in TRANSIENT_EXCEPTIONS for cls in type(error).__mro__)
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE_SECONDS, cap: float = BACKOFF_MAX_SECONDS) -> float:
+    """Full-jitter exponential backoff before retry number attempt + 1"""
+    return random.uniform(0.0, min(cap, base * 2 ** attempt))
+
+
+class ThreadedS3Transport:
+    """Async facade over a blocking boto3-compatible client"""
+
+    def __init__(self, client, workers: int = DEFAULT_BUCKET_CONCURRENCY):
+        self.client = client
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='s3-fetch')
+
+    async def _call(self, function, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self._pool, partial(function, *args, **kwargs))
+
+    async def head(self, bucket: str, key: str) -> Dict:
+        return await self._call(self.client.head_object, Bucket=bucket, Key=key)
+
+    async def stream(self, bucket: str, key: str, byte_range: Optional[str] = None,
+                     chunk_size: int = STREAM_CHUNK_BYTES) -> AsyncIterator[bytes]:
+        request = {'Bucket': bucket, 'Key': key}
+        if byte_range:
+            request['Range'] = byte_range
+        response = await self._call(self.client.get_object, **request)
+        body = response['Body']
+        try:
+            while True:
+                chunk = await self._call(body.read, chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            body.close()
+
+    async def run_blocking(self, function, *args, **kwargs):
+        """Run disk or cache work off the event loop, on the transport's threads"""
+        return await self._call(function, *args, **kwargs)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+class FetchMetrics:
+    """Counters for one fetcher; report() gives a snapshot with rates"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.requests = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.in_flight = 0
+        self.bytes_downloaded = 0
+        self.bytes_from_cache = 0
+
+    def report(self) -> Dict:
+        elapsed = max(time.time() - self.started, 1e-9)
+        return {
+            'requests': self.requests,
+            'completed': self.completed,
+            'failed': self.failed,
+            'retries': self.retries,
+            'cache_hits': self.cache_hits,
+            'in_flight': self.in_flight,
+            'bytes_downloaded': self.bytes_downloaded,
+            'bytes_from_cache': self.bytes_from_cache,
+            'elapsed': elapsed,
+            'requests_per_second': self.completed / elapsed,
+            'download_mb_per_second': self.bytes_downloaded / 1024 ** 2 / elapsed
+        }
+
+
+def format_fetch_report(report: Dict) -> str:
+    return (f"{report['completed']:,}/{report['requests']:,} done, {report['failed']:,} failed, "
+            f"{report['in_flight']:,} in flight, {report['retries']:,} retries, "
+            f"{report['cache_hits']:,} cache hits; "
+            f"{report['bytes_downloaded'] / 1024**2:,.1f} MB downloaded "
+            f"({report['download_mb_per_second']:,.1f} MB/s, {report['requests_per_second']:,.1f} req/s) "
+            f"in {report['elapsed']:.1f}s")
+
+
+class AsyncS3Fetcher:
+    """Bounded-concurrency S3 fetches with retries, cache-backed streaming and metrics
+
+    bucket_concurrency caps in-flight requests per bucket (others get
+    default_concurrency). Backoff sleeps happen outside the bucket's slot, so a
+    throttled request does not hold back the rest. Call run() from synchronous
+    code; the coroutines can also be awaited from a running loop.
+    """
+
+    def __init__(self, transport: ThreadedS3Transport, cache: Optional[ObjectCache] = None,
+                 bucket_concurrency: Optional[Dict[str, int]] = None,
+                 default_concurrency: int = DEFAULT_BUCKET_CONCURRENCY,
+                 max_attempts: int = MAX_ATTEMPTS, backoff_base: float = BACKOFF_BASE_SECONDS,
+                 backoff_max: float = BACKOFF_MAX_SECONDS,
+                 etag_lookup: Optional[Callable[[str, str], Optional[str]]] = None,
+                 progress: Optional[Callable[[Dict], None]] = None, progress_seconds: float = PROGRESS_SECONDS):
+        self.transport = transport
+        self.cache = cache
+        self.bucket_concurrency = dict(bucket_concurrency or {})
+        self.default_concurrency = default_concurrency
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.etag_lookup = etag_lookup
+        self.progress = progress
+        self.progress_seconds = progress_seconds
+        self.metrics = FetchMetrics()
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._etags: Dict[tuple, str] = {}
+
+    def _semaphore(self, bucket: str) -> asyncio.Semaphore:
+        if bucket not in self._semaphores:
+            self._semaphores[bucket] = asyncio.Semaphore(
+                self.bucket_concurrency.get(bucket, self.default_concurrency)
+            )
+        return self._semaphores[bucket]
+
+    async def _with_retries(self, bucket: str, operation: Callable[[], Awaitable]):
+        """(operation() result, attempts), holding one of bucket's slots per attempt"""
+        for attempt in range(self.max_attempts):
+            async with self._semaphore(bucket):
+                self.metrics.in_flight += 1
+                try:
+                    return await operation(), attempt + 1
+                except Exception as e:
+                    if attempt + 1 >= self.max_attempts or not is_retryable(e):
+                        raise
+                finally:
+                    self.metrics.in_flight -= 1
+            self.metrics.retries += 1
+            await asyncio.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+
+    async def etag(self, request: FetchRequest) -> str:
+        if request.etag:
+            return request.etag
+        known = (request.bucket, request.key)
+        if known not in self._etags:
+            etag = self.etag_lookup(*known) if self.etag_lookup else None
+            if etag is None:
+                head, _ = await self._with_retries(
+                    request.bucket, lambda: self.transport.head(request.bucket, request.key)
+                )
+                etag = head['ETag']
+            self._etags[known] = etag
+        return self._etags[known]
+
+    async def read(self, request: FetchRequest) -> bytes:
+        """Object (or range) bytes in memory, through the cache; for small objects such as .idx files"""
+        self.metrics.requests += 1
+        try:
+            etag = await self.etag(request) if self.cache else None
+            if self.cache:
+                data = await self.transport.run_blocking(
+                    self.cache.get, request.bucket, request.key, etag, request.byte_range
+                )
+                if data is not None:
+                    self.metrics.cache_hits += 1
+                    self.metrics.bytes_from_cache += len(data)
+                    self.metrics.completed += 1
+                    return data
+
+            async def download() -> bytes:
+                chunks = [chunk async for chunk in self.transport.stream(request.bucket, request.key,
+                                                                          request.byte_range)]
+                return b''.join(chunks)
+
+            data, _ = await self._with_retries(request.bucket, download)
+            self.metrics.bytes_downloaded += len(data)
+            if self.cache:
+                self.cache.count_download(len(data))
+                await self.transport.run_blocking(
+                    self.cache.put, request.bucket, request.key, etag, data, request.byte_range
+                )
+        except Exception:
+            self.metrics.failed += 1
+            raise
+        self.metrics.completed += 1
+        return data
+
+    async def _download_to(self, request: FetchRequest, partial_path: Path) -> int:
+        """Stream the body into partial_path, starting over on every attempt"""
+        handle = await self.transport.run_blocking(open, partial_path, 'wb')
+        size = 0
+        try:
+            async for chunk in self.transport.stream(request.bucket, request.key, request.byte_range):
+                await self.transport.run_blocking(handle.write, chunk)
+                size += len(chunk)
+        finally:
+            await self.transport.run_blocking(handle.close)
+        return size
+
+    async def fetch(self, request: FetchRequest) -> FetchResult:
+        """Stream one object to request.destination and/or the cache; failures come back as results"""
+        start = time.time()
+        self.metrics.requests += 1
+        partial_path = None
+        try:
+            etag = await self.etag(request) if self.cache else None
+            if self.cache:
+                blob = await self.transport.run_blocking(self.cache.get_path, request.bucket, request.key,
+                                                         etag, request.byte_range)
+                if blob is not None:
+                    size = blob.stat().st_size
+                    path = blob
+                    if request.destination:
+                        path = await self.transport.run_blocking(_copy_atomic, blob, request.destination)
+                    self.metrics.cache_hits += 1
+                    self.metrics.bytes_from_cache += size
+                    self.metrics.completed += 1
+                    return FetchResult(request, path, size, 0, True, time.time() - start)
+
+            if self.cache:
+                partial_path = self.cache.partial_path(request.bucket, request.key, etag, request.byte_range)
+            else:
+                request.destination.parent.mkdir(parents=True, exist_ok=True)
+                partial_path = request.destination.with_name(request.destination.name + '.part')
+            size, attempts = await self._with_retries(request.bucket,
+                                                      lambda: self._download_to(request, partial_path))
+            self.metrics.bytes_downloaded += size
+
+            path = request.destination
+            if self.cache:
+                self.cache.count_download(size)
+                if request.destination:
+                    await self.transport.run_blocking(_copy_atomic, partial_path, request.destination)
+                blob = await self.transport.run_blocking(self.cache.put_file, request.bucket, request.key, etag,
+                                                         partial_path, request.byte_range)
+                path = request.destination or blob
+            else:
+                partial_path.replace(request.destination)
+        except Exception as e:
+            self.metrics.failed += 1
+            if partial_path is not None:
+                await self.transport.run_blocking(partial_path.unlink, missing_ok=True)
+            return FetchResult(request, None, 0, 0, False, time.time() - start, str(e))
+        self.metrics.completed += 1
+        return FetchResult(request, path, size, attempts, False, time.time() - start)
+
+    async def fetch_many(self, requests: Iterable[FetchRequest]) -> List[FetchResult]:
+        """fetch() every request concurrently (within the bucket limits), results in request order"""
+        return list(await asyncio.gather(*(self.fetch(request) for request in requests)))
+
+    async def _report_progress(self):
+        while True:
+            await asyncio.sleep(self.progress_seconds)
+            self.progress(self.metrics.report())
+
+    async def _run(self, awaitable: Awaitable):
+        reporter = asyncio.ensure_future(self._report_progress()) if self.progress else None
+        try:
+            return await awaitable
+        finally:
+            if reporter:
+                reporter.cancel()
+
+    def run(self, awaitable: Awaitable):
+        """Run a coroutine built on this fetcher to completion on a fresh event loop, with fresh metrics"""
+        self._semaphores = {}  # Semaphores belong to the loop they were first used on
+        self.metrics = FetchMetrics()
+        return asyncio.run(self._run(awaitable))
+
+    def close(self):
+        self.transport.close()
+
+
+def _copy_atomic(source: Path, destination: Path) -> Path:
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    partial_path = destination.with_name(destination.name + '.part')
+    shutil.copyfile(source, partial_path)
+    partial_path.replace(destination)
+    return destination
+
+
+def fetcher_for_client(s3_client, bucket_concurrency: Optional[Dict[str, int]] = None,
+                       default_concurrency: int = DEFAULT_BUCKET_CONCURRENCY,
+                       progress: Optional[Callable[[Dict], None]] = None) -> AsyncS3Fetcher:
+    """AsyncS3Fetcher over the client an ingester already uses
+
+    A CachingS3Client is unwrapped: the fetcher streams into its cache itself
+    and reuses the ETags its listings remembered.
+    """
+    cache = etag_lookup = None
+    if isinstance(s3_client, CachingS3Client):
+        cache, etag_lookup = s3_client.cache, s3_client.known_etag
+        s3_client = s3_client.client
+    workers = sum((bucket_concurrency or {}).values()) + default_concurrency
+    return AsyncS3Fetcher(ThreadedS3Transport(s3_client, workers), cache, bucket_concurrency, default_concurrency,
+                          etag_lookup=etag_lookup, progress=progress)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark grib2_forecasts loading formats for db-6
+Compares INSERT statements, COPY text and COPY binary on the same generated
+forecast slabs: serialization time and size always, and load time into
+PostgreSQL with --load (rows go to a temporary copy of grib2_forecasts).
+"""
+
+import sys
+import time
+import logging
+import argparse
+from typing import Callable, Dict, List, Optional
+
+from generate_large_dataset import (
+    SEEDED_REFERENCE_TIME, ForecastGrid, format_grib2_slab_binary, format_grib2_slab_copy,
+    format_grib2_slab_sql, generate_grib2_forecasts
+)
+from load_copy_dataset import get_postgres_connection
+from pg_binary_copy import BinaryCopyEncoder, ChunkStream, binary_copy_stream
+
+logger = logging.getLogger(__name__)
+
+GRIB2_ENCODER = BinaryCopyEncoder('grib2_forecasts')
+GRIB2_COLUMNS = ', '.join(GRIB2_ENCODER.column_names)
+
+# INSERT statements sent per execute() call when loading
+INSERT_BATCH_SIZE = 1000
+
+
+def serialize_slabs(slabs: List, grid: ForecastGrid, formatter: Callable) -> List:
+    """Format every slab with one of the generator's slab formatters"""
+    return [formatter(grid, forecast_time, param, values) for forecast_time, param, values in slabs]
+
+
+def load_insert(conn, blocks: List[List[str]]):
+    """Execute INSERT statements in batches"""
+    cursor = conn.cursor()
+    for records in blocks:
+        for start in range(0, len(records), INSERT_BATCH_SIZE):
+            cursor.execute(''.join(records[start:start + INSERT_BATCH_SIZE]))
+    cursor.close()
+
+
+def load_copy_text(conn, blocks: List[List[str]]):
+    """COPY text rows from memory"""
+    cursor = conn.cursor()
+    cursor.copy_expert(f"COPY grib2_forecasts ({GRIB2_COLUMNS}) FROM STDIN", ChunkStream(''.join(records).encode('utf-8') for records in blocks))
+    cursor.close()
+
+
+def load_copy_binary(conn, blocks: List[List[bytes]]):
+    """COPY binary tuples from memory"""
+    cursor = conn.cursor()
+    cursor.copy_expert(GRIB2_ENCODER.copy_sql(), binary_copy_stream(b''.join(records) for records in blocks))
+    cursor.close()
+
+
+def time_load(conn, loader: Callable, blocks: List) -> float:
+    """Load blocks into an empty temporary grib2_forecasts; returns elapsed seconds"""
+    cursor = conn.cursor()
+    cursor.execute("TRUNCATE grib2_forecasts")
+    conn.commit()
+    start = time.perf_counter()
+    loader(conn, blocks)
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    cursor.close()
+    return elapsed
+
+
+def run_benchmark(slab_count: int, seed: int, load: bool) -> List[Dict]:
+    """Serialize (and optionally load) slab_count GRIB2 slabs in every format"""
+    grid = ForecastGrid()
+    slabs = list(generate_grib2_forecasts(grid, seed, SEEDED_REFERENCE_TIME, 0, slab_count))
+    rows = slab_count * len(grid)
+
+    # Warm the per-grid caches so they do not count against the first format
+    for formatter in (format_grib2_slab_sql, format_grib2_slab_copy, format_grib2_slab_binary):
+        formatter(grid, *slabs[0])
+
+    formats = [
+        ('INSERT', format_grib2_slab_sql, load_insert),
+        ('COPY text', format_grib2_slab_copy, load_copy_text),
+        ('COPY binary', format_grib2_slab_binary, load_copy_binary)
+    ]
+
+    conn = None
+    if load:
+        conn = get_postgres_connection()
+        if conn is None:
+            raise RuntimeError("--load needs a PostgreSQL connection (see POSTGRES_* environment variables)")
+        cursor = conn.cursor()
+        # Shadows the real table for this session only; keeps the primary key for ON CONFLICT
+        cursor.execute("CREATE TEMP TABLE grib2_forecasts (LIKE public.grib2_forecasts INCLUDING ALL)")
+        conn.commit()
+        cursor.close()
+
+    results = []
+    try:
+        for name, formatter, loader in formats:
+            start = time.perf_counter()
+            blocks = serialize_slabs(slabs, grid, formatter)
+            serialize_seconds = time.perf_counter() - start
+            size = sum(len(r) if isinstance(r, bytes) else len(r.encode('utf-8')) for b in blocks for r in b)
+            result = {
+                'format': name,
+                'rows': rows,
+                'bytes': size,
+                'serialize_seconds': serialize_seconds,
+                'load_seconds': time_load(conn, loader, blocks) if conn is not None else None
+            }
+            results.append(result)
+            del blocks
+    finally:
+        if conn is not None:
+            conn.close()
+
+    return results
+
+
+def print_results(results: List[Dict]):
+    """Print a comparison table"""
+    print(f"\n{'Format':<12} {'Rows':>10} {'MB':>9} {'B/row':>7} {'Serialize s':>12} {'rows/s':>11} "
+          f"{'Load s':>8} {'rows/s':>11}")
+    print("-" * 88)
+    for r in results:
+        load = (f"{r['load_seconds']:>8.2f} {r['rows'] / r['load_seconds']:>11,.0f}"
+                if r['load_seconds'] is not None else f"{'-':>8} {'-':>11}")
+        print(f"{r['format']:<12} {r['rows']:>10,} {r['bytes'] / (1024**2):>9.1f} {r['bytes'] / r['rows']:>7.0f} "
+              f"{r['serialize_seconds']:>12.2f} {r['rows'] / r['serialize_seconds']:>11,.0f} {load}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Benchmark INSERT vs COPY text vs COPY binary for grib2_forecasts')
+    parser.add_argument('--slabs', type=int, default=4,
+                        help='GRIB2 (forecast_time, parameter) slabs to generate (default: 4)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for the generated values (default: 0)')
+    parser.add_argument('--load', action='store_true',
+                        help='Also time loading into PostgreSQL (temporary table)')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Main benchmark function"""
+    args = parse_args(argv)
+    results = run_benchmark(args.slabs, args.seed, args.load)
+    print_results(results)
+    return True
+
+
+if __name__ == '__main__':
+    success = main()
+    sys.exit(0 if success else 1)
@@ -3,18 +3,54 @@
 Generate Large Dataset Script for db-6 Weather/Insurance Database
 Generates at least 1 GB of realistic weather and insurance data.
 Uses legitimate data patterns from NWS API, NOAA, and realistic geographic coverage.
+
+Output formats:
+  sql     - data_large.sql with one INSERT ... ON CONFLICT statement per row
+  copy    - data_large_copy/ with one PostgreSQL COPY text file per table plus
+            manifest.json (load with load_copy_dataset.py)
+  binary  - data_large_binary/, like copy but grib2_forecasts is written in
+            binary COPY format straight from the NumPy slabs
+
+With --direct, copy/binary rows are streamed into PostgreSQL with COPY FROM STDIN
+instead of being written to disk.
+
+File output is checkpointed after every table and GRIB2 slab (<output>.checkpoint.json);
+rerun with the same options plus --resume to continue an interrupted run.
+
+--compress gzip|zstd writes every output file as a compressed stream (.gz/.zst);
+the size target still counts uncompressed bytes.
 """
 
+import os
 import sys
 import json
+import hashlib
 import logging
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from bisect import bisect_left
+from itertools import accumulate, islice
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 import random
 import uuid
 import math
 
+import numpy as np
+
+# Add root scripts to path (shared compressed_io helpers)
+sys.path.append(str(Path(__file__).parent.parent.parent / 'scripts'))
+
+from compressed_io import CODECS, compressed_path, open_compressed
+from load_copy_dataset import get_postgres_connection
+from pg_binary_copy import (
+    COPY_HEADER, COPY_TRAILER, BinaryCopyEncoder, ChunkStream, binary_copy_stream, encode_numeric,
+    encode_prefixed_text, encode_text
+)
+from weather_fields import WeatherFieldSynthesizer
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -31,6 +67,21 @@ OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 TARGET_SIZE_GB = 1.0
 TARGET_SIZE_BYTES = TARGET_SIZE_GB * 1024 * 1024 * 1024
 
+# Output buffer size for the streaming writer (statements are never held in memory)
+WRITE_BUFFER_BYTES = 8 * 1024 * 1024
+
+# Log progress every N records written by block-oriented generators
+PROGRESS_INTERVAL = 1_000_000
+
+# Rows per COPY statement/commit in --direct mode
+DIRECT_BATCH_ROWS = 100_000
+
+# Records sampled per table when planning shard row counts
+ROW_SAMPLE_SIZE = 1000
+
+# Single-output generation steps in order; the checkpoint records the next one to run
+GENERATION_STEPS = ['stations', 'boundaries', 'grib2', 'observations', 'insurance', 'complete']
+
 # US Geographic Coverage (realistic bounds)
 US_BOUNDS = {
     'west': -125.0,
@@ -55,6 +106,9 @@ WEATHER_PARAMETERS = [
     'HeatIndex', 'WindChill', 'ApparentTemperature'
 ]
 
+# Forecast grid resolution (0.1 degree ~11km)
+GRID_RESOLUTION = 0.1
+
 # CWA Codes (Weather Forecast Offices)
 CWA_CODES = [
     'AKQ', 'ALY', 'BGM', 'BOX', 'BTV', 'BUF', 'CAR', 'CHS', 'CLE', 'CTP',
@@ -74,11 +128,112 @@ FORECAST_START = datetime(2025, 12, 3)
 FORECAST_END = datetime(2025, 12, 17)
 FORECAST_DAYS = list(range(7, 15))  # 7-14 days ahead
 
+# Fixed "now" for seeded runs, so timestamps are reproducible too
+SEEDED_REFERENCE_TIME = datetime(2025, 12, 17)
+
+# Generated tables in load order: (column, kind) pairs plus the INSERT conflict clause.
+# Kinds control SQL literal formatting: text is quoted, num/bool are written as-is,
+# geog is wrapped in ST_GeogFromText. COPY output writes every kind as plain text.
+TABLE_SPECS = {
+    'weather_stations': {
+        'columns': [
+            ('station_id', 'text'), ('station_name', 'text'), ('station_latitude', 'num'),
+            ('station_longitude', 'num'), ('station_geom', 'geog'), ('elevation_meters', 'num'),
+            ('state_code', 'text'), ('county_name', 'text'), ('cwa_code', 'text'), ('station_type', 'text'),
+            ('active_status', 'bool'), ('first_observation_date', 'text'), ('last_observation_date', 'text'),
+            ('update_frequency_minutes', 'num')
+        ],
+        'conflict': 'ON CONFLICT (station_id) DO UPDATE SET last_observation_date = EXCLUDED.last_observation_date'
+    },
+    'shapefile_boundaries': {
+        'columns': [
+            ('boundary_id', 'text'), ('feature_type', 'text'), ('feature_name', 'text'),
+            ('feature_identifier', 'text'), ('boundary_geom', 'geog'), ('source_shapefile', 'text'),
+            ('source_crs', 'text'), ('target_crs', 'text'), ('feature_count', 'num'),
+            ('spatial_extent_west', 'num'), ('spatial_extent_south', 'num'), ('spatial_extent_east', 'num'),
+            ('spatial_extent_north', 'num'), ('transformation_status', 'text'), ('state_code', 'text'),
+            ('office_code', 'text')
+        ],
+        'conflict': 'ON CONFLICT (boundary_id) DO NOTHING'
+    },
+    'grib2_forecasts': {
+        'columns': [
+            ('forecast_id', 'text'), ('parameter_name', 'text'), ('forecast_time', 'text'),
+            ('grid_cell_latitude', 'num'), ('grid_cell_longitude', 'num'), ('grid_cell_geom', 'geog'),
+            ('parameter_value', 'num'), ('source_file', 'text'), ('source_crs', 'text'), ('target_crs', 'text'),
+            ('grid_resolution_x', 'num'), ('grid_resolution_y', 'num'), ('spatial_extent_west', 'num'),
+            ('spatial_extent_south', 'num'), ('spatial_extent_east', 'num'), ('spatial_extent_north', 'num'),
+            ('transformation_status', 'text')
+        ],
+        'conflict': 'ON CONFLICT (forecast_id) DO UPDATE SET parameter_value = EXCLUDED.parameter_value'
+    },
+    'weather_observations': {
+        'columns': [
+            ('observation_id', 'text'), ('station_id', 'text'), ('station_name', 'text'),
+            ('observation_time', 'text'), ('station_latitude', 'num'), ('station_longitude', 'num'),
+            ('station_geom', 'geog'), ('temperature', 'num'), ('dewpoint', 'num'), ('humidity', 'num'),
+            ('wind_speed', 'num'), ('wind_direction', 'num'), ('pressure', 'num'), ('visibility', 'num'),
+            ('sky_cover', 'text'), ('precipitation_amount', 'num'), ('data_freshness_minutes', 'num'),
+            ('data_source', 'text')
+        ],
+        'conflict': 'ON CONFLICT (observation_id) DO UPDATE SET temperature = EXCLUDED.temperature'
+    },
+    'insurance_policy_areas': {
+        'columns': [
+            ('policy_area_id', 'text'), ('boundary_id', 'text'), ('policy_type', 'text'),
+            ('coverage_type', 'text'), ('policy_area_name', 'text'), ('state_code', 'text'),
+            ('cwa_code', 'text'), ('risk_zone', 'text'), ('base_rate_factor', 'num'),
+            ('effective_date', 'text'), ('expiration_date', 'text'), ('is_active', 'bool')
+        ],
+        'conflict': 'ON CONFLICT (policy_area_id) DO NOTHING'
+    },
+    'insurance_risk_factors': {
+        'columns': [
+            ('risk_factor_id', 'text'), ('policy_area_id', 'text'), ('forecast_period_start', 'text'),
+            ('forecast_period_end', 'text'), ('forecast_day', 'num'), ('forecast_date', 'text'),
+            ('parameter_name', 'text'), ('extreme_event_probability', 'num'),
+            ('cumulative_precipitation_risk', 'num'), ('wind_damage_risk', 'num'), ('freeze_risk', 'num'),
+            ('flood_risk', 'num'), ('min_forecast_value', 'num'), ('max_forecast_value', 'num'),
+            ('avg_forecast_value', 'num'), ('median_forecast_value', 'num'), ('stddev_forecast_value', 'num'),
+            ('percentile_90_value', 'num'), ('percentile_95_value', 'num'), ('percentile_99_value', 'num'),
+            ('overall_risk_score', 'num'), ('risk_category', 'text'), ('forecast_model', 'text'),
+            ('data_quality_score', 'num')
+        ],
+        'conflict': 'ON CONFLICT (risk_factor_id) DO NOTHING'
+    }
+}
+
+SQL_LITERALS = {
+    'text': "'{}'",
+    'num': '{}',
+    'bool': '{}',
+    'geog': "ST_GeogFromText('{}')"
+}
+
+# Generated column values never contain these, but escape them for COPY text format anyway
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def encoded_length(record) -> int:
+    """UTF-8 size of a formatted record without re-encoding it
+
+    Generated text is ASCII, where the character count is the byte count
+    (str.isascii() is a flag check, not a scan); bytes records are measured directly.
+    """
+    if isinstance(record, bytes) or record.isascii():
+        return len(record)
+    return len(record.encode('utf-8'))
+
 
-def generate_geography_point() -> Tuple[float, float]:
+def table_columns(table: str) -> List[str]:
+    """Column names for a generated table"""
+    return [column for column, _ in TABLE_SPECS[table]['columns']]
+
+
+def generate_geography_point(rng: random.Random) -> Tuple[float, float]:
     """Generate realistic US geographic coordinates"""
-    lat = random.uniform(US_BOUNDS['south'], US_BOUNDS['north'])
-    lon = random.uniform(US_BOUNDS['west'], US_BOUNDS['east'])
+    lat = rng.uniform(US_BOUNDS['south'], US_BOUNDS['north'])
+    lon = rng.uniform(US_BOUNDS['west'], US_BOUNDS['east'])
     return (lat, lon)
 
 
@@ -92,306 +247,1278 @@ def generate_geography_wkt(lat: float, lon: float, is_polygon: bool = False) ->
         return f"POINT({lon} {lat})"
 
 
-def generate_weather_stations_sql(count: int) -> List[str]:
-    """Generate weather station metadata"""
-    sql = []
+def generate_weather_stations(count: int, rng: random.Random, now: datetime) -> Iterator[Tuple]:
+    """Generate weather station metadata rows (station ids are unique)"""
+    used_ids = set()
     for i in range(count):
-        station_id = f"K{random.choice(['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J'])}{random.randint(100, 999)}"
-        lat, lon = generate_geography_point()
-        state = random.choice(US_STATES)
-        cwa = random.choice(CWA_CODES)
-        
-        station_sql = f"""INSERT INTO weather_stations (station_id, station_name, station_latitude, station_longitude, station_geom, elevation_meters, state_code, county_name, cwa_code, station_type, active_status, first_observation_date, last_observation_date, update_frequency_minutes) VALUES
-('{station_id}', 'Weather Station {station_id}', {lat:.7f}, {lon:.7f}, ST_GeogFromText('{generate_geography_wkt(lat, lon)}'), {random.uniform(0, 3000):.2f}, '{state}', 'County {i}', '{cwa}', 'ASOS', TRUE, '{datetime.now() - timedelta(days=365*5)}', '{datetime.now()}', 15)
-ON CONFLICT (station_id) DO UPDATE SET last_observation_date = EXCLUDED.last_observation_date;"""
-        
-        sql.append(station_sql)
-    
-    return sql
-
-
-def generate_grib2_forecasts_sql(target_bytes: int, current_size: int) -> Tuple[List[str], int]:
-    """Generate GRIB2 forecast data - main data generator"""
-    sql = []
-    records_generated = 0
-    
-    # Generate forecasts for multiple time periods
+        station_id = f"K{rng.choice(['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J'])}{rng.randint(100, 999)}"
+        while station_id in used_ids:
+            station_id = f"K{rng.choice(['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J'])}{rng.randint(100, 999)}"
+        used_ids.add(station_id)
+        lat, lon = generate_geography_point(rng)
+        state = rng.choice(US_STATES)
+        cwa = rng.choice(CWA_CODES)
+
+        yield (
+            station_id, f'Weather Station {station_id}', f'{lat:.7f}', f'{lon:.7f}',
+            generate_geography_wkt(lat, lon), f'{rng.uniform(0, 3000):.2f}', state, f'County {i}', cwa,
+            'ASOS', 'TRUE', f'{now - timedelta(days=365*5)}', f'{now}', '15'
+        )
+
+
+def generate_forecast_times(now: datetime) -> List[datetime]:
+    """Forecast issuance times: 60 days, 4 cycles per day"""
     forecast_times = []
-    base_time = datetime.now() - timedelta(days=30)
+    base_time = now - timedelta(days=30)
     for day in range(60):  # 60 days of forecasts
         for hour in [0, 6, 12, 18]:  # 4 forecasts per day
             forecast_times.append(base_time + timedelta(days=day, hours=hour))
-    
-    # Grid resolution (0.1 degree ~11km)
-    grid_resolution = 0.1
-    
-    # Generate grid cells covering US
-    grid_cells = []
-    lat_step = grid_resolution
-    lon_step = grid_resolution
-    
-    lat_start = US_BOUNDS['south']
-    lat_end = US_BOUNDS['north']
-    lon_start = US_BOUNDS['west']
-    lon_end = US_BOUNDS['east']
-    
-    # Generate grid cells
-    for lat in range(int((lat_end - lat_start) / lat_step)):
-        for lon in range(int((lon_end - lon_start) / lon_step)):
-            grid_lat = lat_start + lat * lat_step
-            grid_lon = lon_start + lon * lon_step
-            grid_cells.append((grid_lat, grid_lon))
-    
-    logger.info(f"Generating GRIB2 forecasts: {len(forecast_times)} time periods, {len(grid_cells)} grid cells, {len(WEATHER_PARAMETERS)} parameters")
-    
-    # Generate forecasts
-    for forecast_time in forecast_times:
-        for param in WEATHER_PARAMETERS:
-            for grid_lat, grid_lon in grid_cells:
-                # Generate realistic parameter values
-                if param == 'Temperature':
-                    value = random.uniform(-20, 110)  # Fahrenheit
-                elif param == 'Dewpoint':
-                    value = random.uniform(-30, 80)
-                elif param == 'RelativeHumidity':
-                    value = random.uniform(0, 100)
-                elif param == 'WindSpeed':
-                    value = random.uniform(0, 60)
-                elif param == 'WindDirection':
-                    value = random.randint(0, 360)
-                elif param == 'Pressure':
-                    value = random.uniform(28.0, 31.0)  # inches Hg
-                elif param == 'Visibility':
-                    value = random.uniform(0, 10)
-                elif param == 'Precipitation':
-                    value = random.uniform(0, 5)
-                else:
-                    value = random.uniform(0, 100)
-                
-                forecast_id = f"grib2-{param.lower()}-{forecast_time.strftime('%Y%m%d%H')}-{grid_lat:.3f}-{grid_lon:.3f}"
-                
-                forecast_sql = f"""INSERT INTO grib2_forecasts (forecast_id, parameter_name, forecast_time, grid_cell_latitude, grid_cell_longitude, grid_cell_geom, parameter_value, source_file, source_crs, target_crs, grid_resolution_x, grid_resolution_y, spatial_extent_west, spatial_extent_south, spatial_extent_east, spatial_extent_north, transformation_status) VALUES
-('{forecast_id}', '{param}', '{forecast_time}', {grid_lat:.7f}, {grid_lon:.7f}, ST_GeogFromText('{generate_geography_wkt(grid_lat, grid_lon)}'), {value:.2f}, 'ndfd_grib2_{forecast_time.strftime("%Y%m%d%H")}.grb2', 'EPSG:4326', 'EPSG:4326', {grid_resolution:.6f}, {grid_resolution:.6f}, {US_BOUNDS['west']:.6f}, {US_BOUNDS['south']:.6f}, {US_BOUNDS['east']:.6f}, {US_BOUNDS['north']:.6f}, 'completed')
-ON CONFLICT (forecast_id) DO UPDATE SET parameter_value = EXCLUDED.parameter_value;"""
-                
-                sql.append(forecast_sql)
-                current_size += len(forecast_sql.encode('utf-8'))
-                records_generated += 1
-                
-                if current_size >= target_bytes:
-                    logger.info(f"Reached target size with GRIB2 forecasts: {current_size / (1024**3):.2f} GB")
-                    return sql, current_size
-                
-                if records_generated % 100000 == 0:
-                    logger.info(f"  Generated {records_Rebuilt:,} GRIB2 forecasts ({current_size / (1024**3):.2f} GB)")
-    
-    return sql, current_size
-
-
-def generate_weather_observations_sql(station_ids: List[str], target_bytes: int, current_size: int) -> Tuple[List[str], int]:
-    """Generate weather observations"""
-    sql = []
-    records_generated = 0
-    
+    return forecast_times
+
+
+class ForecastGrid:
+    """Regular lat/lon grid covering US_BOUNDS, with per-cell text fragments built once"""
+
+    def __init__(self, resolution: float = GRID_RESOLUTION):
+        self.resolution = resolution
+        lat_count = int((US_BOUNDS['north'] - US_BOUNDS['south']) / resolution)
+        lon_count = int((US_BOUNDS['east'] - US_BOUNDS['west']) / resolution)
+        self.shape = (lat_count, lon_count)
+
+        # Row-major (latitude outer, longitude inner) cell ordering
+        lat_index, lon_index = np.meshgrid(np.arange(lat_count), np.arange(lon_count), indexing='ij')
+        self.latitudes = (US_BOUNDS['south'] + lat_index * resolution).ravel()
+        self.longitudes = (US_BOUNDS['west'] + lon_index * resolution).ravel()
+
+        # Cell coordinates never change between slabs, so format them once
+        cells = list(zip(self.latitudes.tolist(), self.longitudes.tolist()))
+        self.id_fragments = [f"{lat:.3f}-{lon:.3f}" for lat, lon in cells]
+        self.cell_columns = [(f"{lat:.7f}", f"{lon:.7f}", generate_geography_wkt(lat, lon)) for lat, lon in cells]
+        self._coord_fragments = {}
+        self._binary_columns = None
+
+    def __len__(self) -> int:
+        return len(self.id_fragments)
+
+    def coord_fragments(self, template: str) -> List[str]:
+        """Per-cell latitude/longitude/geometry text for one output format (cached)"""
+        if template not in self._coord_fragments:
+            self._coord_fragments[template] = [template.format(*columns) for columns in self.cell_columns]
+        return self._coord_fragments[template]
+
+    def binary_columns(self) -> Dict:
+        """Binary COPY encoded latitude/longitude/geometry columns and encoded cell ids (cached)"""
+        if self._binary_columns is None:
+            self._binary_columns = {
+                'grid_cell_latitude': encode_numeric(self.latitudes, 10, 7),
+                'grid_cell_longitude': encode_numeric(self.longitudes, 10, 7),
+                'grid_cell_geom': encode_text([wkt for _, _, wkt in self.cell_columns]),
+                'id_fragments': [cell_id.encode('utf-8') for cell_id in self.id_fragments]
+            }
+        return self._binary_columns
+
+
+def generate_grib2_slabs(now: datetime) -> List[Tuple[datetime, str]]:
+    """All (forecast_time, parameter) slabs in generation order"""
+    return [(forecast_time, param) for forecast_time in generate_forecast_times(now) for param in WEATHER_PARAMETERS]
+
+
+def generate_grib2_forecasts(grid: ForecastGrid, seed: int, now: datetime,
+                             start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[datetime, str, np.ndarray]]:
+    """Generate GRIB2 forecast data - main data generator
+
+    Yields one (forecast_time, parameter, values) slab covering every grid cell.
+    All parameters of a forecast time are synthesized together as coherent fields
+    (see weather_fields.py); each forecast time depends only on seed, so start/stop
+    can select any contiguous range of slabs (sharded and resumed generation).
+    """
+    slabs = generate_grib2_slabs(now)[start:stop]
+    synthesizer = WeatherFieldSynthesizer(grid.latitudes, grid.longitudes, grid.shape, grid.resolution, seed)
+
+    logger.info(f"Generating GRIB2 forecasts: {len(slabs)} slabs of {len(grid)} grid cells")
+
+    fields_time = None
+    for forecast_time, param in slabs:
+        if forecast_time != fields_time:
+            fields = synthesizer.fields(forecast_time)
+            fields_time = forecast_time
+        yield forecast_time, param, fields[param]
+
+
+def generate_weather_observations(station_ids: List[str], rng: random.Random, now: datetime) -> Iterator[Tuple]:
+    """Generate weather observation rows"""
     # Generate observations for past 90 days, hourly
-    base_time = datetime.now() - timedelta(days=90)
+    base_time = now - timedelta(days=90)
     observation_times = []
     for day in range(90):
         for hour in range(24):
             observation_times.append(base_time + timedelta(days=day, hours=hour))
-    
+
     logger.info(f"Generating weather observations: {len(station_ids)} stations, {len(observation_times)} time periods")
-    
+
     for station_id in station_ids:
-        lat, lon = generate_geography_point()
+        lat, lon = generate_geography_point(rng)
         station_name = f"Weather Station {station_id}"
-        
+
         for obs_time in observation_times:
             observation_id = f"obs-{station_id}-{obs_time.strftime('%Y%m%d%H%M')}"
-            
+
             # Generate realistic weather values
-            temp = random.uniform(-20, 110)
-            dewpoint = temp - random.uniform(0, 30)
-            humidity = random.uniform(20, 100)
-            wind_speed = random.uniform(0, 40)
-            wind_dir = random.randint(0, 360)
-            pressure = random.uniform(28.5, 30.5)
-            visibility = random.uniform(0, 10)
-            sky_cover = random.choice(['Clear', 'Few', 'Scattered', 'Broken', 'Overcast'])
-            precip = random.uniform(0, 2) if random.random() < 0.3 else 0
-            
-            obs_sql = f"""INSERT INTO weather_observations (observation_id, station_id, station_name, observation_time, station_latitude, station_longitude, station_geom, temperature, dewpoint, humidity, wind_speed, wind_direction, pressure, visibility, sky_cover, precipitation_amount, data_freshness_minutes, data_source) VALUES
-('{observation_id}', '{station_id}', '{station_name}', '{obs_time}', {lat:.7f}, {lon:.7f}, ST_GeogFromText('{generate_geography_wkt(lat, lon)}'), {temp:.2f}, {dewpoint:.2f}, {humidity:.2f}, {wind_speed:.2f}, {wind_dir}, {pressure:.2f}, {visibility:.2f}, '{sky_cover}', {precip:.2f}, {random.randint(5, 60)}, 'NWS_API')
-ON CONFLICT (observation_id) DO UPDATE SET temperature = EXCLUDED.temperature;"""
-            
-            sql.append(obs_sql)
-            current_size += len(obs_sql.encode('utf-8'))
-            records_generated += 1
-            
-            if current_size >= target_bytes:
-                logger.info(f"Reached target size with observations: {current_size / (1024**3):.2f} GB")
-                return sql, current_size
-    
-    return sql, current_size
-
-
-def generate_shapefile_boundaries_sql(count: int) -> List[str]:
-    """Generate shapefile boundary data"""
-    sql = []
+            temp = rng.uniform(-20, 110)
+            dewpoint = temp - rng.uniform(0, 30)
+            humidity = rng.uniform(20, 100)
+            wind_speed = rng.uniform(0, 40)
+            wind_dir = rng.randint(0, 360)
+            pressure = rng.uniform(28.5, 30.5)
+            visibility = rng.uniform(0, 10)
+            sky_cover = rng.choice(['Clear', 'Few', 'Scattered', 'Broken', 'Overcast'])
+            precip = rng.uniform(0, 2) if rng.random() < 0.3 else 0
+
+            yield (
+                observation_id, station_id, station_name, f'{obs_time}', f'{lat:.7f}', f'{lon:.7f}',
+                generate_geography_wkt(lat, lon), f'{temp:.2f}', f'{dewpoint:.2f}', f'{humidity:.2f}',
+                f'{wind_speed:.2f}', f'{wind_dir}', f'{pressure:.2f}', f'{visibility:.2f}', sky_cover,
+                f'{precip:.2f}', f'{rng.randint(5, 60)}', 'NWS_API'
+            )
+
+
+def generate_shapefile_boundaries(count: int, rng: random.Random) -> Iterator[Tuple]:
+    """Generate shapefile boundary rows"""
     feature_types = ['CWA', 'FireZone', 'MarineZone', 'RiverBasin', 'County']
-    
+
     for i in range(count):
-        feature_type = random.choice(feature_types)
-        state = random.choice(US_STATES)
-        cwa = random.choice(CWA_CODES) if feature_type == 'CWA' else None
-        
-        lat, lon = generate_geography_point()
+        feature_type = rng.choice(feature_types)
+        state = rng.choice(US_STATES)
+        cwa = rng.choice(CWA_CODES) if feature_type == 'CWA' else None
+
+        lat, lon = generate_geography_point(rng)
         boundary_id = f"boundary-{feature_type.lower()}-{state}-{i}"
-        
-        boundary_sql = f"""INSERT INTO shapefile_boundaries (boundary_id, feature_type, feature_name, feature_identifier, boundary_geom, source_shapefile, source_crs, target_crs, feature_count, spatial_extent_west, spatial_extent_south, spatial_extent_east, spatial_extent_north, transformation_status, state_code, office_code) VALUES
-('{boundary_id}', '{feature_type}', '{feature_type} {state} {i}', '{state}-{i}', ST_GeogFromText('{generate_geography_wkt(lat, lon, is_polygon=True)}'), 'noaa_{feature_type.lower()}_{state}.shp', 'EPSG:4326', 'EPSG:4326', {random.randint(1, 100)}, {lon-0.5:.6f}, {lat-0.5:.6f}, {lon+0.5:.6f}, {lat+0.5:.6f}, 'completed', '{state}', {'NULL' if cwa is None else f"'{cwa}'"})
-ON CONFLICT (boundary_id) DO NOTHING;"""
-        
-        sql.append(boundary_sql)
-    
-    return sql
-
-
-def generate_insurance_data_sql(boundary_ids: List[str], target_bytes: int, current_size: int) -> Tuple[List[str], int]:
-    """Generate insurance policy and risk factor data"""
-    sql = []
-    records_generated = 0
-    
-    # Generate policy areas
-    policy_areas = []
+
+        yield (
+            boundary_id, feature_type, f'{feature_type} {state} {i}', f'{state}-{i}',
+            generate_geography_wkt(lat, lon, is_polygon=True), f'noaa_{feature_type.lower()}_{state}.shp',
+            'EPSG:4326', 'EPSG:4326', f'{rng.randint(1, 100)}', f'{lon-0.5:.6f}', f'{lat-0.5:.6f}',
+            f'{lon+0.5:.6f}', f'{lat+0.5:.6f}', 'completed', state, cwa
+        )
+
+
+def generate_insurance_policy_areas(boundary_ids: List[str], rng: random.Random) -> Iterator[Tuple]:
+    """Generate insurance policy area rows"""
     for boundary_id in boundary_ids[:1000]:  # Limit to 1000 policy areas
         policy_area_id = f"policy-{boundary_id}"
-        policy_type = random.choice(POLICY_TYPES)
-        coverage_type = random.choice(COVERAGE_TYPES)
-        state = random.choice(US_STATES)
-        risk_zone = random.choice(['Low', 'Moderate', 'High', 'Very High'])
-        base_rate_factor = random.uniform(0.5, 2.0)
-        
-        policy_sql = f"""INSERT INTO insurance_policy_areas (policy_area_id, boundary_id, policy_type, coverage_type, policy_area_name, state_code, cwa_code, risk_zone, base_rate_factor, effective_date, expiration_date, is_active) VALUES
-('{policy_area_id}', '{boundary_id}', '{policy_type}', '{coverage_type}', '{policy_type} Coverage Area {boundary_id}', '{state}', '{random.choice(CWA_CODES)}', '{risk_zone}', {base_rate_factor:.3f}, '{FORECAST_START.date()}', '{FORECAST_END.date() + timedelta(days=365)}', TRUE)
-ON CONFLICT (policy_area_id) DO NOTHING;"""
-        
-        sql.append(policy_sql)
-        policy_areas.append(policy_area_id)
-        current_size += len(policy_sql.encode('utf-8'))
-    
-    # Generate risk factors for each policy area
-    logger.info(f"Generating insurance risk factors for {len(policy_areas)} policy areas")
-    
-    for policy_area_id in policy_areas:
+        policy_type = rng.choice(POLICY_TYPES)
+        coverage_type = rng.choice(COVERAGE_TYPES)
+        state = rng.choice(US_STATES)
+        risk_zone = rng.choice(['Low', 'Moderate', 'High', 'Very High'])
+        base_rate_factor = rng.uniform(0.5, 2.0)
+
+        yield (
+            policy_area_id, boundary_id, policy_type, coverage_type,
+            f'{policy_type} Coverage Area {boundary_id}', state, rng.choice(CWA_CODES), risk_zone,
+            f'{base_rate_factor:.3f}', f'{FORECAST_START.date()}', f'{FORECAST_END.date() + timedelta(days=365)}',
+            'TRUE'
+        )
+
+
+def generate_insurance_risk_factors(policy_area_ids: List[str], rng: random.Random) -> Iterator[Tuple]:
+    """Generate insurance risk factor rows for each policy area"""
+    logger.info(f"Generating insurance risk factors for {len(policy_area_ids)} policy areas")
+
+    for policy_area_id in policy_area_ids:
         for forecast_day in FORECAST_DAYS:
             for param in ['Temperature', 'Precipitation', 'WindSpeed']:
                 forecast_date = FORECAST_START - timedelta(days=forecast_day)
-                
+
                 # Generate risk metrics
-                extreme_prob = random.uniform(0, 0.3)
-                precip_risk = random.uniform(0, 100)
-                wind_risk = random.uniform(0, 100)
-                freeze_risk = random.uniform(0, 50)
-                flood_risk = random.uniform(0, 80)
-                
+                extreme_prob = rng.uniform(0, 0.3)
+                precip_risk = rng.uniform(0, 100)
+                wind_risk = rng.uniform(0, 100)
+                freeze_risk = rng.uniform(0, 50)
+                flood_risk = rng.uniform(0, 80)
+
                 # Generate forecast statistics
-                min_val = random.uniform(0, 50)
-                max_val = min_val + random.uniform(10, 100)
+                min_val = rng.uniform(0, 50)
+                max_val = min_val + rng.uniform(10, 100)
                 avg_val = (min_val + max_val) / 2
                 median_val = avg_val
                 stddev_val = (max_val - min_val) / 4
-                
+
                 risk_factor_id = f"risk-{policy_area_id}-{forecast_day}-{param.lower()}"
                 overall_risk = (precip_risk + wind_risk + freeze_risk + flood_risk) / 4
                 risk_category = 'Low' if overall_risk < 25 else 'Moderate' if overall_risk < 50 else 'High' if overall_risk < 75 else 'Very High'
-                
-                risk_sql = f"""INSERT INTO insurance_risk_factors (risk_factor_id, policy_area_id, forecast_period_start, forecast_period_end, forecast_day, forecast_date, parameter_name, extreme_event_probability, cumulative_precipitation_risk, wind_damage_risk, freeze_risk, flood_risk, min_forecast_value, max_forecast_value, avg_forecast_value, median_forecast_value, stddev_forecast_value, percentile_90_value, percentile_95_value, percentile_99_value, overall_risk_score, risk_category, forecast_model, data_quality_score) VALUES
-('{risk_factor_id}', '{policy_area_id}', '{FORECAST_START.date()}', '{FORECAST_END.date()}', {forecast_day}, '{forecast_date.date()}', '{param}', {extreme_prob:.4f}, {precip_risk:.2f}, {wind_risk:.2f}, {freeze_risk:.2f}, {flood_risk:.2f}, {min_val:.2f}, {max_val:.2f}, {avg_val:.2f}, {median_val:.2f}, {stddev_val:.2f}, {max_val * 0.9:.2f}, {max_val * 0.95:.2f}, {max_val * 0.99:.2f}, {overall_risk:.2f}, '{risk_category}', 'GFS', {random.uniform(85, 95):.2f})
-ON CONFLICT (risk_factor_id) DO NOTHING;"""
-                
-                sql.append(risk_sql)
-                current_size += len(risk_sql.encode('utf-8'))
-                records_generated += 1
-                
-                if current_size >= target_bytes:
-                    logger.info(f"Reached target size with insurance data: {current_size / (1024**3):.2f} GB")
-                    return sql, current_size
-    
-    return sql, current_size
-
-
-def main():
+
+                yield (
+                    risk_factor_id, policy_area_id, f'{FORECAST_START.date()}', f'{FORECAST_END.date()}',
+                    f'{forecast_day}', f'{forecast_date.date()}', param, f'{extreme_prob:.4f}',
+                    f'{precip_risk:.2f}', f'{wind_risk:.2f}', f'{freeze_risk:.2f}', f'{flood_risk:.2f}',
+                    f'{min_val:.2f}', f'{max_val:.2f}', f'{avg_val:.2f}', f'{median_val:.2f}', f'{stddev_val:.2f}',
+                    f'{max_val * 0.9:.2f}', f'{max_val * 0.95:.2f}', f'{max_val * 0.99:.2f}',
+                    f'{overall_risk:.2f}', risk_category, 'GFS', f'{rng.uniform(85, 95):.2f}'
+                )
+
+
+def format_insert_sql(table: str, row: Tuple) -> str:
+    """Format one row as an INSERT ... ON CONFLICT statement (including the trailing blank line)"""
+    spec = TABLE_SPECS[table]
+    values = ', '.join(
+        'NULL' if value is None else SQL_LITERALS[kind].format(value)
+        for value, (_, kind) in zip(row, spec['columns'])
+    )
+    return f"INSERT INTO {table} ({', '.join(table_columns(table))}) VALUES\n({values})\n{spec['conflict']};\n\n"
+
+
+def format_copy_row(table: str, row: Tuple) -> str:
+    """Format one row as a line of PostgreSQL COPY text format"""
+    return '\t'.join('\\N' if value is None else value.translate(COPY_ESCAPES) for value in row) + '\n'
+
+
+def format_grib2_slab_sql(grid: ForecastGrid, forecast_time: datetime, param: str,
+                          values: np.ndarray) -> List[str]:
+    """Serialize one (forecast_time, parameter) slab into INSERT statements"""
+    stamp = forecast_time.strftime('%Y%m%d%H')
+    head = f"""INSERT INTO grib2_forecasts ({', '.join(table_columns('grib2_forecasts'))}) VALUES
+('grib2-{param.lower()}-{stamp}-"""
+    middle = f"', '{param}', '{forecast_time}', "
+    tail = f""", 'ndfd_grib2_{stamp}.grb2', 'EPSG:4326', 'EPSG:4326', {grid.resolution:.6f}, {grid.resolution:.6f}, {US_BOUNDS['west']:.6f}, {US_BOUNDS['south']:.6f}, {US_BOUNDS['east']:.6f}, {US_BOUNDS['north']:.6f}, 'completed')
+{TABLE_SPECS['grib2_forecasts']['conflict']};
+
+"""
+    coord_fragments = grid.coord_fragments("{}, {}, ST_GeogFromText('{}')")
+
+    return [
+        f"{head}{cell_id}{middle}{coords}, {value:.2f}{tail}"
+        for cell_id, coords, value in zip(grid.id_fragments, coord_fragments, values.tolist())
+    ]
+
+
+def format_grib2_slab_copy(grid: ForecastGrid, forecast_time: datetime, param: str,
+                           values: np.ndarray) -> List[str]:
+    """Serialize one (forecast_time, parameter) slab into COPY text lines"""
+    stamp = forecast_time.strftime('%Y%m%d%H')
+    head = f"grib2-{param.lower()}-{stamp}-"
+    middle = f"\t{param}\t{forecast_time}\t"
+    tail = (f"\tndfd_grib2_{stamp}.grb2\tEPSG:4326\tEPSG:4326\t{grid.resolution:.6f}\t{grid.resolution:.6f}"
+            f"\t{US_BOUNDS['west']:.6f}\t{US_BOUNDS['south']:.6f}\t{US_BOUNDS['east']:.6f}\t{US_BOUNDS['north']:.6f}"
+            f"\tcompleted\n")
+    coord_fragments = grid.coord_fragments("{}\t{}\t{}")
+
+    return [
+        f"{head}{cell_id}{middle}{coords}\t{value:.2f}{tail}"
+        for cell_id, coords, value in zip(grid.id_fragments, coord_fragments, values.tolist())
+    ]
+
+
+GRIB2_BINARY_ENCODER = BinaryCopyEncoder('grib2_forecasts')
+
+
+def format_grib2_slab_binary(grid: ForecastGrid, forecast_time: datetime, param: str,
+                             values: np.ndarray) -> List[bytes]:
+    """Serialize one (forecast_time, parameter) slab into binary COPY tuples"""
+    stamp = forecast_time.strftime('%Y%m%d%H')
+    head = f"grib2-{param.lower()}-{stamp}-"
+    data = dict(grid.binary_columns())
+    data.update({
+        'forecast_id': encode_prefixed_text(head, data.pop('id_fragments')),
+        'parameter_name': param,
+        'forecast_time': forecast_time,
+        'parameter_value': values,
+        'source_file': f'ndfd_grib2_{stamp}.grb2',
+        'source_crs': 'EPSG:4326',
+        'target_crs': 'EPSG:4326',
+        'grid_resolution_x': grid.resolution,
+        'grid_resolution_y': grid.resolution,
+        'spatial_extent_west': US_BOUNDS['west'],
+        'spatial_extent_south': US_BOUNDS['south'],
+        'spatial_extent_east': US_BOUNDS['east'],
+        'spatial_extent_north': US_BOUNDS['north'],
+        'transformation_status': 'completed'
+    })
+    return GRIB2_BINARY_ENCODER.encode_rows(data, len(grid))
+
+
+class SQLStreamWriter:
+    """Buffered writer that streams INSERT statements to one SQL file as they are generated
+
+    With resume (a checkpoint_state() from an interrupted run), the output is
+    truncated to the checkpointed position and appended to. codec/level select
+    gzip or zstd compression of the output file.
+    """
+
+    format_row = staticmethod(format_insert_sql)
+    format_grib2_slab = staticmethod(format_grib2_slab_sql)
+
+    def __init__(self, output_path: Path, buffer_size: int = WRITE_BUFFER_BYTES, resume: Optional[Dict] = None,
+                 codec: str = 'none', level: Optional[int] = None):
+        self.codec = codec
+        self.level = level
+        self.output_path = self.output_location(output_path, codec)
+        self.buffer_size = buffer_size
+        self.resume = resume
+        self.bytes_written = 0
+        self.rows_written = 0
+        self.table_rows = {}
+        self._file = None
+
+    def __enter__(self):
+        if self.resume is not None:
+            self.restore_position(self.resume)
+            os.truncate(self.output_path, self.resume['files'][self.output_path.name])
+        self._open_output(append=self.resume is not None)
+        return self
+
+    @staticmethod
+    def output_location(output_path: Path, codec: str) -> Path:
+        """Actual output path for a requested path (compressed files get a .gz/.zst suffix)"""
+        return compressed_path(output_path, codec)
+
+    def _open_output(self, append: bool = False):
+        """Open the SQL file for writing or appending"""
+        self._file = open_compressed(self.output_path, 'a' if append else 'w', self.codec, self.level,
+                                     buffering=self.buffer_size)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_text(self, text: str):
+        """Write text and advance bytes_written, which tracks the file's output position"""
+        self._file.write(text)
+        self.bytes_written += encoded_length(text)
+
+    def write_header(self, rebuilt: datetime, target_size_gb: float):
+        """Write the file header comments"""
+        self._write_text(
+            "-- Large Dataset for Weather/Insurance Database (db-6)\n"
+            f"-- Rebuilt: {rebuilt.isoformat()}\n"
+            f"-- Target size: {target_size_gb} GB\n"
+            "-- Compatible with PostgreSQL\n"
+            "-- Based on legitimate NWS API patterns and realistic US geographic coverage\n\n"
+        )
+
+    def write(self, table: str, row: Tuple):
+        """Write a single row"""
+        self.write_records(table, [self.format_row(table, row)])
+
+    def write_records(self, table: str, records: List[str]):
+        """Write already formatted records for one table with a single buffered write"""
+        if not records:
+            return
+        self._write_text(''.join(records))
+        self.rows_written += len(records)
+        self.table_rows[table] = self.table_rows.get(table, 0) + len(records)
+
+    @classmethod
+    def copy_columns(cls, table: str) -> List[str]:
+        """Column order of a table's rows in this writer's output"""
+        return table_columns(table)
+
+    def output_files(self) -> List[Tuple[Optional[str], Path]]:
+        """(table, path) for every file written; None means all tables"""
+        return [(None, self.output_path)]
+
+    def open_files(self) -> Dict[Path, object]:
+        """Currently open output files by path"""
+        return {self.output_path: self._file}
+
+    def reopen(self, path: Path):
+        """Reopen a closed output file for appending"""
+        self._open_output(append=True)
+
+    def checkpoint_state(self) -> Dict:
+        """Flush output to disk and return the writer position for a checkpoint
+
+        Compressed streams are closed, ending the gzip member / zstd frame, and
+        reopened for appending, so every checkpoint falls on a stream boundary.
+        """
+        files = {}
+        for path, f in self.open_files().items():
+            if self.codec == 'none':
+                f.flush()
+            else:
+                f.close()
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            files[path.name] = path.stat().st_size
+            if self.codec != 'none':
+                self.reopen(path)
+        return {
+            'bytes_written': self.bytes_written,
+            'rows_written': self.rows_written,
+            'table_rows': dict(self.table_rows),
+            'files': files
+        }
+
+    def restore_position(self, state: Dict):
+        """Restore the counters saved by checkpoint_state()"""
+        self.bytes_written = state['bytes_written']
+        self.rows_written = state['rows_written']
+        self.table_rows = dict(state['table_rows'])
+
+    def close(self):
+        """Write the statement count trailer and close the file"""
+        if self._file is None:
+            return
+        self._write_text(f"-- Total SQL statements: {self.rows_written:,}\n")
+        self._file.close()
+        self._file = None
+
+
+class CopyStreamWriter(SQLStreamWriter):
+    """Buffered writer that streams COPY text rows into one file per table
+
+    The output directory also gets a manifest.json listing tables, columns and
+    files in load order for load_copy_dataset.py.
+    """
+
+    manifest_format = 'copy'
+    format_row = staticmethod(format_copy_row)
+    format_grib2_slab = staticmethod(format_grib2_slab_copy)
+
+    def __init__(self, output_path: Path, buffer_size: int = WRITE_BUFFER_BYTES, resume: Optional[Dict] = None,
+                 codec: str = 'none', level: Optional[int] = None):
+        super().__init__(output_path, buffer_size, resume, codec, level)
+        self.rebuilt = None
+        self.target_size_gb = None
+        self._files = {}
+
+    def __enter__(self):
+        self.output_path.mkdir(parents=True, exist_ok=True)
+        kept = {} if self.resume is None else self.resume['files']
+        for stale_file in [*self.output_path.glob('*.tsv*'), *self.output_path.glob('*.bin*')]:
+            if stale_file.name in kept:
+                os.truncate(stale_file, kept[stale_file.name])
+            else:
+                stale_file.unlink()
+
+        if self.resume is not None:
+            self.restore_position(self.resume)
+            self.rebuilt = datetime.fromisoformat(self.resume['rebuilt'])
+            self.target_size_gb = self.resume['target_size_gb']
+            for table in TABLE_SPECS:
+                if self.table_path(table).name in kept:
+                    self._open_table(table, append=True)
+        return self
+
+    @staticmethod
+    def output_location(output_path: Path, codec: str) -> Path:
+        """The output directory itself; compression applies to the table files inside it"""
+        return output_path
+
+    def copy_format(self, table: str) -> str:
+        """COPY format used for a table's file: text or binary"""
+        return 'text'
+
+    def table_path(self, table: str) -> Path:
+        """Output file for one table"""
+        name = f'{table}.bin' if self.copy_format(table) == 'binary' else f'{table}.tsv'
+        return self.output_path / (name + CODECS[self.codec])
+
+    def write_header(self, rebuilt: datetime, target_size_gb: float):
+        """COPY text files carry no comments; metadata goes to manifest.json"""
+        self.rebuilt = rebuilt
+        self.target_size_gb = target_size_gb
+
+    def _open_table(self, table: str, append: bool = False):
+        """Open a table's output file; new binary files start with the COPY header"""
+        mode = 'a' if append else 'w'
+        if self.copy_format(table) == 'binary':
+            f = open_compressed(self.table_path(table), mode + 'b', self.codec, self.level, buffering=self.buffer_size)
+            if not append:
+                f.write(COPY_HEADER)
+                self.bytes_written += len(COPY_HEADER)
+        else:
+            f = open_compressed(self.table_path(table), mode, self.codec, self.level,
+                                buffering=self.buffer_size, newline='')
+        self._files[table] = f
+        return f
+
+    def write_records(self, table: str, records: List[str]):
+        """Write already formatted COPY lines for one table with a single buffered write"""
+        if not records:
+            return
+        if table not in self._files:
+            self._open_table(table)
+        if self.copy_format(table) == 'binary':
+            block = b''.join(records)
+            self._files[table].write(block)
+            self.bytes_written += len(block)
+        else:
+            block = ''.join(records)
+            self._files[table].write(block)
+            self.bytes_written += encoded_length(block)
+        self.rows_written += len(records)
+        self.table_rows[table] = self.table_rows.get(table, 0) + len(records)
+
+    def output_files(self) -> List[Tuple[Optional[str], Path]]:
+        """(table, path) for every table file written, in load order"""
+        return [(table, self.table_path(table)) for table in TABLE_SPECS if table in self.table_rows]
+
+    def open_files(self) -> Dict[Path, object]:
+        """Currently open table files by path"""
+        return {self.table_path(table): f for table, f in self._files.items()}
+
+    def reopen(self, path: Path):
+        """Reopen a closed table file for appending"""
+        table = next(table for table in self._files if self.table_path(table) == path)
+        self._open_table(table, append=True)
+
+    def checkpoint_state(self) -> Dict:
+        """Flush output to disk and return the writer position, plus manifest metadata"""
+        state = super().checkpoint_state()
+        state['rebuilt'] = self.rebuilt.isoformat()
+        state['target_size_gb'] = self.target_size_gb
+        return state
+
+    def close(self):
+        """Close the table files and write the directory manifest"""
+        if self._files is None:
+            return
+        for table, f in self._files.items():
+            if self.copy_format(table) == 'binary':
+                f.write(COPY_TRAILER)
+            f.close()
+        self._files = None
+
+        manifest = {
+            'format': self.manifest_format,
+            'columns': {table: self.copy_columns(table) for table in self.table_rows},
+            'files': [
+                {'table': table, 'file': path.name, 'copy_format': self.copy_format(table),
+                 'rows': self.table_rows[table], 'bytes': path.stat().st_size}
+                for table, path in self.output_files()
+            ]
+        }
+        if self.rebuilt is not None:
+            manifest['rebuilt'] = self.rebuilt.isoformat()
+            manifest['target_size_gb'] = self.target_size_gb
+        (self.output_path / 'manifest.json').write_text(json.dumps(manifest, indent=2) + "\n")
+
+
+class BinaryCopyWriter(CopyStreamWriter):
+    """COPY writer that stores grib2_forecasts in binary COPY format
+
+    The remaining (small) tables stay in COPY text format.
+    """
+
+    BINARY_TABLES = {'grib2_forecasts'}
+
+    manifest_format = 'binary'
+    format_grib2_slab = staticmethod(format_grib2_slab_binary)
+
+    def copy_format(self, table: str) -> str:
+        """COPY format used for a table's file: text or binary"""
+        return 'binary' if table in self.BINARY_TABLES else 'text'
+
+    @classmethod
+    def copy_columns(cls, table: str) -> List[str]:
+        """Column order of a table's rows; binary tuples use the encoder's wire order"""
+        if table == 'grib2_forecasts':
+            return GRIB2_BINARY_ENCODER.column_names
+        return table_columns(table)
+
+
+def log_load_rates(table_rows: Dict[str, int], table_seconds: Dict[str, float], label: str = ''):
+    """Log rows loaded, COPY time and rows/sec per table"""
+    for table in TABLE_SPECS:
+        if table not in table_rows:
+            continue
+        seconds = table_seconds.get(table, 0.0)
+        rate = f"{table_rows[table] / seconds:,.0f} rows/s" if seconds > 0 else "n/a"
+        logger.info(f"   {label}{table}: {table_rows[table]:,} rows in {seconds:.1f}s ({rate})")
+
+
+class DirectCopyWriter(CopyStreamWriter):
+    """Streams COPY rows straight into PostgreSQL instead of writing files
+
+    Rows are buffered per table and sent with COPY ... FROM STDIN once
+    batch_rows rows are queued (and whenever the table changes); each batch
+    is committed.
+    COPY does not apply the INSERT ON CONFLICT clauses, so load into empty tables.
+    """
+
+    def __init__(self, conn, batch_rows: int = DIRECT_BATCH_ROWS):
+        super().__init__(None)
+        self.conn = conn
+        self.batch_rows = batch_rows
+        self.table_seconds = {}
+        self._pending_table = None
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def write_records(self, table: str, records: List[str]):
+        """Queue formatted rows, sending a COPY batch when it is full"""
+        if not records:
+            return
+        if table != self._pending_table:
+            self.flush()
+            self._pending_table = table
+        self._pending.extend(records)
+        self.bytes_written += sum(map(encoded_length, records))
+        self.rows_written += len(records)
+        self.table_rows[table] = self.table_rows.get(table, 0) + len(records)
+        if len(self._pending) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        """COPY the queued rows and commit"""
+        if not self._pending:
+            return
+        table = self._pending_table
+        copy_sql = f"COPY {table} ({', '.join(self.copy_columns(table))}) FROM STDIN"
+        if self.copy_format(table) == 'binary':
+            stream = binary_copy_stream([b''.join(self._pending)])
+            copy_sql += " WITH (FORMAT binary)"
+        else:
+            stream = ChunkStream([''.join(self._pending).encode('utf-8')])
+        self._pending = []
+
+        start = time.perf_counter()
+        cursor = self.conn.cursor()
+        try:
+            cursor.copy_expert(copy_sql, stream, size=WRITE_BUFFER_BYTES)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        self.table_seconds[table] = self.table_seconds.get(table, 0.0) + time.perf_counter() - start
+
+    def output_files(self) -> List[Tuple[Optional[str], Path]]:
+        """Nothing is written to disk"""
+        return []
+
+    def open_files(self) -> Dict[Path, object]:
+        """Nothing is written to disk"""
+        return {}
+
+    def close(self):
+        """Send the last batch, report load rates and close the connection"""
+        if self.conn is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self.conn.close()
+            self.conn = None
+        log_load_rates(self.table_rows, self.table_seconds)
+
+
+class DirectBinaryCopyWriter(DirectCopyWriter, BinaryCopyWriter):
+    """Direct COPY load with grib2_forecasts sent in binary COPY format"""
+
+
+OUTPUT_FORMATS = {
+    'sql': {'writer': SQLStreamWriter, 'path': 'data_large.sql', 'shard_path': 'shard_{:04d}.sql'},
+    'copy': {'writer': CopyStreamWriter, 'direct_writer': DirectCopyWriter,
+             'path': 'data_large_copy', 'shard_path': 'shard_{:04d}'},
+    'binary': {'writer': BinaryCopyWriter, 'direct_writer': DirectBinaryCopyWriter,
+               'path': 'data_large_binary', 'shard_path': 'shard_{:04d}'}
+}
+
+
+def open_writer(output_format: str, output_path: Optional[Path], direct_batch_rows: Optional[int] = None,
+                resume: Optional[Dict] = None, codec: str = 'none', level: Optional[int] = None):
+    """Create the writer for a format; with direct_batch_rows, a direct database loader
+
+    resume is a writer checkpoint_state() to continue a file output from; codec and
+    level select compression of the output files.
+    """
+    if direct_batch_rows is None:
+        return OUTPUT_FORMATS[output_format]['writer'](output_path, resume=resume, codec=codec, level=level)
+
+    conn = get_postgres_connection()
+    if conn is None:
+        raise RuntimeError("--direct needs a PostgreSQL connection (see POSTGRES_* environment variables)")
+    return OUTPUT_FORMATS[output_format]['direct_writer'](conn, direct_batch_rows)
+
+
+def write_rows(writer: SQLStreamWriter, table: str, rows: Iterator[Tuple], label: str,
+               target_bytes: Optional[float] = None, max_records: Optional[int] = None) -> int:
+    """Stream rows into the writer, stopping once target_bytes or max_records is reached"""
+    records_written = 0
+    try:
+        for row in rows:
+            if max_records is not None and records_written >= max_records:
+                break
+
+            writer.write(table, row)
+            records_written += 1
+
+            if target_bytes is not None and writer.bytes_written >= target_bytes:
+                logger.info(f"Reached target size with {label}: {writer.bytes_written / (1024**3):.2f} GB")
+                break
+
+            if records_written % 100000 == 0:
+                logger.info(f"  Generated {records_written:,} {label} ({writer.bytes_written / (1024**3):.2f} GB)")
+    finally:
+        rows.close()
+
+    return records_written
+
+
+def write_grib2_slabs(writer: SQLStreamWriter, grid: ForecastGrid,
+                      slabs: Iterator[Tuple[datetime, str, np.ndarray]], label: str,
+                      target_bytes: Optional[float] = None, max_records: Optional[int] = None,
+                      on_slab: Optional[Callable[[int], None]] = None) -> int:
+    """Format and stream whole GRIB2 slabs, stopping once target_bytes or max_records is reached
+
+    on_slab is called with the number of complete slabs written after each one.
+    """
+    records_written = 0
+    slabs_written = 0
+    next_progress = PROGRESS_INTERVAL
+    try:
+        for forecast_time, param, values in slabs:
+            records = writer.format_grib2_slab(grid, forecast_time, param, values)
+
+            if max_records is not None and records_written + len(records) >= max_records:
+                records = records[:max_records - records_written]
+                writer.write_records('grib2_forecasts', records)
+                records_written += len(records)
+                break
+
+            # Slab records are ASCII text or bytes, so len() is their encoded size
+            if target_bytes is not None and writer.bytes_written + sum(map(len, records)) >= target_bytes:
+                # Running byte offsets locate the record that reaches the target; write up to it in one call
+                offsets = list(accumulate(map(len, records), initial=writer.bytes_written))
+                cut = min(bisect_left(offsets, target_bytes, lo=1), len(records))
+                writer.write_records('grib2_forecasts', records[:cut])
+                records_written += cut
+                logger.info(f"Reached target size with {label}: {writer.bytes_written / (1024**3):.2f} GB")
+                break
+
+            writer.write_records('grib2_forecasts', records)
+            records_written += len(records)
+            slabs_written += 1
+            if on_slab is not None:
+                on_slab(slabs_written)
+
+            if records_written >= next_progress:
+                logger.info(f"  Generated {records_written:,} {label} ({writer.bytes_written / (1024**3):.2f} GB)")
+                next_progress += PROGRESS_INTERVAL
+    finally:
+        slabs.close()
+
+    return records_written
+
+
+def derive_shard_seed(master_seed: int, shard_index: int) -> int:
+    """Derive an independent, reproducible seed for one shard from the master seed"""
+    sequence = np.random.SeedSequence(master_seed, spawn_key=(shard_index,))
+    return int(sequence.generate_state(1, np.uint64)[0])
+
+
+def estimate_record_bytes(sample: List[str]) -> float:
+    """Average bytes per written record, measured on a deterministic sample"""
+    if not sample:
+        return 1.0
+    return sum(map(encoded_length, sample)) / len(sample)
+
+
+def sha256_file(path: Path) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(WRITE_BUFFER_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GenerationCheckpoint:
+    """Progress file for resumable generation, rewritten atomically after each step
+
+    settings identify the run (format, target size, seed, ...); a checkpoint
+    written with different settings cannot be resumed.
+    """
+
+    def __init__(self, path: Path, settings: Dict):
+        self.path = path
+        self.settings = settings
+
+    def load(self) -> Dict:
+        """Read the checkpoint to resume from"""
+        if not self.path.exists():
+            raise FileNotFoundError(f"No checkpoint to resume from: {self.path}")
+        checkpoint = json.loads(self.path.read_text())
+        mismatched = [key for key, value in self.settings.items() if checkpoint['settings'].get(key) != value]
+        if mismatched:
+            raise ValueError(f"Checkpoint {self.path} was written with different {', '.join(mismatched)}")
+        return checkpoint
+
+    def save(self, **state):
+        """Replace the checkpoint with the given state"""
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        tmp_path.write_text(json.dumps({'settings': self.settings, **state}))
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        """Delete the checkpoint once the run has finished"""
+        if self.path.exists():
+            self.path.unlink()
+
+
+def checkpoint_path(output_path: Path) -> Path:
+    """Checkpoint file kept next to an output file or directory"""
+    return output_path.with_name(output_path.name + '.checkpoint.json')
+
+
+_WORKER_GRID: Optional[ForecastGrid] = None
+
+
+def get_worker_grid() -> ForecastGrid:
+    """Forecast grid shared by all GRIB2 shards run in this process"""
+    global _WORKER_GRID
+    if _WORKER_GRID is None:
+        _WORKER_GRID = ForecastGrid()
+    return _WORKER_GRID
+
+
+def generate_reference_shard(shard: Dict, target_size_gb: float) -> Tuple[Dict, List[str], List[str]]:
+    """Write stations and boundaries (shard 0); returns the shard result plus their ids"""
+    rng = random.Random(shard['seed'])
+    now = datetime.fromisoformat(shard['reference_time'])
+    station_ids = []
+    boundary_ids = []
+    with open_writer(shard['format'], Path(shard['output_path']), shard['direct_batch_rows'],
+                     codec=shard['codec'], level=shard['level']) as writer:
+        writer.write_header(now, target_size_gb)
+        for row in generate_weather_stations(5000, rng, now):  # 5000 stations
+            writer.write('weather_stations', row)
+            station_ids.append(row[0])
+        for row in generate_shapefile_boundaries(2000, rng):  # 2000 boundaries
+            writer.write('shapefile_boundaries', row)
+            boundary_ids.append(row[0])
+
+    return shard_result(shard, writer), station_ids, boundary_ids
+
+
+def run_shard(shard: Dict) -> Dict:
+    """Generate one shard into its own file or directory (process pool entry point)"""
+    now = datetime.fromisoformat(shard['reference_time'])
+    label = f"shard {shard['shard_index']:04d} ({shard['kind']})"
+
+    with open_writer(shard['format'], Path(shard['output_path']), shard['direct_batch_rows'],
+                     codec=shard['codec'], level=shard['level']) as writer:
+        if shard['kind'] == 'grib2':
+            grid = get_worker_grid()
+            slabs = generate_grib2_forecasts(grid, shard['seed'], now, shard['start'], shard['stop'])
+            write_grib2_slabs(writer, grid, slabs, label, max_records=shard['row_limit'])
+        elif shard['kind'] == 'observations':
+            rows = generate_weather_observations(shard['station_ids'], random.Random(shard['seed']), now)
+            write_rows(writer, 'weather_observations', rows, label, max_records=shard['row_limit'])
+        elif shard['kind'] == 'insurance':
+            rng = random.Random(shard['seed'])
+            policy_area_ids = []
+            for row in generate_insurance_policy_areas(shard['boundary_ids'], rng):
+                writer.write('insurance_policy_areas', row)
+                policy_area_ids.append(row[0])
+            rows = generate_insurance_risk_factors(policy_area_ids, rng)
+            write_rows(writer, 'insurance_risk_factors', rows, label,
+                       max_records=shard['row_limit'] - len(policy_area_ids))
+        else:
+            raise ValueError(f"Unknown shard kind: {shard['kind']}")
+
+    return shard_result(shard, writer)
+
+
+def shard_result(shard: Dict, writer: SQLStreamWriter) -> Dict:
+    """Manifest entry for a finished shard"""
+    base_dir = Path(shard['output_path']).parent
+    result = {
+        'shard_index': shard['shard_index'],
+        'kind': shard['kind'],
+        'start': shard.get('start'),
+        'stop': shard.get('stop'),
+        'seed': shard['seed'],
+        'rows': writer.rows_written,
+        'bytes': sum(path.stat().st_size for _, path in writer.output_files()),
+        'data_bytes': writer.bytes_written,
+        'files': [
+            {
+                'table': table,
+                'file': str(path.relative_to(base_dir)),
+                'rows': writer.table_rows.get(table, writer.rows_written) if table else writer.rows_written,
+                'bytes': path.stat().st_size,
+                'sha256': sha256_file(path),
+                **({'copy_format': writer.copy_format(table)} if table else {})
+            }
+            for table, path in writer.output_files()
+        ]
+    }
+    if isinstance(writer, DirectCopyWriter):
+        result['bytes'] = writer.bytes_written
+        result['table_rows'] = writer.table_rows
+        result['load_seconds'] = writer.table_seconds
+    return result
+
+
+def plan_shards(master_seed: int, remaining_bytes: float, now: datetime, output_format: str,
+                station_ids: List[str], boundary_ids: List[str], slabs_per_shard: int,
+                stations_per_shard: int) -> List[Dict]:
+    """Split the remaining byte budget into GRIB2, observation and insurance shards
+
+    GRIB2 shards cover contiguous (forecast_time, parameter) slab ranges; observation
+    shards cover station ranges. Row counts are fixed up front from a seeded per-record
+    byte estimate, so the plan (and therefore the output) depends only on the inputs.
+    """
+    shards = []
+    sample_rng = random.Random(master_seed)
+    writer_class = OUTPUT_FORMATS[output_format]['writer']
+
+    # GRIB2 forecasts (main data generator)
+    grid = get_worker_grid()
+    slab_count = len(generate_grib2_slabs(now))
+    first_slab = next(generate_grib2_forecasts(grid, master_seed, now, 0, 1))
+    records = writer_class.format_grib2_slab(grid, *first_slab)
+    row_bytes = estimate_record_bytes(records[::max(1, len(records) // ROW_SAMPLE_SIZE)])
+    grib2_rows = min(math.ceil(max(remaining_bytes, 0) / row_bytes), slab_count * len(grid))
+    for start in range(0, math.ceil(grib2_rows / len(grid)), slabs_per_shard):
+        stop = min(start + slabs_per_shard, slab_count)
+        shards.append({
+            'kind': 'grib2', 'start': start, 'stop': stop,
+            'row_limit': min((stop - start) * len(grid), grib2_rows - start * len(grid))
+        })
+    remaining_bytes -= grib2_rows * row_bytes
+
+    # Weather observations, split by station range (if space allows)
+    obs_station_ids = station_ids[:100]
+    if remaining_bytes > 0 and obs_station_ids:
+        sample = islice(generate_weather_observations(obs_station_ids[:1], sample_rng, now), ROW_SAMPLE_SIZE)
+        row_bytes = estimate_record_bytes([writer_class.format_row('weather_observations', row) for row in sample])
+        rows_per_station = 90 * 24
+        obs_rows = min(math.ceil(remaining_bytes / row_bytes), len(obs_station_ids) * rows_per_station)
+        for start in range(0, math.ceil(obs_rows / rows_per_station), stations_per_shard):
+            stop = min(start + stations_per_shard, len(obs_station_ids))
+            shards.append({
+                'kind': 'observations', 'start': start, 'stop': stop,
+                'station_ids': obs_station_ids[start:stop],
+                'row_limit': min((stop - start) * rows_per_station, obs_rows - start * rows_per_station)
+            })
+        remaining_bytes -= obs_rows * row_bytes
+
+    # Insurance data (if space allows)
+    if remaining_bytes > 0 and boundary_ids:
+        sample = islice(generate_insurance_risk_factors(boundary_ids[:1], sample_rng), ROW_SAMPLE_SIZE)
+        row_bytes = estimate_record_bytes([writer_class.format_row('insurance_risk_factors', row) for row in sample])
+        policy_areas = min(len(boundary_ids), 1000)
+        shards.append({
+            'kind': 'insurance', 'start': 0, 'stop': policy_areas,
+            'boundary_ids': boundary_ids,
+            'row_limit': policy_areas + math.ceil(remaining_bytes / row_bytes)
+        })
+
+    return shards
+
+
+def generate_sharded(output_dir: Path, output_format: str, target_size_gb: float, seed: Optional[int],
+                     workers: int, slabs_per_shard: int, stations_per_shard: int,
+                     direct_batch_rows: Optional[int] = None, resume: bool = False,
+                     codec: str = 'none', level: Optional[int] = None) -> Path:
+    """Generate the dataset as independently seeded shards on a process pool
+
+    With direct_batch_rows, every shard streams its rows into PostgreSQL over its
+    own connection instead of writing shard files. Otherwise finished shards are
+    recorded in a checkpoint, and resume skips them (shards are deterministic, so
+    unfinished ones are simply regenerated).
+    """
+    now = SEEDED_REFERENCE_TIME
+    shard_dir = output_dir / 'data_large_shards'
+    checkpoint = None
+    completed = {}
+    if direct_batch_rows is None:
+        checkpoint = GenerationCheckpoint(checkpoint_path(shard_dir), {
+            'format': output_format, 'target_size_gb': target_size_gb, 'seed': seed,
+            'slabs_per_shard': slabs_per_shard, 'stations_per_shard': stations_per_shard,
+            'compress': codec, 'compress_level': level
+        })
+    if resume:
+        state = checkpoint.load()
+        master_seed = state['master_seed']
+        completed = {result['shard_index']: result for result in state['completed']}
+    else:
+        master_seed = seed if seed is not None else np.random.SeedSequence().entropy
+    logger.info(f"Master seed {master_seed}")
+    if direct_batch_rows is None:
+        shard_dir.mkdir(parents=True, exist_ok=True)
+    shard_path = OUTPUT_FORMATS[output_format]['shard_path']
+
+    def prepare(shard: Dict, shard_index: int) -> Dict:
+        shard['shard_index'] = shard_index
+        shard['seed'] = derive_shard_seed(master_seed, shard_index)
+        shard['format'] = output_format
+        shard['reference_time'] = now.isoformat()
+        shard['output_path'] = str(shard_dir / shard_path.format(shard_index))
+        shard['direct_batch_rows'] = direct_batch_rows
+        shard['codec'] = codec
+        shard['level'] = level
+        return shard
+
+    logger.info("\n1. Generating reference shard (stations, boundaries)...")
+    reference, station_ids, boundary_ids = generate_reference_shard(prepare({'kind': 'reference'}, 0), target_size_gb)
+    logger.info(f"   Generated {len(station_ids)} weather stations and {len(boundary_ids)} boundaries")
+
+    target_bytes = target_size_gb * 1024 * 1024 * 1024
+    shards = plan_shards(master_seed, target_bytes - reference['data_bytes'], now, output_format, station_ids,
+                         boundary_ids, slabs_per_shard, stations_per_shard)
+    shards = [prepare(shard, shard_index) for shard_index, shard in enumerate(shards, start=1)]
+
+    pending = [shard for shard in shards if shard['shard_index'] not in completed]
+    if resume:
+        logger.info(f"   Resuming: {len(shards) - len(pending)} of {len(shards)} shards already complete")
+
+    logger.info(f"\n2. Generating {len(pending)} shards on {workers} worker processes...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(run_shard, pending):
+            logger.info(f"   Shard {result['shard_index']:04d} ({result['kind']}): {result['rows']:,} rows, "
+                        f"{result['bytes'] / (1024**2):.1f} MB")
+            completed[result['shard_index']] = result
+            if checkpoint is not None:
+                checkpoint.save(master_seed=master_seed, completed=list(completed.values()))
+    results = [reference] + [completed[shard['shard_index']] for shard in shards]
+
+    for result in results:
+        for entry in result['files']:
+            entry['file'] = f"{shard_dir.name}/{entry['file']}"
+
+    if direct_batch_rows is not None:
+        table_rows = {}
+        table_seconds = {}
+        for result in results:
+            for table, rows in result['table_rows'].items():
+                table_rows[table] = table_rows.get(table, 0) + rows
+                table_seconds[table] = table_seconds.get(table, 0.0) + result['load_seconds'].get(table, 0.0)
+        logger.info("\n3. Direct load totals (COPY time summed over shards):")
+        log_load_rates(table_rows, table_seconds)
+
+    manifest_file = output_dir / 'data_large_manifest.json'
+    manifest = {
+        'dataset': 'db-6 large dataset',
+        'format': output_format,
+        'direct': direct_batch_rows is not None,
+        'compression': codec,
+        'master_seed': master_seed,
+        'reference_time': now.isoformat(),
+        'target_size_gb': target_size_gb,
+        'total_rows': sum(r['rows'] for r in results),
+        'total_bytes': sum(r['bytes'] for r in results),
+        'total_data_bytes': sum(r['data_bytes'] for r in results),
+        'columns': {table: OUTPUT_FORMATS[output_format]['writer'].copy_columns(table) for table in TABLE_SPECS},
+        'shards': results
+    }
+    manifest_file.write_text(json.dumps(manifest, indent=2) + "\n")
+    if checkpoint is not None:
+        checkpoint.remove()
+    return manifest_file
+
+
+def generate_single_output(writer: SQLStreamWriter, target_size_gb: float, seed: Optional[int],
+                           checkpoint: Optional[GenerationCheckpoint] = None, resume: Optional[Dict] = None) -> int:
+    """Generate the dataset through one writer (file, directory or direct load); returns rows written
+
+    With a checkpoint, progress (next step, next GRIB2 slab, RNG state, field seed
+    and the writer position) is saved after every table and every GRIB2 slab. resume is a
+    loaded checkpoint to continue from; the writer must have been created with its
+    writer state, and the finished output matches an uninterrupted run.
+    """
+    target_bytes = target_size_gb * 1024 * 1024 * 1024
+    rng = random.Random(seed)
+
+    if resume is None:
+        now = datetime.now() if seed is None else SEEDED_REFERENCE_TIME
+        field_seed = seed if seed is not None else np.random.SeedSequence().entropy
+        step, next_slab = GENERATION_STEPS[0], 0
+        station_ids = []
+        boundary_ids = []
+    else:
+        now = datetime.fromisoformat(resume['reference_time'])
+        version, internal_state, gauss_next = resume['python_rng']
+        rng.setstate((version, tuple(internal_state), gauss_next))
+        field_seed = resume['field_seed']
+        step, next_slab = resume['step'], resume['next_slab']
+        station_ids = resume['station_ids']
+        boundary_ids = resume['boundary_ids']
+
+    def pending(name: str) -> bool:
+        return GENERATION_STEPS.index(name) >= GENERATION_STEPS.index(step)
+
+    def save(next_step: str, slab: int = 0):
+        if checkpoint is None:
+            return
+        checkpoint.save(
+            step=next_step, next_slab=slab, reference_time=now.isoformat(),
+            python_rng=rng.getstate(), field_seed=field_seed,
+            station_ids=station_ids, boundary_ids=boundary_ids, writer=writer.checkpoint_state()
+        )
+
+    with writer:
+        if resume is None:
+            writer.write_header(now, target_size_gb)
+        else:
+            logger.info(f"Resuming at step '{step}' (GRIB2 slab {next_slab}) with "
+                        f"{writer.bytes_written / (1024**3):.2f} GB already written")
+
+        # 1. Generate weather stations
+        if pending('stations'):
+            logger.info("\n1. Generating weather stations...")
+            for row in generate_weather_stations(5000, rng, now):  # 5000 stations
+                writer.write('weather_stations', row)
+                station_ids.append(row[0])
+            logger.info(f"   Generated {len(station_ids)} weather stations")
+            save('boundaries')
+
+        # 2. Generate shapefile boundaries
+        if pending('boundaries'):
+            logger.info("\n2. Generating shapefile boundaries...")
+            for row in generate_shapefile_boundaries(2000, rng):  # 2000 boundaries
+                writer.write('shapefile_boundaries', row)
+                boundary_ids.append(row[0])
+            logger.info(f"   Generated {len(boundary_ids)} boundaries")
+            save('grib2')
+
+        # 3. Generate GRIB2 forecasts (main data generator)
+        if pending('grib2'):
+            logger.info("\n3. Generating GRIB2 forecasts (main data generator)...")
+            grid = ForecastGrid()
+            slabs = generate_grib2_forecasts(grid, field_seed, now, next_slab)
+            count = write_grib2_slabs(writer, grid, slabs, 'GRIB2 forecasts', target_bytes,
+                                      on_slab=lambda done: save('grib2', next_slab + done))
+            logger.info(f"   Generated {count} GRIB2 forecast records")
+            save('observations')
+
+        # 4. Generate weather observations (if space allows)
+        if pending('observations') and writer.bytes_written < target_bytes:
+            logger.info("\n4. Generating weather observations...")
+            count = write_rows(writer, 'weather_observations',
+                               generate_weather_observations(station_ids[:100], rng, now),
+                               'observations', target_bytes)
+            logger.info(f"   Generated {count} observation records")
+            save('insurance')
+
+        # 5. Generate insurance data (if space allows)
+        if pending('insurance') and writer.bytes_written < target_bytes:
+            logger.info("\n5. Generating insurance data...")
+            policy_area_ids = []
+            for row in generate_insurance_policy_areas(boundary_ids, rng):
+                writer.write('insurance_policy_areas', row)
+                policy_area_ids.append(row[0])
+            count = write_rows(writer, 'insurance_risk_factors', generate_insurance_risk_factors(policy_area_ids, rng),
+                               'insurance data', target_bytes)
+            logger.info(f"   Generated {len(policy_area_ids) + count} insurance records")
+            save('complete')
+
+        return writer.rows_written
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Generate the db-6 large weather/insurance dataset')
+    parser.add_argument('--target-gb', type=float, default=TARGET_SIZE_GB,
+                        help=f'Target output size in GB (default: {TARGET_SIZE_GB})')
+    parser.add_argument('--output-dir', type=Path, default=OUTPUT_DIR,
+                        help=f'Output directory (default: {OUTPUT_DIR})')
+    parser.add_argument('--format', choices=sorted(OUTPUT_FORMATS), default='sql',
+                        help='sql: INSERT statements; copy: one COPY text file per table; '
+                             'binary: like copy, with grib2_forecasts in binary COPY format (default: sql)')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Master seed; identical seeds produce byte-identical output')
+    parser.add_argument('--sharded', action='store_true',
+                        help='Generate independently seeded shard files on a process pool, plus a manifest')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes for --sharded (default: CPU count)')
+    parser.add_argument('--slabs-per-shard', type=int, default=len(WEATHER_PARAMETERS),
+                        help='GRIB2 (forecast_time, parameter) slabs per shard (default: one forecast time)')
+    parser.add_argument('--stations-per-shard', type=int, default=10,
+                        help='Observation stations per shard (default: 10)')
+    parser.add_argument('--direct', action='store_true',
+                        help='Stream rows into PostgreSQL with COPY FROM STDIN instead of writing files '
+                             '(copy/binary formats; tables should be empty)')
+    parser.add_argument('--batch-rows', type=int, default=DIRECT_BATCH_ROWS,
+                        help=f'Rows per COPY batch and commit with --direct (default: {DIRECT_BATCH_ROWS:,})')
+    parser.add_argument('--compress', choices=sorted(CODECS), default='none',
+                        help='Compress output files as gzip (.gz) or zstd (.zst) streams (default: none)')
+    parser.add_argument('--compress-level', type=int, default=None,
+                        help='Compression level (default: gzip 6, zstd 3)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue an interrupted run from its checkpoint (same options as the original run)')
+    args = parser.parse_args(argv)
+    if args.direct and args.format == 'sql':
+        parser.error("--direct loads with COPY; use --format copy or --format binary")
+    if args.direct and args.compress != 'none':
+        parser.error("--compress applies to file output, not --direct")
+    if args.direct and args.resume:
+        parser.error("--resume needs file output; --direct batches are committed as they are sent")
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
     """Main generation function"""
+    args = parse_args(argv)
+
     logger.info("=" * 80)
     logger.info("Generating Large Dataset for db-6 Weather/Insurance Database")
-    logger.info(f"Target size: {TARGET_SIZE_GB} GB")
+    logger.info(f"Target size: {args.target_gb} GB ({args.format} format)")
     logger.info("=" * 80)
-    
-    all_sql = []
-    current_size = 0
-    
-    # 1. Generate weather stations
-    logger.info("\n1. Generating weather stations...")
-    station_sql = generate_weather_stations_sql(5000)  # 5000 stations
-    all_sql.extend(station_sql)
-    current_size += sum(len(s.encode('utf-8')) for s in station_sql)
-    station_ids = [s.split("'")[1] for s in station_sql if "INSERT INTO weather_stations" in s]
-    logger.info(f"   Generated {len(station_sql)} weather stations")
-    
-    # 2. Generate shapefile boundaries
-    logger.info("\n2. Generating shapefile boundaries...")
-    boundary_sql = generate_shapefile_boundaries_sql(2000)  # 2000 boundaries
-    all_sql.extend(boundary_sql)
-    current_size += sum(len(s.encode('utf-8')) for s in boundary_sql)
-    boundary_ids = [s.split("'")[1] for s in boundary_sql if "INSERT INTO shapefile_boundaries" in s]
-    logger.info(f"   Generated {len(boundary_sql)} boundaries")
-    
-    # 3. Generate GRIB2 forecasts (main data generator)
-    logger.info("\n3. Generating GRIB2 forecasts (main data generator)...")
-    grib2_sql, current_size = generate_grib2_forecasts_sql(TARGET_SIZE_BYTES, current_size)
-    all_sql.extend(grib2_sql)
-    logger.info(f"   Generated {len(grib2_sql)} GRIB2 forecast records")
-    
-    # 4. Generate weather observations (if space allows)
-    if current_size < TARGET_SIZE_BYTES:
-        logger.info("\n4. Generating weather observations...")
-        obs_sql, current_size = generate_weather_observations_sql(station_ids[:100], TARGET_SIZE_BYTES, current_size)
-        all_sql.extend(obs_sql)
-        logger.info(f"   Generated {len(obs_sql)} observation records")
-    
-    # 5. Generate insurance data (if space allows)
-    if current_size < TARGET_SIZE_BYTES:
-        logger.info("\n5. Generating insurance data...")
-        insurance_sql, current_size = generate_insurance_data_sql(boundary_ids, TARGET_SIZE_BYTES, current_size)
-        all_sql.extend(insurance_sql)
-        logger.info(f"   Generated {len(insurance_sql)} insurance records")
-    
-    # Write SQL file
-    output_file = OUTPUT_DIR / 'data_large.sql'
-    logger.info(f"\n6. Writing SQL to {output_file}...")
-    
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("-- Large Dataset for Weather/Insurance Database (db-6)\n")
-        f.write(f"-- Rebuilt: {datetime.now().isoformat()}\n")
-        f.write(f"-- Target size: {TARGET_SIZE_GB} GB\n")
-        f.write(f"-- Total SQL statements: {len(all_sql):,}\n")
-        f.write("-- Compatible with PostgreSQL\n")
-        f.write("-- Based on legitimate NWS API patterns and realistic US geographic coverage\n\n")
-        
-        for sql in all_sql:
-            f.write(sql + "\n\n")
-    
-    file_size_mb = output_file.stat().st_size / (1024**2)
+
+    direct_batch_rows = args.batch_rows if args.direct else None
+
+    if args.sharded:
+        logger.info(f"Sharded mode: {args.workers} workers")
+        manifest_file = generate_sharded(args.output_dir, args.format, args.target_gb, args.seed, args.workers,
+                                         args.slabs_per_shard, args.stations_per_shard, direct_batch_rows,
+                                         args.resume, args.compress, args.compress_level)
+        manifest = json.loads(manifest_file.read_text())
+        total_bytes = manifest['total_bytes']
+        data_bytes = manifest['total_data_bytes']
+        total_rows = manifest['total_rows']
+        output_description = f"{manifest_file} ({len(manifest['shards'])} shards)"
+    elif args.direct:
+        logger.info(f"Streaming {args.format} rows into PostgreSQL (batches of {args.batch_rows:,} rows)...")
+        writer = open_writer(args.format, None, direct_batch_rows)
+        total_rows = generate_single_output(writer, args.target_gb, args.seed)
+        total_bytes = data_bytes = writer.bytes_written
+        output_description = "PostgreSQL (direct COPY)"
+    else:
+        writer_class = OUTPUT_FORMATS[args.format]['writer']
+        output_path = writer_class.output_location(args.output_dir / OUTPUT_FORMATS[args.format]['path'],
+                                                   args.compress)
+        checkpoint = GenerationCheckpoint(checkpoint_path(output_path), {
+            'format': args.format, 'target_size_gb': args.target_gb, 'seed': args.seed,
+            'compress': args.compress, 'compress_level': args.compress_level
+        })
+        resume = checkpoint.load() if args.resume else None
+        logger.info(f"Streaming {args.format} output to {output_path}...")
+        writer = open_writer(args.format, args.output_dir / OUTPUT_FORMATS[args.format]['path'],
+                             resume=resume['writer'] if resume else None,
+                             codec=args.compress, level=args.compress_level)
+        total_rows = generate_single_output(writer, args.target_gb, args.seed, checkpoint, resume)
+        checkpoint.remove()
+        data_bytes = writer.bytes_written
+        if output_path.is_dir():
+            copy_manifest = json.loads((output_path / 'manifest.json').read_text())
+            total_bytes = sum(entry['bytes'] for entry in copy_manifest['files'])
+        else:
+            total_bytes = output_path.stat().st_size
+        output_description = str(output_path)
+
+    file_size_mb = total_bytes / (1024**2)
     file_size_gb = file_size_mb / 1024
-    
+    data_size_gb = data_bytes / (1024**3)
+
     logger.info(f"\n✅ Generation complete!")
-    logger.info(f"   Output file: {output_file}")
-    logger.info(f"   File size: {file_size_gb:.2f} GB ({file_size_mb:.2f} MB)")
-    logger.info(f"   SQL statements: {len(all_sql):,}")
+    logger.info(f"   Output: {output_description}")
+    logger.info(f"   {'Bytes loaded' if args.direct else 'File size'}: {file_size_gb:.2f} GB ({file_size_mb:.2f} MB)")
+    if args.compress != 'none':
+        logger.info(f"   Uncompressed: {data_size_gb:.2f} GB ({args.compress}, "
+                    f"{data_bytes / max(total_bytes, 1):.1f}x smaller on disk)")
+    logger.info(f"   Rows: {total_rows:,}")
     logger.info("=" * 80)
-    
-    return file_size_gb >= TARGET_SIZE_GB
+
+    return data_size_gb >= args.target_gb
 
 
 if __name__ == '__main__':
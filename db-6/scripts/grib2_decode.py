@@ -0,0 +1,717 @@
+#!/usr/bin/env python3
+"""
+GRIB2 decoding into grib2_forecasts
+Decodes GRIB2 messages (e.g. the .idx subsets written by grib2_fetch.py) into
+NumPy grids, converts them to db-6 parameter_name values in NWS units, subsets
+them to US_BOUNDS and bulk-loads them with binary COPY, one transaction per file.
+
+The pure NumPy decoder handles what NOAA's GFS/HRRR/RAP/RTMA products use:
+  grids     3.0 regular lat/lon, 3.30 Lambert conformal
+  products  4.0, 4.1, 4.8, 4.11 (valid time is the end of accumulation windows)
+  packing   5.0 simple, 5.2 complex, 5.3 complex with spatial differencing
+Other templates (e.g. 5.40 JPEG2000) are decoded with pygrib when it is installed.
+"""
+
+import sys
+import time
+import struct
+import logging
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from generate_large_dataset import US_BOUNDS, WEATHER_PARAMETERS, generate_geography_wkt
+from grib2_fetch import GRIB2_PARAMETER_MESSAGES
+from load_copy_dataset import get_postgres_connection
+from pg_binary_copy import (
+    TABLE_COLUMNS, BinaryCopyEncoder, EncodedColumn, copy_binary, encode_numeric, encode_prefixed_text, encode_text
+)
+from weather_fields import apparent_temperature, heat_index, wind_chill
+
+try:
+    import pygrib
+    PYGRIB_AVAILABLE = True
+except ImportError:
+    PYGRIB_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+GRIB_MAGIC = b'GRIB'
+END_MARKER = b'7777'
+
+# (discipline, category, number) -> GRIB short name, for the fields db-6 uses
+GRIB2_SHORT_NAMES = {
+    (0, 0, 0): 'TMP',
+    (0, 0, 6): 'DPT',
+    (0, 1, 1): 'RH',
+    (0, 1, 8): 'APCP',
+    (0, 2, 2): 'UGRD',
+    (0, 2, 3): 'VGRD',
+    (0, 3, 1): 'PRMSL',
+    (0, 3, 5): 'HGT',
+    (0, 3, 198): 'MSLMA',
+    (0, 6, 1): 'TCDC',
+    (0, 19, 0): 'VIS'
+}
+
+# Fixed surface type -> .idx level text (see level_name for typed heights)
+SURFACE_LEVELS = {
+    1: 'surface',
+    2: 'cloud base',
+    10: 'entire atmosphere',
+    101: 'mean sea level',
+    200: 'entire atmosphere (considered as a single layer)'
+}
+
+# Shape of the earth (section 3 octet 15) -> spherical radius in metres
+EARTH_RADIUS_M = {
+    0: 6367470.0,
+    6: 6371229.0
+}
+DEFAULT_EARTH_RADIUS_M = 6371229.0
+
+# Product definition templates whose valid time is the end of a statistical
+# processing window, and the section 4 offset of that end time
+END_TIME_OFFSETS = {
+    8: 34,
+    11: 37
+}
+
+# Unit of time range (section 4 octet 18) -> seconds
+TIME_UNIT_SECONDS = {
+    0: 60, 1: 3600, 2: 86400, 10: 3 * 3600, 11: 6 * 3600, 12: 12 * 3600, 13: 1
+}
+
+# Scanning mode flags
+SCAN_I_NEGATIVE = 0x80
+SCAN_J_POSITIVE = 0x40
+SCAN_J_CONSECUTIVE = 0x20
+SCAN_BOUSTROPHEDON = 0x10
+
+# Resolution flag: u/v components are relative to the grid's x/y directions
+RESOLUTION_GRID_RELATIVE_WINDS = 0x08
+
+KELVIN_OFFSET = 273.15
+MPH_PER_MS = 2.2369363
+PA_PER_INHG = 3386.389
+METRES_PER_MILE = 1609.344
+MM_PER_INCH = 25.4
+FEET_PER_METRE = 3.2808399
+KM_PER_DEGREE = 111.0
+
+# Rows per encoded COPY block; bounds memory for 1.9M-point HRRR grids
+BLOCK_ROWS = 100_000
+
+# Files are COPYed here and merged into grib2_forecasts on forecast_id, so a
+# rerun, or a full file and an .idx subset of the same cycle, replace rows
+# instead of failing on duplicates
+GRIB2_STAGE_TABLE = 'grib2_forecasts_stage'
+
+
+class GribDecodeError(ValueError):
+    """Malformed or unsupported GRIB2 data"""
+
+
+def kelvin_to_fahrenheit(values: np.ndarray) -> np.ndarray:
+    return (values - KELVIN_OFFSET) * 1.8 + 32.0
+
+
+def wind_speed_mph(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    return np.hypot(u, v) * MPH_PER_MS
+
+
+# parameter_name -> conversion from the GRIB fields of its GRIB2_PARAMETER_MESSAGES
+# slots (SI units) to db-6 values in NWS API units (see weather_fields.py)
+PARAMETER_CONVERSIONS = {
+    'Temperature': kelvin_to_fahrenheit,
+    'Dewpoint': kelvin_to_fahrenheit,
+    'RelativeHumidity': lambda rh: np.clip(rh, 0.0, 100.0),
+    'WindSpeed': wind_speed_mph,
+    'WindDirection': lambda u, v: np.rint(np.degrees(np.arctan2(-u, -v)) % 360.0),
+    'Pressure': lambda pa: pa / PA_PER_INHG,
+    'Visibility': lambda metres: np.minimum(metres / METRES_PER_MILE, 10.0),
+    'Precipitation': lambda mm: mm / MM_PER_INCH,
+    'SkyCover': lambda percent: np.clip(percent, 0.0, 100.0),
+    'CloudBase': lambda metres: metres * FEET_PER_METRE / 100.0,
+    'HeatIndex': lambda t, rh: heat_index(kelvin_to_fahrenheit(t), rh),
+    'WindChill': lambda t, u, v: wind_chill(kelvin_to_fahrenheit(t), wind_speed_mph(u, v)),
+    'ApparentTemperature': lambda t, rh, u, v: apparent_temperature(
+        kelvin_to_fahrenheit(t),
+        heat_index(kelvin_to_fahrenheit(t), rh),
+        wind_chill(kelvin_to_fahrenheit(t), wind_speed_mph(u, v))
+    )
+}
+
+
+def _uint(data: bytes, offset: int, size: int) -> int:
+    return int.from_bytes(data[offset:offset + size], 'big')
+
+
+def _sint(data: bytes, offset: int, size: int) -> int:
+    """GRIB2 signed integer: sign bit plus magnitude"""
+    value = _uint(data, offset, size)
+    sign_bit = 1 << (8 * size - 1)
+    return -(value & (sign_bit - 1)) if value & sign_bit else value
+
+
+def _datetime(data: bytes, offset: int) -> datetime:
+    return datetime(_uint(data, offset, 2), data[offset + 2], data[offset + 3],
+                    data[offset + 4], data[offset + 5], data[offset + 6])
+
+
+def extract_bits(buffer: np.ndarray, bit_offsets: np.ndarray, widths) -> np.ndarray:
+    """Unsigned big-endian integers of widths bits (<= 57) starting at bit_offsets"""
+    padded = np.concatenate([buffer, np.zeros(8, dtype=np.uint8)])
+    # One gather of the 8 bytes starting at each offset's byte
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 8)[bit_offsets >> 3]
+    window = windows.view('>u8')[:, 0].astype(np.uint64)
+    widths = np.broadcast_to(np.asarray(widths, dtype=np.uint64), window.shape)
+    values = (window << (bit_offsets & 7).astype(np.uint64)) >> (np.uint64(64) - widths)
+    return np.where(widths == 0, np.uint64(0), values).astype(np.int64)
+
+
+def read_packed(buffer: np.ndarray, bit_offset: int, count: int, width: int) -> np.ndarray:
+    """count consecutive width-bit unsigned integers starting at bit_offset"""
+    if width == 0 or count == 0:
+        return np.zeros(count, dtype=np.int64)
+    if bit_offset % 8 == 0 and width in (8, 16, 32):
+        start = bit_offset // 8
+        return np.frombuffer(buffer, dtype=f'>u{width // 8}', count=count, offset=start).astype(np.int64)
+    return extract_bits(buffer, bit_offset + np.arange(count, dtype=np.int64) * width, width)
+
+
+def _byte_aligned(bit_offset: int) -> int:
+    return -(-bit_offset // 8) * 8
+
+
+class GribGrid:
+    """Point coordinates of a GRIB2 grid in data order, plus what loading needs from it
+
+    wind_rotation holds the angle (radians) from grid x/y to east/north when the
+    grid's u/v components are grid-relative, else None.
+    """
+
+    def __init__(self, latitudes: np.ndarray, longitudes: np.ndarray, resolution_x: float,
+                 resolution_y: float, crs: str, wind_rotation: Optional[np.ndarray] = None):
+        self.latitudes = latitudes
+        self.longitudes = (longitudes + 180.0) % 360.0 - 180.0
+        self.resolution_x = resolution_x
+        self.resolution_y = resolution_y
+        self.crs = crs
+        self.wind_rotation = wind_rotation
+        self._bounded = None
+
+    def __len__(self) -> int:
+        return len(self.latitudes)
+
+    def bounded_cells(self) -> np.ndarray:
+        """Indices of the points inside US_BOUNDS (cached)"""
+        if self._bounded is None:
+            self._bounded = np.flatnonzero(
+                (self.latitudes >= US_BOUNDS['south']) & (self.latitudes <= US_BOUNDS['north'])
+                & (self.longitudes >= US_BOUNDS['west']) & (self.longitudes <= US_BOUNDS['east'])
+            )
+        return self._bounded
+
+
+def _scan_indices(ni: int, nj: int, scan: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(i, j) grid indices of every point in data order"""
+    if scan & SCAN_BOUSTROPHEDON:
+        raise GribDecodeError("Boustrophedonic scanning is not supported")
+    if scan & SCAN_J_CONSECUTIVE:
+        return np.repeat(np.arange(ni), nj), np.tile(np.arange(nj), ni)
+    return np.tile(np.arange(ni), nj), np.repeat(np.arange(nj), ni)
+
+
+def _earth_radius(section: bytes) -> float:
+    shape = section[14]
+    if shape == 1:
+        return _uint(section, 16, 4) / 10.0 ** section[15]
+    return EARTH_RADIUS_M.get(shape, DEFAULT_EARTH_RADIUS_M)
+
+
+def _latlon_grid(section: bytes) -> GribGrid:
+    """Template 3.0: regular latitude/longitude grid"""
+    ni, nj = _uint(section, 30, 4), _uint(section, 34, 4)
+    basic_angle, subdivisions = _uint(section, 38, 4), _uint(section, 42, 4)
+    unit = 1e-6 if basic_angle in (0, 0xFFFFFFFF) else basic_angle / subdivisions
+    lat1, lon1 = _sint(section, 46, 4) * unit, _sint(section, 50, 4) * unit
+    di, dj = _uint(section, 63, 4) * unit, _uint(section, 67, 4) * unit
+    scan = section[71]
+
+    i, j = _scan_indices(ni, nj, scan)
+    longitudes = lon1 + i * (-di if scan & SCAN_I_NEGATIVE else di)
+    latitudes = lat1 + j * (dj if scan & SCAN_J_POSITIVE else -dj)
+    return GribGrid(latitudes, longitudes, di, dj, 'EPSG:4326')
+
+
+def _lambert_grid(section: bytes) -> GribGrid:
+    """Template 3.30: Lambert conformal conic grid (spherical earth)"""
+    nx, ny = _uint(section, 30, 4), _uint(section, 34, 4)
+    lat1, lon1 = _sint(section, 38, 4) * 1e-6, _sint(section, 42, 4) * 1e-6
+    grid_relative = bool(section[46] & RESOLUTION_GRID_RELATIVE_WINDS)
+    lov = _sint(section, 51, 4) * 1e-6
+    dx, dy = _uint(section, 55, 4) / 1000.0, _uint(section, 59, 4) / 1000.0
+    scan = section[64]
+    latin1, latin2 = _sint(section, 65, 4) * 1e-6, _sint(section, 69, 4) * 1e-6
+    radius = _earth_radius(section)
+
+    phi1, phi2 = np.radians(latin1), np.radians(latin2)
+    if np.isclose(phi1, phi2):
+        n = np.sin(phi1)
+    else:
+        n = (np.log(np.cos(phi1) / np.cos(phi2))
+             / np.log(np.tan(np.pi / 4 + phi2 / 2) / np.tan(np.pi / 4 + phi1 / 2)))
+    scale = radius * np.cos(phi1) * np.tan(np.pi / 4 + phi1 / 2) ** n / n
+
+    # Cone-apex-centred coordinates of the first point, then step through the grid
+    rho1 = scale / np.tan(np.pi / 4 + np.radians(lat1) / 2) ** n
+    theta1 = n * np.radians((lon1 - lov + 180.0) % 360.0 - 180.0)
+    i, j = _scan_indices(nx, ny, scan)
+    x = rho1 * np.sin(theta1) + i * (-dx if scan & SCAN_I_NEGATIVE else dx)
+    y = -rho1 * np.cos(theta1) + j * (dy if scan & SCAN_J_POSITIVE else -dy)
+
+    sign = np.sign(n)
+    rho = sign * np.hypot(x, y)
+    theta = np.arctan2(sign * x, -sign * y)
+    latitudes = np.degrees(2.0 * np.arctan((scale / rho) ** (1.0 / n)) - np.pi / 2)
+    longitudes = lov + np.degrees(theta / n)
+    crs = f"+proj=lcc +lat_1={latin1:g} +lat_2={latin2:g} +lon_0={lov:g} +R={radius:.0f}"
+    return GribGrid(latitudes, longitudes, dx / 1000.0 / KM_PER_DEGREE, dy / 1000.0 / KM_PER_DEGREE,
+                    crs, theta if grid_relative else None)
+
+
+GRID_TEMPLATES = {
+    0: _latlon_grid,
+    30: _lambert_grid
+}
+
+
+def unpack_simple(section: bytes, data: bytes, count: int) -> np.ndarray:
+    """Template 5.0 packed integers"""
+    return read_packed(np.frombuffer(data, dtype=np.uint8), 0, count, section[19])
+
+
+def unpack_complex(section: bytes, data: bytes, count: int, template: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Templates 5.2/5.3 packed integers, and the mask of missing values"""
+    nbits = section[19]
+    missing_management = section[22]
+    groups = _uint(section, 31, 4)
+    width_reference, width_bits = section[35], section[36]
+    length_reference, length_increment = _uint(section, 37, 4), section[41]
+    last_length, length_bits = _uint(section, 42, 4), section[46]
+    order = section[47] if template == 3 else 0
+    extra_octets = section[48] if template == 3 else 0
+
+    # Spatial differencing: first values and the minimum difference lead the data section
+    offset = 0
+    first_values = []
+    minimum = 0
+    if order:
+        for _ in range(order):
+            first_values.append(_sint(data, offset, extra_octets))
+            offset += extra_octets
+        minimum = _sint(data, offset, extra_octets)
+        offset += extra_octets
+
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    bit = offset * 8
+    references = read_packed(buffer, bit, groups, nbits)
+    bit = _byte_aligned(bit + groups * nbits)
+    widths = read_packed(buffer, bit, groups, width_bits) + width_reference
+    bit = _byte_aligned(bit + groups * width_bits)
+    lengths = read_packed(buffer, bit, groups, length_bits) * length_increment + length_reference
+    lengths[-1] = last_length
+    bit = _byte_aligned(bit + groups * length_bits)
+    if lengths.sum() != count:
+        raise GribDecodeError(f"Complex packing groups hold {lengths.sum()} values, expected {count}")
+
+    # Bit offset of every value: group start plus position within the group
+    group_starts = bit + np.concatenate([[0], np.cumsum(widths * lengths)[:-1]])
+    group_firsts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    value_widths = np.repeat(widths, lengths)
+    value_offsets = (np.repeat(group_starts, lengths)
+                     + (np.arange(count) - np.repeat(group_firsts, lengths)) * value_widths)
+    packed = extract_bits(buffer, value_offsets, value_widths)
+
+    missing = np.zeros(count, dtype=bool)
+    if missing_management:
+        value_references = np.repeat(references, lengths)
+        all_ones = np.where(value_widths > 0, (1 << value_widths) - 1, (1 << nbits) - 1)
+        level = np.where(value_widths > 0, packed, value_references)
+        missing = level == all_ones
+        if missing_management == 2:
+            missing |= level == all_ones - 1
+    values = np.repeat(references, lengths) + packed
+
+    if order:
+        present = values[~missing]
+        if order == 1:
+            present[1:] += minimum
+            present[0] = first_values[0]
+            present = np.cumsum(present)
+        else:
+            differences = present.copy()
+            differences[2:] += minimum
+            differences[1] = first_values[1] - first_values[0]
+            present = np.empty_like(differences)
+            present[0] = first_values[0]
+            present[1:] = first_values[0] + np.cumsum(np.cumsum(differences[1:]))
+        values[~missing] = present
+    return values, missing
+
+
+class GribField(NamedTuple):
+    """One decoded GRIB2 field; values are float64 in data order with NaN for missing points"""
+    variable: str
+    level: str
+    reference_time: datetime
+    valid_time: datetime
+    grid: GribGrid
+    grid_key: bytes
+    values: np.ndarray
+
+
+def level_name(surface_type: int, scale: int, scaled_value: int) -> str:
+    """.idx style level text of a fixed surface"""
+    if surface_type in SURFACE_LEVELS:
+        return SURFACE_LEVELS[surface_type]
+    value = scaled_value / 10.0 ** scale if scale != 255 else 0.0
+    if surface_type == 103:
+        return f"{value:g} m above ground"
+    if surface_type == 100:
+        return f"{value / 100.0:g} mb"
+    return f"surface type {surface_type} {value:g}"
+
+
+def iter_messages(data: bytes) -> Iterator[bytes]:
+    """Complete GRIB2 messages in a byte stream, skipping anything between them"""
+    position = data.find(GRIB_MAGIC)
+    while position >= 0 and position + 16 <= len(data):
+        if data[position + 7] != 2:
+            raise GribDecodeError(f"GRIB edition {data[position + 7]} at byte {position} is not supported")
+        length = _uint(data, position + 8, 8)
+        message = data[position:position + length]
+        if len(message) < length or not message.endswith(END_MARKER):
+            raise GribDecodeError(f"Truncated GRIB2 message at byte {position}")
+        yield message
+        position = data.find(GRIB_MAGIC, position + length)
+
+
+class GribDecoder:
+    """Decodes GRIB2 messages into GribFields; grids are built once per distinct section 3"""
+
+    def __init__(self):
+        self.grids: Dict[bytes, GribGrid] = {}
+
+    def grid(self, section: bytes) -> GribGrid:
+        key = bytes(section)
+        if key not in self.grids:
+            template = _uint(section, 12, 2)
+            if template not in GRID_TEMPLATES:
+                raise GribDecodeError(f"Grid definition template 3.{template} is not supported")
+            self.grids[key] = GRID_TEMPLATES[template](section)
+        return self.grids[key]
+
+    def decode(self, message: bytes) -> Iterator[GribField]:
+        """Every field in one message (sections 2-7 may repeat)"""
+        discipline = message[6]
+        reference_time = None
+        grid_section = product = representation = bitmap = None
+        position = 16
+        while position < len(message) - 4:
+            length = _uint(message, position, 4)
+            number = message[position + 4]
+            section = message[position:position + length]
+            position += length
+
+            if number == 1:
+                reference_time = _datetime(section, 12)
+            elif number == 3:
+                grid_section = section
+            elif number == 4:
+                product = section
+            elif number == 5:
+                representation = section
+            elif number == 6:
+                indicator = section[5]
+                if indicator == 0:
+                    bitmap = np.unpackbits(np.frombuffer(section, dtype=np.uint8, offset=6)).astype(bool)
+                elif indicator == 255:
+                    bitmap = None
+                elif indicator != 254:
+                    raise GribDecodeError(f"Predefined bitmap {indicator} is not supported")
+            elif number == 7:
+                field = self._field(discipline, reference_time, grid_section, product, representation,
+                                    bitmap, section)
+                if field is not None:
+                    yield field
+
+    def _field(self, discipline: int, reference_time: datetime, grid_section: bytes, product: bytes,
+               representation: bytes, bitmap: Optional[np.ndarray], data_section: bytes) -> Optional[GribField]:
+        variable = GRIB2_SHORT_NAMES.get((discipline, product[9], product[10]))
+        if variable is None:
+            return None  # Not a field db-6 uses
+        level = level_name(product[22], product[23], _sint(product, 24, 4))
+
+        template = _uint(product, 7, 2)
+        if template in END_TIME_OFFSETS:
+            valid_time = _datetime(product, END_TIME_OFFSETS[template])
+        else:
+            unit = TIME_UNIT_SECONDS.get(product[17])
+            if unit is None:
+                raise GribDecodeError(f"Unit of time range {product[17]} is not supported")
+            valid_time = reference_time + timedelta(seconds=_uint(product, 18, 4) * unit)
+
+        grid = self.grid(grid_section)
+        count = _uint(representation, 5, 4)
+        packing = _uint(representation, 9, 2)
+        data = data_section[5:]
+        if packing == 0:
+            packed = unpack_simple(representation, data, count)
+            missing = None
+        elif packing in (2, 3):
+            packed, missing = unpack_complex(representation, data, count, packing)
+        else:
+            raise GribDecodeError(f"Data representation template 5.{packing} is not supported")
+
+        reference = struct.unpack('>f', representation[11:15])[0]
+        binary_scale = _sint(representation, 15, 2)
+        decimal_scale = _sint(representation, 17, 2)
+        values = (reference + packed * 2.0 ** binary_scale) / 10.0 ** decimal_scale
+        if missing is not None:
+            values[missing] = np.nan
+
+        if bitmap is not None:
+            expanded = np.full(len(grid), np.nan)
+            expanded[bitmap[:len(grid)]] = values
+            values = expanded
+        elif len(values) != len(grid):
+            raise GribDecodeError(f"{variable} has {len(values)} values for {len(grid)} grid points")
+        return GribField(variable, level, reference_time, valid_time, grid, bytes(grid_section), values)
+
+    def decode_bytes(self, data: bytes) -> Iterator[GribField]:
+        """Every db-6 field in a GRIB2 byte stream, falling back to pygrib for unsupported templates"""
+        for message in iter_messages(data):
+            try:
+                yield from self.decode(message)
+            except GribDecodeError:
+                if not PYGRIB_AVAILABLE:
+                    raise
+                yield from self._decode_with_pygrib(message)
+
+    def _decode_with_pygrib(self, message: bytes) -> Iterator[GribField]:
+        grib = pygrib.fromstring(message)
+        variable = GRIB2_SHORT_NAMES.get((grib.discipline, grib.parameterCategory, grib.parameterNumber))
+        if variable is None:
+            return
+        latitudes, longitudes = grib.latlons()
+        key = f"pygrib:{grib.gridType}:{latitudes.shape}:{latitudes.flat[0]}:{longitudes.flat[0]}".encode()
+        if key not in self.grids:
+            self.grids[key] = GribGrid(latitudes.ravel(), longitudes.ravel(),
+                                       getattr(grib, 'iDirectionIncrementInDegrees', 0.0),
+                                       getattr(grib, 'jDirectionIncrementInDegrees', 0.0), 'EPSG:4326')
+        values = np.ma.filled(np.ma.asarray(grib.values, dtype=np.float64), np.nan).ravel()
+        level = level_name(grib.typeOfFirstFixedSurface, grib.scaleFactorOfFirstFixedSurface,
+                           grib.scaledValueOfFirstFixedSurface)
+        yield GribField(variable, level, grib.analDate, grib.validDate, self.grids[key], key, values)
+
+
+def earth_relative_winds(u: np.ndarray, v: np.ndarray, rotation: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Rotate grid-relative u/v to east/north components (rotation None: already earth-relative)"""
+    if rotation is None:
+        return u, v
+    cos, sin = np.cos(rotation), np.sin(rotation)
+    return cos * u + sin * v, -sin * u + cos * v
+
+
+def slice_column(column: EncodedColumn, start: int, stop: int) -> EncodedColumn:
+    """Rows start:stop of an encoded column"""
+    if column.matrix is not None:
+        return EncodedColumn(min(stop, column.rows) - start, matrix=column.matrix[start:stop])
+    return EncodedColumn(len(column.values[start:stop]), values=column.values[start:stop])
+
+
+def forecast_values(fields: Dict[Tuple[str, str], np.ndarray],
+                    parameters: Sequence[str] = WEATHER_PARAMETERS) -> Dict[str, np.ndarray]:
+    """db-6 parameter values from decoded fields keyed by (variable, level)
+
+    Parameters whose GRIB fields are not all present are left out.
+    """
+    values = {}
+    for parameter in parameters:
+        inputs = []
+        for alternatives in GRIB2_PARAMETER_MESSAGES[parameter]:
+            field = next((fields[key] for key in alternatives if key in fields), None)
+            if field is None:
+                break
+            inputs.append(field)
+        if len(inputs) == len(GRIB2_PARAMETER_MESSAGES[parameter]):
+            values[parameter] = PARAMETER_CONVERSIONS[parameter](*inputs)
+    return values
+
+
+class Grib2ForecastLoader:
+    """Turns GRIB2 files into grib2_forecasts rows and loads them with binary COPY
+
+    Fields are grouped by (reference time, valid time, grid); every db-6 parameter
+    the group can produce becomes rows over the grid's US_BOUNDS cells, encoded in
+    blocks of block_rows. Per-cell coordinate, geometry and id columns are encoded
+    once per grid.
+    """
+
+    def __init__(self, parameters: Sequence[str] = WEATHER_PARAMETERS, block_rows: int = BLOCK_ROWS):
+        self.parameters = list(parameters)
+        self.block_rows = block_rows
+        self.decoder = GribDecoder()
+        self.encoder = BinaryCopyEncoder(GRIB2_STAGE_TABLE, TABLE_COLUMNS['grib2_forecasts'])
+        self._cell_columns = {}
+        self.rows = 0
+        self.blocks = 0
+
+    def cell_columns(self, grid_key: bytes, grid: GribGrid) -> Dict:
+        """Encoded per-cell columns of a grid's US_BOUNDS cells (cached)"""
+        if grid_key not in self._cell_columns:
+            cells = grid.bounded_cells()
+            latitudes, longitudes = grid.latitudes[cells], grid.longitudes[cells]
+            pairs = list(zip(latitudes.tolist(), longitudes.tolist()))
+            self._cell_columns[grid_key] = {
+                'grid_cell_latitude': encode_numeric(latitudes, 10, 7),
+                'grid_cell_longitude': encode_numeric(longitudes, 10, 7),
+                'grid_cell_geom': encode_text([generate_geography_wkt(lat, lon) for lat, lon in pairs]),
+                'id_fragments': [f"{lat:.4f}-{lon:.4f}".encode('utf-8') for lat, lon in pairs],
+                'extent': (float(longitudes.min()), float(latitudes.min()),
+                           float(longitudes.max()), float(latitudes.max())) if len(cells) else None
+            }
+        return self._cell_columns[grid_key]
+
+    def blocks_for(self, data: bytes, model: str, source_file: str) -> Iterator[bytes]:
+        """Encoded grib2_forecasts rows for every field group in a GRIB2 byte stream"""
+        groups: Dict[Tuple, Dict[Tuple[str, str], GribField]] = {}
+        for field in self.decoder.decode_bytes(data):
+            group = groups.setdefault((field.reference_time, field.valid_time, field.grid_key), {})
+            group.setdefault((field.variable, field.level), field)
+
+        for (reference_time, valid_time, grid_key), fields in groups.items():
+            grid = next(iter(fields.values())).grid
+            columns = self.cell_columns(grid_key, grid)
+            if columns['extent'] is None:
+                continue
+            cells = grid.bounded_cells()
+
+            subset = {key: field.values[cells] for key, field in fields.items()}
+            u_key, v_key = ('UGRD', '10 m above ground'), ('VGRD', '10 m above ground')
+            if u_key in subset and v_key in subset and grid.wind_rotation is not None:
+                subset[u_key], subset[v_key] = earth_relative_winds(subset[u_key], subset[v_key],
+                                                                    grid.wind_rotation[cells])
+
+            lead_hours = int((valid_time - reference_time).total_seconds() // 3600)
+            stamp = f"{reference_time:%Y%m%d%H}-f{lead_hours:03d}"
+            for parameter, values in forecast_values(subset, self.parameters).items():
+                for start in range(0, len(cells), self.block_rows):
+                    stop = min(start + self.block_rows, len(cells))
+                    yield self._encode_block(columns, start, stop, f"{model}-{parameter.lower()}-{stamp}-",
+                                             parameter, valid_time, values[start:stop], source_file, grid)
+
+    def _encode_block(self, columns: Dict, start: int, stop: int, id_prefix: str, parameter: str,
+                      valid_time: datetime, values: np.ndarray, source_file: str, grid: GribGrid) -> bytes:
+        west, south, east, north = columns['extent']
+        block = {
+            'forecast_id': encode_prefixed_text(id_prefix, columns['id_fragments'][start:stop]),
+            'parameter_name': parameter,
+            'forecast_time': valid_time,
+            'grid_cell_latitude': slice_column(columns['grid_cell_latitude'], start, stop),
+            'grid_cell_longitude': slice_column(columns['grid_cell_longitude'], start, stop),
+            'grid_cell_geom': slice_column(columns['grid_cell_geom'], start, stop),
+            'parameter_value': values,
+            'source_file': source_file,
+            'source_crs': grid.crs,
+            'target_crs': 'EPSG:4326',
+            'grid_resolution_x': grid.resolution_x,
+            'grid_resolution_y': grid.resolution_y,
+            'spatial_extent_west': west,
+            'spatial_extent_south': south,
+            'spatial_extent_east': east,
+            'spatial_extent_north': north,
+            'transformation_status': 'completed'
+        }
+        self.rows += stop - start
+        self.blocks += 1
+        return self.encoder.encode(block, stop - start)
+
+    def merge_sql(self) -> str:
+        names = self.encoder.column_names
+        updates = ', '.join(f"{name} = EXCLUDED.{name}" for name in names if name != 'forecast_id')
+        return (f"INSERT INTO grib2_forecasts ({', '.join(names)}) SELECT {', '.join(names)} "
+                f"FROM {GRIB2_STAGE_TABLE} ON CONFLICT (forecast_id) DO UPDATE SET {updates}, "
+                f"load_timestamp = CURRENT_TIMESTAMP")
+
+    def load_file(self, conn, path: Path, model: str, source_file: str) -> int:
+        """Decode one file and merge its rows into grib2_forecasts in one transaction; returns rows"""
+        start_rows, start_blocks = self.rows, self.blocks
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {GRIB2_STAGE_TABLE} "
+                           f"(LIKE grib2_forecasts INCLUDING DEFAULTS) ON COMMIT DELETE ROWS")
+            copy_binary(conn, self.encoder, self.blocks_for(path.read_bytes(), model, source_file))
+            cursor.execute(self.merge_sql())
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            self.rows, self.blocks = start_rows, start_blocks
+            raise
+        finally:
+            cursor.close()
+        return self.rows - start_rows
+
+    def load(self, conn, files: Iterable[Tuple[Path, str, str]]) -> int:
+        """load_file every (path, model, source_file); raises on the first failure, earlier files stay committed"""
+        return sum(self.load_file(conn, path, model, source_file) for path, model, source_file in files)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Decode GRIB2 files and load them into grib2_forecasts')
+    parser.add_argument('files', nargs='+', type=Path, help='GRIB2 files (full files or .idx subsets)')
+    parser.add_argument('--model', help='Model name used in forecast_id (default: file name prefix, e.g. gfs)')
+    parser.add_argument('--parameters', default=','.join(WEATHER_PARAMETERS),
+                        help='Comma-separated parameter_name values to load (default: all)')
+    parser.add_argument('--load', action='store_true', help='COPY the rows into PostgreSQL')
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args()
+    loader = Grib2ForecastLoader([p.strip() for p in args.parameters.split(',') if p.strip()])
+    files = [(path, args.model or path.name.split('.')[0], path.name) for path in args.files]
+
+    start = time.time()
+    if args.load:
+        conn = get_postgres_connection()
+        if conn is None:
+            logger.error("PostgreSQL connection failed")
+            sys.exit(1)
+        try:
+            for path, model, source_file in files:
+                try:
+                    loader.load_file(conn, path, model, source_file)
+                except Exception as e:
+                    logger.error(f"Skipping {path}: {e}")
+        finally:
+            conn.close()
+    else:
+        for path, model, source_file in files:
+            for _ in loader.blocks_for(path.read_bytes(), model, source_file):
+                pass
+    elapsed = time.time() - start
+
+    action = 'Loaded' if args.load else 'Decoded'
+    logger.info(f"{action} {loader.rows:,} grib2_forecasts rows ({loader.blocks} parameter slabs) "
+                f"from {len(files)} files in {elapsed:.2f}s ({loader.rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
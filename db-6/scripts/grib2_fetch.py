@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+GRIB2 byte-range fetch driven by .idx inventories
+NOAA model buckets publish a <file>.idx inventory next to every GRIB2 file, one
+line per message:
+  <message>:<byte offset>:d=<YYYYMMDDHH>:<variable>:<level>:<forecast>:
+Only the messages behind the requested db-6 parameter_name values are downloaded,
+with adjacent messages coalesced into single HTTP Range requests. A GFS 0.25 degree
+file is ~500 MB; the dozen surface messages db-6 uses are a few MB of it.
+
+Works with any boto3-compatible S3 client (including local_s3.LocalS3Client);
+fetch_async does the same on an async_s3.AsyncS3Fetcher for bulk backfills.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from async_s3 import AsyncS3Fetcher, FetchRequest
+
+# GRIB (variable, level) alternatives that can serve one message slot; the first
+# present in an inventory wins (e.g. HRRR has MSLMA where GFS has PRMSL)
+TEMPERATURE_2M = [('TMP', '2 m above ground')]
+DEWPOINT_2M = [('DPT', '2 m above ground')]
+HUMIDITY_2M = [('RH', '2 m above ground')]
+WIND_U_10M = [('UGRD', '10 m above ground')]
+WIND_V_10M = [('VGRD', '10 m above ground')]
+
+# parameter_name -> message slots needed to produce it. Heat index, wind chill and
+# apparent temperature are derived from the base fields, so they pull those in.
+GRIB2_PARAMETER_MESSAGES = {
+    'Temperature': [TEMPERATURE_2M],
+    'Dewpoint': [DEWPOINT_2M],
+    'RelativeHumidity': [HUMIDITY_2M],
+    'WindSpeed': [WIND_U_10M, WIND_V_10M],
+    'WindDirection': [WIND_U_10M, WIND_V_10M],
+    'Pressure': [[('PRMSL', 'mean sea level'), ('MSLMA', 'mean sea level')]],
+    'Visibility': [[('VIS', 'surface')]],
+    'Precipitation': [[('APCP', 'surface')]],
+    'SkyCover': [[('TCDC', 'entire atmosphere'), ('TCDC', 'entire atmosphere (considered as a single layer)')]],
+    'CloudBase': [[('HGT', 'cloud base')]],
+    'HeatIndex': [TEMPERATURE_2M, HUMIDITY_2M],
+    'WindChill': [TEMPERATURE_2M, WIND_U_10M, WIND_V_10M],
+    'ApparentTemperature': [TEMPERATURE_2M, HUMIDITY_2M, WIND_U_10M, WIND_V_10M]
+}
+
+# Messages closer than this are fetched in one request, gap bytes included;
+# a round-trip costs more than a few KB of transfer
+DEFAULT_MAX_GAP_BYTES = 64 * 1024
+
+RANGE_FETCH_WORKERS = 4
+
+
+class IdxEntry(NamedTuple):
+    """One GRIB2 message from an .idx inventory; end is inclusive, None means end of file"""
+    message: str
+    offset: int
+    end: Optional[int]
+    reference_time: str
+    variable: str
+    level: str
+    forecast: str
+
+
+class RangeFetchResult(NamedTuple):
+    """Messages written by GribRangeFetcher.fetch and what it took to get them"""
+    bucket: str
+    key: str
+    entries: List[IdxEntry]
+    missing: List[str]
+    ranges: List[Tuple[int, Optional[int]]]
+    bytes_fetched: int
+    file_size: Optional[int]
+
+
+def parse_idx(text: str) -> List[IdxEntry]:
+    """Parse an .idx inventory; each message ends where the next one starts
+
+    Sub-messages (numbered like '3.1', '3.2', e.g. UGRD/VGRD pairs) share one
+    offset and therefore one byte range.
+    """
+    rows = []
+    for line in text.splitlines():
+        fields = line.split(':')
+        if len(fields) < 6 or not fields[1].isdigit():
+            continue
+        rows.append((fields[0], int(fields[1]), fields[2].replace('d=', ''), fields[3], fields[4], fields[5]))
+
+    offsets = sorted({row[1] for row in rows})
+    next_offset = dict(zip(offsets, offsets[1:]))
+    return [
+        IdxEntry(message, offset, next_offset[offset] - 1 if offset in next_offset else None,
+                 reference_time, variable, level, forecast)
+        for message, offset, reference_time, variable, level, forecast in rows
+    ]
+
+
+def select_messages(entries: Sequence[IdxEntry], parameters: Iterable[str]) -> Tuple[List[IdxEntry], List[str]]:
+    """Messages needed for parameters, in file order, plus parameters that cannot be served
+
+    A slot takes the first matching message in the file (e.g. the first APCP
+    accumulation window). Sub-messages sharing an offset are all kept, so
+    result entries list every field behind the shared byte range.
+    """
+    by_field = {}
+    for entry in entries:
+        by_field.setdefault((entry.variable, entry.level), entry)
+
+    selected = {}
+    missing = []
+    for parameter in parameters:
+        slots = GRIB2_PARAMETER_MESSAGES.get(parameter)
+        if slots is None:
+            raise ValueError(f"No GRIB2 mapping for parameter {parameter}")
+        matches = []
+        for alternatives in slots:
+            match = next((by_field[field] for field in alternatives if field in by_field), None)
+            if match is None:
+                break
+            matches.append(match)
+        if len(matches) < len(slots):
+            missing.append(parameter)
+            continue
+        for entry in matches:
+            selected[(entry.offset, entry.variable, entry.level)] = entry
+    return sorted(selected.values(), key=lambda entry: (entry.offset, entry.message)), missing
+
+
+def coalesce_ranges(entries: Sequence[IdxEntry],
+                    max_gap: int = DEFAULT_MAX_GAP_BYTES) -> List[Tuple[int, Optional[int]]]:
+    """Inclusive byte ranges covering entries (sorted by offset), merging ranges at most max_gap apart"""
+    ranges = []
+    for entry in entries:
+        if ranges:
+            start, end = ranges[-1]
+            if end is None or entry.offset - end - 1 <= max_gap:
+                ranges[-1] = (start, None if end is None or entry.end is None else max(end, entry.end))
+                continue
+        ranges.append((entry.offset, entry.end))
+    return ranges
+
+
+def range_header(start: int, end: Optional[int]) -> str:
+    return f"bytes={start}-" if end is None else f"bytes={start}-{end}"
+
+
+class GribRangeFetcher:
+    """Downloads selected GRIB2 messages of S3 objects using their .idx inventories"""
+
+    def __init__(self, s3_client, max_gap: int = DEFAULT_MAX_GAP_BYTES, workers: int = RANGE_FETCH_WORKERS):
+        self.s3_client = s3_client
+        self.max_gap = max_gap
+        self.workers = workers
+
+    def read_index(self, bucket: str, key: str) -> List[IdxEntry]:
+        response = self.s3_client.get_object(Bucket=bucket, Key=key + '.idx')
+        return parse_idx(response['Body'].read().decode('utf-8', errors='replace'))
+
+    def _get_range(self, bucket: str, key: str, byte_range: Tuple[int, Optional[int]]) -> bytes:
+        response = self.s3_client.get_object(Bucket=bucket, Key=key, Range=range_header(*byte_range))
+        return response['Body'].read()
+
+    def fetch_bytes(self, bucket: str, key: str, parameters: Iterable[str]) -> Tuple[bytes, RangeFetchResult]:
+        """The selected messages concatenated in file order, which is itself a valid GRIB2 stream
+
+        Messages inside a coalesced gap come along too; decoders read them as
+        ordinary extra messages.
+        """
+        entries, missing = select_messages(self.read_index(bucket, key), parameters)
+        ranges = coalesce_ranges(entries, self.max_gap)
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(ranges)))) as pool:
+            chunks = list(pool.map(lambda byte_range: self._get_range(bucket, key, byte_range), ranges))
+        return _assemble(bucket, key, entries, missing, ranges, chunks)
+
+    def fetch(self, bucket: str, key: str, parameters: Iterable[str], destination: Path) -> RangeFetchResult:
+        """Write the selected messages of bucket/key to destination (atomically)"""
+        data, result = self.fetch_bytes(bucket, key, parameters)
+        write_atomic(destination, data)
+        return result
+
+
+async def fetch_async(fetcher: AsyncS3Fetcher, bucket: str, key: str, parameters: Iterable[str],
+                      destination: Path, max_gap: int = DEFAULT_MAX_GAP_BYTES) -> RangeFetchResult:
+    """GribRangeFetcher.fetch on an AsyncS3Fetcher; a file's ranges share its bucket's concurrency limit"""
+    index = await fetcher.read(FetchRequest(bucket, key + '.idx'))
+    entries, missing = select_messages(parse_idx(index.decode('utf-8', errors='replace')), parameters)
+    ranges = coalesce_ranges(entries, max_gap)
+    chunks = await asyncio.gather(*(
+        fetcher.read(FetchRequest(bucket, key, range_header(*byte_range))) for byte_range in ranges
+    ))
+    data, result = _assemble(bucket, key, entries, missing, ranges, chunks)
+    await fetcher.transport.run_blocking(write_atomic, destination, data)
+    return result
+
+
+def _assemble(bucket: str, key: str, entries: List[IdxEntry], missing: List[str],
+              ranges: List[Tuple[int, Optional[int]]], chunks: Sequence[bytes]) -> Tuple[bytes, RangeFetchResult]:
+    data = b''.join(chunks)
+    file_size = None
+    if ranges and ranges[-1][1] is None:
+        file_size = ranges[-1][0] + len(chunks[-1])
+    return data, RangeFetchResult(bucket, key, entries, missing, ranges, len(data), file_size)
+
+
+def write_atomic(destination: Path, data: bytes):
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    partial = destination.with_name(destination.name + '.part')
+    partial.write_bytes(data)
+    partial.replace(destination)
+
+
+def summarize_fetches(results: Sequence[RangeFetchResult], file_sizes: Dict[str, int]) -> Dict:
+    """Totals for a batch of fetches; file_sizes maps keys to full object sizes (from listings)"""
+    fetched = sum(result.bytes_fetched for result in results)
+    full = sum(file_sizes.get(result.key) or result.file_size or 0 for result in results)
+    return {
+        'files': len(results),
+        'messages': sum(len(result.entries) for result in results),
+        'requests': sum(len(result.ranges) for result in results),
+        'bytes_fetched': fetched,
+        'bytes_full': full,
+        'saved_fraction': 1.0 - fetched / full if full else 0.0
+    }
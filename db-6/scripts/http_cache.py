@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Persistent conditional-request cache for the NWS and GeoPlatform JSON APIs
+Stores each GET response's validators (ETag, Last-Modified) and body in a local
+SQLite file. The next GET of the same URL sends If-None-Match /
+If-Modified-Since; a 304 is answered from the stored body.
+
+A 304 only says the body matches the cached copy, not that the copy ever
+reached the database: a load can fail or roll back after the GET, the
+database can be reset, and one cache is shared by runs against different
+databases. So loaders mark the URLs whose records they committed with
+mark_applied, keyed by the cache's target database, and a 304 for a body
+already applied to that target is flagged with response.already_applied;
+pollers skip re-parsing and re-inserting only those. Any other 304 is parsed
+and loaded again, and ON CONFLICT de-duplicates it. After resetting a
+database, forget_applied makes the next run load everything it revalidates.
+
+It is a requests transport adapter, mounted on a Session with mount_http_cache,
+so every get() through that session (including AsyncNWSClient's worker
+sessions) is covered without call-site changes.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ingest_manifest import lookup_chunks
+
+DEFAULT_HTTP_CACHE_PATH = Path(__file__).parent.parent / 'data' / 'http_cache.sqlite'
+
+HTTP_CACHE_DDL = """
+CREATE TABLE IF NOT EXISTS http_responses (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    content_type TEXT,
+    body BLOB NOT NULL,
+    stored_at TEXT NOT NULL
+);
+
+-- stored_at of the body whose records were committed to target
+CREATE TABLE IF NOT EXISTS applied_responses (
+    url TEXT NOT NULL,
+    target TEXT NOT NULL,
+    stored_at TEXT NOT NULL,
+    PRIMARY KEY (url, target)
+);
+"""
+
+
+def database_target(db_type: str) -> str:
+    """Identity of the database the ingesters connect to for db_type, from the same environment"""
+    if db_type == 'postgresql':
+        return (f"postgresql://{os.getenv('POSTGRES_HOST', '127.0.0.1')}:{os.getenv('POSTGRES_PORT_DB6', '5437')}"
+                f"/{os.getenv('POSTGRES_DB', 'db6')}")
+    return f"{db_type}://{os.getenv('SNOWFLAKE_DATABASE', 'DB6')}/{os.getenv('SNOWFLAKE_SCHEMA', 'PUBLIC')}"
+
+
+class CachedResponse(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_type: Optional[str]
+    body: bytes
+
+
+class HTTPCache:
+    """Validators and bodies by URL, and which bodies target has loaded; safe to share between sessions and threads"""
+
+    def __init__(self, path: Path = DEFAULT_HTTP_CACHE_PATH, target: str = 'default'):
+        self.path = Path(path)
+        self.target = target
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._db.executescript(HTTP_CACHE_DDL)
+        self.requests = 0
+        self.conditional = 0
+        self.not_modified = 0
+        self.stored = 0
+        self.bytes_saved = 0
+
+    def lookup(self, url: str) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, content_type, body FROM http_responses WHERE url = ?", (url,)
+            ).fetchone()
+        return CachedResponse(*row) if row else None
+
+    def store(self, url: str, response: requests.Response):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO http_responses VALUES (?, ?, ?, ?, ?, ?)",
+                (url, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                 response.headers.get('Content-Type'), response.content, datetime.now().isoformat())
+            )
+            self._db.commit()
+            self.stored += 1
+
+    def is_applied(self, url: str) -> bool:
+        """Whether the stored body of url has been loaded into target"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM http_responses r JOIN applied_responses a ON a.url = r.url "
+                "WHERE r.url = ? AND a.target = ? AND a.stored_at = r.stored_at", (url, self.target)
+            ).fetchone()
+        return row is not None
+
+    def mark_applied(self, urls: Iterable[str]) -> int:
+        """Record that the stored bodies of urls were committed to target; call after the commit"""
+        urls = list(dict.fromkeys(urls))
+        marked = 0
+        with self._lock:
+            for chunk in lookup_chunks(urls):
+                marked += self._db.execute(
+                    "INSERT OR REPLACE INTO applied_responses (url, target, stored_at) "
+                    f"SELECT url, ?, stored_at FROM http_responses WHERE url IN ({', '.join(['?'] * len(chunk))})",
+                    [self.target, *chunk]
+                ).rowcount
+            self._db.commit()
+        return marked
+
+    def forget_applied(self) -> int:
+        """Drop target's applied marks, e.g. after the database was reset"""
+        with self._lock:
+            forgotten = self._db.execute("DELETE FROM applied_responses WHERE target = ?", (self.target,)).rowcount
+            self._db.commit()
+        return forgotten
+
+    def count(self, conditional: bool, not_modified_bytes: Optional[int] = None):
+        """Account one GET; not_modified_bytes is the stored body size when it was answered by a 304"""
+        with self._lock:
+            self.requests += 1
+            self.conditional += conditional
+            if not_modified_bytes is not None:
+                self.not_modified += 1
+                self.bytes_saved += not_modified_bytes
+
+    def report(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'conditional': self.conditional,
+            'not_modified': self.not_modified,
+            'not_modified_rate': self.not_modified / self.requests if self.requests else 0.0,
+            'stored': self.stored,
+            'bytes_saved': self.bytes_saved
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class ConditionalRequestAdapter(HTTPAdapter):
+    """HTTPAdapter that revalidates GETs against an HTTPCache"""
+
+    def __init__(self, cache: HTTPCache, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        if request.method != 'GET':
+            return super().send(request, **kwargs)
+
+        cached = self.cache.lookup(request.url)
+        if cached and (cached.etag or cached.last_modified):
+            if cached.etag:
+                request.headers.setdefault('If-None-Match', cached.etag)
+            if cached.last_modified:
+                request.headers.setdefault('If-Modified-Since', cached.last_modified)
+        else:
+            cached = None
+
+        response = super().send(request, **kwargs)
+        response.already_applied = False
+
+        if response.status_code == 304 and cached:
+            response.status_code = 200
+            response.reason = 'OK (not modified)'
+            response._content = cached.body
+            response._content_consumed = True
+            if cached.content_type:
+                response.headers.setdefault('Content-Type', cached.content_type)
+            response.already_applied = self.cache.is_applied(request.url)
+            self.cache.count(True, len(cached.body))
+            return response
+
+        self.cache.count(cached is not None)
+        if response.status_code == 200 and ('ETag' in response.headers or 'Last-Modified' in response.headers):
+            self.cache.store(request.url, response)
+        return response
+
+
+def mount_http_cache(session: requests.Session, cache: HTTPCache) -> requests.Session:
+    adapter = ConditionalRequestAdapter(cache)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def already_applied(response: requests.Response) -> bool:
+    """Whether response was served from the cache after a 304 and its body is already in the cache's target"""
+    return getattr(response, 'already_applied', False)
+
+
+def format_http_cache_report(report: Dict) -> str:
+    return (f"{report['not_modified']:,} of {report['requests']:,} requests not modified "
+            f"({report['not_modified_rate']:.0%}), {report['bytes_saved'] / 1024**2:,.1f} MB not re-downloaded, "
+            f"{report['stored']:,} responses stored")
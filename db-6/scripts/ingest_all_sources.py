@@ -13,9 +13,12 @@ from pathlib import Path
 script_dir = Path(__file__).parent
 sys.path.insert(0, str(script_dir))
 
+from http_cache import HTTPCache, database_target, format_http_cache_report
 from ingest_aws_opendata import AWSDataIngester
+from ingest_manifest import IngestManifest
 from ingest_nws_api import NWSAPIIngester
 from ingest_geoplatform import GeoPlatformIngester
+from nws_gridpoints import GridpointIndex
 
 
 def main():
@@ -37,16 +40,19 @@ def main():
         aws_ingester = AWSDataIngester(db_type=db_type)
         conn = aws_ingester.get_db_connection()
         if conn:
-            # Ingest recent GFS and HRRR forecasts
+            # Ingest recent GFS and HRRR forecasts, listing all cycles concurrently
             from datetime import datetime, timedelta
             today = datetime.now()
             yesterday = today - timedelta(days=1)
 
-            for date_str in [yesterday.strftime('%Y%m%d'), today.strftime('%Y%m%d')]:
-                for cycle in ['00', '06', '12', '18']:
-                    aws_ingester.ingest_gfs_forecast(conn, date_str, cycle)
-                    if cycle == '00':
-                        aws_ingester.ingest_hrrr_forecast(conn, date_str, cycle)
+            requests = aws_ingester.inventory_requests(
+                ['noaa_gfs', 'noaa_hrrr'], [yesterday.strftime('%Y%m%d'), today.strftime('%Y%m%d')]
+            )
+            with IngestManifest() as manifest:
+                # Only objects that are new or changed since the last run
+                inventory = aws_ingester.pending_inventory(aws_ingester.list_inventory(requests), manifest)
+                if aws_ingester.ingest_inventory(conn, inventory) == sum(map(len, inventory.values())):
+                    aws_ingester.record_inventory(inventory, manifest)
             conn.close()
             print("  ✅ AWS ingestion complete")
         else:
@@ -54,14 +60,22 @@ def main():
     except Exception as e:
         print(f"  ❌ AWS ingestion error: {e}")
 
+    # NWS and GeoPlatform polls revalidate against one HTTP cache, which tracks
+    # what has been loaded into this database
+    http_cache = HTTPCache(target=database_target(db_type))
+
     # 2. NWS API
     print("\n[2/3] Ingesting NWS API data...")
     try:
-        nws_ingester = NWSAPIIngester(db_type=db_type)
+        nws_ingester = NWSAPIIngester(db_type=db_type, http_cache=http_cache)
         conn = nws_ingester.get_db_connection()
         if conn:
             nws_ingester.ingest_stations(conn, states=['NY', 'CA', 'IL', 'FL', 'WA', 'TX', 'CO'])
             nws_ingester.ingest_observations(conn)
+            with GridpointIndex() as index:
+                nws_ingester.ingest_gridpoint_forecasts(conn, index)
+            with IngestManifest() as manifest:
+                nws_ingester.ingest_alerts(conn, manifest)
             conn.close()
             print("  ✅ NWS API ingestion complete")
         else:
@@ -72,7 +86,7 @@ def main():
     # 3. GeoPlatform
     print("\n[3/3] Ingesting GeoPlatform.gov data...")
     try:
-        geo_ingester = GeoPlatformIngester(db_type=db_type)
+        geo_ingester = GeoPlatformIngester(db_type=db_type, http_cache=http_cache)
         conn = geo_ingester.get_db_connection()
         if conn:
             geo_ingester.ingest_boundary_datasets(conn)
@@ -83,6 +97,9 @@ def main():
     except Exception as e:
         print(f"  ❌ GeoPlatform ingestion error: {e}")
 
+    print(f"\n🗄️  HTTP cache: {format_http_cache_report(http_cache.report())}")
+    http_cache.close()
+
     print("\n" + "="*70)
     print("DATA INGESTION COMPLETE")
     print("="*70)
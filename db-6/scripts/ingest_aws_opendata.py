@@ -5,13 +5,31 @@ Supports multiple datasets including NOAA GFS, HRRR, NEXRAD, and others
 """
 
 import json
+import asyncio
 import boto3
 import os
+import argparse
+import time
+import uuid
+from botocore import UNSIGNED
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import sys
 
+from async_s3 import (DEFAULT_BUCKET_CONCURRENCY, AsyncS3Fetcher, FetchRequest, fetcher_for_client,
+                      format_fetch_report)
+from grib2_decode import Grib2ForecastLoader
+from grib2_fetch import (GRIB2_PARAMETER_MESSAGES, GribRangeFetcher, RangeFetchResult, fetch_async,
+                         summarize_fetches)
+from ingest_manifest import DEFAULT_MANIFEST_PATH, IngestManifest
+from local_s3 import LocalS3Client
+from nexrad_grid import NexradGridLoader
+from nexrad_level2 import DECODE_WORKERS, Level2Decoder, NexradLevel2Loader
+from object_cache import DEFAULT_CACHE_BYTES, DEFAULT_CACHE_DIR, CachingS3Client, ObjectCache, format_cache_report
+
 try:
     import databricks.connector
     SNOWFLAKE_AVAILABLE = True
@@ -21,17 +39,165 @@ except ImportError:
 
 try:
     import psycopg2
-    from psycopg2.extras import RealDictCursor
+    from psycopg2.extras import RealDictCursor, execute_values
     POSTGRES_AVAILABLE = True
 except ImportError:
     POSTGRES_AVAILABLE = False
     print("⚠️  psycopg2 not available")
 
+# Concurrent (source, date, cycle) listings; also sizes the S3 connection pool
+LISTING_WORKERS = 16
+
+# Keys per list_objects_v2 page (the S3 maximum)
+LISTING_PAGE_SIZE = 1000
+
+# aws_data_source_log rows per multi-row INSERT, and the longest a buffered
+# row waits before being flushed
+LOG_BATCH_ROWS = 1000
+LOG_FLUSH_SECONDS = 5.0
+
+LOG_COLUMNS = ['source_id', 'source_name', 'source_type', 'bucket_name', 'file_path',
+               'format', 'ingestion_timestamp', 'status', 'metadata']
+
+# aws_data_source_log DDL per database; the metadata column is semi-structured
+LOG_TABLE_DDL = {
+    'databricks': """
+        CREATE TABLE IF NOT EXISTS aws_data_source_log (
+            source_id VARCHAR(255) PRIMARY KEY,
+            source_name VARCHAR(500),
+            source_type VARCHAR(100),
+            bucket_name VARCHAR(255),
+            file_path VARCHAR(1000),
+            format VARCHAR(50),
+            ingestion_timestamp TIMESTAMP_NTZ,
+            status VARCHAR(50),
+            metadata VARIANT
+        )
+    """,
+    'postgresql': """
+        CREATE TABLE IF NOT EXISTS aws_data_source_log (
+            source_id VARCHAR(255) PRIMARY KEY,
+            source_name VARCHAR(500),
+            source_type VARCHAR(100),
+            bucket_name VARCHAR(255),
+            file_path VARCHAR(1000),
+            format VARCHAR(50),
+            ingestion_timestamp TIMESTAMP,
+            status VARCHAR(50),
+            metadata JSONB
+        )
+    """
+}
+
+HOURLY_CYCLES = [f"{hour:02d}" for hour in range(24)]
+SYNOPTIC_CYCLES = ['00', '06', '12', '18']
+
+
+def make_s3_client(max_pool_connections: int = LISTING_WORKERS):
+    """Anonymous S3 client for the public NOAA buckets, pooled for concurrent listing"""
+    config = Config(signature_version=UNSIGNED, max_pool_connections=max_pool_connections,
+                    retries={'max_attempts': 5, 'mode': 'adaptive'})
+    return boto3.client('s3', region_name='us-east-1', config=config)
+
+
+def new_source_id(source_key: str) -> str:
+    """Unique aws_data_source_log key: readable time prefix plus a random suffix"""
+    return f"{source_key}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex}"
+
+
+class DataSourceLogWriter:
+    """Buffers aws_data_source_log rows and inserts them in multi-row batches
+
+    The table is created once per writer, and each batch is one INSERT in its own
+    transaction. A batch is written when batch_size rows are buffered, when a row
+    is added flush_seconds after the last write, and on flush()/close(). Use as a
+    context manager so the tail is written. A failed batch is rolled back and
+    counted in failed_rows; later batches still go through.
+    """
+
+    def __init__(self, conn, db_type: str = 'databricks', batch_size: int = LOG_BATCH_ROWS,
+                 flush_seconds: float = LOG_FLUSH_SECONDS):
+        self.conn = conn
+        self.db_type = db_type
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.rows = []
+        self.rows_written = 0
+        self.failed_rows = 0
+        self.batches = 0
+        self._table_ready = False
+        self._last_flush = time.monotonic()
+
+    def ensure_table(self):
+        if self._table_ready:
+            return
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(LOG_TABLE_DDL.get(self.db_type, LOG_TABLE_DDL['databricks']))
+            self.conn.commit()
+        finally:
+            cursor.close()
+        self._table_ready = True
+
+    def add(self, row: Tuple):
+        """Queue one row, in LOG_COLUMNS order"""
+        self.rows.append(row)
+        if (len(self.rows) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_seconds):
+            self.flush()
+
+    def _insert(self, cursor, rows: List[Tuple]):
+        columns = ', '.join(LOG_COLUMNS)
+        if self.db_type == 'postgresql' and POSTGRES_AVAILABLE:
+            execute_values(cursor, f"INSERT INTO aws_data_source_log ({columns}) VALUES %s",
+                           rows, page_size=len(rows))
+            return
+        placeholders = '(' + ', '.join(['%s'] * len(LOG_COLUMNS)) + ')'
+        cursor.execute(
+            f"INSERT INTO aws_data_source_log ({columns}) VALUES " + ', '.join([placeholders] * len(rows)),
+            [value for row in rows for value in row]
+        )
+
+    def flush(self) -> bool:
+        """Write buffered rows as one batch; False if the batch was rolled back"""
+        self._last_flush = time.monotonic()
+        if not self.rows:
+            return True
+        rows, self.rows = self.rows, []
+
+        self.ensure_table()
+        cursor = self.conn.cursor()
+        try:
+            self._insert(cursor, rows)
+            self.conn.commit()
+            self.rows_written += len(rows)
+            self.batches += 1
+            return True
+        except Exception as e:
+            print(f"⚠️  Error logging {len(rows)} data sources: {e}")
+            self.conn.rollback()
+            self.failed_rows += len(rows)
+            return False
+        finally:
+            cursor.close()
+
+    def close(self) -> bool:
+        return self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
 
 class AWSDataIngester:
     """Ingest data from AWS Open Data Registry"""
 
-    # AWS S3 buckets for weather/climate data
+    # AWS S3 buckets for weather/climate data. Model sources also give the key
+    # prefix of one cycle ({date} is YYYYMMDD, also split into {year}/{month}/{day};
+    # {cycle} is HH, or the radar site for NEXRAD), the cycles issued per day, and
+    # an optional substring that keys must contain to be ingested.
     DATA_SOURCES = {
         'noaa_gfs': {
             'bucket': 'noaa-gfs-bdp-pds',
@@ -40,7 +206,9 @@ class AWSDataIngester:
             'format': 'grib2',
             'update_frequency': '4x daily (00Z, 06Z, 12Z, 18Z)',
             'forecast_hours': 384,
-            'resolution': '0.25 degree (~28km)'
+            'resolution': '0.25 degree (~28km)',
+            'cycle_prefix': 'gfs.{date}/{cycle}/atmos/',
+            'cycles': SYNOPTIC_CYCLES
         },
         'noaa_hrrr': {
             'bucket': 'noaa-hrrr-bdp-pds',
@@ -49,7 +217,10 @@ class AWSDataIngester:
             'format': 'grib2',
             'update_frequency': 'hourly',
             'forecast_hours': 48,
-            'resolution': '3km'
+            'resolution': '3km',
+            'cycle_prefix': 'hrrr.{date}/conus/hrrr.t{cycle}z.',
+            'cycles': HOURLY_CYCLES,
+            'key_filter': 'wrfprs'
         },
         'noaa_nexrad': {
             'bucket': 'noaa-nexrad-level2',
@@ -58,7 +229,10 @@ class AWSDataIngester:
             'format': 'binary',
             'update_frequency': 'real-time',
             'forecast_hours': 0,
-            'resolution': '1km'
+            'resolution': '1km',
+            'cycle_prefix': '{year}/{month}/{day}/{cycle}/',
+            'cycles': [],
+            'key_filter': '_V0'
         },
         'noaa_ndfd': {
             'bucket': 'noaa-ndfd-pds',
@@ -76,7 +250,9 @@ class AWSDataIngester:
             'format': 'grib2',
             'update_frequency': 'hourly',
             'forecast_hours': 21,
-            'resolution': '13km'
+            'resolution': '13km',
+            'cycle_prefix': 'rap.{date}/rap.t{cycle}z.',
+            'cycles': HOURLY_CYCLES
         },
         'noaa_gefs': {
             'bucket': 'noaa-gefs-pds',
@@ -90,17 +266,22 @@ class AWSDataIngester:
         'noaa_rtma': {
             'bucket': 'noaa-rtma-pds',
             'description': 'Real-Time Mesoscale Analysis',
-            'prefix': 'rtma.',
+            'prefix': 'rtma2p5.',
             'format': 'grib2',
             'update_frequency': 'hourly',
             'forecast_hours': 0,
-            'resolution': '2.5km'
+            'resolution': '2.5km',
+            'cycle_prefix': 'rtma2p5.{date}/rtma2p5.t{cycle}z.',
+            'cycles': HOURLY_CYCLES
         }
     }
 
-    def __init__(self, db_type='databricks'):
+    def __init__(self, db_type='databricks', s3_client=None, async_fetcher: Optional[AsyncS3Fetcher] = None):
         self.db_type = db_type
-        self.s3_client = boto3.client('s3', region_name='us-east-1')
+        # Any boto3-compatible client works, e.g. LocalS3Client or a moto mock
+        self.s3_client = s3_client or make_s3_client()
+        # Downloads go through the asyncio engine instead of thread pools when set
+        self.async_fetcher = async_fetcher
         self.script_dir = Path(__file__).parent
         self.root_dir = self.script_dir.parent.parent.parent
 
@@ -200,100 +381,142 @@ class AWSDataIngester:
             print(f"⚠️  Error listing datasets from {bucket}: {e}")
             return []
 
-    def log_data_source(self, conn, source_key: str, file_path: str,
-                       metadata: Dict, status: str = 'Success'):
-        """Log data source ingestion"""
+    def iter_objects(self, bucket: str, prefix: str) -> Iterator[Dict]:
+        """Every object under prefix, following list_objects_v2 continuation tokens"""
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(Bucket=bucket, Prefix=prefix,
+                                   PaginationConfig={'PageSize': LISTING_PAGE_SIZE})
+        for page in pages:
+            yield from page.get('Contents', [])
+
+    def cycle_prefix(self, source_key: str, forecast_date: str, cycle: str) -> str:
+        """Key prefix holding one model cycle's files"""
+        return self.DATA_SOURCES[source_key]['cycle_prefix'].format(
+            date=forecast_date, year=forecast_date[:4], month=forecast_date[4:6], day=forecast_date[6:8], cycle=cycle
+        )
+
+    def list_cycle_objects(self, source_key: str, forecast_date: str, cycle: str) -> List[Dict]:
+        """All GRIB2 objects of one model cycle (index files excluded)"""
         source = self.DATA_SOURCES[source_key]
+        key_filter = source.get('key_filter')
+        return [
+            obj for obj in self.iter_objects(source['bucket'], self.cycle_prefix(source_key, forecast_date, cycle))
+            if not obj['Key'].endswith('.idx') and (key_filter is None or key_filter in obj['Key'])
+        ]
 
-        log_entry = {
-            'source_id': f"{source_key}_{datetime.now().strftime('%Y%m%d%H%M%S')}",
-            'source_name': source['description'],
-            'source_type': source_key,
-            'bucket_name': source['bucket'],
-            'file_path': file_path,
-            'format': source['format'],
-            'ingestion_timestamp': datetime.now().isoformat(),
-            'status': status,
-            'metadata': json.dumps(metadata)
-        }
+    def inventory_requests(self, source_keys: Iterable[str], dates: Iterable[str],
+                           cycles: Optional[Dict[str, List[str]]] = None) -> List[Tuple[str, str, str]]:
+        """(source, date, cycle) for every cycle each source issues on the given dates
 
-        # Insert into data source log table (create if doesn't exist)
-        cursor = conn.cursor()
+        cycles overrides a source's cycle list, e.g. {'noaa_nexrad': ['KTLX']}.
+        """
+        dates = list(dates)
+        cycles = cycles or {}
+        return [
+            (source_key, date_str, cycle)
+            for source_key in source_keys
+            for date_str in dates
+            for cycle in cycles.get(source_key, self.DATA_SOURCES[source_key]['cycles'])
+        ]
 
-        # Create table if it doesn't exist
-        create_table_sql = """
-        CREATE TABLE IF NOT EXISTS aws_data_source_log (
-            source_id VARCHAR(255) PRIMARY KEY,
-            source_name VARCHAR(500),
-            source_type VARCHAR(100),
-            bucket_name VARCHAR(255),
-            file_path VARCHAR(1000),
-            format VARCHAR(50),
-            ingestion_timestamp TIMESTAMP_NTZ,
-            status VARCHAR(50),
-            metadata VARIANT
-        )
+    def list_inventory(self, requests: Iterable[Tuple[str, str, str]],
+                       workers: int = LISTING_WORKERS) -> Dict[Tuple[str, str, str], List[Dict]]:
+        """List many (source, date, cycle) prefixes concurrently
+
+        Returns objects per request in request order; a prefix that fails to list
+        is reported and maps to an empty list.
+        """
+        requests = list(requests)
+        inventory = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(self.list_cycle_objects, *request): request for request in requests}
+            for future in as_completed(futures):
+                request = futures[future]
+                try:
+                    inventory[request] = future.result()
+                except Exception as e:
+                    print(f"  ⚠️  Error listing {'/'.join(request)}: {e}")
+                    inventory[request] = []
+        return {request: inventory[request] for request in requests}
+
+    def pending_inventory(self, inventory: Dict[Tuple[str, str, str], List[Dict]],
+                          manifest: IngestManifest) -> Dict[Tuple[str, str, str], List[Dict]]:
+        """The inventory cut down to objects that are new or changed since manifest recorded them
+
+        Cycles with nothing pending are dropped.
         """
+        pending = {
+            request: manifest.pending(self.DATA_SOURCES[request[0]]['bucket'], objects)
+            for request, objects in inventory.items()
+        }
+        return {request: objects for request, objects in pending.items() if objects}
+
+    def record_inventory(self, inventory: Dict[Tuple[str, str, str], List[Dict]],
+                         manifest: IngestManifest) -> int:
+        """Mark every object of an inventory as processed in manifest"""
+        return sum(
+            manifest.record(self.DATA_SOURCES[source_key]['bucket'], objects)
+            for (source_key, _, _), objects in inventory.items()
+        )
+
+    def log_entry(self, source_key: str, file_path: str, metadata: Dict,
+                  status: str = 'Success') -> Tuple:
+        """aws_data_source_log row, in LOG_COLUMNS order"""
+        source = self.DATA_SOURCES[source_key]
+        return (
+            new_source_id(source_key),
+            source['description'],
+            source_key,
+            source['bucket'],
+            file_path,
+            source['format'],
+            datetime.now().isoformat(),
+            status,
+            json.dumps(metadata)
+        )
 
+    def log_data_source(self, conn, source_key: str, file_path: str,
+                       metadata: Dict, status: str = 'Success'):
+        """Log one data source ingestion immediately
+
+        For many objects use a DataSourceLogWriter, which batches the inserts.
+        """
+        writer = DataSourceLogWriter(conn, self.db_type)
         try:
-            cursor.execute(create_table_sql)
-
-            # Insert log entry
-            insert_sql = """
-            INSERT INTO aws_data_source_log
-            (source_id, source_name, source_type, bucket_name, file_path,
-             format, ingestion_timestamp, status, metadata)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-
-            cursor.execute(insert_sql, (
-                log_entry['source_id'],
-                log_entry['source_name'],
-                log_entry['source_type'],
-                log_entry['bucket_name'],
-                log_entry['file_path'],
-                log_entry['format'],
-                log_entry['ingestion_timestamp'],
-                log_entry['status'],
-                log_entry['metadata']
-            ))
-
-            conn.commit()
-            cursor.close()
-            return True
+            writer.add(self.log_entry(source_key, file_path, metadata, status))
+            return writer.flush()
         except Exception as e:
             print(f"⚠️  Error logging data source: {e}")
-            conn.rollback()
-            cursor.close()
             return False
 
-    def ingest_gfs_forecast(self, conn, forecast_date: str, cycle: str = '00'):
-        """Ingest GFS forecast data"""
-        source = self.DATA_SOURCES['noaa_gfs']
-        bucket = source['bucket']
+    def ingest_cycle(self, conn, source_key: str, forecast_date: str, cycle: str,
+                     objects: Optional[List[Dict]] = None,
+                     log_writer: Optional[DataSourceLogWriter] = None) -> List[str]:
+        """Log one model cycle's files, listing them first unless objects is given
 
-        # GFS file naming: gfs.YYYYMMDD/HH/atmos/gfs.tHHz.pgrb2.0p25.fFFF
-        prefix = f"gfs.{forecast_date}/{cycle}/atmos/"
+        Rows go to log_writer when given (the caller flushes it); otherwise the
+        cycle is logged in batches of its own.
+        """
+        if log_writer is None:
+            with DataSourceLogWriter(conn, self.db_type) as log_writer:
+                return self.ingest_cycle(conn, source_key, forecast_date, cycle, objects, log_writer)
+
+        source = self.DATA_SOURCES[source_key]
+        prefix = self.cycle_prefix(source_key, forecast_date, cycle)
 
-        print(f"📥 Ingesting GFS data from {bucket}/{prefix}")
+        print(f"📥 Ingesting {source_key} data from {source['bucket']}/{prefix}")
 
         try:
-            response = self.s3_client.list_objects_v2(
-                Bucket=bucket,
-                Prefix=prefix,
-                MaxKeys=50
-            )
+            if objects is None:
+                objects = self.list_cycle_objects(source_key, forecast_date, cycle)
 
-            if 'Contents' not in response:
+            if not objects:
                 print(f"  ⚠️  No files found for {forecast_date}/{cycle}")
                 return []
 
             ingested_files = []
-            for obj in response['Contents']:
+            for obj in objects:
                 file_key = obj['Key']
-                if file_key.endswith('.idx'):
-                    continue  # Skip index files
-
                 metadata = {
                     'file_size': obj['Size'],
                     'last_modified': obj['LastModified'].isoformat(),
@@ -302,86 +525,274 @@ class AWSDataIngester:
                 }
 
                 # Log the ingestion
-                self.log_data_source(conn, 'noaa_gfs', file_key, metadata, 'Success')
+                log_writer.add(self.log_entry(source_key, file_key, metadata, 'Success'))
                 ingested_files.append(file_key)
 
-            print(f"  ✅ Ingested {len(ingested_files)} GFS files")
+            print(f"  ✅ Ingested {len(ingested_files)} {source_key} files")
             return ingested_files
 
         except Exception as e:
-            print(f"  ❌ Error ingesting GFS data: {e}")
+            print(f"  ❌ Error ingesting {source_key} data: {e}")
             return []
 
-    def ingest_hrrr_forecast(self, conn, forecast_date: str, cycle: str = '00'):
-        """Ingest HRRR forecast data"""
-        source = self.DATA_SOURCES['noaa_hrrr']
-        bucket = source['bucket']
-
-        # HRRR file naming: hrrr.YYYYMMDD/conus/hrrr.tHHz.wrfprsfFF.grib2
-        prefix = f"hrrr.{forecast_date}/conus/"
-
-        print(f"📥 Ingesting HRRR data from {bucket}/{prefix}")
-
-        try:
-            response = self.s3_client.list_objects_v2(
-                Bucket=bucket,
-                Prefix=prefix,
-                MaxKeys=50
-            )
-
-            if 'Contents' not in response:
-                print(f"  ⚠️  No files found for {forecast_date}/{cycle}")
-                return []
+    def ingest_inventory(self, conn, inventory: Dict[Tuple[str, str, str], List[Dict]]) -> int:
+        """Log every cycle of a list_inventory() result in shared batches
 
-            ingested_files = []
-            for obj in response['Contents']:
-                file_key = obj['Key']
-                if 'wrfprs' not in file_key:
-                    continue  # Focus on pressure level files
-
-                metadata = {
-                    'file_size': obj['Size'],
-                    'last_modified': obj['LastModified'].isoformat(),
-                    'forecast_date': forecast_date,
-                    'cycle': cycle
-                }
+        Returns the number of log rows written.
+        """
+        with DataSourceLogWriter(conn, self.db_type) as log_writer:
+            for (source_key, forecast_date, cycle), objects in inventory.items():
+                self.ingest_cycle(conn, source_key, forecast_date, cycle, objects, log_writer)
+        print(f"  📋 Logged {log_writer.rows_written:,} files in {log_writer.batches} batches"
+              + (f", {log_writer.failed_rows:,} failed" if log_writer.failed_rows else ""))
+        return log_writer.rows_written
+
+    def fetch_parameters(self, inventory: Dict[Tuple[str, str, str], List[Dict]], parameters: List[str],
+                         output_dir: Path, workers: int = LISTING_WORKERS) -> List[RangeFetchResult]:
+        """Download only the GRIB2 messages behind parameters for every listed file
+
+        Each file's .idx inventory picks the byte ranges; the subset is written to
+        output_dir/<bucket>/<key>. Files run concurrently, ranges within a file
+        sequentially, so workers bounds the open connections. With an async
+        fetcher every range of every file is queued at once and its per-bucket
+        limits bound the connections instead.
+        """
+        jobs = [
+            (self.DATA_SOURCES[source_key]['bucket'], obj)
+            for (source_key, _, _), objects in inventory.items()
+            if self.DATA_SOURCES[source_key]['format'] == 'grib2'
+            for obj in objects
+        ]
 
-                self.log_data_source(conn, 'noaa_hrrr', file_key, metadata, 'Success')
-                ingested_files.append(file_key)
+        if self.async_fetcher:
+            async def fetch_one(job):
+                bucket, obj = job
+                try:
+                    return await fetch_async(self.async_fetcher, bucket, obj['Key'], parameters,
+                                             output_dir / bucket / obj['Key'])
+                except Exception as e:
+                    print(f"  ⚠️  Error fetching {bucket}/{obj['Key']}: {e}")
+                    return None
+
+            async def fetch_all():
+                return await asyncio.gather(*(fetch_one(job) for job in jobs))
+
+            results = [result for result in self.async_fetcher.run(fetch_all()) if result is not None]
+            print(f"  ⏱️  {format_fetch_report(self.async_fetcher.metrics.report())}")
+        else:
+            fetcher = GribRangeFetcher(self.s3_client, workers=1)
+
+            def fetch(job):
+                bucket, obj = job
+                try:
+                    return fetcher.fetch(bucket, obj['Key'], parameters, output_dir / bucket / obj['Key'])
+                except Exception as e:
+                    print(f"  ⚠️  Error fetching {bucket}/{obj['Key']}: {e}")
+                    return None
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = [result for result in pool.map(fetch, jobs) if result is not None]
+
+        summary = summarize_fetches(results, {obj['Key']: obj['Size'] for _, obj in jobs})
+        print(f"  ✅ Fetched {summary['messages']:,} messages from {summary['files']:,} files "
+              f"in {summary['requests']:,} range requests: "
+              f"{summary['bytes_fetched'] / 1024**2:,.1f} MB of {summary['bytes_full'] / 1024**2:,.1f} MB "
+              f"({summary['saved_fraction']:.1%} saved)")
+        incomplete = sum(1 for result in results if result.missing)
+        if incomplete:
+            print(f"  ⚠️  {incomplete:,} files lacked some parameters (e.g. no APCP in analysis files)")
+        return results
+
+    def load_grib2_subsets(self, conn, results: List[RangeFetchResult], output_dir: Path) -> List[str]:
+        """Decode fetched GRIB2 subsets into grib2_forecasts (PostgreSQL only), one transaction per file
+
+        Files that fail to decode or load are reported and skipped. Returns the
+        keys that were loaded.
+        """
+        models = {source['bucket']: key.replace('noaa_', '') for key, source in self.DATA_SOURCES.items()}
+        loader = Grib2ForecastLoader()
+        start = time.time()
+        loaded = []
+        for result in results:
+            try:
+                loader.load_file(conn, output_dir / result.bucket / result.key, models.get(result.bucket, 'grib2'),
+                                 f"s3://{result.bucket}/{result.key}")
+                loaded.append(result.key)
+            except Exception as e:
+                print(f"  ⚠️  Error loading {result.bucket}/{result.key}: {e}")
+        failed = len(results) - len(loaded)
+        print(f"  ✅ Loaded {loader.rows:,} grib2_forecasts rows from {len(loaded):,} files "
+              f"in {time.time() - start:.1f}s" + (f", {failed:,} failed" if failed else ""))
+        return loaded
+
+    def load_nexrad_volumes(self, conn, inventory: Dict[Tuple[str, str, str], List[Dict]],
+                            workers: int = DECODE_WORKERS, min_reflectivity: Optional[float] = None,
+                            grid: bool = False) -> List[str]:
+        """Decode the inventory's NEXRAD volumes into nexrad_level2_data (PostgreSQL only)
+
+        Volumes are read through the S3 client (and so the object cache), decoded
+        with records spread over workers processes, and committed one by one.
+        With grid, each volume is also binned into nexrad_reflectivity_grid and
+        nexrad_velocity_grid in the same transaction. Returns the keys that were loaded.
+        With an async fetcher that has a cache, all volumes are first downloaded
+        into the cache concurrently, so decoding reads them from disk.
+        """
+        bucket = self.DATA_SOURCES['noaa_nexrad']['bucket']
+        volumes = [obj for (source_key, _, _), objects in inventory.items()
+                   if source_key == 'noaa_nexrad' for obj in objects]
+        keys = [obj['Key'] for obj in volumes]
+        if self.async_fetcher and self.async_fetcher.cache:
+            requests = [FetchRequest(bucket, obj['Key'], etag=obj.get('ETag')) for obj in volumes]
+            self.async_fetcher.run(self.async_fetcher.fetch_many(requests))
+            print(f"  📦 Prefetched volumes: {format_fetch_report(self.async_fetcher.metrics.report())}")
+        loader = NexradLevel2Loader(min_reflectivity=min_reflectivity)
+        grid_loader = NexradGridLoader() if grid else None
+        start = time.time()
+        loaded = []
+        with Level2Decoder(workers) as decoder:
+            for key in keys:
+                try:
+                    response = self.s3_client.get_object(Bucket=bucket, Key=key)
+                    volume = decoder.decode(response['Body'].read())
+                    if grid_loader:
+                        grid_loader.copy(conn, volume)
+                    loader.load(conn, [(volume, f"s3://{bucket}/{key}", bucket, key)])
+                    loaded.append(key)
+                except Exception as e:
+                    conn.rollback()
+                    print(f"  ⚠️  Error loading {bucket}/{key}: {e}")
+        failed = len(keys) - len(loaded)
+        print(f"  ✅ Loaded {loader.rows:,} nexrad_level2_data rows from {len(loaded):,} volumes "
+              f"in {time.time() - start:.1f}s" + (f", {failed:,} failed" if failed else ""))
+        if grid_loader:
+            print(f"  ✅ Gridded {grid_loader.reflectivity_rows:,} reflectivity and "
+                  f"{grid_loader.velocity_rows:,} velocity cells")
+        return loaded
 
-            print(f"  ✅ Ingested {len(ingested_files)} HRRR files")
-            return ingested_files
+    def ingest_gfs_forecast(self, conn, forecast_date: str, cycle: str = '00'):
+        """Ingest GFS forecast data"""
+        # GFS file naming: gfs.YYYYMMDD/HH/atmos/gfs.tHHz.pgrb2.0p25.fFFF
+        return self.ingest_cycle(conn, 'noaa_gfs', forecast_date, cycle)
 
-        except Exception as e:
-            print(f"  ❌ Error ingesting HRRR data: {e}")
-            return []
+    def ingest_hrrr_forecast(self, conn, forecast_date: str, cycle: str = '00'):
+        """Ingest HRRR forecast data"""
+        # HRRR file naming: hrrr.YYYYMMDD/conus/hrrr.tHHz.wrfprsfFF.grib2
+        return self.ingest_cycle(conn, 'noaa_hrrr', forecast_date, cycle)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Ingest recent model cycles from the AWS Open Data Registry')
+    parser.add_argument('--sources', default='noaa_gfs,noaa_hrrr',
+                        help='Comma-separated model sources (noaa_gfs, noaa_hrrr, noaa_rap, noaa_rtma)')
+    parser.add_argument('--days', type=int, default=2,
+                        help='Number of days to ingest, ending today (default: 2)')
+    parser.add_argument('--workers', type=int, default=LISTING_WORKERS,
+                        help=f'Concurrent prefix listings (default: {LISTING_WORKERS})')
+    parser.add_argument('--s3-root', type=Path,
+                        help='Serve buckets from <dir>/<bucket>/<key> instead of S3')
+    parser.add_argument('--list-only', action='store_true',
+                        help='Only list the inventory; do not connect to the database')
+    parser.add_argument('--fetch-parameters',
+                        help='Comma-separated parameter_name values (e.g. Temperature,WindSpeed) to download '
+                             'from each listed file via its .idx byte ranges')
+    parser.add_argument('--fetch-dir', type=Path, default=Path(__file__).parent.parent / 'data' / 'grib2',
+                        help='Where fetched GRIB2 subsets are written (default: db-6/data/grib2)')
+    parser.add_argument('--load-grib2', action='store_true',
+                        help='Decode the fetched subsets into grib2_forecasts (needs --fetch-parameters '
+                             'and --db-type postgresql)')
+    parser.add_argument('--cache-dir', type=Path, default=DEFAULT_CACHE_DIR,
+                        help='Local object cache for downloads (default: db-6/data/s3_cache)')
+    parser.add_argument('--cache-max-gb', type=float, default=DEFAULT_CACHE_BYTES / 1024 ** 3,
+                        help='Cache size cap; least recently used objects are evicted (default: 20)')
+    parser.add_argument('--no-cache', action='store_true', help='Always download from S3')
+    parser.add_argument('--fetch-backend', default='threads', choices=['threads', 'asyncio'],
+                        help='Download engine: thread pools, or asyncio with per-bucket limits and retries '
+                             'for bulk backfills (default: threads)')
+    parser.add_argument('--bucket-concurrency', type=int, default=DEFAULT_BUCKET_CONCURRENCY,
+                        help=f'In-flight requests per bucket with --fetch-backend asyncio '
+                             f'(default: {DEFAULT_BUCKET_CONCURRENCY})')
+    parser.add_argument('--manifest', type=Path, default=DEFAULT_MANIFEST_PATH,
+                        help='Manifest of processed objects; only new or changed objects are processed '
+                             '(default: db-6/data/ingest_manifest.sqlite)')
+    parser.add_argument('--full', action='store_true',
+                        help='Process every listed object, ignoring the manifest (it is still updated)')
+    parser.add_argument('--nexrad-sites',
+                        help='Comma-separated radar sites (e.g. KTLX,KFWS) whose Level II volumes are listed too')
+    parser.add_argument('--load-nexrad', action='store_true',
+                        help='Decode the listed NEXRAD volumes into nexrad_level2_data (needs --nexrad-sites '
+                             'and --db-type postgresql)')
+    parser.add_argument('--decode-workers', type=int, default=DECODE_WORKERS,
+                        help=f'Processes decompressing NEXRAD records (default: {DECODE_WORKERS})')
+    parser.add_argument('--min-dbz', type=float,
+                        help='Drop NEXRAD reflectivity below this dBZ (gates with velocity keep their row)')
+    parser.add_argument('--grid-nexrad', action='store_true',
+                        help='With --load-nexrad, also bin each volume into nexrad_reflectivity_grid and '
+                             'nexrad_velocity_grid')
+    parser.add_argument('--db-type', default='databricks', choices=['databricks', 'postgresql'])
+    args = parser.parse_args()
+    args.sources = [source.strip() for source in args.sources.split(',') if source.strip()]
+    args.nexrad_sites = [site.strip().upper() for site in (args.nexrad_sites or '').split(',') if site.strip()]
+    if args.nexrad_sites and 'noaa_nexrad' not in args.sources:
+        args.sources.append('noaa_nexrad')
+    if 'noaa_nexrad' in args.sources and not args.nexrad_sites:
+        parser.error("noaa_nexrad needs --nexrad-sites")
+    if args.load_nexrad and (not args.nexrad_sites or args.db_type != 'postgresql' or args.list_only):
+        parser.error("--load-nexrad needs --nexrad-sites and --db-type postgresql, without --list-only")
+    if args.grid_nexrad and not args.load_nexrad:
+        parser.error("--grid-nexrad needs --load-nexrad")
+    args.fetch_parameters = [p.strip() for p in (args.fetch_parameters or '').split(',') if p.strip()]
+    unknown = sorted(set(args.fetch_parameters) - set(GRIB2_PARAMETER_MESSAGES))
+    if unknown:
+        parser.error(f"No GRIB2 mapping for: {', '.join(unknown)}")
+    if args.load_grib2 and (not args.fetch_parameters or args.db_type != 'postgresql' or args.list_only):
+        parser.error("--load-grib2 needs --fetch-parameters and --db-type postgresql, without --list-only")
+    for source_key in args.sources:
+        if 'cycle_prefix' not in AWSDataIngester.DATA_SOURCES.get(source_key, {}):
+            parser.error(f"{source_key} is not a model source with cycle listings")
+    return args
 
 
 def main():
     """Main execution"""
+    args = parse_args()
+
     print("="*70)
     print("AWS OPEN DATA REGISTRY INGESTION FOR DB-6")
     print("="*70)
 
-    ingester = AWSDataIngester(db_type='databricks')
-    conn = ingester.get_db_connection()
+    buckets = {AWSDataIngester.DATA_SOURCES[source_key]['bucket'] for source_key in args.sources}
+    connections = args.workers
+    if args.fetch_backend == 'asyncio':
+        connections = max(connections, args.bucket_concurrency * (len(buckets) + 1))
+    s3_client = LocalS3Client(args.s3_root) if args.s3_root else make_s3_client(connections)
+    cache = None
+    if not args.no_cache:
+        cache = ObjectCache(args.cache_dir, int(args.cache_max_gb * 1024 ** 3))
+        s3_client = CachingS3Client(s3_client, cache)
+    async_fetcher = None
+    if args.fetch_backend == 'asyncio':
+        async_fetcher = fetcher_for_client(
+            s3_client, {bucket: args.bucket_concurrency for bucket in buckets}, args.bucket_concurrency,
+            progress=lambda report: print(f"  ⏱️  {format_fetch_report(report)}")
+        )
+    ingester = AWSDataIngester(db_type=args.db_type, s3_client=s3_client, async_fetcher=async_fetcher)
 
-    if not conn:
-        print("❌ Database connection failed")
-        return
+    conn = None
+    if not args.list_only:
+        conn = ingester.get_db_connection()
+        if not conn:
+            print("❌ Database connection failed")
+            return
 
+    manifest = IngestManifest(args.manifest)
     try:
-        # Get today's date and yesterday for recent forecasts
+        # Most recent days, oldest first
         today = datetime.now()
-        yesterday = today - timedelta(days=1)
-
         dates_to_ingest = [
-            yesterday.strftime('%Y%m%d'),
-            today.strftime('%Y%m%d')
+            (today - timedelta(days=offset)).strftime('%Y%m%d')
+            for offset in reversed(range(args.days))
         ]
 
-        cycles = ['00', '06', '12', '18']
-
         print(f"\n📊 Available data sources:")
         for key, source in ingester.DATA_SOURCES.items():
             print(f"  • {key}: {source['description']}")
@@ -389,26 +800,79 @@ def main():
             print(f"    Resolution: {source['resolution']}")
             print(f"    Update: {source['update_frequency']}")
 
-        print(f"\n📥 Ingesting recent forecasts...")
-
-        total_ingested = 0
-        for date_str in dates_to_ingest:
-            for cycle in cycles:
-                # Ingest GFS
-                files = ingester.ingest_gfs_forecast(conn, date_str, cycle)
-                total_ingested += len(files)
+        requests = ingester.inventory_requests(args.sources, dates_to_ingest, {'noaa_nexrad': args.nexrad_sites})
+        print(f"\n🔎 Listing {len(requests)} cycles with {args.workers} workers...")
+        start = time.time()
+        inventory = ingester.list_inventory(requests, workers=args.workers)
+        elapsed = time.time() - start
+        listed = sum(len(objects) for objects in inventory.values())
+        print(f"  ✅ Listed {listed:,} files in {elapsed:.1f}s")
+
+        if not args.full:
+            inventory = ingester.pending_inventory(inventory, manifest)
+            pending = sum(len(objects) for objects in inventory.values())
+            print(f"  🆕 {pending:,} new or changed since the last run ({listed - pending:,} already processed)")
+        for source_key in args.sources:
+            count = sum(len(objects) for (key, _, _), objects in inventory.items() if key == source_key)
+            print(f"    {source_key}: {count:,} files")
+
+        fetched = []
+        if args.fetch_parameters:
+            print(f"\n📦 Fetching {', '.join(args.fetch_parameters)} into {args.fetch_dir}...")
+            fetched = ingester.fetch_parameters(inventory, args.fetch_parameters, args.fetch_dir,
+                                                workers=args.workers)
+
+        if args.list_only:
+            return
 
-                # Ingest HRRR (only 00Z cycle typically)
-                if cycle == '00':
-                    files = ingester.ingest_hrrr_forecast(conn, date_str, cycle)
-                    total_ingested += len(files)
+        print(f"\n📥 Ingesting recent forecasts...")
+        total_ingested = ingester.ingest_inventory(conn, inventory)
+
+        loaded_grib2 = None
+        if args.load_grib2:
+            print(f"\n🧮 Decoding GRIB2 subsets into grib2_forecasts...")
+            loaded_grib2 = set(ingester.load_grib2_subsets(conn, fetched, args.fetch_dir))
+
+        loaded_volumes = None
+        if args.load_nexrad:
+            print(f"\n📡 Decoding NEXRAD Level II volumes into nexrad_level2_data...")
+            loaded_volumes = set(ingester.load_nexrad_volumes(conn, inventory, args.decode_workers, args.min_dbz,
+                                                              args.grid_nexrad))
+
+        if total_ingested == sum(len(objects) for objects in inventory.values()):
+            # Objects whose fetch or decode failed stay pending for the next run
+            fetched_keys = {result.key for result in fetched}
+
+            def processed(source_key: str, key: str) -> bool:
+                if source_key == 'noaa_nexrad':
+                    return loaded_volumes is None or key in loaded_volumes
+                if loaded_grib2 is not None:
+                    return key in loaded_grib2
+                return not args.fetch_parameters or key in fetched_keys
+
+            inventory = {
+                request: [obj for obj in objects if processed(request[0], obj['Key'])]
+                for request, objects in inventory.items()
+            }
+            recorded = ingester.record_inventory(inventory, manifest)
+            print(f"\n🗂️  Manifest: recorded {recorded:,} objects ({manifest.count():,} total)")
+        else:
+            print(f"\n⚠️  Some log rows failed; manifest not updated, so these objects are retried next run")
 
         print(f"\n✅ Total files ingested: {total_ingested}")
         print(f"\n📋 Data source log table created/updated")
         print(f"   Query: SELECT * FROM aws_data_source_log ORDER BY ingestion_timestamp DESC")
 
     finally:
-        conn.close()
+        if async_fetcher:
+            async_fetcher.close()
+        if cache and cache.hits + cache.misses:
+            print(f"\n🗄️  Object cache: {format_cache_report(cache.report())}")
+        if cache:
+            cache.close()
+        manifest.close()
+        if conn:
+            conn.close()
 
 
 if __name__ == '__main__':
@@ -12,6 +12,8 @@ from datetime import datetime
 from typing import Dict, List, Optional
 import time
 
+from http_cache import HTTPCache, already_applied, database_target, format_http_cache_report, mount_http_cache
+
 try:
     import databricks.connector
     SNOWFLAKE_AVAILABLE = True
@@ -32,13 +34,16 @@ class GeoPlatformIngester:
     BASE_URL = "https://www.geoplatform.gov"
     CATALOG_URL = "https://www.geoplatform.gov/api/items"
 
-    def __init__(self, db_type='databricks'):
+    def __init__(self, db_type='databricks', http_cache: Optional[HTTPCache] = None):
         self.db_type = db_type
+        self.http_cache = http_cache
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'WeatherConsultingService/1.0',
             'Accept': 'application/json'
         })
+        if http_cache:
+            mount_http_cache(self.session, http_cache)
         self.script_dir = Path(__file__).parent
         self.root_dir = self.script_dir.parent.parent.parent
 
@@ -112,8 +117,12 @@ class GeoPlatformIngester:
             print(f"❌ PostgreSQL connection failed: {e}")
             return None
 
-    def search_datasets(self, query: str, limit: int = 50) -> List[Dict]:
-        """Search GeoPlatform catalog"""
+    def search_datasets(self, query: str, limit: int = 50, changed_only: bool = False,
+                        fetched: Optional[List[str]] = None) -> List[Dict]:
+        """Search GeoPlatform catalog (no results when unchanged since they were loaded, with changed_only)
+
+        fetched, if given, receives the URL of a search whose results were returned.
+        """
         params = {
             'q': query,
             'limit': limit,
@@ -123,7 +132,11 @@ class GeoPlatformIngester:
         try:
             response = self.session.get(self.CATALOG_URL, params=params, timeout=10)
             response.raise_for_status()
+            if changed_only and already_applied(response):
+                return []
             data = response.json()
+            if fetched is not None:
+                fetched.append(response.url)
             return data.get('items', [])
         except Exception as e:
             print(f"⚠️  Error searching GeoPlatform: {e}")
@@ -145,9 +158,11 @@ class GeoPlatformIngester:
 
         cursor = conn.cursor()
         datasets_found = 0
+        fetched: List[str] = []
 
         for term in search_terms:
-            datasets = self.search_datasets(term, limit=10)
+            # Results already logged into this database are not parsed or inserted again
+            datasets = self.search_datasets(term, limit=10, changed_only=True, fetched=fetched)
 
             for dataset in datasets:
                 props = dataset.get('properties', {})
@@ -209,6 +224,8 @@ class GeoPlatformIngester:
 
         conn.commit()
         cursor.close()
+        if self.http_cache:
+            self.http_cache.mark_applied(fetched)
         print(f"  ✅ Found {datasets_found} boundary datasets")
         return datasets_found
 
@@ -219,11 +236,13 @@ def main():
     print("GEOPLATFORM.GOV DATA INGESTION FOR DB-6")
     print("="*70)
 
-    ingester = GeoPlatformIngester(db_type='databricks')
+    http_cache = HTTPCache(target=database_target('databricks'))
+    ingester = GeoPlatformIngester(db_type='databricks', http_cache=http_cache)
     conn = ingester.get_db_connection()
 
     if not conn:
         print("❌ Database connection failed")
+        http_cache.close()
         return
 
     try:
@@ -231,6 +250,8 @@ def main():
         print("\n✅ GeoPlatform ingestion complete")
 
     finally:
+        print(f"\n🗄️  HTTP cache: {format_http_cache_report(http_cache.report())}")
+        http_cache.close()
         conn.close()
 
 
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Incremental ingest manifest for AWS Open Data objects
+A local SQLite file recording every object an ingest run has processed, with the
+size, ETag and LastModified it had at the time. Later runs still list their
+cycles (listings are cheap) but only process objects that are new or whose
+size/ETag/LastModified changed, so hourly HRRR polling touches just the files
+published since the previous poll.
+
+SQLite keeps the manifest independent of the target database: --list-only and
+fetch runs can use it, and Databricks and PostgreSQL runs share one format.
+
+The same file keeps per-station observation high-water marks for the NWS
+observation backfill, so reruns only request observations newer than the
+latest one already loaded, and the alert poller's last-seen sent time.
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_MANIFEST_PATH = Path(__file__).parent.parent / 'data' / 'ingest_manifest.sqlite'
+
+# Keys per SELECT ... IN (...); stays under SQLite's bound-parameter limit
+LOOKUP_CHUNK = 500
+
+MANIFEST_DDL = """
+CREATE TABLE IF NOT EXISTS processed_objects (
+    bucket TEXT NOT NULL,
+    object_key TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    etag TEXT NOT NULL,
+    last_modified TEXT NOT NULL,
+    processed_at TEXT NOT NULL,
+    PRIMARY KEY (bucket, object_key)
+);
+CREATE TABLE IF NOT EXISTS observation_watermarks (
+    station_id TEXT PRIMARY KEY,
+    last_observation_time TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS alert_watermarks (
+    feed TEXT PRIMARY KEY,
+    last_sent TEXT NOT NULL,
+    last_alert_ids TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+
+def lookup_chunks(keys: Sequence) -> Iterator[Sequence]:
+    """keys in slices of LOOKUP_CHUNK, for the local SQLite files' IN (...) statements"""
+    for start in range(0, len(keys), LOOKUP_CHUNK):
+        yield keys[start:start + LOOKUP_CHUNK]
+
+
+def object_version(obj: Dict) -> Tuple[int, str, str]:
+    """(size, ETag, LastModified) of a list_objects_v2 entry; any change means reprocess"""
+    last_modified = obj.get('LastModified')
+    if isinstance(last_modified, datetime):
+        last_modified = last_modified.isoformat()
+    return obj['Size'], obj.get('ETag') or '', last_modified or ''
+
+
+class IngestManifest:
+    """Processed-object manifest; use as a context manager so the file is closed"""
+
+    def __init__(self, path: Path = DEFAULT_MANIFEST_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), timeout=30)
+        self._db.executescript(MANIFEST_DDL)
+
+    def versions(self, bucket: str, keys: Iterable[str]) -> Dict[str, Tuple[int, str, str]]:
+        """Recorded (size, ETag, LastModified) for the keys that are in the manifest"""
+        keys = list(keys)
+        recorded = {}
+        for chunk in lookup_chunks(keys):
+            rows = self._db.execute(
+                "SELECT object_key, size_bytes, etag, last_modified FROM processed_objects "
+                f"WHERE bucket = ? AND object_key IN ({', '.join(['?'] * len(chunk))})",
+                [bucket, *chunk]
+            )
+            for key, size, etag, last_modified in rows:
+                recorded[key] = (size, etag, last_modified)
+        return recorded
+
+    def pending(self, bucket: str, objects: List[Dict]) -> List[Dict]:
+        """The objects that are new or changed since they were recorded, in input order"""
+        recorded = self.versions(bucket, (obj['Key'] for obj in objects))
+        return [obj for obj in objects if recorded.get(obj['Key']) != object_version(obj)]
+
+    def record(self, bucket: str, objects: Iterable[Dict]) -> int:
+        """Mark objects processed at their listed version; returns the number recorded"""
+        processed_at = datetime.now().isoformat()
+        rows = [(bucket, obj['Key'], *object_version(obj), processed_at) for obj in objects]
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO processed_objects VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def watermarks(self, station_ids: Iterable[str]) -> Dict[str, str]:
+        """Latest loaded observation time (ISO 8601) for the stations that have one"""
+        station_ids = list(station_ids)
+        marks = {}
+        for chunk in lookup_chunks(station_ids):
+            rows = self._db.execute(
+                "SELECT station_id, last_observation_time FROM observation_watermarks "
+                f"WHERE station_id IN ({', '.join(['?'] * len(chunk))})",
+                chunk
+            )
+            marks.update(rows)
+        return marks
+
+    def advance_watermarks(self, marks: Dict[str, str]) -> int:
+        """Move station high-water marks forward (never back); returns the number of stations given"""
+        updated_at = datetime.now().isoformat()
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO observation_watermarks VALUES (?, ?, ?) ON CONFLICT (station_id) DO UPDATE SET "
+                "last_observation_time = MAX(last_observation_time, excluded.last_observation_time), "
+                "updated_at = excluded.updated_at",
+                [(station_id, mark, updated_at) for station_id, mark in marks.items()]
+            )
+        return len(marks)
+
+    def alert_watermark(self, feed: str) -> Optional[Tuple[str, List[str]]]:
+        """(sent time, ids of the alerts sent at that time) of the newest alerts loaded from feed"""
+        row = self._db.execute(
+            "SELECT last_sent, last_alert_ids FROM alert_watermarks WHERE feed = ?", (feed,)
+        ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def advance_alert_watermark(self, feed: str, last_sent: str, alert_ids: List[str]):
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO alert_watermarks VALUES (?, ?, ?, ?)",
+                (feed, last_sent, json.dumps(alert_ids), datetime.now().isoformat())
+            )
+
+    def count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM processed_objects").fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -5,13 +5,23 @@ Includes forecasts, observations, alerts, and station data
 """
 
 import json
+import argparse
+import asyncio
 import requests
 import os
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import time
 
+from http_cache import HTTPCache, already_applied, database_target, format_http_cache_report, mount_http_cache
+from nws_bulk import BULK_TABLES, REJECTS_TABLE, NWSBulkLoader, validate_record, validate_value
+from ingest_manifest import DEFAULT_MANIFEST_PATH, IngestManifest
+from nws_alerts import ALERTS_PAGE_LIMIT, alert_record, latest_sent, unseen_alerts
+from nws_client import NWS_CONCURRENCY, NWS_REQUESTS_PER_SECOND, AsyncNWSClient
+from nws_gridpoints import (DEFAULT_GRIDPOINT_INDEX_PATH, GridCell, GridpointIndex, forecast_records,
+                            group_by_cell, point_key)
+
 try:
     import databricks.connector
     SNOWFLAKE_AVAILABLE = True
@@ -25,6 +35,37 @@ try:
 except ImportError:
     POSTGRES_AVAILABLE = False
 
+# api.weather.gov observation units -> (scale, offset) to the units weather_observations
+# holds: deg F, mph, inHg, miles and inches, as in generate_large_dataset
+OBSERVATION_UNITS = {
+    'wmoUnit:degC': (1.8, 32.0),
+    'wmoUnit:km_h-1': (0.621371, 0.0),
+    'wmoUnit:m_s-1': (2.236936, 0.0),
+    'wmoUnit:Pa': (1 / 3386.389, 0.0),
+    'wmoUnit:m': (1 / 1609.344, 0.0),
+    'wmoUnit:mm': (1 / 25.4, 0.0)
+}
+
+# Observation backfill: the API serves about a week of history, up to 500 per page
+BACKFILL_DAYS = 7
+OBSERVATION_PAGE_LIMIT = 500
+# Stations per bulk load; high-water marks are saved after each one commits
+BACKFILL_STATION_BATCH = 50
+
+
+def high_water_marks(records: Iterable[Dict]) -> Dict[str, str]:
+    """Latest observation_time (UTC ISO 8601) per station_id among weather_observations records"""
+    marks: Dict[str, datetime] = {}
+    for record in records:
+        observed = validate_value(record['observation_time'], 'timestamp', False)
+        if record['station_id'] not in marks or observed > marks[record['station_id']]:
+            marks[record['station_id']] = observed
+    return {station_id: observed.replace(tzinfo=timezone.utc).isoformat() for station_id, observed in marks.items()}
+
+
+def format_nulled(nulled: Dict[str, int]) -> str:
+    return ', '.join(f"{column} {count:,}" for column, count in sorted(nulled.items()))
+
 
 class NWSAPIIngester:
     """Ingest data from National Weather Service API"""
@@ -32,15 +73,26 @@ class NWSAPIIngester:
     BASE_URL = "https://api.weather.gov"
     USER_AGENT = "WeatherConsultingService/1.0 (contact@example.com)"
 
-    def __init__(self, db_type='databricks'):
+    def __init__(self, db_type='databricks', rate: float = NWS_REQUESTS_PER_SECOND,
+                 concurrency: int = NWS_CONCURRENCY, http_cache: Optional[HTTPCache] = None):
         self.db_type = db_type
-        self.session = requests.Session()
-        self.session.headers.update({
+        # Conditional GETs: unchanged payloads come back as cheap 304s
+        self.http_cache = http_cache
+        self.session = self.new_session()
+        # Station and observation sweeps run concurrently under one rate limit
+        self.client = AsyncNWSClient(self.new_session, rate=rate, concurrency=concurrency)
+        self.script_dir = Path(__file__).parent
+        self.root_dir = self.script_dir.parent.parent.parent
+
+    def new_session(self) -> requests.Session:
+        session = requests.Session()
+        session.headers.update({
             'User-Agent': self.USER_AGENT,
             'Accept': 'application/json'
         })
-        self.script_dir = Path(__file__).parent
-        self.root_dir = self.script_dir.parent.parent.parent
+        if self.http_cache:
+            mount_http_cache(session, self.http_cache)
+        return session
 
     def get_db_connection(self):
         """Get database connection"""
@@ -128,102 +180,336 @@ class NWSAPIIngester:
             print(f"⚠️  Error fetching stations: {e}")
             return []
 
-    def get_observations(self, station_id: str) -> Optional[Dict]:
-        """Get latest observations from a station"""
-        url = f"{self.BASE_URL}/stations/{station_id}/observations/latest"
+    def get_observations(self, station_id: str, changed_only: bool = False) -> Optional[Dict]:
+        """Get latest observations from a station
+
+        With changed_only, None is also returned when the HTTP cache says the
+        observation has not changed since it was last loaded.
+        """
+        url = self.observation_url(station_id)
 
         try:
             response = self.session.get(url, timeout=10)
             response.raise_for_status()
+            if changed_only and already_applied(response):
+                return None
             return response.json()
         except Exception as e:
             print(f"⚠️  Error fetching observations for {station_id}: {e}")
             return None
 
-    def get_forecast(self, grid_id: str, x: int, y: int) -> Optional[Dict]:
-        """Get forecast for a grid point"""
-        url = f"{self.BASE_URL}/gridpoints/{grid_id}/{x},{y}/forecast"
+    def observation_url(self, station_id: str) -> str:
+        return f"{self.BASE_URL}/stations/{station_id}/observations/latest"
+
+    def mark_applied(self, urls: Iterable[str]):
+        """Tell the HTTP cache that the responses of urls are loaded; call once they are committed"""
+        if self.http_cache:
+            self.http_cache.mark_applied(urls)
+
+    def fetch_stations(self, states: List[str], limit: int = 100) -> Dict[str, List[Dict]]:
+        """get_stations for many states concurrently"""
+        pages = self.client.run(self.client.get_many(
+            [(f"{self.BASE_URL}/stations", {'state': state, 'limit': limit}) for state in states], 'stations'
+        ))
+        return {state: (page or {}).get('features', []) for state, page in zip(states, pages)}
+
+    def fetch_observations(self, station_ids: List[str], changed_only: bool = False) -> Dict[str, Optional[Dict]]:
+        """get_observations for many stations concurrently; None where the fetch failed (or, with
+        changed_only, where the observation has not changed since it was loaded)"""
+        observations = self.client.run(self.client.get_many(
+            [(self.observation_url(station_id), None) for station_id in station_ids],
+            'observations', changed_only
+        ))
+        return dict(zip(station_ids, observations))
+
+    async def station_history(self, station_id: str, start: str) -> List[Dict]:
+        """Every observation feature for station_id since start (ISO 8601), newest first
+
+        Follows the response's pagination cursor; when a full page comes back
+        without one, the next page is requested with end set to the oldest
+        timestamp seen so far.
+        """
+        url = f"{self.BASE_URL}/stations/{station_id}/observations"
+        page_url, params = url, {'start': start, 'limit': OBSERVATION_PAGE_LIMIT}
+        features: List[Dict] = []
+        while True:
+            page = await self.client.get_json(page_url, params) or {}
+            batch = page.get('features', [])
+            features.extend(batch)
+            next_url = (page.get('pagination') or {}).get('next')
+            if batch and next_url and next_url != page_url:
+                page_url, params = next_url, None
+                continue
+            oldest = min((f.get('properties', {}).get('timestamp') or '' for f in batch), default='')
+            if len(batch) < OBSERVATION_PAGE_LIMIT or not oldest or oldest == (params or {}).get('end'):
+                return features
+            page_url, params = url, {'start': start, 'end': oldest, 'limit': OBSERVATION_PAGE_LIMIT}
+
+    def observation_history(self, station_ids: List[str], since: Dict[str, str]) -> Iterator[Dict]:
+        """Parsed weather_observations records for each station since since[station_id]
+
+        Stations are fetched concurrently, client.concurrency at a time, and
+        their records streamed out as each group completes. A station whose
+        fetch failed yields nothing, so the next run retries it.
+        """
+        for start in range(0, len(station_ids), self.client.concurrency):
+            group = station_ids[start:start + self.client.concurrency]
+
+            async def fetch_group():
+                return await asyncio.gather(*(self.station_history(station_id, since[station_id])
+                                              for station_id in group), return_exceptions=True)
+
+            for station_id, features in zip(group, self.client.run(fetch_group())):
+                if isinstance(features, Exception):
+                    self.client.failures += 1
+                    print(f"  ⚠️  Error fetching observation history for {station_id}: {features}")
+                    continue
+                for feature in features:
+                    yield self.observation_record(station_id, feature)
+
+    def forecast_url(self, grid_id: str, x: int, y: int) -> str:
+        return f"{self.BASE_URL}/gridpoints/{grid_id}/{x},{y}/forecast"
+
+    def get_forecast(self, grid_id: str, x: int, y: int, changed_only: bool = False) -> Optional[Dict]:
+        """Get forecast for a grid point (None when unchanged since it was loaded, with changed_only)"""
+        url = self.forecast_url(grid_id, x, y)
 
         try:
             response = self.session.get(url, timeout=10)
             response.raise_for_status()
+            if changed_only and already_applied(response):
+                return None
             return response.json()
         except Exception as e:
             print(f"⚠️  Error fetching forecast: {e}")
             return None
 
-    def get_alerts(self, area: str = 'US') -> List[Dict]:
-        """Get active weather alerts"""
+    async def alerts_since(self, since: Optional[str], area: Optional[str] = None) -> List[Dict]:
+        """Alert features sent at or after since, following the pagination cursor
+
+        Without since (the first poll) this is the set of active alerts.
+        """
+        if since is None:
+            url, params = f"{self.BASE_URL}/alerts/active", ({'area': area} if area else None)
+        else:
+            url, params = f"{self.BASE_URL}/alerts", {'start': since, 'limit': ALERTS_PAGE_LIMIT}
+            if area:
+                params['area'] = area
+        features: List[Dict] = []
+        while url:
+            page = await self.client.get_json(url, params) or {}
+            batch = page.get('features', [])
+            features.extend(batch)
+            next_url = (page.get('pagination') or {}).get('next')
+            url, params = (next_url, None) if batch and next_url and next_url != url else (None, None)
+        return features
+
+    async def resolve_points(self, keys: List[str]) -> Dict[str, Optional[GridCell]]:
+        """GridCell per point_key from /points; None for points outside NWS coverage
+
+        Points whose lookup failed for any other reason are left out, so they
+        are not remembered and the next run tries them again.
+        """
+        async def resolve(key: str):
+            try:
+                props = (await self.client.get_json(f"{self.BASE_URL}/points/{key}")).get('properties', {})
+            except requests.HTTPError as e:
+                if e.response is not None and e.response.status_code == 404:
+                    return key, None
+                print(f"  ⚠️  Error resolving point {key}: {e}")
+                return None
+            except Exception as e:
+                print(f"  ⚠️  Error resolving point {key}: {e}")
+                return None
+            if not props.get('gridId') or props.get('gridX') is None:
+                return key, None
+            return key, GridCell(props['gridId'], int(props['gridX']), int(props['gridY']))
+
+        return dict(result for result in await asyncio.gather(*(resolve(key) for key in keys)) if result)
+
+    def resolve_gridpoints(self, locations: Dict[str, Tuple[float, float]],
+                           index: GridpointIndex) -> Dict[str, Optional[GridCell]]:
+        """GridCell per location id, calling /points only for points the index does not know yet"""
+        keys = {location_id: point_key(*position) for location_id, position in locations.items()}
+        cells = index.lookup(set(keys.values()))
+        missing = sorted(set(keys.values()) - cells.keys())
+        if missing:
+            resolved = self.client.run(self.resolve_points(missing))
+            index.store(resolved)
+            cells.update(resolved)
+        print(f"  📍 {len(set(keys.values())) - len(missing)} of {len(set(keys.values()))} points from the "
+              f"gridpoint index, {len(missing)} resolved")
+        return {location_id: cells.get(key) for location_id, key in keys.items()}
+
+    def forecast_locations(self, conn) -> Dict[str, Tuple[float, float]]:
+        """(latitude, longitude) of every station and active policy area (the centre of its boundary)"""
+        cursor = conn.cursor()
+        cursor.execute("SELECT station_id, station_latitude, station_longitude FROM weather_stations")
+        locations = {station_id: (float(lat), float(lon)) for station_id, lat, lon in cursor.fetchall()}
+        try:
+            cursor.execute("""
+                SELECT p.policy_area_id,
+                       (b.spatial_extent_south + b.spatial_extent_north) / 2,
+                       (b.spatial_extent_west + b.spatial_extent_east) / 2
+                FROM insurance_policy_areas p
+                JOIN shapefile_boundaries b ON b.boundary_id = p.boundary_id
+                WHERE p.is_active AND b.spatial_extent_south IS NOT NULL
+            """)
+            locations.update(
+                (policy_area_id, (float(lat), float(lon))) for policy_area_id, lat, lon in cursor.fetchall()
+            )
+        except Exception as e:
+            print(f"  ⚠️  Policy areas not included: {e}")
+            conn.rollback()
+        cursor.close()
+        return locations
+
+    def get_alerts(self, area: str = 'US', changed_only: bool = False) -> List[Dict]:
+        """Get active weather alerts (none when the set is unchanged since it was loaded, with changed_only)"""
         url = f"{self.BASE_URL}/alerts/active/area/{area}"
 
         try:
             response = self.session.get(url, timeout=10)
             response.raise_for_status()
+            if changed_only and already_applied(response):
+                return []
             data = response.json()
             return data.get('features', [])
         except Exception as e:
             print(f"⚠️  Error fetching alerts: {e}")
             return []
 
-    def ingest_stations(self, conn, states: List[str] = None):
-        """Ingest weather station data"""
-        if states is None:
-            states = ['NY', 'CA', 'IL', 'FL', 'WA']  # Sample states
+    @staticmethod
+    def station_record(feature: Dict, state: str) -> Optional[Dict]:
+        """weather_stations row for a /stations feature; None without a station identifier"""
+        props = feature.get('properties', {})
+        coordinates = (feature.get('geometry') or {}).get('coordinates', [None, None])
 
-        print(f"\n📥 Ingesting NWS station data...")
+        station_id = props.get('stationIdentifier', '')
+        if not station_id:
+            return None
 
-        cursor = conn.cursor()
-        stations_ingested = 0
+        return {
+            'station_id': station_id,
+            'station_name': props.get('name', ''),
+            'station_latitude': coordinates[1],
+            'station_longitude': coordinates[0],
+            'state_code': state,
+            'cwa_code': props.get('cwa', [None])[0] if isinstance(props.get('cwa'), list) else props.get('cwa'),
+            'station_type': 'ASOS',  # Default type
+            'active_status': True,
+            'first_observation_date': None,
+            'last_observation_date': datetime.now().date(),
+            'update_frequency_minutes': 5
+        }
 
-        for state in states:
-            stations = self.get_stations(state=state, limit=50)
+    @staticmethod
+    def observation_record(station_id: str, obs_data: Dict) -> Dict:
+        """weather_observations row for an observation; observation_time stays the raw ISO string
+
+        Measurements are converted from the API's SI units (OBSERVATION_UNITS).
+        """
+        props = obs_data.get('properties', {})
+        coordinates = (obs_data.get('geometry') or {}).get('coordinates', [None, None])
+
+        def value(name: str):
+            quantity = props.get(name) or {}
+            if quantity.get('value') is None:
+                return None
+            scale, offset = OBSERVATION_UNITS.get(quantity.get('unitCode'), (1.0, 0.0))
+            return quantity['value'] * scale + offset
+
+        return {
+            'observation_id': f"{station_id}_{props.get('timestamp', datetime.now().isoformat())}",
+            'station_id': station_id,
+            'station_name': props.get('station', ''),
+            'observation_time': props.get('timestamp', ''),
+            'station_latitude': coordinates[1],
+            'station_longitude': coordinates[0],
+            'temperature': value('temperature'),
+            'dewpoint': value('dewpoint'),
+            'humidity': value('relativeHumidity'),
+            'wind_speed': value('windSpeed'),
+            'wind_direction': value('windDirection'),
+            'pressure': value('barometricPressure'),
+            'visibility': value('visibility'),
+            'sky_cover': props.get('skyCondition', ''),
+            'precipitation_amount': value('precipitationLastHour'),
+            'data_freshness_minutes': 0,
+            'load_timestamp': datetime.now(),
+            'data_source': 'NWS_API'
+        }
 
-            for station_feature in stations:
-                props = station_feature.get('properties', {})
-                geom = station_feature.get('geometry', {})
+    def load_records(self, conn, table: str, records: Iterable[Dict], label: str,
+                     accepted: Optional[List[Dict]] = None) -> int:
+        """Write parsed records to table; PostgreSQL takes the staged bulk upsert, other targets go row by row
+
+        accepted, if given, receives the records that were committed.
+        """
+        if self.db_type == 'postgresql':
+            start = time.time()
+            result = NWSBulkLoader(conn).upsert(table, records, accepted)
+            elapsed = time.time() - start
+            print(f"  📦 Bulk upserted {result.records:,} {label} in {elapsed:.2f}s "
+                  f"({result.records / max(elapsed, 1e-6):,.0f} rows/s)")
+            if result.rejected:
+                print(f"  ⚠️  {result.rejected:,} {label} rejected to {REJECTS_TABLE}")
+            if result.nulled:
+                print(f"  ⚠️  Out-of-range values stored as NULL: {format_nulled(result.nulled)}")
+            return result.merged
+
+        spec = BULK_TABLES[table]
+        names = [name for name, _, _ in spec.columns]
+        insert_sql = f"""
+        INSERT INTO {table}
+        ({', '.join(names)})
+        VALUES ({', '.join(['%s'] * len(names))})
+        ON CONFLICT ({', '.join(spec.key)}) {spec.conflict_action}
+        """
+
+        # The warehouse connectors have no savepoints, so each row commits on its own
+        # and a rejected row rolls back nothing but itself
+        cursor = conn.cursor()
+        ingested = 0
+        nulled: Dict[str, int] = {}
+        inserted: List[Dict] = []
+        for record in records:
+            values, reason = validate_record(table, record, nulled)
+            if reason:
+                print(f"  ⚠️  Skipping {label} {record.get(spec.key[0])}: {reason}")
+                continue
+            try:
+                cursor.execute(insert_sql, values)
+                conn.commit()
+                ingested += 1
+                inserted.append(record)
+            except Exception as e:
+                print(f"  ⚠️  Error inserting {label} {record.get(spec.key[0])}: {e}")
+                conn.rollback()
 
-                station_id = props.get('stationIdentifier', '')
-                if not station_id:
-                    continue
+        cursor.close()
+        if accepted is not None:
+            accepted.extend(inserted)
+        if nulled:
+            print(f"  ⚠️  Out-of-range values stored as NULL: {format_nulled(nulled)}")
+        return ingested
 
-                # Insert or update station
-                insert_sql = """
-                INSERT INTO weather_stations
-                (station_id, station_name, station_latitude, station_longitude,
-                 state_code, cwa_code, station_type, active_status,
-                 first_observation_date, last_observation_date, update_frequency_minutes)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (station_id) DO UPDATE SET
-                    station_name = EXCLUDED.station_name,
-                    station_latitude = EXCLUDED.station_latitude,
-                    station_longitude = EXCLUDED.station_longitude,
-                    last_observation_date = EXCLUDED.last_observation_date
-                """
+    def ingest_stations(self, conn, states: List[str] = None):
+        """Ingest weather station data"""
+        if states is None:
+            states = ['NY', 'CA', 'IL', 'FL', 'WA']  # Sample states
 
-                try:
-                    cursor.execute(insert_sql, (
-                        station_id,
-                        props.get('name', ''),
-                        geom.get('coordinates', [None, None])[1],  # lat
-                        geom.get('coordinates', [None, None])[0],  # lon
-                        state,
-                        props.get('cwa', [None])[0] if isinstance(props.get('cwa'), list) else props.get('cwa'),
-                        'ASOS',  # Default type
-                        True,
-                        None,  # first_observation_date
-                        datetime.now().date(),  # last_observation_date
-                        5  # update_frequency_minutes
-                    ))
-                    stations_ingested += 1
-                except Exception as e:
-                    print(f"  ⚠️  Error inserting station {station_id}: {e}")
-                    conn.rollback()
-                    continue
+        print(f"\n📥 Ingesting NWS station data...")
 
-            time.sleep(0.5)  # Rate limiting
+        stations_by_state = self.fetch_stations(states, limit=50)
 
-        conn.commit()
-        cursor.close()
+        records = [
+            record
+            for state, stations in stations_by_state.items()
+            for record in (self.station_record(feature, state) for feature in stations)
+            if record
+        ]
+        stations_ingested = self.load_records(conn, 'weather_stations', records, 'stations')
         print(f"  ✅ Ingested {stations_ingested} stations")
         return stations_ingested
 
@@ -238,94 +524,198 @@ class NWSAPIIngester:
 
         print(f"\n📥 Ingesting NWS observations for {len(station_ids)} stations...")
 
-        cursor = conn.cursor()
-        observations_ingested = 0
-
-        for station_id in station_ids:
-            obs_data = self.get_observations(station_id)
-            if not obs_data:
-                continue
+        fetch_start = time.time()
+        # Observations unchanged since they were last loaded come back as None and are skipped
+        observations = self.fetch_observations(station_ids, changed_only=True)
+        stats = self.client.stats()
+        print(f"  🌐 Fetched {len(station_ids)} stations in {time.time() - fetch_start:.1f}s "
+              f"({stats['retries']} retries, {stats['throttled']} throttled)")
+
+        records = [
+            self.observation_record(station_id, obs_data)
+            for station_id, obs_data in observations.items()
+            if obs_data
+        ]
+        accepted: List[Dict] = []
+        observations_ingested = self.load_records(conn, 'weather_observations', records, 'observations', accepted)
+        self.mark_applied(self.observation_url(record['station_id']) for record in accepted)
+        print(f"  ✅ Ingested {observations_ingested} observations")
+        return observations_ingested
 
-            props = obs_data.get('properties', {})
-            geom = obs_data.get('geometry', {})
+    def ingest_gridpoint_forecasts(self, conn, index: GridpointIndex,
+                                   locations: Dict[str, Tuple[float, float]] = None):
+        """Load the gridpoint forecast of every grid cell holding a station or policy area
+
+        Locations that share a cell cost one request, and a cell whose forecast
+        has not been reissued since it was last loaded comes back from the
+        HTTP cache as not modified and is skipped, so each cell is fetched
+        and loaded once per forecast cycle.
+        """
+        if locations is None:
+            locations = self.forecast_locations(conn)
+
+        print(f"\n📥 Ingesting NWS gridpoint forecasts for {len(locations)} locations...")
+        groups = group_by_cell(self.resolve_gridpoints(locations, index))
+        cells = list(groups)
+        located = sum(map(len, groups.values()))
+        print(f"  🗺️  {located} locations fall in {len(cells)} grid cells "
+              f"({len(locations) - located} outside NWS coverage or unresolved)")
+
+        urls = [self.forecast_url(*cell) for cell in cells]
+        forecasts = self.client.run(self.client.get_many([(url, None) for url in urls], 'forecast',
+                                                         changed_only=True))
+
+        def records():
+            for cell, url, forecast in zip(cells, urls, forecasts):
+                if not forecast:
+                    continue
+                try:
+                    yield from forecast_records(cell, forecast, url)
+                except (KeyError, TypeError, ValueError) as e:
+                    print(f"  ⚠️  Error parsing forecast {url}: {e}")
+
+        updated = sum(1 for forecast in forecasts if forecast)
+        accepted: List[Dict] = []
+        values_ingested = self.load_records(conn, 'grib2_forecasts', records(), 'forecast values', accepted)
+        self.mark_applied(record['source_file'] for record in accepted)
+        print(f"  ✅ Ingested {values_ingested} forecast values from {updated} updated cells "
+              f"({len(cells) - updated} unchanged or failed)")
+        return values_ingested
+
+    def ingest_alerts(self, conn, manifest: IngestManifest, area: Optional[str] = None):
+        """Load alerts sent since the last poll into weather_alerts
+
+        The manifest keeps the newest sent time loaded and the ids sent at that
+        time; the next poll asks only for alerts sent from then on and drops
+        the boundary alerts it already has, so only new alerts and new
+        versions of alerts reach the database.
+        """
+        feed = area or 'all'
+        watermark = manifest.alert_watermark(feed)
+        print(f"\n📥 Ingesting NWS alerts ({feed}) "
+              f"{'sent since ' + watermark[0] if watermark else 'currently active'}...")
 
-            observation_id = f"{station_id}_{props.get('timestamp', datetime.now().isoformat())}"
+        try:
+            features = self.client.run(self.alerts_since(watermark[0] if watermark else None, area))
+        except Exception as e:
+            print(f"  ⚠️  Error fetching alerts: {e}")
+            return 0
+        features = unseen_alerts(features, watermark)
+
+        records = [alert_record(f) for f in features]
+        accepted: List[Dict] = []
+        alerts_ingested = self.load_records(conn, 'weather_alerts', records, 'alerts', accepted)
+        # The next poll starts at the watermark, so it may only cover alerts that were committed
+        stored = {record['alert_id'] for record in accepted}
+        newest = latest_sent([feature for feature, record in zip(features, records) if record['alert_id'] in stored])
+        if newest:
+            manifest.advance_alert_watermark(feed, *newest)
+        print(f"  ✅ Ingested {alerts_ingested} of {len(features)} new or updated alerts")
+        return alerts_ingested
+
+    def backfill_observations(self, conn, manifest: IngestManifest, station_ids: List[str] = None,
+                              days: int = BACKFILL_DAYS):
+        """Load observation history, from each station's high-water mark (or days back) to now"""
+        if station_ids is None:
+            cursor = conn.cursor()
+            cursor.execute("SELECT station_id FROM weather_stations ORDER BY station_id")
+            station_ids = [row[0] for row in cursor.fetchall()]
+            cursor.close()
 
-            insert_sql = """
-            INSERT INTO weather_observations
-            (observation_id, station_id, station_name, observation_time,
-             station_latitude, station_longitude, temperature, dewpoint,
-             humidity, wind_speed, wind_direction, pressure, visibility,
-             sky_cover, precipitation_amount, data_freshness_minutes,
-             load_timestamp, data_source)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (observation_id) DO NOTHING
-            """
+        marks = manifest.watermarks(station_ids)
+        default_start = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat(timespec='seconds')
+        since = {station_id: marks.get(station_id, default_start) for station_id in station_ids}
+        print(f"\n📥 Backfilling NWS observations for {len(station_ids)} stations "
+              f"({len(marks)} resuming from their high-water mark)...")
 
-            try:
-                obs_time = datetime.fromisoformat(
-                    props.get('timestamp', '').replace('Z', '+00:00')
-                )
-
-                cursor.execute(insert_sql, (
-                    observation_id,
-                    station_id,
-                    props.get('station', ''),
-                    obs_time,
-                    geom.get('coordinates', [None, None])[1],
-                    geom.get('coordinates', [None, None])[0],
-                    props.get('temperature', {}).get('value'),
-                    props.get('dewpoint', {}).get('value'),
-                    props.get('relativeHumidity', {}).get('value'),
-                    props.get('windSpeed', {}).get('value'),
-                    props.get('windDirection', {}).get('value'),
-                    props.get('barometricPressure', {}).get('value'),
-                    props.get('visibility', {}).get('value'),
-                    props.get('skyCondition', ''),
-                    props.get('precipitationLastHour', {}).get('value'),
-                    0,  # data_freshness_minutes
-                    datetime.now(),
-                    'NWS_API'
-                ))
-                observations_ingested += 1
-            except Exception as e:
-                print(f"  ⚠️  Error inserting observation for {station_id}: {e}")
-                conn.rollback()
-                continue
+        observations_ingested = 0
+        for start in range(0, len(station_ids), BACKFILL_STATION_BATCH):
+            accepted: List[Dict] = []
+            observations_ingested += self.load_records(
+                conn, 'weather_observations',
+                self.observation_history(station_ids[start:start + BACKFILL_STATION_BATCH], since),
+                'observations', accepted
+            )
+            # Marks move only as far as the latest observation actually committed per station
+            manifest.advance_watermarks(high_water_marks(accepted))
+
+        stats = self.client.stats()
+        print(f"  ✅ Backfilled {observations_ingested} observations "
+              f"({stats['requests']} requests, {stats['throttled']} throttled, {stats['failures']} failed)")
+        return observations_ingested
 
-            time.sleep(0.2)  # Rate limiting
 
-        conn.commit()
-        cursor.close()
-        print(f"  ✅ Ingested {observations_ingested} observations")
-        return observations_ingested
+def parse_args():
+    parser = argparse.ArgumentParser(description='Ingest stations and observations from api.weather.gov')
+    parser.add_argument('--db-type', default='databricks', choices=['databricks', 'postgresql'],
+                        help='Target database (default: databricks)')
+    parser.add_argument('--backfill', action='store_true',
+                        help='Load observation history instead of the latest observation per station')
+    parser.add_argument('--forecasts', action='store_true',
+                        help='Load gridpoint forecasts for every station and policy area grid cell')
+    parser.add_argument('--gridpoint-index', type=Path, default=DEFAULT_GRIDPOINT_INDEX_PATH,
+                        help='Where resolved point -> gridpoint lookups are kept '
+                             '(default: db-6/data/nws_gridpoints.sqlite)')
+    parser.add_argument('--alerts', action='store_true',
+                        help='Load alerts sent since the last poll into weather_alerts')
+    parser.add_argument('--area', help='State or marine area to poll alerts for (default: all)')
+    parser.add_argument('--stations',
+                        help='Comma-separated station ids to backfill (default: every station in weather_stations)')
+    parser.add_argument('--days', type=int, default=BACKFILL_DAYS,
+                        help=f'History to backfill for stations without a high-water mark (default: {BACKFILL_DAYS})')
+    parser.add_argument('--reload-unchanged', action='store_true',
+                        help='Load responses the HTTP cache has already loaded into this database again '
+                             '(after the database was reset)')
+    parser.add_argument('--manifest', type=Path, default=DEFAULT_MANIFEST_PATH,
+                        help='Where observation and alert high-water marks are kept '
+                             '(default: db-6/data/ingest_manifest.sqlite)')
+    return parser.parse_args()
 
 
 def main():
     """Main execution"""
+    args = parse_args()
+
     print("="*70)
     print("NWS API DATA INGESTION FOR DB-6")
     print("="*70)
 
-    ingester = NWSAPIIngester(db_type='databricks')
+    http_cache = HTTPCache(target=database_target(args.db_type))
+    if args.reload_unchanged:
+        http_cache.forget_applied()
+    ingester = NWSAPIIngester(db_type=args.db_type, http_cache=http_cache)
     conn = ingester.get_db_connection()
 
     if not conn:
         print("❌ Database connection failed")
+        http_cache.close()
         return
 
     try:
-        # Ingest stations
-        ingester.ingest_stations(conn, states=['NY', 'CA', 'IL', 'FL', 'WA'])
+        if args.backfill:
+            with IngestManifest(args.manifest) as manifest:
+                station_ids = args.stations.split(',') if args.stations else None
+                ingester.backfill_observations(conn, manifest, station_ids, days=args.days)
+        elif args.alerts:
+            with IngestManifest(args.manifest) as manifest:
+                ingester.ingest_alerts(conn, manifest, args.area)
+        elif args.forecasts:
+            with GridpointIndex(args.gridpoint_index) as index:
+                ingester.ingest_gridpoint_forecasts(conn, index)
+        else:
+            # Ingest stations
+            ingester.ingest_stations(conn, states=['NY', 'CA', 'IL', 'FL', 'WA'])
 
-        # Ingest observations
-        ingester.ingest_observations(conn)
+            # Ingest observations
+            ingester.ingest_observations(conn)
 
         print("\n✅ NWS API ingestion complete")
 
     finally:
+        print(f"\n🗄️  HTTP cache: {format_http_cache_report(http_cache.report())}")
+        ingester.client.close()
+        http_cache.close()
         conn.close()
 
-
 if __name__ == '__main__':
     main()
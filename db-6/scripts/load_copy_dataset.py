@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Load a COPY-format large dataset into PostgreSQL
+Reads the output of generate_large_dataset.py --format copy/binary (single directory
+or sharded manifest) and streams every table file through COPY ... FROM STDIN.
+gzip/zstd compressed table files are decompressed on the fly.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Add root scripts to path (shared compressed_io helpers)
+sys.path.append(str(Path(__file__).parent.parent.parent / 'scripts'))
+
+from compressed_io import open_compressed
+
+try:
+    import psycopg2
+    POSTGRES_AVAILABLE = True
+except ImportError:
+    POSTGRES_AVAILABLE = False
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).parent.parent
+DEFAULT_DATASET = BASE_DIR / 'data' / 'data_large_copy'
+
+# Read size handed to copy_expert
+COPY_BUFFER_BYTES = 8 * 1024 * 1024
+
+
+def get_postgres_connection():
+    """Get PostgreSQL connection"""
+    if not POSTGRES_AVAILABLE:
+        return None
+
+    conn_params = {
+        'host': os.getenv('POSTGRES_HOST', '127.0.0.1'),
+        'port': os.getenv('POSTGRES_PORT_DB6', '5437'),
+        'database': os.getenv('POSTGRES_DB', 'db6'),
+        'user': os.getenv('POSTGRES_USER', 'postgres'),
+        'password': os.getenv('POSTGRES_PASSWORD', 'postgres'),
+        'connect_timeout': 10
+    }
+
+    try:
+        return psycopg2.connect(**conn_params)
+    except Exception as e:
+        logger.error(f"PostgreSQL connection failed: {e}")
+        return None
+
+
+def read_copy_manifest(dataset: Path) -> Tuple[Dict[str, List[str]], List[Dict]]:
+    """Return (columns per table, files in load order) for a COPY dataset
+
+    dataset is either a COPY output directory (with manifest.json) or a sharded
+    data_large_manifest.json. File paths in the result are absolute.
+    """
+    manifest_file = dataset / 'manifest.json' if dataset.is_dir() else dataset
+    manifest = json.loads(manifest_file.read_text())
+    if manifest.get('format') not in ('copy', 'binary'):
+        raise ValueError(f"{manifest_file} is not a COPY-format dataset (format: {manifest.get('format', 'sql')})")
+
+    if 'shards' in manifest:
+        entries = [entry for shard in manifest['shards'] for entry in shard['files']]
+    else:
+        entries = manifest['files']
+
+    files = [dict(entry, path=manifest_file.parent / entry['file']) for entry in entries]
+    return manifest['columns'], files
+
+
+def copy_file(conn, table: str, columns: List[str], path: Path, copy_format: str = 'text') -> float:
+    """COPY one table file (text or binary COPY format, optionally compressed) and commit; returns elapsed seconds"""
+    copy_sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    if copy_format == 'binary':
+        copy_sql += " WITH (FORMAT binary)"
+    start = time.perf_counter()
+    cursor = conn.cursor()
+    try:
+        with open_compressed(path, 'rb') as f:
+            cursor.copy_expert(copy_sql, f, size=COPY_BUFFER_BYTES)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return time.perf_counter() - start
+
+
+def load_dataset(conn, dataset: Path, tables: Optional[List[str]] = None) -> Dict[str, int]:
+    """Load every file of a COPY dataset; returns rows loaded per table"""
+    columns, files = read_copy_manifest(dataset)
+    loaded = {}
+
+    for entry in files:
+        table = entry['table']
+        if tables and table not in tables:
+            continue
+
+        elapsed = copy_file(conn, table, columns[table], entry['path'], entry.get('copy_format', 'text'))
+        loaded[table] = loaded.get(table, 0) + entry['rows']
+        rate = entry['rows'] / elapsed if elapsed > 0 else float('inf')
+        logger.info(f"  {table}: {entry['rows']:,} rows from {entry['file']} in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+
+    return loaded
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Load a COPY-format db-6 large dataset into PostgreSQL')
+    parser.add_argument('dataset', type=Path, nargs='?', default=DEFAULT_DATASET,
+                        help=f'COPY output directory or sharded manifest (default: {DEFAULT_DATASET})')
+    parser.add_argument('--tables', nargs='+', default=None,
+                        help='Only load these tables')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Main load function"""
+    args = parse_args(argv)
+
+    conn = get_postgres_connection()
+    if conn is None:
+        logger.error("No PostgreSQL connection (is psycopg2 installed and the database running?)")
+        return False
+
+    logger.info(f"Loading {args.dataset} with COPY FROM STDIN...")
+    start = time.perf_counter()
+    try:
+        loaded = load_dataset(conn, args.dataset, args.tables)
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - start
+
+    total_rows = sum(loaded.values())
+    logger.info(f"\n✅ Loaded {total_rows:,} rows into {len(loaded)} tables in {elapsed:.1f}s "
+                f"({total_rows / elapsed if elapsed > 0 else 0:,.0f} rows/s)")
+    return True
+
+
+if __name__ == '__main__':
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Filesystem-backed stand-in for the boto3 S3 client
+Serves <root>/<bucket>/<key> with the subset of the S3 API the db-6 ingesters
+use (list_objects_v2 and its paginator, head_object, get_object with Range),
+so listing and fetch code can run offline against a local mirror or fixture tree.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+# Same page size as S3's list_objects_v2
+DEFAULT_MAX_KEYS = 1000
+
+
+class LocalS3Error(Exception):
+    """Raised for missing buckets/keys, with the S3 error code"""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(f"{code}: {message}")
+        self.response = {'Error': {'Code': code, 'Message': message}}
+
+
+class LocalListObjectsPaginator:
+    """Mirrors botocore's list_objects_v2 paginator"""
+
+    def __init__(self, client: 'LocalS3Client'):
+        self.client = client
+
+    def paginate(self, Bucket: str, Prefix: str = '', PaginationConfig: Optional[Dict] = None) -> Iterator[Dict]:
+        page_size = (PaginationConfig or {}).get('PageSize', DEFAULT_MAX_KEYS)
+        token = None
+        while True:
+            kwargs = {'Bucket': Bucket, 'Prefix': Prefix, 'MaxKeys': page_size}
+            if token:
+                kwargs['ContinuationToken'] = token
+            page = self.client.list_objects_v2(**kwargs)
+            yield page
+            if not page['IsTruncated']:
+                return
+            token = page['NextContinuationToken']
+
+
+class LocalS3Client:
+    """Read-only S3 client over a directory tree"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _bucket_dir(self, bucket: str) -> Path:
+        path = self.root / bucket
+        if not path.is_dir():
+            raise LocalS3Error('NoSuchBucket', bucket)
+        return path
+
+    def _object_path(self, bucket: str, key: str) -> Path:
+        path = self._bucket_dir(bucket) / key
+        if not path.is_file():
+            raise LocalS3Error('NoSuchKey', key)
+        return path
+
+    @staticmethod
+    def _object_info(key: str, path: Path) -> Dict:
+        stat = path.stat()
+        # Cheap stable ETag: changes whenever the file is rewritten
+        etag = hashlib.md5(f"{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+        return {
+            'Key': key,
+            'Size': stat.st_size,
+            'LastModified': datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+            'ETag': f'"{etag}"'
+        }
+
+    def _keys(self, bucket: str, prefix: str) -> List[str]:
+        bucket_dir = self._bucket_dir(bucket)
+        # Only walk the deepest directory the prefix pins down
+        base = bucket_dir / prefix.rsplit('/', 1)[0] if '/' in prefix else bucket_dir
+        if not base.is_dir():
+            return []
+        keys = (path.relative_to(bucket_dir).as_posix() for path in base.rglob('*') if path.is_file())
+        return sorted(key for key in keys if key.startswith(prefix))
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = '', MaxKeys: int = DEFAULT_MAX_KEYS,
+                        ContinuationToken: Optional[str] = None, StartAfter: Optional[str] = None) -> Dict:
+        keys = self._keys(Bucket, Prefix)
+        after = ContinuationToken or StartAfter
+        if after:
+            keys = [key for key in keys if key > after]
+        page = keys[:MaxKeys]
+        response = {
+            'Name': Bucket,
+            'Prefix': Prefix,
+            'KeyCount': len(page),
+            'MaxKeys': MaxKeys,
+            'IsTruncated': len(keys) > MaxKeys
+        }
+        if page:
+            bucket_dir = self.root / Bucket
+            response['Contents'] = [self._object_info(key, bucket_dir / key) for key in page]
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = page[-1]
+        return response
+
+    def get_paginator(self, operation_name: str) -> LocalListObjectsPaginator:
+        if operation_name != 'list_objects_v2':
+            raise NotImplementedError(f"LocalS3Client has no paginator for {operation_name}")
+        return LocalListObjectsPaginator(self)
+
+    def head_object(self, Bucket: str, Key: str) -> Dict:
+        info = self._object_info(Key, self._object_path(Bucket, Key))
+        return {'ContentLength': info['Size'], 'LastModified': info['LastModified'], 'ETag': info['ETag']}
+
+    def get_object(self, Bucket: str, Key: str, Range: Optional[str] = None) -> Dict:
+        """Whole object, or the 'bytes=start-end' / 'bytes=start-' slice of it"""
+        path = self._object_path(Bucket, Key)
+        info = self._object_info(Key, path)
+        start, end = 0, info['Size'] - 1
+        if Range:
+            first, _, last = Range.split('=', 1)[1].partition('-')
+            start = int(first)
+            if last:
+                end = min(int(last), end)
+        body = open(path, 'rb')
+        body.seek(start)
+        return {
+            'Body': _RangeReader(body, end - start + 1),
+            'ContentLength': end - start + 1,
+            'LastModified': info['LastModified'],
+            'ETag': info['ETag']
+        }
+
+
+class _RangeReader:
+    """File slice with the read/iter_chunks/close interface of botocore's StreamingBody"""
+
+    def __init__(self, f, length: int):
+        self._f = f
+        self._remaining = length
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        if amt is None or amt > self._remaining:
+            amt = self._remaining
+        data = self._f.read(amt)
+        self._remaining -= len(data)
+        return data
+
+    def iter_chunks(self, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self):
+        self._f.close()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Polar-to-Cartesian gridding of NEXRAD Level II volumes
+Bins the decoded gates of a volume (nexrad_level2.py) onto a 0.01 degree
+latitude/longitude grid with NumPy scatter-reduce (ufunc.at / bincount) and
+bulk-loads the cells into nexrad_reflectivity_grid and nexrad_velocity_grid.
+
+Cell centres sit on multiples of 0.01 degrees from the US_BOUNDS south-west
+corner, so cells from neighbouring radars line up exactly and composites such
+as Query 25 group by (grid_latitude, grid_longitude) instead of matching raw
+gates with ST_DWithin.
+
+Per cell and volume scan:
+  max/mean/min/count        base (lowest) reflectivity sweep; mean in linear Z
+  composite reflectivity    maximum over every elevation
+  height of max             beam height (m above sea level) of that maximum
+  precipitation rate        Marshall-Palmer Z = 200 R^1.6 on the base mean, hail-capped
+  velocity                  lowest Doppler sweep: mean radial velocity, azimuth and spectrum width
+"""
+
+import sys
+import time
+import math
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from generate_large_dataset import US_BOUNDS, generate_geography_wkt
+from load_copy_dataset import get_postgres_connection
+from nexrad_level2 import DECODE_WORKERS, Level2Decoder, Level2Volume
+from pg_binary_copy import BinaryCopyEncoder, copy_binary, encode_prefixed_text, encode_text
+
+logger = logging.getLogger(__name__)
+
+GRID_RESOLUTION_DEGREES = 0.01
+KM_PER_DEGREE = 111.2
+
+# Marshall-Palmer Z-R relation, and the WSR-88D hail cap applied before it
+ZR_COEFFICIENT = 200.0
+ZR_EXPONENT = 1.6
+HAIL_CAP_DBZ = 53.0
+
+# Composite reflectivity (dBZ) lower bounds of storm_severity, strongest first;
+# weaker cells get no severity
+STORM_SEVERITY = [
+    (65.0, 'Extreme'),
+    (55.0, 'Severe'),
+    (45.0, 'Strong'),
+    (35.0, 'Moderate'),
+    (20.0, 'Weak')
+]
+
+GRID_METHOD = 'GateBinning'
+
+# velocity_quality_flag bits
+QUALITY_RANGE_FOLDED = 1
+
+# Rows per encoded COPY block
+BLOCK_ROWS = 100_000
+
+
+class GridWindow(NamedTuple):
+    """The part of the national lattice a radar can reach; cells are numbered row-major"""
+    first_row: int
+    first_column: int
+    rows: int
+    columns: int
+    resolution: float
+
+    @property
+    def size(self) -> int:
+        return self.rows * self.columns
+
+    def cells(self, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        """Window cell number of each point"""
+        rows = np.rint((latitudes - US_BOUNDS['south']) / self.resolution).astype(np.int64) - self.first_row
+        columns = np.rint((longitudes - US_BOUNDS['west']) / self.resolution).astype(np.int64) - self.first_column
+        return rows * self.columns + columns
+
+    def centres(self, cells: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Latitude and longitude of cell centres"""
+        rows, columns = np.divmod(cells, self.columns)
+        return (np.round(US_BOUNDS['south'] + (rows + self.first_row) * self.resolution, 7),
+                np.round(US_BOUNDS['west'] + (columns + self.first_column) * self.resolution, 7))
+
+
+class ReflectivityGrid(NamedTuple):
+    """Reflectivity cells of one volume scan; NaN where the base sweep has no gate"""
+    cells: np.ndarray
+    max_dbz: np.ndarray
+    mean_dbz: np.ndarray
+    min_dbz: np.ndarray
+    count: np.ndarray
+    composite_dbz: np.ndarray
+    height_of_max_m: np.ndarray
+    precipitation_rate_mmh: np.ndarray
+
+
+class VelocityGrid(NamedTuple):
+    """Radial velocity cells of one volume scan's lowest Doppler sweep"""
+    cells: np.ndarray
+    velocity_ms: np.ndarray
+    azimuth: np.ndarray
+    spectrum_width_ms: np.ndarray
+    range_folded: np.ndarray
+
+
+def rain_rate(dbz: np.ndarray) -> np.ndarray:
+    """Marshall-Palmer rain rate (mm/h) from reflectivity, capped at HAIL_CAP_DBZ"""
+    z = 10.0 ** (np.minimum(dbz, HAIL_CAP_DBZ) / 10.0)
+    return (z / ZR_COEFFICIENT) ** (1.0 / ZR_EXPONENT)
+
+
+def storm_severity(composite_dbz: np.ndarray) -> List[Optional[str]]:
+    severity = np.full(len(composite_dbz), None, dtype=object)
+    for threshold, label in reversed(STORM_SEVERITY):
+        severity[composite_dbz >= threshold] = label
+    return severity.tolist()
+
+
+class NexradGridder:
+    """Scatter-reduces a volume's gates onto the 0.01 degree lattice"""
+
+    def __init__(self, resolution: float = GRID_RESOLUTION_DEGREES):
+        self.resolution = resolution
+
+    def window(self, latitude: float, longitude: float, max_range_m: float) -> GridWindow:
+        """Lattice window covering every gate out to max_range_m (ground range never exceeds slant range)"""
+        span_lat = max_range_m / 1000.0 / KM_PER_DEGREE + self.resolution
+        span_lon = span_lat / math.cos(math.radians(min(abs(latitude) + span_lat, 89.0)))
+        first_row = math.floor((latitude - span_lat - US_BOUNDS['south']) / self.resolution)
+        first_column = math.floor((longitude - span_lon - US_BOUNDS['west']) / self.resolution)
+        rows = math.ceil(2 * span_lat / self.resolution) + 2
+        columns = math.ceil(2 * span_lon / self.resolution) + 2
+        return GridWindow(first_row, first_column, rows, columns, self.resolution)
+
+    def grid(self, volume: Level2Volume) -> Tuple[GridWindow, Optional[ReflectivityGrid], Optional[VelocityGrid]]:
+        sweeps = list(volume.sweeps())
+        window = self.window(volume.latitude, volume.longitude,
+                             max((sweep.ranges_m[-1] for sweep in sweeps), default=0.0))
+        return window, self.reflectivity(volume, sweeps, window), self.velocity(volume, sweeps, window)
+
+    def reflectivity(self, volume: Level2Volume, sweeps, window: GridWindow) -> Optional[ReflectivityGrid]:
+        composite = np.full(window.size, -np.inf)
+        height_of_max = np.full(window.size, np.nan)
+        base = None
+        for sweep in sweeps:
+            values = sweep.moments['reflectivity']
+            radials, gates = np.nonzero(np.isfinite(values))
+            if not len(radials):
+                continue
+            values = values[radials, gates].astype(np.float64)
+            latitudes, longitudes, heights = volume.gate_locations(sweep, radials, gates)
+            cells = window.cells(latitudes, longitudes)
+
+            sweep_max = np.full(window.size, -np.inf)
+            np.maximum.at(sweep_max, cells, values)
+            raised = sweep_max > composite
+            at_max = raised[cells] & (values == sweep_max[cells])
+            sweep_height = np.full(window.size, np.nan)
+            np.fmax.at(sweep_height, cells[at_max], heights[at_max])
+            composite = np.where(raised, sweep_max, composite)
+            height_of_max = np.where(raised, sweep_height, height_of_max)
+
+            if base is None:
+                count = np.bincount(cells, minlength=window.size)
+                linear = np.bincount(cells, weights=10.0 ** (values / 10.0), minlength=window.size)
+                minimum = np.full(window.size, np.inf)
+                np.minimum.at(minimum, cells, values)
+                base = (sweep_max, linear, minimum, count)
+
+        if base is None:
+            return None
+        cells = np.flatnonzero(np.isfinite(composite))
+        sweep_max, linear, minimum, count = (array[cells] for array in base)
+        present = count > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(present, 10.0 * np.log10(linear / count), np.nan)
+        return ReflectivityGrid(
+            cells=cells,
+            max_dbz=np.where(present, sweep_max, np.nan),
+            mean_dbz=mean,
+            min_dbz=np.where(present, minimum, np.nan),
+            count=count,
+            composite_dbz=composite[cells],
+            height_of_max_m=height_of_max[cells],
+            precipitation_rate_mmh=np.where(present, rain_rate(mean), np.nan)
+        )
+
+    def velocity(self, volume: Level2Volume, sweeps, window: GridWindow) -> Optional[VelocityGrid]:
+        sweep = next((sweep for sweep in sweeps if np.isfinite(sweep.moments['velocity']).any()), None)
+        if sweep is None:
+            return None
+        velocity = sweep.moments['velocity']
+        radials, gates = np.nonzero(np.isfinite(velocity))
+        latitudes, longitudes, _ = volume.gate_locations(sweep, radials, gates)
+        cells = window.cells(latitudes, longitudes)
+        azimuth = np.radians(sweep.azimuth[radials].astype(np.float64))
+        width = sweep.moments['spectrum_width'][radials, gates].astype(np.float64)
+        has_width = np.isfinite(width)
+
+        count = np.bincount(cells, minlength=window.size)
+        totals = {
+            'velocity': np.bincount(cells, weights=velocity[radials, gates], minlength=window.size),
+            'east': np.bincount(cells, weights=np.sin(azimuth), minlength=window.size),
+            'north': np.bincount(cells, weights=np.cos(azimuth), minlength=window.size),
+            'width': np.bincount(cells[has_width], weights=width[has_width], minlength=window.size),
+            'width_count': np.bincount(cells[has_width], minlength=window.size)
+        }
+        folded = np.zeros(window.size, dtype=bool)
+        folded_radials, folded_gates = np.nonzero(sweep.range_folded)
+        if len(folded_radials):
+            folded_latitudes, folded_longitudes, _ = volume.gate_locations(sweep, folded_radials, folded_gates)
+            folded[window.cells(folded_latitudes, folded_longitudes)] = True
+
+        cells = np.flatnonzero(count)
+        totals = {key: values[cells] for key, values in totals.items()}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            width = np.where(totals['width_count'] > 0, totals['width'] / totals['width_count'], np.nan)
+        return VelocityGrid(
+            cells=cells,
+            velocity_ms=totals['velocity'] / count[cells],
+            azimuth=np.degrees(np.arctan2(totals['east'], totals['north'])) % 360.0,
+            spectrum_width_ms=width,
+            range_folded=folded[cells]
+        )
+
+
+class NexradGridLoader:
+    """Grids volumes and loads nexrad_reflectivity_grid and nexrad_velocity_grid with binary COPY"""
+
+    def __init__(self, gridder: Optional[NexradGridder] = None, block_rows: int = BLOCK_ROWS):
+        self.gridder = gridder or NexradGridder()
+        self.block_rows = block_rows
+        self.reflectivity_encoder = BinaryCopyEncoder('nexrad_reflectivity_grid')
+        self.velocity_encoder = BinaryCopyEncoder('nexrad_velocity_grid')
+        self.reflectivity_rows = 0
+        self.velocity_rows = 0
+
+    @staticmethod
+    def _cell_columns(window: GridWindow, cells: np.ndarray) -> Dict:
+        latitudes, longitudes = window.centres(cells)
+        pairs = list(zip(latitudes.tolist(), longitudes.tolist()))
+        return {
+            'grid_latitude': latitudes,
+            'grid_longitude': longitudes,
+            'grid_geom': encode_text([generate_geography_wkt(lat, lon) for lat, lon in pairs]),
+            'id_fragments': [f"{lat:.2f}_{lon:.2f}".encode('ascii') for lat, lon in pairs]
+        }
+
+    def reflectivity_blocks(self, volume: Level2Volume, window: GridWindow,
+                            grid: ReflectivityGrid) -> Iterator[bytes]:
+        header = volume.header
+        prefix = f"{header.site_id}-{header.volume_time:%Y%m%d%H%M%S}-"
+        resolution_km = round(window.resolution * KM_PER_DEGREE, 2)
+        for start in range(0, len(grid.cells), self.block_rows):
+            stop = min(start + self.block_rows, len(grid.cells))
+            cell_columns = self._cell_columns(window, grid.cells[start:stop])
+            block = {
+                'grid_id': encode_prefixed_text(prefix, cell_columns.pop('id_fragments')),
+                'site_id': header.site_id,
+                'scan_time': header.volume_time,
+                'grid_resolution_km': resolution_km,
+                'max_reflectivity_dbz': grid.max_dbz[start:stop],
+                'mean_reflectivity_dbz': grid.mean_dbz[start:stop],
+                'min_reflectivity_dbz': grid.min_dbz[start:stop],
+                'reflectivity_count': grid.count[start:stop],
+                'composite_reflectivity_dbz': grid.composite_dbz[start:stop],
+                'height_of_max_reflectivity_m': grid.height_of_max_m[start:stop],
+                'precipitation_rate_mmh': grid.precipitation_rate_mmh[start:stop],
+                'storm_severity': encode_text(storm_severity(grid.composite_dbz[start:stop])),
+                'grid_method': GRID_METHOD,
+                **cell_columns
+            }
+            self.reflectivity_rows += stop - start
+            yield self.reflectivity_encoder.encode(block, stop - start)
+
+    def velocity_blocks(self, volume: Level2Volume, window: GridWindow, grid: VelocityGrid) -> Iterator[bytes]:
+        header = volume.header
+        prefix = f"{header.site_id}-{header.volume_time:%Y%m%d%H%M%S}-"
+        resolution_km = round(window.resolution * KM_PER_DEGREE, 2)
+        for start in range(0, len(grid.cells), self.block_rows):
+            stop = min(start + self.block_rows, len(grid.cells))
+            cell_columns = self._cell_columns(window, grid.cells[start:stop])
+            velocity = grid.velocity_ms[start:stop]
+            azimuth = np.radians(grid.azimuth[start:stop])
+            # Only the along-beam component is observed; u/v are it projected east/north
+            u, v = velocity * np.sin(azimuth), velocity * np.cos(azimuth)
+            block = {
+                'grid_id': encode_prefixed_text(prefix, cell_columns.pop('id_fragments')),
+                'site_id': header.site_id,
+                'scan_time': header.volume_time,
+                'grid_resolution_km': resolution_km,
+                'radial_velocity_ms': velocity,
+                'velocity_azimuth': grid.azimuth[start:stop],
+                'u_wind_component_ms': u,
+                'v_wind_component_ms': v,
+                'wind_speed_ms': np.abs(velocity),
+                'wind_direction_deg': np.degrees(np.arctan2(-u, -v)) % 360.0,
+                'spectrum_width_ms': grid.spectrum_width_ms[start:stop],
+                'velocity_quality_flag': np.where(grid.range_folded[start:stop], QUALITY_RANGE_FOLDED, 0),
+                **cell_columns
+            }
+            self.velocity_rows += stop - start
+            yield self.velocity_encoder.encode(block, stop - start)
+
+    def copy(self, conn, volume: Level2Volume):
+        """Grid one volume and COPY its cells without committing, so callers can share the transaction"""
+        window, reflectivity, velocity = self.gridder.grid(volume)
+        if reflectivity is not None:
+            copy_binary(conn, self.reflectivity_encoder, self.reflectivity_blocks(volume, window, reflectivity))
+        if velocity is not None:
+            copy_binary(conn, self.velocity_encoder, self.velocity_blocks(volume, window, velocity))
+
+    def load(self, conn, volumes: Iterable[Level2Volume]) -> Tuple[int, int]:
+        """Grid and COPY every volume, one transaction per volume; returns (reflectivity, velocity) rows"""
+        start_rows = (self.reflectivity_rows, self.velocity_rows)
+        for volume in volumes:
+            try:
+                self.copy(conn, volume)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return self.reflectivity_rows - start_rows[0], self.velocity_rows - start_rows[1]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Grid NEXRAD Level II volumes into nexrad_reflectivity_grid '
+                                                 'and nexrad_velocity_grid')
+    parser.add_argument('files', nargs='+', type=Path, help='Archive II volume files (optionally gzipped)')
+    parser.add_argument('--workers', type=int, default=DECODE_WORKERS,
+                        help=f'Processes decompressing records (default: {DECODE_WORKERS})')
+    parser.add_argument('--load', action='store_true', help='COPY the cells into PostgreSQL')
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args()
+    loader = NexradGridLoader()
+
+    conn = None
+    if args.load:
+        conn = get_postgres_connection()
+        if conn is None:
+            logger.error("PostgreSQL connection failed")
+            sys.exit(1)
+
+    start = time.time()
+    try:
+        with Level2Decoder(args.workers) as decoder:
+            for path in args.files:
+                volume = decoder.decode(path.read_bytes())
+                grid_start = time.time()
+                if conn:
+                    loader.load(conn, [volume])
+                else:
+                    window, reflectivity, velocity = loader.gridder.grid(volume)
+                    for blocks in ((loader.reflectivity_blocks(volume, window, reflectivity) if reflectivity else ()),
+                                   (loader.velocity_blocks(volume, window, velocity) if velocity else ())):
+                        for _ in blocks:
+                            pass
+                logger.info(f"{path.name}: {volume.header.site_id} {volume.header.volume_time:%Y-%m-%d %H:%M:%S} "
+                            f"gridded in {time.time() - grid_start:.2f}s")
+    finally:
+        if conn:
+            conn.close()
+    elapsed = time.time() - start
+
+    action = 'Loaded' if args.load else 'Gridded'
+    logger.info(f"{action} {loader.reflectivity_rows:,} reflectivity and {loader.velocity_rows:,} velocity cells "
+                f"from {len(args.files)} volumes in {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,596 @@
+#!/usr/bin/env python3
+"""
+NEXRAD Level II decoding into nexrad_level2_data
+Decodes Archive II volumes (the noaa-nexrad-level2 bucket) into NumPy sweeps of
+azimuth x range gates and bulk-loads the valid gates with binary COPY.
+
+An Archive II file is a 24-byte volume header followed by LDM records, each a
+4-byte control word (byte count, negative on the last record) and a bzip2
+stream. Records decompress independently, so a volume's records are decoded on
+a process pool. Decompressed records hold RDA messages: 2432-byte frames for
+the metadata messages, variable length for message 31 (digital radar data,
+every volume since 2008), which carries one radial with its moment blocks.
+"""
+
+import bz2
+import os
+import sys
+import gzip
+import time
+import struct
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from generate_large_dataset import generate_geography_wkt
+from load_copy_dataset import get_postgres_connection
+from pg_binary_copy import (
+    NULL_LENGTH, BinaryCopyEncoder, EncodedColumn, copy_binary, encode_prefixed_text, encode_text
+)
+
+logger = logging.getLogger(__name__)
+
+VOLUME_HEADER = struct.Struct('>9s3sII4s')
+CONTROL_WORD = struct.Struct('>i')
+CTM_HEADER_SIZE = 12
+MESSAGE_HEADER = struct.Struct('>HBBHHIHH')
+FRAME_SIZE = 2432
+DIGITAL_RADAR_DATA = 31
+
+MSG31_HEADER = struct.Struct('>4sIHHfBBHBBBBfBBH')
+VOLUME_BLOCK = struct.Struct('>1s3sHBBffhH')
+RADIAL_BLOCK = struct.Struct('>1s3sHhffhh')
+MOMENT_HEADER = struct.Struct('>1s3sIHhhhhBBff')
+
+BZIP2_MAGIC = b'BZh'
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Moment block name -> Sweep.moments key; other moments (ZDR, PHI, RHO, CFP) are skipped
+MOMENTS = {
+    b'REF': 'reflectivity',
+    b'VEL': 'velocity',
+    b'SW ': 'spectrum_width'
+}
+
+# Raw moment codes below 2 are not data
+RAW_BELOW_THRESHOLD = 0
+RAW_RANGE_FOLDED = 1
+
+# data_quality_flag bits
+QUALITY_RANGE_FOLDED = 1
+
+# Encoded data_type of rows with reflectivity, and of velocity-only rows
+DATA_TYPES = encode_text(['Reflectivity', 'Velocity']).values
+
+# Effective earth radius for beam height (4/3 earth model) and the sphere used
+# for azimuthal equidistant positions, in metres
+EFFECTIVE_EARTH_RADIUS_M = 6371000.0 * 4.0 / 3.0
+EARTH_RADIUS_M = 6370997.0
+
+SPEED_OF_LIGHT_MS = 299792458.0
+
+# Archive II dates count days from 1 = 1970-01-01
+ARCHIVE_EPOCH = datetime(1969, 12, 31)
+
+# Rows per encoded COPY block
+BLOCK_ROWS = 100_000
+
+# Processes decoding records of one volume
+DECODE_WORKERS = os.cpu_count() or 1
+
+
+class NexradDecodeError(ValueError):
+    """Malformed or unsupported Level II data"""
+
+
+class VolumeHeader(NamedTuple):
+    site_id: str
+    volume_time: datetime
+    version: str
+    volume_number: int
+
+
+class RecordRadials(NamedTuple):
+    """Message 31 radials of one LDM record
+
+    Moments are (first gate m, gate spacing m, scale, offset) per radial plus the
+    raw (radials, gates) codes, 0-padded; raw codes keep the pickled result small.
+    """
+    azimuth: np.ndarray
+    azimuth_number: np.ndarray
+    elevation: np.ndarray
+    elevation_number: np.ndarray
+    time_ms: np.ndarray
+    nyquist_ms: np.ndarray
+    unambiguous_range_m: np.ndarray
+    site: Optional[Tuple[float, float, float, int]]
+    moments: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]]
+
+
+def archive_time(julian_date: int, milliseconds: int) -> datetime:
+    return ARCHIVE_EPOCH + timedelta(days=julian_date, milliseconds=milliseconds)
+
+
+def parse_volume_header(data: bytes) -> VolumeHeader:
+    if len(data) < VOLUME_HEADER.size or not data.startswith(b'AR2V'):
+        raise NexradDecodeError("Not an Archive II volume (missing AR2V header)")
+    tape, extension, julian_date, milliseconds, icao = VOLUME_HEADER.unpack_from(data)
+    number = extension.decode('ascii', errors='replace')
+    try:
+        volume_time = archive_time(julian_date, milliseconds)
+    except OverflowError:
+        raise NexradDecodeError(f"Volume header date out of range ({julian_date})") from None
+    return VolumeHeader(icao.decode('ascii', errors='replace').strip(), volume_time,
+                        tape.decode('ascii', errors='replace').rstrip('.'),
+                        int(number) if number.isdigit() else 0)
+
+
+def split_records(data: bytes) -> Tuple[List[bytes], str]:
+    """LDM records of a volume (after any outer gzip) and their compression type
+
+    Uncompressed volumes come back as one record holding the whole message stream.
+    """
+    position = VOLUME_HEADER.size
+    if data[position + CONTROL_WORD.size:position + CONTROL_WORD.size + 3] != BZIP2_MAGIC:
+        return [data[position:]], 'none'
+
+    records = []
+    while position + CONTROL_WORD.size <= len(data):
+        size = abs(CONTROL_WORD.unpack_from(data, position)[0])
+        position += CONTROL_WORD.size
+        if size == 0:
+            break
+        records.append(data[position:position + size])
+        position += size
+    return records, 'bzip2'
+
+
+def _moment(message: bytes, pointer: int) -> Tuple[str, Tuple[float, float, float, float, np.ndarray]]:
+    """Name and (first gate m, gate spacing m, scale, offset, raw codes) of one moment block"""
+    (_, name, _, gates, first_gate, spacing, _, _, _, word_size,
+     scale, offset) = MOMENT_HEADER.unpack_from(message, pointer)
+    dtype = '>u2' if word_size == 16 else 'u1'
+    raw = np.frombuffer(message, dtype=dtype, count=gates, offset=pointer + MOMENT_HEADER.size)
+    return MOMENTS[name], (float(first_gate), float(spacing), scale, offset, raw)
+
+
+def _stack(rows: List[np.ndarray]) -> np.ndarray:
+    """(len(rows), longest) array of 1-D rows, padded with 0 (below threshold)"""
+    gates = max((len(row) for row in rows), default=0)
+    dtype = np.result_type(np.uint8, *(row.dtype.newbyteorder('=') for row in rows))
+    stacked = np.zeros((len(rows), gates), dtype=dtype)
+    for index, row in enumerate(rows):
+        stacked[index, :len(row)] = row
+    return stacked
+
+
+def moment_values(scale: np.ndarray, offset: np.ndarray, codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Physical values (NaN below threshold or range folded) and range-folded mask of raw codes"""
+    values = (codes.astype(np.float32) - offset[:, None]) / scale[:, None]
+    values[codes <= RAW_RANGE_FOLDED] = np.nan
+    return values, codes == RAW_RANGE_FOLDED
+
+
+def decode_record(record: bytes) -> RecordRadials:
+    """Decompress one LDM record and parse its message 31 radials
+
+    Module-level so ProcessPoolExecutor can pickle it.
+    """
+    if record.startswith(BZIP2_MAGIC):
+        record = bz2.decompress(record)
+
+    radials = {key: [] for key in RecordRadials._fields if key not in ('site', 'moments')}
+    moment_rows = {name: ([], [], [], [], []) for name in MOMENTS.values()}
+    no_moment = (0.0, 0.0, 1.0, 0.0, np.empty(0, np.uint8))
+    site = None
+    position = 0
+    while position + CTM_HEADER_SIZE + MESSAGE_HEADER.size <= len(record):
+        size, _, message_type = MESSAGE_HEADER.unpack_from(record, position + CTM_HEADER_SIZE)[:3]
+        if message_type != DIGITAL_RADAR_DATA or size == 0:
+            position += FRAME_SIZE
+            continue
+        start = position + CTM_HEADER_SIZE + MESSAGE_HEADER.size
+        message = record[start:position + CTM_HEADER_SIZE + 2 * size]
+        position += CTM_HEADER_SIZE + 2 * size
+
+        (_, collect_ms, julian_date, azimuth_number, azimuth, _, _, _, _, _, elevation_number, _,
+         elevation, _, _, block_count) = MSG31_HEADER.unpack_from(message)
+        pointers = struct.unpack_from(f'>{block_count}I', message, MSG31_HEADER.size)
+        found = {}
+        nyquist, unambiguous = np.nan, np.nan
+        for pointer in pointers:
+            name = message[pointer + 1:pointer + 4] if pointer else b''
+            if name == b'VOL' and site is None:
+                _, _, _, _, _, latitude, longitude, height, feedhorn = VOLUME_BLOCK.unpack_from(message, pointer)
+                vcp = struct.unpack_from('>H', message, pointer + 40)[0]
+                site = (latitude, longitude, float(height + feedhorn), vcp)
+            elif name == b'RAD':
+                _, _, _, range_tenths_km, _, _, nyquist_hundredths, _ = RADIAL_BLOCK.unpack_from(message, pointer)
+                nyquist, unambiguous = nyquist_hundredths * 0.01, range_tenths_km * 100.0
+            elif name in MOMENTS:
+                key, moment = _moment(message, pointer)
+                found[key] = moment
+
+        radials['azimuth'].append(azimuth)
+        radials['azimuth_number'].append(azimuth_number)
+        radials['elevation'].append(elevation)
+        radials['elevation_number'].append(elevation_number)
+        radials['time_ms'].append((julian_date - 1) * 86_400_000 + collect_ms)
+        radials['nyquist_ms'].append(nyquist)
+        radials['unambiguous_range_m'].append(unambiguous)
+        for key, columns in moment_rows.items():
+            for column, value in zip(columns, found.get(key, no_moment)):
+                column.append(value)
+
+    moments = {
+        key: (np.array(first_gates), np.array(spacings), np.array(scales, dtype=np.float32),
+              np.array(offsets, dtype=np.float32), _stack(codes))
+        for key, (first_gates, spacings, scales, offsets, codes) in moment_rows.items()
+    }
+    return RecordRadials(
+        azimuth=np.array(radials['azimuth'], dtype=np.float32),
+        azimuth_number=np.array(radials['azimuth_number'], dtype=np.int32),
+        elevation=np.array(radials['elevation'], dtype=np.float32),
+        elevation_number=np.array(radials['elevation_number'], dtype=np.int32),
+        time_ms=np.array(radials['time_ms'], dtype=np.int64),
+        nyquist_ms=np.array(radials['nyquist_ms'], dtype=np.float32),
+        unambiguous_range_m=np.array(radials['unambiguous_range_m'], dtype=np.float32),
+        site=site,
+        moments=moments
+    )
+
+
+def _decode_record_or_error(record: bytes):
+    try:
+        return decode_record(record)
+    except Exception as e:
+        return e
+
+
+def gate_locations(latitude: float, longitude: float, height_m: float, azimuth: np.ndarray,
+                   elevation: np.ndarray, ranges_m: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Latitude, longitude and height (m above sea level) of gates
+
+    azimuth/elevation (degrees) and ranges_m broadcast against each other. Beam
+    height uses the 4/3 effective earth radius; ground distance is placed with
+    an azimuthal equidistant projection centred on the radar.
+    """
+    elevation = np.radians(elevation)
+    azimuth = np.radians(azimuth)
+    radius = EFFECTIVE_EARTH_RADIUS_M
+    height = np.sqrt(ranges_m ** 2 + radius ** 2 + 2.0 * ranges_m * radius * np.sin(elevation)) - radius
+    ground = radius * np.arcsin(ranges_m * np.cos(elevation) / (radius + height))
+    x, y = ground * np.sin(azimuth), ground * np.cos(azimuth)
+
+    lat0, lon0 = np.radians(latitude), np.radians(longitude)
+    rho = np.hypot(x, y)
+    c = rho / EARTH_RADIUS_M
+    with np.errstate(invalid='ignore', divide='ignore'):
+        lat = np.arcsin(np.cos(c) * np.sin(lat0) + np.where(rho > 0, y * np.sin(c) * np.cos(lat0) / rho, 0.0))
+    lon = lon0 + np.arctan2(x * np.sin(c), rho * np.cos(lat0) * np.cos(c) - y * np.sin(lat0) * np.sin(c))
+    return np.degrees(lat), (np.degrees(lon) + 180.0) % 360.0 - 180.0, height + height_m
+
+
+class Sweep(NamedTuple):
+    """One elevation cut: moments on a common range-gate axis, (radials, gates), NaN where no data"""
+    elevation_number: int
+    azimuth: np.ndarray
+    azimuth_number: np.ndarray
+    elevation: np.ndarray
+    times: np.ndarray
+    ranges_m: np.ndarray
+    moments: Dict[str, np.ndarray]
+    range_folded: np.ndarray
+    nyquist_ms: np.ndarray
+    prf_hz: np.ndarray
+
+
+class Level2Volume:
+    """A decoded volume: header, radar site and every message 31 radial"""
+
+    def __init__(self, header: VolumeHeader, records: List[RecordRadials], compression_type: str,
+                 records_total: int, duration_seconds: float):
+        self.header = header
+        self.compression_type = compression_type
+        self.records_total = records_total
+        self.records_decoded = len(records)
+        self.duration_seconds = duration_seconds
+        site = next((record.site for record in records if record.site is not None), None)
+        if site is None:
+            raise NexradDecodeError(f"{header.site_id}: no volume data block with the radar location")
+        self.latitude, self.longitude, self.height_m, self.vcp = site
+        records = [record for record in records if len(record.azimuth)]
+        if not records:
+            raise NexradDecodeError(f"{header.site_id}: no message 31 radials (pre-2008 volumes are not supported)")
+
+        def join(field: str) -> np.ndarray:
+            return np.concatenate([getattr(record, field) for record in records])
+
+        self.azimuth = join('azimuth')
+        self.azimuth_number = join('azimuth_number')
+        self.elevation = join('elevation')
+        self.elevation_number = join('elevation_number')
+        self.times = join('time_ms').astype('datetime64[ms]')
+        self.nyquist_ms = join('nyquist_ms')
+        self.unambiguous_range_m = join('unambiguous_range_m')
+        # key -> (first gate m, gate spacing m, values, range-folded mask), per radial
+        self.moments = {}
+        for key in MOMENTS.values():
+            parts = [record.moments[key] for record in records]
+            first_gates, spacings, scales, offsets = (np.concatenate([part[field] for part in parts])
+                                                      for field in range(4))
+            gates = max(part[4].shape[1] for part in parts)
+            codes = np.concatenate([np.pad(part[4], ((0, 0), (0, gates - part[4].shape[1]))) for part in parts])
+            self.moments[key] = (first_gates, spacings, *moment_values(scales, offsets, codes))
+
+    @property
+    def decompression_status(self) -> str:
+        return 'Success' if self.records_decoded == self.records_total else 'Partial'
+
+    @property
+    def radials(self) -> int:
+        return len(self.azimuth)
+
+    def sweeps(self) -> Iterator[Sweep]:
+        """Elevation cuts in scan order
+
+        Gates follow reflectivity's range axis where the cut has reflectivity,
+        otherwise velocity's; the other moments are mapped to the nearest gate.
+        Split cuts (surveillance then Doppler at one angle) are separate sweeps.
+        """
+        for number in dict.fromkeys(self.elevation_number.tolist()):
+            radials = np.flatnonzero(self.elevation_number == number)
+            base = next((key for key in ('reflectivity', 'velocity')
+                         if (self.moments[key][1][radials] > 0).any()), None)
+            if base is None:
+                continue
+            first_gates, spacings, values, _ = self.moments[base]
+            with_data = radials[spacings[radials] > 0]
+            first_gate, spacing = first_gates[with_data[0]], spacings[with_data[0]]
+            gates = values.shape[1]
+            ranges = first_gate + spacing * np.arange(gates)
+
+            moments, folded = {}, np.zeros((len(radials), gates), dtype=bool)
+            for key, (source_firsts, source_spacings, source_values, source_folded) in self.moments.items():
+                moment_radials = radials[source_spacings[radials] > 0]
+                if not len(moment_radials):
+                    moments[key] = np.full((len(radials), gates), np.nan, dtype=np.float32)
+                    continue
+                source_first, source_spacing = source_firsts[moment_radials[0]], source_spacings[moment_radials[0]]
+                index = np.rint((ranges - source_first) / source_spacing).astype(np.int64)
+                inside = (index >= 0) & (index < source_values.shape[1])
+                mapped = np.full((len(radials), gates), np.nan, dtype=np.float32)
+                mapped[:, inside] = source_values[radials][:, index[inside]]
+                moments[key] = mapped
+                if key == 'velocity':
+                    folded[:, inside] = source_folded[radials][:, index[inside]]
+
+            unambiguous = self.unambiguous_range_m[radials]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                prf = np.rint(SPEED_OF_LIGHT_MS / (2.0 * unambiguous))
+            yield Sweep(number, self.azimuth[radials], self.azimuth_number[radials], self.elevation[radials],
+                        self.times[radials], ranges, moments, folded, self.nyquist_ms[radials], prf)
+
+    def gate_locations(self, sweep: Sweep, radials: np.ndarray, gates: np.ndarray):
+        """Latitude, longitude, height of (radial, gate) index pairs of a sweep"""
+        return gate_locations(self.latitude, self.longitude, self.height_m, sweep.azimuth[radials],
+                              sweep.elevation[radials], sweep.ranges_m[gates])
+
+
+class Level2Decoder:
+    """Decodes Archive II volumes, decompressing records on a shared process pool
+
+    Use as a context manager so the pool is shut down; workers=1 decodes in
+    process.
+    """
+
+    def __init__(self, workers: int = DECODE_WORKERS):
+        self.workers = workers
+        self._pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def decode(self, data: bytes) -> Level2Volume:
+        start = time.time()
+        outer = ''
+        if data.startswith(GZIP_MAGIC):
+            data, outer = gzip.decompress(data), 'gzip+'
+        header = parse_volume_header(data)
+        records, compression = split_records(data)
+        if self._pool is not None and len(records) > 1:
+            decoded = list(self._pool.map(_decode_record_or_error, records, chunksize=4))
+        else:
+            decoded = [_decode_record_or_error(record) for record in records]
+
+        failures = [result for result in decoded if isinstance(result, Exception)]
+        if failures:
+            logger.warning(f"{header.site_id} {header.volume_time:%Y-%m-%d %H:%M:%S}: "
+                           f"{len(failures)} of {len(records)} records failed to decode ({failures[0]})")
+        radials = [result for result in decoded if not isinstance(result, Exception)]
+        if not radials:
+            raise NexradDecodeError(f"{header.site_id}: no decodable records")
+        return Level2Volume(header, radials, outer + compression, len(records), time.time() - start)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _where_text(condition: List[bool], values: List[bytes], otherwise: bytes) -> EncodedColumn:
+    """Encoded text column taking values where condition holds and the pre-encoded otherwise elsewhere"""
+    return EncodedColumn(len(condition), values=[value if keep else otherwise
+                                                 for value, keep in zip(values, condition)])
+
+
+class NexradLevel2Loader:
+    """Turns decoded volumes into nexrad_level2_data rows and loads them with binary COPY
+
+    One row per gate with reflectivity or velocity; spectrum width rides along.
+    Gates below min_reflectivity dBZ keep their row only if they have velocity.
+    """
+
+    def __init__(self, block_rows: int = BLOCK_ROWS, min_reflectivity: Optional[float] = None):
+        self.block_rows = block_rows
+        self.min_reflectivity = min_reflectivity
+        self.encoder = BinaryCopyEncoder('nexrad_level2_data')
+        self.rows = 0
+        self.blocks = 0
+
+    def sweep_rows(self, volume: Level2Volume, sweep: Sweep) -> Dict[str, np.ndarray]:
+        """Flat per-row arrays of a sweep's valid gates"""
+        reflectivity = sweep.moments['reflectivity']
+        if self.min_reflectivity is not None:
+            reflectivity = np.where(reflectivity >= self.min_reflectivity, reflectivity, np.nan)
+        valid = np.isfinite(reflectivity) | np.isfinite(sweep.moments['velocity'])
+        radials, gates = np.nonzero(valid)
+        latitudes, longitudes, _ = volume.gate_locations(sweep, radials, gates)
+        return {
+            'radials': radials,
+            'gates': gates,
+            'latitudes': latitudes,
+            'longitudes': longitudes,
+            'reflectivity': reflectivity[radials, gates],
+            'velocity': sweep.moments['velocity'][radials, gates],
+            'spectrum_width': sweep.moments['spectrum_width'][radials, gates],
+            'range_folded': sweep.range_folded[radials, gates]
+        }
+
+    def blocks_for(self, volume: Level2Volume, source_file: str, bucket: Optional[str] = None,
+                   key: Optional[str] = None) -> Iterator[bytes]:
+        """Encoded nexrad_level2_data rows of one volume"""
+        sweeps = [(sweep, self.sweep_rows(volume, sweep)) for sweep in volume.sweeps()]
+        sweeps = [(sweep, rows) for sweep, rows in sweeps if len(rows['radials'])]
+        if not sweeps:
+            return
+        latitudes = np.concatenate([rows['latitudes'] for _, rows in sweeps])
+        longitudes = np.concatenate([rows['longitudes'] for _, rows in sweeps])
+        extent = (float(longitudes.min()), float(latitudes.min()), float(longitudes.max()), float(latitudes.max()))
+        header = volume.header
+        constants = {
+            'site_id': header.site_id,
+            'volume_scan_number': header.volume_number,
+            'source_file': source_file,
+            'aws_bucket': bucket,
+            'aws_key': key,
+            'file_format': 'Level2',
+            'compression_type': volume.compression_type,
+            'decompression_status': volume.decompression_status,
+            'sweep_mode': 'PPI',
+            'spatial_extent_west': extent[0],
+            'spatial_extent_south': extent[1],
+            'spatial_extent_east': extent[2],
+            'spatial_extent_north': extent[3],
+            'processing_duration_seconds': int(round(volume.duration_seconds)),
+            'records_processed': volume.records_decoded
+        }
+        for sweep, rows in sweeps:
+            prefix = f"{header.site_id}-{header.volume_time:%Y%m%d%H%M%S}-e{sweep.elevation_number:02d}-"
+            for start in range(0, len(rows['radials']), self.block_rows):
+                stop = min(start + self.block_rows, len(rows['radials']))
+                yield self._encode_block(sweep, rows, start, stop, prefix, constants)
+
+    def _encode_block(self, sweep: Sweep, rows: Dict[str, np.ndarray], start: int, stop: int,
+                      id_prefix: str, constants: Dict) -> bytes:
+        radials, gates = rows['radials'][start:stop], rows['gates'][start:stop]
+        prf = sweep.prf_hz[radials]
+        reflectivity, velocity = rows['reflectivity'][start:stop], rows['velocity'][start:stop]
+        has_reflectivity, has_velocity = np.isfinite(reflectivity).tolist(), np.isfinite(velocity).tolist()
+        points = encode_text([generate_geography_wkt(lat, lon) for lat, lon in
+                              zip(rows['latitudes'][start:stop].tolist(), rows['longitudes'][start:stop].tolist())])
+        block = dict(constants)
+        block.update({
+            'radar_data_id': encode_prefixed_text(id_prefix, [
+                f"{azimuth:03d}-{gate:04d}".encode('ascii')
+                for azimuth, gate in zip(sweep.azimuth_number[radials].tolist(), gates.tolist())
+            ]),
+            'scan_time': sweep.times[radials],
+            'elevation_angle': sweep.elevation[radials],
+            'azimuth_angle': sweep.azimuth[radials],
+            'range_gate': gates,
+            'range_km': sweep.ranges_m[gates] / 1000.0,
+            'reflectivity_dbz': reflectivity,
+            'reflectivity_geom': _where_text(has_reflectivity, points.values, NULL_LENGTH),
+            'radial_velocity_ms': velocity,
+            'velocity_geom': _where_text(has_velocity, points.values, NULL_LENGTH),
+            'spectrum_width_ms': rows['spectrum_width'][start:stop],
+            'data_quality_flag': np.where(rows['range_folded'][start:stop], QUALITY_RANGE_FOLDED, 0),
+            'data_type': _where_text(has_reflectivity, [DATA_TYPES[0]] * len(has_reflectivity), DATA_TYPES[1]),
+            'pulse_repetition_frequency': np.ma.masked_array(np.nan_to_num(prf).astype(np.int64), np.isnan(prf)),
+            'nyquist_velocity_ms': sweep.nyquist_ms[radials]
+        })
+        self.rows += stop - start
+        self.blocks += 1
+        return self.encoder.encode(block, stop - start)
+
+    def load(self, conn, volumes: Iterable[Tuple[Level2Volume, str, Optional[str], Optional[str]]]) -> int:
+        """COPY every (volume, source_file, bucket, key), one transaction per volume; returns rows"""
+        start_rows = self.rows
+        for volume, source_file, bucket, key in volumes:
+            try:
+                copy_binary(conn, self.encoder, self.blocks_for(volume, source_file, bucket, key))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return self.rows - start_rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Decode NEXRAD Level II volumes and load them into '
+                                                 'nexrad_level2_data')
+    parser.add_argument('files', nargs='+', type=Path, help='Archive II volume files (optionally gzipped)')
+    parser.add_argument('--workers', type=int, default=DECODE_WORKERS,
+                        help=f'Processes decompressing records (default: {DECODE_WORKERS})')
+    parser.add_argument('--min-dbz', type=float,
+                        help='Drop reflectivity below this dBZ (gates with velocity keep their row)')
+    parser.add_argument('--load', action='store_true', help='COPY the rows into PostgreSQL')
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args()
+    loader = NexradLevel2Loader(min_reflectivity=args.min_dbz)
+
+    conn = None
+    if args.load:
+        conn = get_postgres_connection()
+        if conn is None:
+            logger.error("PostgreSQL connection failed")
+            sys.exit(1)
+
+    start = time.time()
+    try:
+        with Level2Decoder(args.workers) as decoder:
+            for path in args.files:
+                volume = decoder.decode(path.read_bytes())
+                logger.info(f"{path.name}: {volume.header.site_id} {volume.header.volume_time:%Y-%m-%d %H:%M:%S}, "
+                            f"VCP {volume.vcp}, {volume.radials:,} radials from {volume.records_decoded} of "
+                            f"{volume.records_total} records in {volume.duration_seconds:.2f}s")
+                if conn:
+                    loader.load(conn, [(volume, path.name, None, None)])
+                else:
+                    for _ in loader.blocks_for(volume, path.name):
+                        pass
+    finally:
+        if conn:
+            conn.close()
+    elapsed = time.time() - start
+
+    action = 'Loaded' if args.load else 'Decoded'
+    logger.info(f"{action} {loader.rows:,} nexrad_level2_data rows from {len(args.files)} volumes "
+                f"in {elapsed:.2f}s ({loader.rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+NWS alert parsing for weather_alerts
+Turns /alerts GeoJSON features into weather_alerts records: times in UTC, the
+alert polygon as WKT, and its bounding box in the bbox_* columns so joins to
+boundaries and policy areas can discard non-overlapping pairs with four
+numeric comparisons before any exact geometry test. Zone-based alerts come
+without a polygon and keep NULL geometry and bbox; they join by geocode.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from nws_gridpoints import polygon_bounds
+
+# Alerts per /alerts page (the API maximum)
+ALERTS_PAGE_LIMIT = 500
+
+
+def utc_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """ISO 8601 with offset -> naive UTC, as the TIMESTAMP columns store it"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _ring_wkt(ring: Iterable) -> str:
+    return f"({', '.join(f'{point[0]} {point[1]}' for point in ring)})"
+
+
+def geometry_wkt(geometry: Optional[Dict]) -> Optional[str]:
+    """WKT of a GeoJSON Polygon or MultiPolygon"""
+    if not geometry or not geometry.get('coordinates'):
+        return None
+    if geometry.get('type') == 'Polygon':
+        return f"POLYGON({', '.join(_ring_wkt(ring) for ring in geometry['coordinates'])})"
+    if geometry.get('type') == 'MultiPolygon':
+        polygons = (f"({', '.join(_ring_wkt(ring) for ring in polygon)})" for polygon in geometry['coordinates'])
+        return f"MULTIPOLYGON({', '.join(polygons)})"
+    return None
+
+
+def alert_record(feature: Dict) -> Dict:
+    """weather_alerts row for an /alerts feature"""
+    props = feature.get('properties') or {}
+    geometry = feature.get('geometry')
+    geocode = props.get('geocode') or {}
+    ugc = geocode.get('UGC') or []
+    same = geocode.get('SAME') or []
+    awips = (props.get('parameters') or {}).get('AWIPSidentifier') or []
+    west, south, east, north = polygon_bounds(geometry) or (None, None, None, None)
+
+    return {
+        'alert_id': props.get('id') or feature.get('id'),
+        'event_type': props.get('event'),
+        'severity': props.get('severity'),
+        'urgency': props.get('urgency'),
+        'certainty': props.get('certainty'),
+        'headline': (props.get('headline') or '')[:500],
+        'description': props.get('description'),
+        'instruction': props.get('instruction'),
+        'effective_time': utc_timestamp(props.get('effective')),
+        'expires_time': utc_timestamp(props.get('expires')),
+        'onset_time': utc_timestamp(props.get('onset')),
+        'ends_time': utc_timestamp(props.get('ends')),
+        'area_description': (props.get('areaDesc') or '')[:1000],
+        'geocode_type': 'UGC' if ugc else None,
+        'geocode_value': ugc[0] if ugc else None,
+        'state_code': ugc[0][:2] if ugc else None,
+        # SAME codes are 0 + state FIPS + county FIPS
+        'county_code': same[0][1:] if same and len(same[0]) == 6 else None,
+        # AWIPS identifiers are product category + issuing office, e.g. SVSOKX
+        'cwa_code': awips[0][3:] if awips and len(awips[0]) == 6 else None,
+        'alert_geometry': geometry_wkt(geometry),
+        'alert_sent': utc_timestamp(props.get('sent')),
+        'bbox_west': west,
+        'bbox_south': south,
+        'bbox_east': east,
+        'bbox_north': north
+    }
+
+
+def latest_sent(features: List[Dict]) -> Optional[Tuple[str, List[str]]]:
+    """(sent, alert ids sent then) of the most recently sent features; None without any"""
+    stamped = [
+        (utc_timestamp(f['properties']['sent']), f['properties']['sent'], f['properties']['id'])
+        for f in features
+        if (f.get('properties') or {}).get('sent') and f['properties'].get('id')
+    ]
+    if not stamped:
+        return None
+    newest = max(stamp for stamp, _, _ in stamped)
+    sent = next(text for stamp, text, _ in stamped if stamp == newest)
+    return sent, sorted(alert_id for stamp, _, alert_id in stamped if stamp == newest)
+
+
+def unseen_alerts(features: List[Dict], watermark: Optional[Tuple[str, List[str]]]) -> List[Dict]:
+    """features minus the ones a poll from watermark already loaded
+
+    A poll from the watermark time returns the alerts sent at that time again;
+    those whose ids the watermark records are dropped, so only new alerts and
+    new versions get through.
+    """
+    if not watermark:
+        return list(features)
+    last_sent, seen_ids = utc_timestamp(watermark[0]), set(watermark[1])
+    return [
+        feature for feature in features
+        if not (utc_timestamp((feature.get('properties') or {}).get('sent')) == last_sent
+                and (feature.get('properties') or {}).get('id') in seen_ids)
+    ]
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Staged bulk upserts for NWS API records (PostgreSQL)
+Parsed records are validated against the target column types in Python, the
+valid ones are COPYed into a temporary staging table, and one
+INSERT ... SELECT ... ON CONFLICT statement merges them into the target table.
+Records that fail validation (or, if the merge itself fails, the records that
+fail on their own) are written to nws_ingest_rejects with the reason, so one
+bad observation no longer costs the rest of the batch. An optional
+measurement that cannot be stored (out of range for its NUMERIC column) is
+loaded as NULL and counted, rather than rejecting the whole record.
+"""
+
+import io
+import json
+import re
+from datetime import date, datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from generate_large_dataset import COPY_ESCAPES
+
+# Records per staging COPY + merge transaction
+BULK_BATCH_ROWS = 50_000
+
+REJECTS_TABLE = 'nws_ingest_rejects'
+
+REJECTS_DDL = f"""
+CREATE TABLE IF NOT EXISTS {REJECTS_TABLE} (
+    reject_id BIGSERIAL PRIMARY KEY,
+    target_table VARCHAR(100) NOT NULL,
+    record_key VARCHAR(255),
+    reason TEXT NOT NULL,
+    record JSONB,
+    rejected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+VARCHAR_PATTERN = re.compile(r'varchar\((\d+)\)')
+NUMERIC_PATTERN = re.compile(r'numeric\((\d+),\s*(\d+)\)')
+
+
+class BulkTable(NamedTuple):
+    """Target table: (column, type, nullable) in schema order, conflict key, and the ON CONFLICT action"""
+    columns: List[Tuple[str, str, bool]]
+    key: List[str]
+    conflict_action: str
+
+
+# Types follow schema_postgresql.sql
+BULK_TABLES = {
+    'weather_stations': BulkTable(
+        columns=[
+            ('station_id', 'varchar(50)', False),
+            ('station_name', 'varchar(255)', True),
+            ('station_latitude', 'numeric(10,7)', False),
+            ('station_longitude', 'numeric(10,7)', False),
+            ('state_code', 'varchar(2)', True),
+            ('cwa_code', 'varchar(10)', True),
+            ('station_type', 'varchar(50)', True),
+            ('active_status', 'boolean', True),
+            ('first_observation_date', 'date', True),
+            ('last_observation_date', 'date', True),
+            ('update_frequency_minutes', 'integer', True)
+        ],
+        key=['station_id'],
+        conflict_action="""DO UPDATE SET
+            station_name = EXCLUDED.station_name,
+            station_latitude = EXCLUDED.station_latitude,
+            station_longitude = EXCLUDED.station_longitude,
+            last_observation_date = EXCLUDED.last_observation_date"""
+    ),
+    'weather_observations': BulkTable(
+        columns=[
+            ('observation_id', 'varchar(255)', False),
+            ('station_id', 'varchar(50)', False),
+            ('station_name', 'varchar(255)', True),
+            ('observation_time', 'timestamp', False),
+            ('station_latitude', 'numeric(10,7)', False),
+            ('station_longitude', 'numeric(10,7)', False),
+            ('temperature', 'numeric(6,2)', True),
+            ('dewpoint', 'numeric(6,2)', True),
+            ('humidity', 'numeric(5,2)', True),
+            ('wind_speed', 'numeric(6,2)', True),
+            ('wind_direction', 'integer', True),
+            ('pressure', 'numeric(8,2)', True),
+            ('visibility', 'numeric(6,2)', True),
+            ('sky_cover', 'varchar(50)', True),
+            ('precipitation_amount', 'numeric(8,2)', True),
+            ('data_freshness_minutes', 'integer', True),
+            ('load_timestamp', 'timestamp', True),
+            ('data_source', 'varchar(50)', True)
+        ],
+        key=['observation_id'],
+        conflict_action='DO NOTHING'
+    ),
+    # Gridpoint forecasts (nws_gridpoints.forecast_records)
+    'grib2_forecasts': BulkTable(
+        columns=[
+            ('forecast_id', 'varchar(255)', False),
+            ('parameter_name', 'varchar(100)', False),
+            ('forecast_time', 'timestamp', False),
+            ('grid_cell_latitude', 'numeric(10,7)', False),
+            ('grid_cell_longitude', 'numeric(10,7)', False),
+            ('parameter_value', 'numeric(10,2)', True),
+            ('source_file', 'varchar(500)', True),
+            ('source_crs', 'varchar(50)', True),
+            ('target_crs', 'varchar(50)', True),
+            ('spatial_extent_west', 'numeric(10,6)', True),
+            ('spatial_extent_south', 'numeric(10,6)', True),
+            ('spatial_extent_east', 'numeric(10,6)', True),
+            ('spatial_extent_north', 'numeric(10,6)', True),
+            ('transformation_status', 'varchar(50)', True)
+        ],
+        key=['forecast_id'],
+        conflict_action='DO UPDATE SET parameter_value = EXCLUDED.parameter_value'
+    ),
+    # NWS alerts (nws_alerts.alert_record); bbox and alert_sent come from schema_extensions
+    'weather_alerts': BulkTable(
+        columns=[
+            ('alert_id', 'varchar(255)', False),
+            ('event_type', 'varchar(100)', False),
+            ('severity', 'varchar(50)', True),
+            ('urgency', 'varchar(50)', True),
+            ('certainty', 'varchar(50)', True),
+            ('headline', 'varchar(500)', True),
+            ('description', 'text', True),
+            ('instruction', 'text', True),
+            ('effective_time', 'timestamp', True),
+            ('expires_time', 'timestamp', True),
+            ('onset_time', 'timestamp', True),
+            ('ends_time', 'timestamp', True),
+            ('area_description', 'varchar(1000)', True),
+            ('geocode_type', 'varchar(50)', True),
+            ('geocode_value', 'varchar(100)', True),
+            ('state_code', 'varchar(2)', True),
+            ('county_code', 'varchar(5)', True),
+            ('cwa_code', 'varchar(10)', True),
+            ('alert_geometry', 'text', True),
+            ('alert_sent', 'timestamp', True),
+            ('bbox_west', 'numeric(10,6)', True),
+            ('bbox_south', 'numeric(10,6)', True),
+            ('bbox_east', 'numeric(10,6)', True),
+            ('bbox_north', 'numeric(10,6)', True)
+        ],
+        key=['alert_id'],
+        # Only a newer version of an alert replaces the stored row
+        conflict_action='DO UPDATE SET ' + ', '.join(
+            f"{name} = EXCLUDED.{name}"
+            for name in ['event_type', 'severity', 'urgency', 'certainty', 'headline', 'description',
+                         'instruction', 'effective_time', 'expires_time', 'onset_time', 'ends_time',
+                         'area_description', 'geocode_type', 'geocode_value', 'state_code', 'county_code',
+                         'cwa_code', 'alert_geometry', 'alert_sent', 'bbox_west', 'bbox_south', 'bbox_east',
+                         'bbox_north']
+        ) + ', ingestion_timestamp = CURRENT_TIMESTAMP '
+            'WHERE EXCLUDED.alert_sent > weather_alerts.alert_sent OR weather_alerts.alert_sent IS NULL'
+    )
+}
+
+
+class BulkUpsertResult(NamedTuple):
+    records: int
+    merged: int
+    rejected: int
+    # Optional measurements stored as NULL because they were out of range, by column
+    nulled: Dict[str, int]
+
+
+def copy_text_value(value, column_type: str) -> str:
+    """One already-validated value in COPY text format"""
+    if value is None:
+        return '\\N'
+    if column_type == 'boolean':
+        return 't' if value else 'f'
+    if column_type in ('timestamp', 'date'):
+        return value.isoformat()
+    return str(value).translate(COPY_ESCAPES)
+
+
+def validate_value(value, column_type: str, nullable: bool):
+    """value converted to what column_type accepts; raises ValueError if it cannot be stored"""
+    if value is None or value == '':
+        if not nullable:
+            raise ValueError("missing required value")
+        return None
+    match = VARCHAR_PATTERN.fullmatch(column_type)
+    if match:
+        value = str(value)
+        if len(value) > int(match.group(1)):
+            raise ValueError(f"longer than {match.group(1)} characters")
+        return value
+    match = NUMERIC_PATTERN.fullmatch(column_type)
+    if match:
+        precision, scale = int(match.group(1)), int(match.group(2))
+        try:
+            number = round(Decimal(str(value)), scale)
+        except InvalidOperation:
+            raise ValueError(f"not a number: {value!r}")
+        if not number.is_finite() or abs(number) >= Decimal(10) ** (precision - scale):
+            raise ValueError(f"{value} out of range for {column_type}")
+        return number
+    if column_type == 'integer':
+        number = float(value)
+        if number != number or abs(number) >= 2 ** 31:
+            raise ValueError(f"{value} out of range for integer")
+        return int(round(number))
+    if column_type == 'timestamp':
+        if not isinstance(value, datetime):
+            value = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        # TIMESTAMP columns hold naive UTC; COPY would drop an offset and a bound parameter would apply it
+        return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+    if column_type == 'date':
+        return value if isinstance(value, date) else date.fromisoformat(str(value))
+    if column_type == 'boolean':
+        return bool(value)
+    return str(value)
+
+
+def is_measurement(column_type: str) -> bool:
+    return column_type == 'integer' or NUMERIC_PATTERN.fullmatch(column_type) is not None
+
+
+def validate_record(table: str, record: Dict,
+                    nulled: Optional[Dict[str, int]] = None) -> Tuple[Optional[List], Optional[str]]:
+    """(values in BULK_TABLES[table] column order, None) or (None, reason)
+
+    A nullable numeric column whose value cannot be stored becomes NULL
+    instead; nulled counts those by column.
+    """
+    values = []
+    for name, column_type, nullable in BULK_TABLES[table].columns:
+        try:
+            values.append(validate_value(record.get(name), column_type, nullable))
+        except (TypeError, ValueError) as e:
+            if not (nullable and is_measurement(column_type)):
+                return None, f"{name}: {e}"
+            values.append(None)
+            if nulled is not None:
+                nulled[name] = nulled.get(name, 0) + 1
+    return values, None
+
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else str(value)
+
+
+class NWSBulkLoader:
+    """COPY-to-staging-table upserts into the BULK_TABLES targets, with a reject side table"""
+
+    def __init__(self, conn, batch_rows: int = BULK_BATCH_ROWS):
+        self.conn = conn
+        self.batch_rows = batch_rows
+        self._rejects_ready = False
+
+    def _ensure_rejects_table(self, cursor):
+        if not self._rejects_ready:
+            cursor.execute(REJECTS_DDL)
+            self._rejects_ready = True
+
+    def upsert(self, table: str, records: Iterable[Dict],
+               accepted: Optional[List[Dict]] = None) -> BulkUpsertResult:
+        """Validate, stage and merge records in batches of batch_rows
+
+        A record repeated within a batch keeps its last occurrence. accepted,
+        if given, receives every record that is committed to the table
+        (inserted, updated, or already there), i.e. all but the rejects.
+        """
+        spec = BULK_TABLES[table]
+        rejected: List[Tuple[Dict, str]] = []
+        nulled: Dict[str, int] = {}
+        total = merged = 0
+        batch: Dict[Tuple, Tuple[Dict, List]] = {}
+        for record in records:
+            total += 1
+            values, reason = validate_record(table, record, nulled)
+            if reason:
+                rejected.append((record, reason))
+                continue
+            batch[tuple(record[column] for column in spec.key)] = (record, values)
+            if len(batch) >= self.batch_rows:
+                merged += self._merge_batch(table, list(batch.values()), rejected, accepted)
+                batch = {}
+        if batch:
+            merged += self._merge_batch(table, list(batch.values()), rejected, accepted)
+        self._write_rejects(table, rejected)
+        return BulkUpsertResult(total, merged, len(rejected), nulled)
+
+    def _merge_batch(self, table: str, entries: List[Tuple[Dict, List]], rejected: List[Tuple[Dict, str]],
+                     accepted: Optional[List[Dict]]) -> int:
+        """Stage and merge one batch of (record, values) in a transaction; if that fails, retry them one by one"""
+        try:
+            merged = self._stage_and_merge(table, [values for _, values in entries])
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            return self._merge_rows(table, entries, rejected, accepted)
+        if accepted is not None:
+            accepted.extend(record for record, _ in entries)
+        return merged
+
+    def _stage_and_merge(self, table: str, rows: List[List]) -> int:
+        spec = BULK_TABLES[table]
+        names = [name for name, _, _ in spec.columns]
+        stage = f"{table}_stage"
+        payload = io.StringIO(''.join(
+            '\t'.join(copy_text_value(value, column_type) for value, (_, column_type, _) in zip(row, spec.columns))
+            + '\n'
+            for row in rows
+        ))
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {stage} (LIKE {table} INCLUDING DEFAULTS) "
+                           f"ON COMMIT DELETE ROWS")
+            cursor.copy_expert(f"COPY {stage} ({', '.join(names)}) FROM STDIN", payload)
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(names)}) SELECT {', '.join(names)} FROM {stage} "
+                f"ON CONFLICT ({', '.join(spec.key)}) {spec.conflict_action}"
+            )
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    def _merge_rows(self, table: str, entries: List[Tuple[Dict, List]], rejected: List[Tuple[Dict, str]],
+                    accepted: Optional[List[Dict]]) -> int:
+        """Row-at-a-time fallback under savepoints; rows the database refuses become rejects"""
+        spec = BULK_TABLES[table]
+        names = [name for name, _, _ in spec.columns]
+        sql = (f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join(['%s'] * len(names))}) "
+               f"ON CONFLICT ({', '.join(spec.key)}) {spec.conflict_action}")
+        merged = 0
+        cursor = self.conn.cursor()
+        try:
+            committed = []
+            for record, row in entries:
+                cursor.execute("SAVEPOINT bulk_row")
+                try:
+                    cursor.execute(sql, row)
+                    merged += cursor.rowcount
+                    cursor.execute("RELEASE SAVEPOINT bulk_row")
+                    committed.append(record)
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO SAVEPOINT bulk_row")
+                    rejected.append((dict(zip(names, row)), str(e).strip()))
+            self.conn.commit()
+        finally:
+            cursor.close()
+        if accepted is not None:
+            accepted.extend(committed)
+        return merged
+
+    def _write_rejects(self, table: str, rejected: List[Tuple[Dict, str]]):
+        if not rejected:
+            return
+        key = BULK_TABLES[table].key
+        rows = [
+            (table, '|'.join(str(record.get(column, '')) for column in key)[:255], reason,
+             json.dumps(record, default=_json_default))
+            for record, reason in rejected
+        ]
+        cursor = self.conn.cursor()
+        try:
+            self._ensure_rejects_table(cursor)
+            cursor.executemany(
+                f"INSERT INTO {REJECTS_TABLE} (target_table, record_key, reason, record) VALUES (%s, %s, %s, %s)",
+                rows
+            )
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            print(f"  ⚠️  Could not write {len(rows)} rejects to {REJECTS_TABLE}: {e}")
+        finally:
+            cursor.close()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Concurrent api.weather.gov client with token-bucket rate limiting
+Station and observation sweeps are thousands of small GETs. AsyncNWSClient runs
+them concurrently under one shared token bucket, so a sweep goes at the rate
+the API tolerates instead of a fixed sleep per request. A 429 pauses the whole
+bucket (honouring Retry-After) and halves its rate before retrying; successes
+win the rate back gradually. 5xx responses and network errors are retried with
+jittered backoff.
+
+Requests go through requests.Session objects (one per worker thread) built by
+a caller-supplied factory, so headers and any session-level caching apply to
+the concurrent path as they do to single calls.
+"""
+
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from async_s3 import backoff_delay
+from http_cache import already_applied
+
+# api.weather.gov does not publish its limit; sustained bursts above a few
+# requests per second per client draw 429s, so stay at 5/s with short bursts
+NWS_REQUESTS_PER_SECOND = 5.0
+NWS_BURST = 10
+NWS_CONCURRENCY = 8
+
+MAX_ATTEMPTS = 5
+REQUEST_TIMEOUT = 10
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Wait after a 429 without a usable Retry-After header
+DEFAULT_THROTTLE_SECONDS = 5.0
+
+# A 429 halves the rate down to this floor; each success adds the step back
+MIN_REQUESTS_PER_SECOND = 0.5
+RATE_RECOVERY_STEP = 0.1
+
+
+class TokenBucket:
+    """Shared asyncio rate limiter: rate tokens per second, up to burst saved up
+
+    throttle() empties the bucket, holds every caller until the deadline and
+    halves the rate, which is how a 429 slows the whole sweep rather than one
+    request; each success wins back a little rate, up to max_rate (AIMD).
+    """
+
+    def __init__(self, rate: float = NWS_REQUESTS_PER_SECOND, burst: int = NWS_BURST):
+        self.rate = rate
+        self.max_rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+    def throttle(self, seconds: float):
+        now = time.monotonic()
+        if now >= self._paused_until:
+            # 429s from requests already in flight belong to the same overload; halve once
+            self.rate = max(MIN_REQUESTS_PER_SECOND, self.rate / 2.0)
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0.0
+
+    def succeeded(self):
+        self.rate = min(self.max_rate, self.rate + RATE_RECOVERY_STEP)
+
+    def reset(self):
+        """Forget the loop-bound lock before running on a new event loop"""
+        self._lock = None
+
+
+def retry_after_seconds(response: requests.Response) -> Optional[float]:
+    value = response.headers.get('Retry-After')
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None  # HTTP-date form; fall back to the default wait
+
+
+class AsyncNWSClient:
+    """Rate-limited concurrent GETs against api.weather.gov
+
+    get_json() is a coroutine; run() drives one from synchronous code, and
+    get_many() fetches a batch, mapping failures to None.
+    """
+
+    def __init__(self, session_factory: Callable[[], requests.Session], rate: float = NWS_REQUESTS_PER_SECOND,
+                 burst: int = NWS_BURST, concurrency: int = NWS_CONCURRENCY, max_attempts: int = MAX_ATTEMPTS,
+                 timeout: float = REQUEST_TIMEOUT):
+        self.session_factory = session_factory
+        self.limiter = TokenBucket(rate, burst)
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='nws')
+        self._local = threading.local()
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+
+    def _session(self) -> requests.Session:
+        if not hasattr(self._local, 'session'):
+            self._local.session = self.session_factory()
+        return self._local.session
+
+    def _get(self, url: str, params: Optional[Dict]) -> requests.Response:
+        return self._session().get(url, params=params, timeout=self.timeout)
+
+    async def get_json(self, url: str, params: Optional[Dict] = None, changed_only: bool = False) -> Optional[Dict]:
+        """Parsed JSON body of url; raises once retries are exhausted or on a non-retryable status
+
+        With changed_only, a response the HTTP cache revalidated (304) whose
+        body is already loaded into the cache's target gives None without
+        being parsed.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_attempts):
+            last_attempt = attempt + 1 >= self.max_attempts
+            await self.limiter.acquire()
+            self.requests += 1
+            try:
+                response = await loop.run_in_executor(self._pool, partial(self._get, url, params))
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    raise
+                delay = backoff_delay(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or last_attempt:
+                    response.raise_for_status()
+                    self.limiter.succeeded()
+                    if changed_only and already_applied(response):
+                        return None
+                    return response.json()
+                delay = retry_after_seconds(response)
+                if response.status_code == 429:
+                    self.throttled += 1
+                    self.limiter.throttle(delay if delay is not None else DEFAULT_THROTTLE_SECONDS)
+                    delay = 0.0
+                elif delay is None:
+                    delay = backoff_delay(attempt)
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    async def get_many(self, calls: Iterable[Tuple[str, Optional[Dict]]], label: str = 'request',
+                       changed_only: bool = False) -> List[Optional[Dict]]:
+        """get_json for every (url, params) concurrently, in order; failures are reported and come back as None"""
+        async def get_one(url: str, params: Optional[Dict]) -> Optional[Dict]:
+            try:
+                return await self.get_json(url, params, changed_only)
+            except Exception as e:
+                self.failures += 1
+                print(f"  ⚠️  Error fetching {label} {url}: {e}")
+                return None
+
+        return list(await asyncio.gather(*(get_one(url, params) for url, params in calls)))
+
+    def run(self, awaitable: Awaitable):
+        self.limiter.reset()
+        return asyncio.run(awaitable)
+
+    def stats(self) -> Dict:
+        return {'requests': self.requests, 'retries': self.retries, 'throttled': self.throttled,
+                'failures': self.failures, 'rate': self.limiter.rate}
+
+    def close(self):
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Persistent point -> NWS gridpoint index and gridpoint forecast parsing
+api.weather.gov forecasts are keyed by forecast office and grid cell
+(/gridpoints/{office}/{x},{y}), which a location only learns from a
+/points/{lat},{lon} call. Grid assignments almost never change, so the index
+keeps every resolved point in a local SQLite file and later runs resolve only
+locations they have not seen. Points outside NWS coverage are remembered too,
+for a shorter time, so they are not retried on every run.
+
+Locations are keyed by coordinates rounded to 4 decimals, the precision the
+/points endpoint works at. Stations and policy areas that fall in the same
+2.5 km cell share one GridCell, so each cell's forecast is fetched once.
+"""
+
+import re
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from ingest_manifest import lookup_chunks
+
+DEFAULT_GRIDPOINT_INDEX_PATH = Path(__file__).parent.parent / 'data' / 'nws_gridpoints.sqlite'
+
+# /points works at 4 decimal places (~11 m); finer coordinates are redirected
+POINT_DECIMALS = 4
+
+# Re-resolve resolved points after this long (office boundaries do move, rarely);
+# points outside coverage are retried sooner
+POINT_TTL_DAYS = 90
+UNRESOLVED_TTL_DAYS = 7
+
+GRIDPOINT_INDEX_DDL = """
+CREATE TABLE IF NOT EXISTS points (
+    point_key TEXT PRIMARY KEY,
+    office TEXT,
+    grid_x INTEGER,
+    grid_y INTEGER,
+    resolved_at TEXT NOT NULL
+);
+"""
+
+# Cardinal wind directions in NWS forecast periods, as degrees (from)
+COMPASS_DEGREES = {
+    name: index * 22.5
+    for index, name in enumerate(['N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE',
+                                  'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW'])
+}
+
+WIND_SPEED_PATTERN = re.compile(r'(\d+(?:\.\d+)?)')
+
+
+class GridCell(NamedTuple):
+    office: str
+    grid_x: int
+    grid_y: int
+
+
+def point_key(latitude: float, longitude: float) -> str:
+    """The /points path segment for a location, e.g. '40.7128,-74.006'"""
+    return f"{round(float(latitude), POINT_DECIMALS):g},{round(float(longitude), POINT_DECIMALS):g}"
+
+
+def group_by_cell(cells: Dict[str, Optional[GridCell]]) -> Dict[GridCell, List[str]]:
+    """Location ids per grid cell; locations without a cell are left out"""
+    groups: Dict[GridCell, List[str]] = {}
+    for location_id, cell in cells.items():
+        if cell:
+            groups.setdefault(cell, []).append(location_id)
+    return groups
+
+
+class GridpointIndex:
+    """point_key -> GridCell memo; use as a context manager so the file is closed"""
+
+    def __init__(self, path: Path = DEFAULT_GRIDPOINT_INDEX_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), timeout=30)
+        self._db.executescript(GRIDPOINT_INDEX_DDL)
+
+    def lookup(self, keys: Iterable[str]) -> Dict[str, Optional[GridCell]]:
+        """Fresh entries for keys; None marks a point known to be outside NWS coverage"""
+        keys = list(keys)
+        now = datetime.now()
+        resolved_after = (now - timedelta(days=POINT_TTL_DAYS)).isoformat()
+        unresolved_after = (now - timedelta(days=UNRESOLVED_TTL_DAYS)).isoformat()
+        found: Dict[str, Optional[GridCell]] = {}
+        for chunk in lookup_chunks(keys):
+            rows = self._db.execute(
+                "SELECT point_key, office, grid_x, grid_y, resolved_at FROM points "
+                f"WHERE point_key IN ({', '.join(['?'] * len(chunk))})",
+                chunk
+            )
+            for key, office, grid_x, grid_y, resolved_at in rows:
+                if office and resolved_at >= resolved_after:
+                    found[key] = GridCell(office, grid_x, grid_y)
+                elif not office and resolved_at >= unresolved_after:
+                    found[key] = None
+        return found
+
+    def store(self, cells: Dict[str, Optional[GridCell]]) -> int:
+        """Record resolved points (None for points outside coverage); returns the number stored"""
+        resolved_at = datetime.now().isoformat()
+        rows = [(key, *(cell or (None, None, None)), resolved_at) for key, cell in cells.items()]
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO points VALUES (?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM points WHERE office IS NOT NULL").fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def polygon_bounds(geometry: Optional[Dict]) -> Optional[Tuple[float, float, float, float]]:
+    """(west, south, east, north) of a GeoJSON Polygon or MultiPolygon"""
+    rings = (geometry or {}).get('coordinates') or []
+    if (geometry or {}).get('type') == 'MultiPolygon':
+        rings = [ring for polygon in rings for ring in polygon]
+    points = [point for ring in rings for point in ring]
+    if not points:
+        return None
+    longitudes, latitudes = [p[0] for p in points], [p[1] for p in points]
+    return min(longitudes), min(latitudes), max(longitudes), max(latitudes)
+
+
+def fahrenheit(value: Optional[float], unit: str) -> Optional[float]:
+    """Temperature in deg F; unit is 'F', 'C' or a wmoUnit code"""
+    if value is None:
+        return None
+    return value * 9.0 / 5.0 + 32.0 if unit.endswith('C') else value
+
+
+def wind_speed_mph(text: Optional[str]) -> Optional[float]:
+    """'10 mph' -> 10; a range such as '10 to 15 mph' gives its upper end"""
+    speeds = [float(match) for match in WIND_SPEED_PATTERN.findall(text or '')]
+    return max(speeds) if speeds else None
+
+
+def period_values(period: Dict) -> Dict[str, Optional[float]]:
+    """WEATHER_PARAMETERS values (NWS units, as generate_large_dataset) of one forecast period"""
+    dewpoint = period.get('dewpoint') or {}
+    humidity = period.get('relativeHumidity') or {}
+    return {
+        'Temperature': fahrenheit(period.get('temperature'), period.get('temperatureUnit') or 'F'),
+        'Dewpoint': fahrenheit(dewpoint.get('value'), dewpoint.get('unitCode') or 'F'),
+        'RelativeHumidity': humidity.get('value'),
+        'WindSpeed': wind_speed_mph(period.get('windSpeed')),
+        'WindDirection': COMPASS_DEGREES.get(period.get('windDirection') or '')
+    }
+
+
+def forecast_records(cell: GridCell, forecast: Dict, source_url: str) -> List[Dict]:
+    """grib2_forecasts records for every period and parameter of a gridpoint forecast
+
+    The cell's position is the centre of the forecast's polygon. forecast_id
+    carries the forecast's update time, so each issuance keeps its own rows,
+    and the period number; the current period usually starts before the
+    update time, so a lead time would go negative. Period start times come
+    with the office's local offset and are stored as UTC.
+    """
+    props = forecast.get('properties', {})
+    bounds = polygon_bounds(forecast.get('geometry'))
+    if not bounds:
+        return []
+    west, south, east, north = bounds
+    updated = datetime.fromisoformat((props.get('updateTime') or props.get('generatedAt')).replace('Z', '+00:00'))
+    cell_id = f"{cell.office}-{cell.grid_x}-{cell.grid_y}"
+
+    records = []
+    for index, period in enumerate(props.get('periods', []), start=1):
+        valid_time = datetime.fromisoformat(period['startTime']).astimezone(timezone.utc)
+        number = period.get('number') or index
+        for parameter, value in period_values(period).items():
+            if value is None:
+                continue
+            records.append({
+                'forecast_id': f"nws-{parameter.lower()}-{updated:%Y%m%d%H}-p{number:03d}-{cell_id}",
+                'parameter_name': parameter,
+                'forecast_time': valid_time.replace(tzinfo=None),
+                'grid_cell_latitude': (south + north) / 2.0,
+                'grid_cell_longitude': (west + east) / 2.0,
+                'parameter_value': value,
+                'source_file': source_url,
+                'source_crs': 'EPSG:4326',
+                'target_crs': 'EPSG:4326',
+                'spatial_extent_west': west,
+                'spatial_extent_south': south,
+                'spatial_extent_east': east,
+                'spatial_extent_north': north,
+                'transformation_status': 'completed'
+            })
+    return records
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Content-addressed local cache for AWS Open Data objects
+Objects (or byte ranges of them) are stored under the SHA-256 of
+(bucket, key, ETag, range), so a changed object never serves stale bytes, and
+re-runs, backfills and reprocessing read GFS/HRRR/NEXRAD data from disk instead
+of S3. The index is a SQLite file next to the blobs; the total size is capped
+with least-recently-used eviction, and blobs are written atomically.
+
+CachingS3Client wraps any boto3-compatible client (including
+local_s3.LocalS3Client), so readers use the cache without code changes.
+"""
+
+import io
+import os
+import time
+import sqlite3
+import hashlib
+import itertools
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / 'data' / 's3_cache'
+DEFAULT_CACHE_BYTES = 20 * 1024 ** 3
+
+INDEX_FILE = 'index.sqlite'
+
+# Distinguishes concurrent partial files of one blob within a process
+_PARTIAL_SEQUENCE = itertools.count()
+
+INDEX_DDL = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    digest TEXT PRIMARY KEY,
+    bucket TEXT NOT NULL,
+    object_key TEXT NOT NULL,
+    etag TEXT NOT NULL,
+    byte_range TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_last_access ON cache_entries(last_access);
+"""
+
+
+def cache_digest(bucket: str, key: str, etag: str, byte_range: Optional[str] = None) -> str:
+    """Content address of an object version (or one byte range of it)"""
+    return hashlib.sha256('\0'.join([bucket, key, etag, byte_range or '']).encode('utf-8')).hexdigest()
+
+
+class ObjectCache:
+    """On-disk blob cache with a size cap and LRU eviction; safe to share between threads"""
+
+    def __init__(self, root: Path = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.root / INDEX_FILE), check_same_thread=False, timeout=30)
+        self._db.executescript(INDEX_DDL)
+        self.hits = 0
+        self.misses = 0
+        self.bytes_from_cache = 0
+        self.bytes_downloaded = 0
+        self.evictions = 0
+
+    def blob_path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM cache_entries").fetchone()[0]
+
+    def get_path(self, bucket: str, key: str, etag: str, byte_range: Optional[str] = None) -> Optional[Path]:
+        """Path of the cached blob, or None on a miss; for readers that stream or copy the file"""
+        digest = cache_digest(bucket, key, etag, byte_range)
+        path = self.blob_path(digest)
+        with self._lock:
+            row = self._db.execute("SELECT size_bytes FROM cache_entries WHERE digest = ?", (digest,)).fetchone()
+            if row and not path.is_file():
+                # Evicted by another process, or removed by hand
+                self._db.execute("DELETE FROM cache_entries WHERE digest = ?", (digest,))
+                self._db.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE cache_entries SET last_access = ? WHERE digest = ?", (time.time(), digest))
+            self._db.commit()
+            self.hits += 1
+            self.bytes_from_cache += row[0]
+        return path
+
+    def get(self, bucket: str, key: str, etag: str, byte_range: Optional[str] = None) -> Optional[bytes]:
+        """Cached bytes, or None on a miss"""
+        path = self.get_path(bucket, key, etag, byte_range)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None  # Evicted between the lookup and the read (rare); the caller downloads again
+
+    def put(self, bucket: str, key: str, etag: str, data: bytes, byte_range: Optional[str] = None):
+        """Store bytes (write to a temp file, then rename) and evict down to max_bytes"""
+        if len(data) > self.max_bytes:
+            return
+        partial = self.partial_path(bucket, key, etag, byte_range)
+        partial.write_bytes(data)
+        self.put_file(bucket, key, etag, partial, byte_range)
+
+    def partial_path(self, bucket: str, key: str, etag: str, byte_range: Optional[str] = None) -> Path:
+        """Private temp file next to the blob, for writers that stream an object in before put_file"""
+        digest = cache_digest(bucket, key, etag, byte_range)
+        path = self.blob_path(digest)
+        path.parent.mkdir(exist_ok=True)
+        return path.with_name(f"{digest}.{os.getpid()}.{next(_PARTIAL_SEQUENCE)}.part")
+
+    def put_file(self, bucket: str, key: str, etag: str, partial: Path,
+                 byte_range: Optional[str] = None) -> Optional[Path]:
+        """Move a fully written partial_path() file into the cache; returns the blob path
+
+        Files larger than max_bytes are deleted instead and None is returned.
+        """
+        size = partial.stat().st_size
+        if size > self.max_bytes:
+            partial.unlink(missing_ok=True)
+            return None
+        digest = cache_digest(bucket, key, etag, byte_range)
+        path = self.blob_path(digest)
+        os.replace(partial, path)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (digest, bucket, key, etag, byte_range or '', size, time.time())
+            )
+            self._evict(keep=digest)
+            self._db.commit()
+        return path
+
+    def _evict(self, keep: str):
+        """Drop least recently used entries until the cache fits (lock held)"""
+        total = self._db.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM cache_entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute(
+            "SELECT digest, size_bytes FROM cache_entries WHERE digest != ? ORDER BY last_access", (keep,)
+        )
+        evicted = []
+        for digest, size in rows.fetchall():
+            if total <= self.max_bytes:
+                break
+            self.blob_path(digest).unlink(missing_ok=True)
+            evicted.append((digest,))
+            total -= size
+        self._db.executemany("DELETE FROM cache_entries WHERE digest = ?", evicted)
+        self.evictions += len(evicted)
+
+    def fetch(self, bucket: str, key: str, etag: str, download: Callable[[], bytes],
+              byte_range: Optional[str] = None) -> bytes:
+        """Cached bytes, or download() stored for next time"""
+        data = self.get(bucket, key, etag, byte_range)
+        if data is None:
+            data = download()
+            self.count_download(len(data))
+            self.put(bucket, key, etag, data, byte_range)
+        return data
+
+    def count_download(self, size: int):
+        """Account bytes fetched from S3 on a miss, for writers that fill the cache themselves"""
+        with self._lock:
+            self.bytes_downloaded += size
+
+    def report(self) -> Dict:
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'bytes_from_cache': self.bytes_from_cache,
+            'bytes_downloaded': self.bytes_downloaded,
+            'evictions': self.evictions,
+            'cached_bytes': self.total_bytes(),
+            'max_bytes': self.max_bytes
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class CachedBody(io.BytesIO):
+    """In-memory object body with botocore StreamingBody's iter_chunks"""
+
+    def iter_chunks(self, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+class CachingS3Client:
+    """S3 client wrapper whose get_object is served from an ObjectCache
+
+    ETags come from listings made through this client (list_objects_v2 or its
+    paginator) and otherwise from one head_object call. Other methods pass
+    straight through to the wrapped client.
+    """
+
+    def __init__(self, client, cache: ObjectCache):
+        self.client = client
+        self.cache = cache
+        self._etags: Dict[tuple, str] = {}
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _remember(self, bucket: str, page: Dict) -> Dict:
+        for obj in page.get('Contents', []):
+            self._etags[(bucket, obj['Key'])] = obj['ETag']
+        return page
+
+    def list_objects_v2(self, **kwargs) -> Dict:
+        return self._remember(kwargs['Bucket'], self.client.list_objects_v2(**kwargs))
+
+    def get_paginator(self, operation_name: str):
+        paginator = self.client.get_paginator(operation_name)
+        if operation_name != 'list_objects_v2':
+            return paginator
+        return _RememberingPaginator(paginator, self)
+
+    def known_etag(self, bucket: str, key: str) -> Optional[str]:
+        """ETag seen in a listing made through this client, if any"""
+        return self._etags.get((bucket, key))
+
+    def etag(self, bucket: str, key: str) -> str:
+        if (bucket, key) not in self._etags:
+            self._etags[(bucket, key)] = self.client.head_object(Bucket=bucket, Key=key)['ETag']
+        return self._etags[(bucket, key)]
+
+    def get_object(self, Bucket: str, Key: str, Range: Optional[str] = None, **kwargs) -> Dict:
+        if kwargs:
+            return self.client.get_object(Bucket=Bucket, Key=Key, Range=Range, **kwargs)
+        etag = self.etag(Bucket, Key)
+
+        def download() -> bytes:
+            request = {'Bucket': Bucket, 'Key': Key}
+            if Range:
+                request['Range'] = Range
+            response = self.client.get_object(**request)
+            try:
+                return response['Body'].read()
+            finally:
+                response['Body'].close()
+
+        data = self.cache.fetch(Bucket, Key, etag, download, Range)
+        return {'Body': CachedBody(data), 'ContentLength': len(data), 'ETag': etag}
+
+
+class _RememberingPaginator:
+    def __init__(self, paginator, client: CachingS3Client):
+        self.paginator = paginator
+        self.client = client
+
+    def paginate(self, **kwargs) -> Iterator[Dict]:
+        for page in self.paginator.paginate(**kwargs):
+            yield self.client._remember(kwargs['Bucket'], page)
+
+
+def format_cache_report(report: Dict) -> str:
+    return (f"{report['hits']:,} hits / {report['misses']:,} misses ({report['hit_rate']:.0%}), "
+            f"{report['bytes_from_cache'] / 1024**2:,.1f} MB from cache, "
+            f"{report['bytes_downloaded'] / 1024**2:,.1f} MB downloaded, {report['evictions']:,} evicted, "
+            f"{report['cached_bytes'] / 1024**3:,.2f} of {report['max_bytes'] / 1024**3:,.0f} GB used")
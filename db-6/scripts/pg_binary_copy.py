@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+PostgreSQL binary COPY encoder for high-volume db-6 tables
+Encodes whole NumPy column arrays into COPY ... WITH (FORMAT binary) rows without
+per-value text formatting. Shared by generate_large_dataset.py and the ingestion
+scripts for grib2_forecasts, nexrad_level2_data and the NEXRAD grid tables.
+
+Column types follow schema_postgresql.sql / nexrad_satellite_schema_postgresql.sql:
+  text         VARCHAR/TEXT (geometry columns are TEXT holding WKT)
+  int4, int8   INTEGER, BIGINT
+  float8       DOUBLE PRECISION
+  numeric(p,s) NUMERIC(p, s)
+  timestamp    TIMESTAMP (without time zone)
+  geography    PostGIS GEOGRAPHY point, encoded as EWKB from (longitude, latitude)
+"""
+
+import re
+import struct
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+COPY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+COPY_HEADER = COPY_SIGNATURE + struct.pack('!ii', 0, 0)
+COPY_TRAILER = struct.pack('!h', -1)
+
+NULL_LENGTH = struct.pack('!i', -1)
+
+# PostgreSQL timestamps count microseconds from 2000-01-01
+POSTGRES_EPOCH = np.datetime64('2000-01-01T00:00:00', 'us')
+
+# NUMERIC digits are base 10000, four decimal digits each
+NUMERIC_DIGITS_PER_GROUP = 4
+NUMERIC_NEGATIVE = 0x4000
+
+# Little-endian EWKB point with SRID 4326
+EWKB_POINT_SRID = 0x20000001
+WGS84_SRID = 4326
+EWKB_POINT_DTYPE = np.dtype([
+    ('byte_order', 'u1'), ('geometry_type', '<u4'), ('srid', '<u4'), ('x', '<f8'), ('y', '<f8')
+])
+
+NUMERIC_TYPE_PATTERN = re.compile(r'numeric\((\d+),\s*(\d+)\)')
+
+# Column specs for the high-volume tables (load_timestamp/ingestion_timestamp style defaults omitted)
+GRIB2_FORECAST_COLUMNS = [
+    ('forecast_id', 'text'), ('parameter_name', 'text'), ('forecast_time', 'timestamp'),
+    ('grid_cell_latitude', 'numeric(10,7)'), ('grid_cell_longitude', 'numeric(10,7)'), ('grid_cell_geom', 'text'),
+    ('parameter_value', 'numeric(10,2)'), ('source_file', 'text'), ('source_crs', 'text'), ('target_crs', 'text'),
+    ('grid_resolution_x', 'numeric(10,6)'), ('grid_resolution_y', 'numeric(10,6)'),
+    ('spatial_extent_west', 'numeric(10,6)'), ('spatial_extent_south', 'numeric(10,6)'),
+    ('spatial_extent_east', 'numeric(10,6)'), ('spatial_extent_north', 'numeric(10,6)'),
+    ('transformation_status', 'text')
+]
+
+NEXRAD_LEVEL2_COLUMNS = [
+    ('radar_data_id', 'text'), ('site_id', 'text'), ('scan_time', 'timestamp'), ('volume_scan_number', 'int4'),
+    ('elevation_angle', 'numeric(5,2)'), ('azimuth_angle', 'numeric(6,2)'), ('range_gate', 'int4'),
+    ('range_km', 'numeric(8,2)'), ('reflectivity_dbz', 'numeric(6,2)'), ('reflectivity_geom', 'text'),
+    ('radial_velocity_ms', 'numeric(6,2)'), ('velocity_geom', 'text'), ('spectrum_width_ms', 'numeric(6,2)'),
+    ('data_quality_flag', 'int4'), ('source_file', 'text'), ('aws_bucket', 'text'), ('aws_key', 'text'),
+    ('file_format', 'text'), ('compression_type', 'text'), ('decompression_status', 'text'),
+    ('data_type', 'text'), ('sweep_mode', 'text'), ('pulse_repetition_frequency', 'int4'),
+    ('nyquist_velocity_ms', 'numeric(6,2)'), ('spatial_extent_west', 'numeric(10,6)'),
+    ('spatial_extent_south', 'numeric(10,6)'), ('spatial_extent_east', 'numeric(10,6)'),
+    ('spatial_extent_north', 'numeric(10,6)'), ('processing_duration_seconds', 'int4'),
+    ('records_processed', 'int4')
+]
+
+NEXRAD_REFLECTIVITY_GRID_COLUMNS = [
+    ('grid_id', 'text'), ('site_id', 'text'), ('scan_time', 'timestamp'), ('grid_latitude', 'numeric(10,7)'),
+    ('grid_longitude', 'numeric(10,7)'), ('grid_geom', 'text'), ('grid_resolution_km', 'numeric(6,2)'),
+    ('max_reflectivity_dbz', 'numeric(6,2)'), ('mean_reflectivity_dbz', 'numeric(6,2)'),
+    ('min_reflectivity_dbz', 'numeric(6,2)'), ('reflectivity_count', 'int4'),
+    ('composite_reflectivity_dbz', 'numeric(6,2)'), ('height_of_max_reflectivity_m', 'numeric(8,2)'),
+    ('precipitation_rate_mmh', 'numeric(8,2)'), ('accumulated_precipitation_mm', 'numeric(8,2)'),
+    ('storm_cell_id', 'text'), ('storm_severity', 'text'), ('grid_method', 'text')
+]
+
+NEXRAD_VELOCITY_GRID_COLUMNS = [
+    ('grid_id', 'text'), ('site_id', 'text'), ('scan_time', 'timestamp'), ('grid_latitude', 'numeric(10,7)'),
+    ('grid_longitude', 'numeric(10,7)'), ('grid_geom', 'text'), ('grid_resolution_km', 'numeric(6,2)'),
+    ('radial_velocity_ms', 'numeric(6,2)'), ('velocity_azimuth', 'numeric(6,2)'),
+    ('u_wind_component_ms', 'numeric(6,2)'), ('v_wind_component_ms', 'numeric(6,2)'),
+    ('wind_speed_ms', 'numeric(6,2)'), ('wind_direction_deg', 'numeric(6,2)'),
+    ('spectrum_width_ms', 'numeric(6,2)'), ('velocity_quality_flag', 'int4')
+]
+
+TABLE_COLUMNS = {
+    'grib2_forecasts': GRIB2_FORECAST_COLUMNS,
+    'nexrad_level2_data': NEXRAD_LEVEL2_COLUMNS,
+    'nexrad_reflectivity_grid': NEXRAD_REFLECTIVITY_GRID_COLUMNS,
+    'nexrad_velocity_grid': NEXRAD_VELOCITY_GRID_COLUMNS
+}
+
+
+class EncodedColumn:
+    """One column encoded for N rows, length prefixes included
+
+    Fixed-width columns hold an (N, width) uint8 matrix; text and NULL-bearing
+    columns hold one bytes object per row. Columns that never change (grid cell
+    geometries, constants) can be encoded once and passed to encode() as-is.
+    """
+
+    def __init__(self, rows: int, matrix: Optional[np.ndarray] = None, values: Optional[List[bytes]] = None):
+        self.rows = rows
+        self.matrix = matrix
+        self.values = values
+
+    @property
+    def fixed_width(self) -> Optional[int]:
+        return None if self.matrix is None else self.matrix.shape[1]
+
+    def row_bytes(self) -> List[bytes]:
+        """Encoded bytes of every row"""
+        if self.values is not None:
+            return self.values
+        width = self.matrix.shape[1]
+        if self.matrix.strides[0] == 0:
+            return [self.matrix[0].tobytes()] * self.rows
+        data = np.ascontiguousarray(self.matrix).tobytes()
+        return [data[start:start + width] for start in range(0, len(data), width)]
+
+
+def _be_bytes(values: np.ndarray, dtype: str) -> np.ndarray:
+    """(N, itemsize) uint8 view of values in a big-endian dtype"""
+    array = np.ascontiguousarray(values, dtype=dtype)
+    return array.view(np.uint8).reshape(len(array), np.dtype(dtype).itemsize)
+
+
+def _fixed_column(payload: np.ndarray, nulls: Optional[np.ndarray] = None) -> EncodedColumn:
+    """Prefix a (N, width) payload matrix with its length; any NULL makes the column per-row bytes"""
+    rows, width = payload.shape
+    matrix = np.empty((rows, width + 4), dtype=np.uint8)
+    matrix[:, :4] = np.frombuffer(struct.pack('!i', width), dtype=np.uint8)
+    matrix[:, 4:] = payload
+    column = EncodedColumn(rows, matrix=matrix)
+    if nulls is None or not nulls.any():
+        return column
+
+    values = column.row_bytes()
+    for row in np.flatnonzero(nulls).tolist():
+        values[row] = NULL_LENGTH
+    return EncodedColumn(rows, values=values)
+
+
+def encode_text(values: Sequence[Optional[str]]) -> EncodedColumn:
+    """Encode a sequence of strings (None is NULL)"""
+    pack_length = struct.Struct('!i').pack
+    encoded = [
+        NULL_LENGTH if value is None else pack_length(len(data)) + data
+        for value, data in zip(values, (b'' if value is None else value.encode('utf-8') for value in values))
+    ]
+    return EncodedColumn(len(encoded), values=encoded)
+
+
+def encode_prefixed_text(prefix: str, suffixes: Sequence[bytes]) -> EncodedColumn:
+    """Encode prefix + suffix strings, e.g. ids built from a block key and pre-encoded cell keys"""
+    head = prefix.encode('utf-8')
+    pack_length = struct.Struct('!i').pack
+    length_prefixes = {length: pack_length(len(head) + length) + head for length in set(map(len, suffixes))}
+    return EncodedColumn(len(suffixes), values=[length_prefixes[len(suffix)] + suffix for suffix in suffixes])
+
+
+def encode_int(values: np.ndarray, dtype: str = '>i4') -> EncodedColumn:
+    """Encode integers (masked entries are NULL)"""
+    nulls = np.ma.getmaskarray(values) if np.ma.isMaskedArray(values) else None
+    return _fixed_column(_be_bytes(np.ma.filled(values, 0) if nulls is not None else values, dtype), nulls)
+
+
+def encode_float8(values: np.ndarray) -> EncodedColumn:
+    """Encode doubles (NaN is NULL)"""
+    values = np.asarray(values, dtype=np.float64)
+    return _fixed_column(_be_bytes(values, '>f8'), np.isnan(values))
+
+
+def encode_numeric(values: np.ndarray, precision: int, scale: int) -> EncodedColumn:
+    """Encode NUMERIC(precision, scale) from floats (NaN is NULL)
+
+    Every row uses the same digit layout: enough base-10000 groups for the integer
+    part, and the fractional part padded to whole groups. PostgreSQL strips the
+    leading/trailing zero groups on receive. Values that do not fit (after
+    rounding to scale) raise ValueError, as PostgreSQL's numeric field overflow.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    nulls = np.isnan(values)
+    pad = -scale % NUMERIC_DIGITS_PER_GROUP
+    integer_groups = max(1, -(-(precision - scale) // NUMERIC_DIGITS_PER_GROUP))
+    fraction_groups = (scale + pad) // NUMERIC_DIGITS_PER_GROUP
+    ndigits = integer_groups + fraction_groups
+
+    rounded = np.rint(np.abs(np.where(nulls, 0.0, values)) * 10.0 ** scale)
+    overflow = rounded >= 10.0 ** precision
+    if overflow.any():
+        raise ValueError(f"numeric({precision},{scale}) overflow: {values[overflow][0]!r} "
+                         f"(absolute value must round below 10^{precision - scale})")
+    scaled = rounded.astype(np.int64) * 10 ** pad
+    fields = np.empty((len(values), 4 + ndigits), dtype='>i2')
+    fields[:, 0] = ndigits
+    fields[:, 1] = integer_groups - 1
+    fields[:, 2] = np.where(values < 0, NUMERIC_NEGATIVE, 0)
+    fields[:, 3] = scale
+    for group in range(ndigits):
+        fields[:, 4 + group] = scaled // 10000 ** (ndigits - 1 - group) % 10000
+    return _fixed_column(fields.view(np.uint8).reshape(len(values), -1), nulls)
+
+
+def encode_timestamp(values: np.ndarray) -> EncodedColumn:
+    """Encode TIMESTAMP from datetime64 values (NaT is NULL)"""
+    values = np.asarray(values, dtype='datetime64[us]')
+    micros = (values - POSTGRES_EPOCH).astype(np.int64)
+    return _fixed_column(_be_bytes(micros, '>i8'), np.isnat(values))
+
+
+def encode_geography_points(longitudes: np.ndarray, latitudes: np.ndarray) -> EncodedColumn:
+    """Encode PostGIS GEOGRAPHY points (SRID 4326) as EWKB"""
+    points = np.empty(len(longitudes), dtype=EWKB_POINT_DTYPE)
+    points['byte_order'] = 1
+    points['geometry_type'] = EWKB_POINT_SRID
+    points['srid'] = WGS84_SRID
+    points['x'] = longitudes
+    points['y'] = latitudes
+    return _fixed_column(points.view(np.uint8).reshape(len(points), EWKB_POINT_DTYPE.itemsize))
+
+
+def encode_values(column_type: str, values, rows: int) -> EncodedColumn:
+    """Encode one column; scalars (including None) are broadcast to every row"""
+    if isinstance(values, EncodedColumn):
+        return values
+    if values is None or isinstance(values, (str, int, float, datetime, np.generic)):
+        return encode_constant(column_type, values, rows)
+    if column_type == 'text':
+        return encode_text(values)
+    if column_type in ('int4', 'int8'):
+        return encode_int(values, '>i4' if column_type == 'int4' else '>i8')
+    if column_type == 'float8':
+        return encode_float8(values)
+    if column_type == 'timestamp':
+        return encode_timestamp(values)
+    if column_type == 'geography':
+        longitudes, latitudes = values
+        return encode_geography_points(longitudes, latitudes)
+    match = NUMERIC_TYPE_PATTERN.fullmatch(column_type)
+    if match:
+        return encode_numeric(values, int(match.group(1)), int(match.group(2)))
+    raise ValueError(f"Unsupported binary COPY column type: {column_type}")
+
+
+def encode_constant(column_type: str, value, rows: int) -> EncodedColumn:
+    """Encode a value once and repeat it for every row"""
+    if value is None:
+        data = NULL_LENGTH
+    elif column_type == 'text':
+        data = encode_text([value]).values[0]
+    elif isinstance(value, datetime):
+        data = encode_timestamp(np.array([value], dtype='datetime64[us]')).row_bytes()[0]
+    else:
+        data = encode_values(column_type, np.array([value]), 1).row_bytes()[0]
+    return EncodedColumn(rows, matrix=np.broadcast_to(np.frombuffer(data, dtype=np.uint8), (rows, len(data))))
+
+
+class BinaryCopyEncoder:
+    """Encodes column arrays for one table into binary COPY tuples
+
+    Fixed-width types are sent first and text columns last, so the fixed part of
+    every tuple is packed as one NumPy matrix; copy_sql() lists the columns in
+    that wire order.
+    """
+
+    def __init__(self, table: str, columns: Optional[List[Tuple[str, str]]] = None):
+        self.table = table
+        columns = columns if columns is not None else TABLE_COLUMNS[table]
+        self.columns = ([column for column in columns if column[1] != 'text'] +
+                        [column for column in columns if column[1] == 'text'])
+        self.column_names = [name for name, _ in self.columns]
+        self.tuple_header = np.frombuffer(struct.pack('!h', len(self.columns)), dtype=np.uint8)
+
+    def copy_sql(self) -> str:
+        """COPY statement for loading this encoder's output"""
+        return f"COPY {self.table} ({', '.join(self.column_names)}) FROM STDIN WITH (FORMAT binary)"
+
+    def encode_columns(self, data: Dict[str, object], rows: int) -> List[EncodedColumn]:
+        """Encode every column of a block (missing columns are NULL)"""
+        return [encode_values(column_type, data.get(name), rows) for name, column_type in self.columns]
+
+    def encode(self, data: Dict[str, object], rows: int) -> bytes:
+        """Encode a block of rows (no file header or trailer)"""
+        return b''.join(self.encode_rows(data, rows))
+
+    def encode_rows(self, data: Dict[str, object], rows: int) -> List[bytes]:
+        """Encode a block of rows, one bytes object per tuple"""
+        return self.assemble(self.encode_columns(data, rows), rows)
+
+    def assemble(self, encoded: List[EncodedColumn], rows: int) -> List[bytes]:
+        """Join encoded columns into tuples
+
+        The leading run of fixed-width columns is packed with one NumPy matrix; the
+        remaining columns (adjacent constants merged) are appended per row.
+        """
+        columns = [EncodedColumn(rows, matrix=np.broadcast_to(self.tuple_header, (rows, 2)))] + list(encoded)
+        fixed_count = 0
+        while fixed_count < len(columns) and columns[fixed_count].fixed_width is not None:
+            fixed_count += 1
+
+        fixed = columns[:fixed_count]
+        row_width = sum(column.fixed_width for column in fixed)
+        packed = np.empty((rows, row_width), dtype=np.uint8)
+        offset = 0
+        for column in fixed:
+            packed[:, offset:offset + column.fixed_width] = column.matrix
+            offset += column.fixed_width
+        parts = [EncodedColumn(rows, matrix=packed).row_bytes()]
+
+        constant = b''
+        for column in columns[fixed_count:]:
+            if column.matrix is not None and column.matrix.strides[0] == 0:
+                constant += column.matrix[0].tobytes()
+                continue
+            if constant:
+                parts.append([constant] * rows)
+                constant = b''
+            parts.append(column.row_bytes())
+        if constant:
+            parts.append([constant] * rows)
+
+        if len(parts) == 1:
+            return parts[0]
+        return list(map(b''.join, zip(*parts)))
+
+
+class ChunkStream:
+    """File-like reader over an iterable of byte chunks, for cursor.copy_expert"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._chunk = b''
+        self._position = 0
+
+    def read(self, size: int = -1) -> bytes:
+        parts = []
+        remaining = size
+        while remaining != 0:
+            if self._position >= len(self._chunk):
+                self._chunk = next(self._chunks, b'')
+                self._position = 0
+                if not self._chunk:
+                    break
+            available = len(self._chunk) - self._position
+            take = available if remaining < 0 else min(remaining, available)
+            parts.append(self._chunk[self._position:self._position + take])
+            self._position += take
+            if remaining > 0:
+                remaining -= take
+        return b''.join(parts)
+
+    def readline(self, size: int = -1) -> bytes:
+        return self.read(size)
+
+
+def binary_copy_stream(blocks: Iterable[bytes]) -> ChunkStream:
+    """Stream of a complete binary COPY file: header, encoded blocks, trailer"""
+    def frame():
+        yield COPY_HEADER
+        yield from blocks
+        yield COPY_TRAILER
+    return ChunkStream(frame())
+
+
+def copy_binary(conn, encoder: BinaryCopyEncoder, blocks: Iterable[bytes], size: int = 8 * 1024 * 1024):
+    """Stream encoded blocks into the encoder's table with COPY FROM STDIN (FORMAT binary)"""
+    cursor = conn.cursor()
+    try:
+        cursor.copy_expert(encoder.copy_sql(), binary_copy_stream(blocks), size=size)
+    finally:
+        cursor.close()
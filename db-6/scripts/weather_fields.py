@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Spatially and temporally coherent synthetic weather fields for db-6
+Builds every WEATHER_PARAMETERS field for one forecast time at once on a regular
+lat/lon grid, for generate_large_dataset.py. Values follow NWS API units:
+  Temperature, Dewpoint, HeatIndex, WindChill, ApparentTemperature  deg F
+  RelativeHumidity, SkyCover                                        percent
+  WindSpeed mph, WindDirection degrees (from), Pressure inHg, Visibility miles,
+  Precipitation inches per 6 h, CloudBase hundreds of feet
+
+Each field is a climatology (latitude gradient, seasonal and diurnal cycles) plus
+smooth anomalies. Anomalies are FFT-filtered Gaussian random fields drawn at daily
+keyframes and blended between them, so neighbouring cells and consecutive forecast
+times are correlated. Keyframes are seeded from (seed, keyframe index), which makes
+any forecast time reproducible on its own: shards and resumed runs need no state.
+"""
+
+import math
+from datetime import datetime
+from typing import Dict, Tuple
+
+import numpy as np
+
+# Grid spacing in km per degree of latitude
+KM_PER_DEGREE = 111.0
+
+# Hours between anomaly keyframes; fields in between are blended
+KEYFRAME_HOURS = 24
+
+# Keyframes are indexed by whole KEYFRAME_HOURS periods since this epoch
+KEYFRAME_EPOCH = datetime(2000, 1, 1)
+
+# Smooth anomaly components and their correlation length scales (km)
+ANOMALY_LENGTH_KM = {
+    'temperature': 600.0,
+    'moisture': 400.0,
+    'wind_u': 700.0,
+    'wind_v': 700.0,
+    'pressure': 1200.0,
+    'convection': 150.0
+}
+
+# Temperature climatology (deg F): annual mean at the southern edge, change per
+# degree of latitude, and seasonal/diurnal amplitudes
+TEMPERATURE_MEAN_SOUTH = 77.0
+TEMPERATURE_LAPSE_PER_DEGREE = -1.4
+SEASONAL_AMPLITUDE_SOUTH = 5.0
+SEASONAL_AMPLITUDE_PER_DEGREE = 0.6
+SEASONAL_PEAK_DAY = 200  # mid July
+DIURNAL_AMPLITUDE = 8.0
+DIURNAL_PEAK_HOUR = 15  # local solar time
+TEMPERATURE_ANOMALY = 12.0
+
+STANDARD_PRESSURE_INHG = 29.92
+
+
+def gaussian_filter_spectrum(shape: Tuple[int, int], length_cells: float) -> np.ndarray:
+    """rfft2 transfer function of a Gaussian smoothing kernel with std length_cells"""
+    ky = np.fft.fftfreq(shape[0])[:, None]
+    kx = np.fft.rfftfreq(shape[1])[None, :]
+    return np.exp(-2.0 * math.pi ** 2 * length_cells ** 2 * (kx ** 2 + ky ** 2))
+
+
+def smooth_gaussian_fields(rng: np.random.Generator, shape: Tuple[int, int],
+                           filters: np.ndarray) -> np.ndarray:
+    """Unit-variance smooth random fields, one per filter, via FFT filtering of white noise"""
+    noise = rng.standard_normal((len(filters), *shape))
+    fields = np.fft.irfft2(np.fft.rfft2(noise) * filters, s=shape)
+    fields -= fields.mean(axis=(1, 2), keepdims=True)
+    fields /= fields.std(axis=(1, 2), keepdims=True)
+    return fields
+
+
+def relative_humidity(temperature_f: np.ndarray, dewpoint_f: np.ndarray) -> np.ndarray:
+    """Relative humidity (%) from temperature and dewpoint (Magnus formula)"""
+    t = (temperature_f - 32.0) / 1.8
+    td = (dewpoint_f - 32.0) / 1.8
+    return np.clip(100.0 * np.exp(17.625 * td / (243.04 + td) - 17.625 * t / (243.04 + t)), 0.0, 100.0)
+
+
+def heat_index(temperature_f: np.ndarray, humidity: np.ndarray) -> np.ndarray:
+    """NWS heat index (deg F); equal to the temperature below 80 F
+
+    Uses Steadman's simple formula, switching to the Rothfusz regression once
+    the simple estimate reaches 80 F.
+    """
+    t, rh = temperature_f, humidity
+    simple = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + rh * 0.094)
+    rothfusz = (-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh
+                - 6.83783e-3 * t * t - 5.481717e-2 * rh * rh + 1.22874e-3 * t * t * rh
+                + 8.5282e-4 * t * rh * rh - 1.99e-6 * t * t * rh * rh)
+    index = np.where((simple + t) / 2.0 >= 80.0, rothfusz, simple)
+    return np.where(t >= 80.0, index, t)
+
+
+def wind_chill(temperature_f: np.ndarray, wind_mph: np.ndarray) -> np.ndarray:
+    """NWS wind chill (deg F); equal to the temperature above 50 F or below 3 mph"""
+    v = np.power(np.maximum(wind_mph, 0.0), 0.16)
+    chill = 35.74 + 0.6215 * temperature_f - 35.75 * v + 0.4275 * temperature_f * v
+    return np.where((temperature_f <= 50.0) & (wind_mph >= 3.0), chill, temperature_f)
+
+
+def apparent_temperature(temperature_f: np.ndarray, heat: np.ndarray, chill: np.ndarray) -> np.ndarray:
+    """Apparent temperature (deg F): heat index from 80 F up, wind chill below"""
+    return np.where(temperature_f >= 80.0, heat, chill)
+
+
+class WeatherFieldSynthesizer:
+    """Generates all forecast parameters for one forecast time over a grid
+
+    latitudes/longitudes are the grid cells in row-major (latitude outer) order
+    and shape is (latitude count, longitude count).
+    """
+
+    def __init__(self, latitudes: np.ndarray, longitudes: np.ndarray, shape: Tuple[int, int],
+                 resolution: float, seed: int):
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.shape = shape
+        self.seed = seed
+        cell_km = resolution * KM_PER_DEGREE
+        self.components = list(ANOMALY_LENGTH_KM)
+        self.filters = np.stack([
+            gaussian_filter_spectrum(shape, ANOMALY_LENGTH_KM[name] / cell_km) for name in self.components
+        ])
+        self._keyframes = {}
+
+        latitude_offset = latitudes - latitudes.min()
+        self._temperature_mean = TEMPERATURE_MEAN_SOUTH + TEMPERATURE_LAPSE_PER_DEGREE * latitude_offset
+        self._seasonal_amplitude = SEASONAL_AMPLITUDE_SOUTH + SEASONAL_AMPLITUDE_PER_DEGREE * latitude_offset
+
+    def keyframe(self, index: int) -> np.ndarray:
+        """Anomaly components at one keyframe, shape (components, cells); the last two are cached"""
+        if index not in self._keyframes:
+            rng = np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(index,)))
+            fields = smooth_gaussian_fields(rng, self.shape, self.filters)
+            self._keyframes[index] = fields.reshape(len(self.components), -1)
+            for stale in sorted(self._keyframes)[:-2]:
+                del self._keyframes[stale]
+        return self._keyframes[index]
+
+    def anomalies(self, forecast_time: datetime) -> Dict[str, np.ndarray]:
+        """Unit-variance anomaly fields at a forecast time, blended between keyframes"""
+        hours = (forecast_time - KEYFRAME_EPOCH).total_seconds() / 3600.0
+        index = math.floor(hours / KEYFRAME_HOURS)
+        fraction = hours / KEYFRAME_HOURS - index
+        # cos/sin weights keep unit variance along the blend
+        blended = (math.cos(fraction * math.pi / 2) * self.keyframe(index)
+                   + math.sin(fraction * math.pi / 2) * self.keyframe(index + 1))
+        return dict(zip(self.components, blended))
+
+    def fields(self, forecast_time: datetime) -> Dict[str, np.ndarray]:
+        """Every WEATHER_PARAMETERS field at a forecast time, as float64 arrays over the grid cells"""
+        anomaly = self.anomalies(forecast_time)
+
+        day_of_year = forecast_time.timetuple().tm_yday
+        seasonal = math.cos(2.0 * math.pi * (day_of_year - SEASONAL_PEAK_DAY) / 365.25)
+        solar_hour = (forecast_time.hour + forecast_time.minute / 60.0 + self.longitudes / 15.0) % 24.0
+        diurnal = np.cos(2.0 * math.pi * (solar_hour - DIURNAL_PEAK_HOUR) / 24.0)
+
+        temperature = (self._temperature_mean + self._seasonal_amplitude * seasonal
+                       + DIURNAL_AMPLITUDE * diurnal + TEMPERATURE_ANOMALY * anomaly['temperature'])
+
+        # Dewpoint depression shrinks in moist air and at night
+        depression = np.maximum(10.0 - 7.0 * anomaly['moisture'] + 4.0 * diurnal, 0.0)
+        dewpoint = temperature - depression
+        humidity = relative_humidity(temperature, dewpoint)
+
+        # Prevailing westerlies plus smooth perturbations
+        wind_u = 8.0 + 9.0 * anomaly['wind_u']
+        wind_v = 7.0 * anomaly['wind_v']
+        wind_speed = np.hypot(wind_u, wind_v)
+        wind_direction = np.rint(np.degrees(np.arctan2(-wind_u, -wind_v)) % 360.0)
+
+        pressure = np.clip(STANDARD_PRESSURE_INHG + 0.25 * anomaly['pressure'] - 0.1 * anomaly['moisture'],
+                           28.5, 31.0)
+
+        # Precipitation only where moist air and convection line up, so most cells are dry
+        wetness = 0.7 * anomaly['moisture'] + 0.6 * anomaly['convection']
+        precipitation = np.clip(0.35 * (wetness - 1.0), 0.0, 5.0)
+        sky_cover = 100.0 / (1.0 + np.exp(-2.5 * (wetness - 0.2)))
+        visibility = np.clip(10.0 - 0.3 * np.maximum(humidity - 85.0, 0.0) - 12.0 * precipitation, 0.1, 10.0)
+        cloud_base = np.clip(2.22 * depression, 0.0, 100.0)  # LCL ~ 222 ft per deg F of depression
+
+        heat = heat_index(temperature, humidity)
+        chill = wind_chill(temperature, wind_speed)
+        apparent = apparent_temperature(temperature, heat, chill)
+
+        return {
+            'Temperature': temperature,
+            'Dewpoint': dewpoint,
+            'RelativeHumidity': humidity,
+            'WindSpeed': wind_speed,
+            'WindDirection': wind_direction,
+            'Pressure': pressure,
+            'Visibility': visibility,
+            'Precipitation': precipitation,
+            'SkyCover': sky_cover,
+            'CloudBase': cloud_base,
+            'HeatIndex': heat,
+            'WindChill': chill,
+            'ApparentTemperature': apparent
+        }
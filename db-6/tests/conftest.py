@@ -0,0 +1,75 @@
+"""Tests import the flat modules in db-6/scripts the way the scripts import each other"""
+
+import sqlite3
+import sys
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+from nws_bulk import BULK_TABLES  # noqa: E402
+
+
+class SQLiteWarehouse:
+    """DB-API connection taking psycopg2-style %s parameters, over in-memory SQLite
+
+    Stands in for the non-PostgreSQL targets of the row-by-row load paths;
+    SQLite understands their INSERT ... ON CONFLICT ... DO UPDATE ... WHERE.
+    """
+
+    def __init__(self):
+        self.db = sqlite3.connect(':memory:')
+        self.commits = 0
+
+    def create_table(self, table: str, checks=()):
+        spec = BULK_TABLES[table]
+        columns = [f"{name} {'TEXT' if column_type == 'text' or 'char' in column_type else 'NUMERIC'}"
+                   f"{'' if nullable else ' NOT NULL'}" for name, column_type, nullable in spec.columns]
+        constraints = [f"PRIMARY KEY ({', '.join(spec.key)})"] + [f"CHECK ({check})" for check in checks]
+        self.db.execute(f"CREATE TABLE {table} ({', '.join(columns)}, ingestion_timestamp TEXT, "
+                        f"{', '.join(constraints)})")
+
+    def cursor(self):
+        return SQLiteCursor(self.db.cursor())
+
+    def commit(self):
+        self.commits += 1
+        self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
+
+    def rows(self, sql: str, *params):
+        return self.db.execute(sql, params).fetchall()
+
+
+class SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @staticmethod
+    def _parameter(value):
+        if isinstance(value, Decimal):
+            return float(value)
+        if isinstance(value, (date, datetime)):
+            return value.isoformat(' ')
+        return value
+
+    def execute(self, sql: str, params=()):
+        self._cursor.execute(sql.replace('%s', '?'), [self._parameter(value) for value in params])
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+@pytest.fixture
+def warehouse():
+    warehouse = SQLiteWarehouse()
+    yield warehouse
+    warehouse.db.close()
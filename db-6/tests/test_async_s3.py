@@ -0,0 +1,194 @@
+"""AsyncS3Fetcher against LocalS3Client with injected throttling and stream faults"""
+
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from async_s3 import AsyncS3Fetcher, FetchRequest, ThreadedS3Transport
+from local_s3 import LocalS3Client, LocalS3Error
+from object_cache import ObjectCache
+
+BUCKET = 'noaa-hrrr-bdp-pds'
+OTHER_BUCKET = 'noaa-gfs-bdp-pds'
+KEYS = [f"hrrr.20240506/conus/hrrr.t{hour:02d}z.wrfsfcf00.grib2" for hour in range(8)]
+
+
+class FaultyS3Client:
+    """LocalS3Client that throttles or breaks chosen keys and records concurrency per bucket
+
+    throttle[key] is how many get_object calls of key fail with SlowDown first;
+    broken_streams[key] how many bodies of key raise ConnectionError mid-read.
+    """
+
+    def __init__(self, client: LocalS3Client, throttle=None, broken_streams=None, latency: float = 0.02):
+        self.client = client
+        self.throttle = Counter(throttle or {})
+        self.broken_streams = Counter(broken_streams or {})
+        self.latency = latency
+        self.calls = Counter()
+        self.in_flight = Counter()
+        self.peak = Counter()
+        self._lock = threading.Lock()
+
+    def head_object(self, **kwargs):
+        return self.client.head_object(**kwargs)
+
+    def get_object(self, Bucket, Key, **kwargs):
+        with self._lock:
+            self.calls[Key] += 1
+            self.in_flight[Bucket] += 1
+            self.peak[Bucket] = max(self.peak[Bucket], self.in_flight[Bucket])
+            throttled = self.throttle[Key] > 0
+            self.throttle[Key] -= throttled
+            broken = self.broken_streams[Key] > 0
+            self.broken_streams[Key] -= broken
+        try:
+            time.sleep(self.latency)
+            if throttled:
+                raise LocalS3Error('SlowDown', 'Please reduce your request rate.')
+            response = self.client.get_object(Bucket=Bucket, Key=Key, **kwargs)
+        except Exception:
+            self._done(Bucket)
+            raise
+        response['Body'] = _TrackedBody(response['Body'], lambda: self._done(Bucket), broken)
+        return response
+
+    def _done(self, bucket: str):
+        with self._lock:
+            self.in_flight[bucket] -= 1
+
+
+class _TrackedBody:
+    def __init__(self, body, on_close, broken: bool):
+        self.body = body
+        self.on_close = on_close
+        self.broken = broken
+        self.reads = 0
+
+    def read(self, amt=None):
+        self.reads += 1
+        # The first read delivers data, so the .part file is already written when the body breaks
+        if self.broken and self.reads == 2:
+            raise ConnectionResetError('connection reset mid-body')
+        return self.body.read(amt)
+
+    def close(self):
+        self.body.close()
+        self.on_close()
+
+
+def object_bytes(key: str) -> bytes:
+    return (key.encode() * 4000)[:100_000]
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    root = tmp_path / 's3'
+    for bucket in (BUCKET, OTHER_BUCKET):
+        for key in KEYS:
+            path = root / bucket / key
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(object_bytes(key))
+    return LocalS3Client(root)
+
+
+def fetcher(client, cache=None, **kwargs) -> AsyncS3Fetcher:
+    transport = ThreadedS3Transport(client, workers=16)
+    kwargs.setdefault('backoff_base', 0.001)
+    kwargs.setdefault('backoff_max', 0.005)
+    return AsyncS3Fetcher(transport, cache, **kwargs)
+
+
+def part_files(*directories):
+    return [path for directory in directories for path in directory.rglob('*.part')]
+
+
+def test_throttled_and_broken_fetches_are_retried(mirror, tmp_path):
+    client = FaultyS3Client(mirror, throttle={KEYS[0]: 2, KEYS[1]: 1}, broken_streams={KEYS[2]: 1})
+    engine = fetcher(client)
+    requests = [FetchRequest(BUCKET, key, destination=tmp_path / 'out' / key) for key in KEYS]
+    try:
+        results = engine.run(engine.fetch_many(requests))
+    finally:
+        engine.close()
+
+    assert [result.error for result in results] == [None] * len(KEYS)
+    assert [result.attempts for result in results[:4]] == [3, 2, 2, 1]
+    assert engine.metrics.retries == 4
+    assert engine.metrics.completed == len(KEYS) and engine.metrics.failed == 0
+    for result in results:
+        assert result.path.read_bytes() == object_bytes(result.request.key)
+    assert part_files(tmp_path / 'out') == []
+
+
+def test_concurrency_is_capped_per_bucket(mirror, tmp_path):
+    client = FaultyS3Client(mirror, latency=0.05)
+    engine = fetcher(client, bucket_concurrency={BUCKET: 2}, default_concurrency=3)
+    requests = [FetchRequest(bucket, key, destination=tmp_path / bucket / key)
+                for bucket in (BUCKET, OTHER_BUCKET) for key in KEYS]
+    try:
+        results = engine.run(engine.fetch_many(requests))
+    finally:
+        engine.close()
+
+    assert all(result.path for result in results)
+    assert client.peak[BUCKET] == 2
+    assert client.peak[OTHER_BUCKET] == 3
+
+
+def test_cache_hits_skip_the_client(mirror, tmp_path):
+    cache = ObjectCache(tmp_path / 'cache')
+    client = FaultyS3Client(mirror, throttle={KEYS[3]: 1})
+    engine = fetcher(client, cache)
+    requests = [FetchRequest(BUCKET, key) for key in KEYS[:4]]
+    ranged = FetchRequest(BUCKET, KEYS[5], byte_range='bytes=10-19')
+
+    async def fetch_all():
+        return await engine.fetch_many(requests), await engine.read(ranged)
+
+    try:
+        first, first_range = engine.run(fetch_all())
+        calls = sum(client.calls.values())
+        second, second_range = engine.run(fetch_all())
+    finally:
+        engine.close()
+        cache.close()
+
+    assert first_range == second_range == object_bytes(KEYS[5])[10:20]
+    assert not any(result.from_cache for result in first)
+    assert all(result.from_cache and result.attempts == 0 for result in second)
+    assert [result.path.read_bytes() for result in second] == [object_bytes(key) for key in KEYS[:4]]
+    assert sum(client.calls.values()) == calls
+    assert engine.metrics.cache_hits == len(requests) + 1
+    assert part_files(tmp_path / 'cache') == []
+
+
+def test_failed_fetches_leave_no_part_files(mirror, tmp_path):
+    cache = ObjectCache(tmp_path / 'cache')
+    # A body that breaks on every attempt, and a key that does not exist (not retried)
+    client = FaultyS3Client(mirror, broken_streams={KEYS[0]: 10})
+    engine = fetcher(client, cache, max_attempts=3)
+    uncached = fetcher(FaultyS3Client(mirror, broken_streams={KEYS[1]: 10}), max_attempts=2)
+    try:
+        broken, missing = engine.run(engine.fetch_many([
+            FetchRequest(BUCKET, KEYS[0], destination=tmp_path / 'out' / 'a.grib2'),
+            FetchRequest(BUCKET, 'hrrr.20240506/missing.grib2', etag='"x"')
+        ]))
+        (direct,) = uncached.run(uncached.fetch_many([
+            FetchRequest(BUCKET, KEYS[1], destination=tmp_path / 'out' / 'b.grib2')
+        ]))
+    finally:
+        engine.close()
+        uncached.close()
+        cache.close()
+
+    assert broken.path is None and 'connection reset' in broken.error
+    assert client.calls[KEYS[0]] == 3
+    assert missing.path is None and 'NoSuchKey' in missing.error
+    assert client.calls['hrrr.20240506/missing.grib2'] == 1
+    assert direct.path is None
+    assert engine.metrics.failed == 2 and engine.metrics.retries == 2
+    assert part_files(tmp_path / 'cache', tmp_path / 'out') == []
+    assert not (tmp_path / 'out' / 'a.grib2').exists()
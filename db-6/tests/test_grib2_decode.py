@@ -0,0 +1,396 @@
+"""grib2_decode on synthetic GRIB2 messages: packing templates 5.0/5.2/5.3 and grids 3.0/3.30"""
+
+import struct
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from grib2_decode import DEFAULT_EARTH_RADIUS_M, GribDecodeError, GribDecoder, Grib2ForecastLoader, iter_messages
+
+REFERENCE_TIME = datetime(2024, 5, 6, 0)
+
+# (category, number) of the discipline 0 fields used here
+TMP = (0, 0)
+UGRD = (2, 2)
+APCP = (1, 8)
+
+HEIGHT_ABOVE_GROUND = 103
+SURFACE = 1
+
+# Bits per group reference in complex packing
+REFERENCE_BITS = 12
+
+
+def octets(value: int, size: int) -> bytes:
+    return int(value).to_bytes(size, 'big')
+
+
+def signed(value: float, size: int) -> bytes:
+    """GRIB2 sign-and-magnitude integer"""
+    value = int(round(value))
+    return octets((1 << (8 * size - 1)) | -value if value < 0 else value, size)
+
+
+def section(number: int, body: bytes) -> bytes:
+    return octets(len(body) + 5, 4) + bytes([number]) + body
+
+
+def identification(reference_time: datetime = REFERENCE_TIME) -> bytes:
+    return section(1, octets(7, 2) + octets(0, 2) + bytes([2, 1, 1]) + octets(reference_time.year, 2)
+                   + bytes([reference_time.month, reference_time.day, reference_time.hour, 0, 0, 0, 1]))
+
+
+def grid_header(points: int, template: int) -> bytes:
+    # Earth shape 6: sphere of 6,371,229 m
+    return (bytes([0]) + octets(points, 4) + bytes([0, 0]) + octets(template, 2) + bytes([6, 0])
+            + octets(0, 4) + bytes([0]) + octets(0, 4) + bytes([0]) + octets(0, 4))
+
+
+def latlon_grid(ni: int, nj: int, lat1: float, lon1: float, di: float, dj: float, scan: int = 0) -> bytes:
+    """Template 3.0; scan 0 runs west to east, then north to south"""
+    lat2 = lat1 + (nj - 1) * (dj if scan & 0x40 else -dj)
+    lon2 = lon1 + (ni - 1) * di
+    return section(3, grid_header(ni * nj, 0) + octets(ni, 4) + octets(nj, 4) + octets(0, 4)
+                   + octets(0xFFFFFFFF, 4) + signed(lat1 * 1e6, 4) + signed(lon1 * 1e6, 4) + bytes([48])
+                   + signed(lat2 * 1e6, 4) + signed(lon2 * 1e6, 4) + octets(di * 1e6, 4) + octets(dj * 1e6, 4)
+                   + bytes([scan]))
+
+
+def lambert_grid(nx: int, ny: int, lat1: float, lon1: float, lov: float, dx_m: float, latin1: float,
+                 latin2: float, grid_relative: bool = True, scan: int = 0x40) -> bytes:
+    """Template 3.30"""
+    flags = 0x30 | (0x08 if grid_relative else 0)
+    return section(3, grid_header(nx * ny, 30) + octets(nx, 4) + octets(ny, 4) + signed(lat1 * 1e6, 4)
+                   + signed(lon1 * 1e6, 4) + bytes([flags]) + signed(latin1 * 1e6, 4) + signed(lov * 1e6, 4)
+                   + octets(dx_m * 1000, 4) + octets(dx_m * 1000, 4) + bytes([0, scan])
+                   + signed(latin1 * 1e6, 4) + signed(latin2 * 1e6, 4) + signed(-90e6, 4) + signed(0, 4))
+
+
+def product(parameter, hours: int, surface: int, surface_value: int, accumulation_end: datetime = None) -> bytes:
+    """Template 4.0, or 4.8 when accumulation_end is given"""
+    category, number = parameter
+    body = (octets(0, 2) + octets(8 if accumulation_end else 0, 2) + bytes([category, number, 2, 0, 96])
+            + octets(0, 2) + bytes([0, 1]) + octets(hours, 4) + bytes([surface, 0]) + signed(surface_value, 4)
+            + bytes([255, 0]) + octets(0, 4))
+    if accumulation_end:
+        end = accumulation_end
+        body += (octets(end.year, 2) + bytes([end.month, end.day, end.hour, 0, 0, 1]) + octets(0, 4)
+                 + bytes([1, 2, 1]) + octets(6, 4) + bytes([255]) + octets(0, 4))
+    return section(4, body)
+
+
+def pack_bits(values, widths) -> bytes:
+    """values as consecutive big-endian bit fields, zero-padded to a whole octet"""
+    bits = ''.join(format(int(value), f'0{width}b') for value, width in zip(values, widths) if width)
+    bits += '0' * (-len(bits) % 8)
+    return int(bits, 2).to_bytes(len(bits) // 8, 'big') if bits else b''
+
+
+def simple_packing(values: np.ndarray, decimal_scale: int, nbits: int):
+    """Sections 5 (template 5.0) and 7 of values, lossless at decimal_scale"""
+    scaled = np.round(values * 10 ** decimal_scale).astype(np.int64)
+    reference = int(scaled.min())
+    packed = scaled - reference
+    assert packed.max() < 1 << nbits
+    representation = section(5, octets(len(values), 4) + octets(0, 2) + struct.pack('>f', reference)
+                             + signed(0, 2) + signed(decimal_scale, 2) + bytes([nbits, 0]))
+    return representation, section(7, pack_bits(packed, [nbits] * len(packed)))
+
+
+def complex_packing(values: np.ndarray, decimal_scale: int, order: int = 0, group: int = 7):
+    """Sections 5 (template 5.2, or 5.3 with order 1/2) and 7; NaN values are sent as missing"""
+    missing = np.isnan(values)
+    present = np.round(values[~missing] * 10 ** decimal_scale).astype(np.int64)
+    extra_octets = 4
+    leading = b''
+    if order:
+        differences = present.copy()
+        differences[:order] = 0
+        differences[order:] = np.diff(present, n=order)
+        minimum = int(differences[order:].min())
+        differences[order:] -= minimum
+        leading = b''.join(signed(value, extra_octets) for value in present[:order]) + signed(minimum, extra_octets)
+        present = differences
+
+    stream = np.zeros(len(values), dtype=np.int64)
+    stream[~missing] = present
+    references, widths, lengths, packed, packed_widths = [], [], [], [], []
+    for start in range(0, len(values), group):
+        chunk, chunk_missing = stream[start:start + group], missing[start:start + group]
+        if chunk_missing.all():
+            references.append((1 << REFERENCE_BITS) - 1)
+            widths.append(0)
+        else:
+            real = chunk[~chunk_missing]
+            reference = int(real.min())
+            # All ones at the group's width is reserved for missing
+            width = (int(real.max()) - reference + 1).bit_length()
+            references.append(reference)
+            widths.append(width)
+            for value, is_missing in zip(chunk, chunk_missing):
+                packed.append((1 << width) - 1 if is_missing else value - reference)
+                packed_widths.append(width)
+        lengths.append(len(chunk))
+    assert max(references) < 1 << REFERENCE_BITS
+
+    width_bits = max(max(widths).bit_length(), 1)
+    length_bits = max(lengths).bit_length()
+    template = 3 if order else 2
+    body = (octets(len(values), 4) + octets(template, 2) + struct.pack('>f', 0.0) + signed(0, 2)
+            + signed(decimal_scale, 2) + bytes([REFERENCE_BITS, 0, 1, 1]) + octets(0, 4) + octets(0, 4)
+            + octets(len(lengths), 4) + bytes([0, width_bits]) + octets(0, 4) + bytes([1])
+            + octets(lengths[-1], 4) + bytes([length_bits]))
+    if order:
+        body += bytes([order, extra_octets])
+    data = (leading + pack_bits(references, [REFERENCE_BITS] * len(references))
+            + pack_bits(widths, [width_bits] * len(widths)) + pack_bits(lengths, [length_bits] * len(lengths))
+            + pack_bits(packed, packed_widths))
+    return section(5, body), section(7, data)
+
+
+def message(grid: bytes, product_section: bytes, packing, bitmap: np.ndarray = None) -> bytes:
+    representation, data = packing
+    if bitmap is None:
+        bitmap_section = section(6, bytes([255]))
+    else:
+        bitmap_section = section(6, bytes([0]) + np.packbits(bitmap).tobytes())
+    body = identification() + grid + product_section + representation + bitmap_section + data + b'7777'
+    return b'GRIB' + b'\0\0' + bytes([0, 2]) + octets(16 + len(body), 8) + body
+
+
+def temperatures(count: int) -> np.ndarray:
+    """Kelvin values with 0.1 K resolution"""
+    return np.round(280.0 + 15.0 * np.sin(np.arange(count) / 3.0), 1)
+
+
+def decode_one(data: bytes):
+    fields = list(GribDecoder().decode_bytes(data))
+    assert len(fields) == 1
+    return fields[0]
+
+
+GRID = latlon_grid(ni=6, nj=5, lat1=45.0, lon1=260.0, di=0.25, dj=0.25)
+
+
+@pytest.mark.parametrize('nbits', [16, 12])
+def test_simple_packing_on_latlon_grid(nbits):
+    values = temperatures(30)
+    field = decode_one(message(GRID, product(TMP, 6, HEIGHT_ABOVE_GROUND, 2), simple_packing(values, 1, nbits)))
+
+    assert (field.variable, field.level) == ('TMP', '2 m above ground')
+    assert field.reference_time == REFERENCE_TIME
+    assert field.valid_time == datetime(2024, 5, 6, 6)
+    np.testing.assert_allclose(field.values, values, atol=1e-4)
+
+    grid = field.grid
+    # Rows run west to east from the north-west corner; longitudes come back in -180..180
+    assert (grid.latitudes[0], grid.longitudes[0]) == (45.0, -100.0)
+    assert (grid.latitudes[6], grid.longitudes[6]) == (44.75, -100.0)
+    assert (grid.latitudes[-1], grid.longitudes[-1]) == (44.0, -98.75)
+    assert (grid.resolution_x, grid.resolution_y, grid.crs) == (0.25, 0.25, 'EPSG:4326')
+
+
+def test_complex_packing_with_missing_values():
+    values = temperatures(30)
+    # A missing run inside a group, and a group that is missing entirely
+    values[[3, 4]] = np.nan
+    values[14:21] = np.nan
+    field = decode_one(message(GRID, product(TMP, 6, HEIGHT_ABOVE_GROUND, 2), complex_packing(values, 1)))
+    np.testing.assert_allclose(field.values, values, atol=1e-4)
+    np.testing.assert_array_equal(np.isnan(field.values), np.isnan(values))
+
+
+@pytest.mark.parametrize('order', [1, 2])
+def test_complex_packing_with_spatial_differencing(order):
+    values = temperatures(30)
+    values[[0, 9, 22]] = np.nan
+    field = decode_one(message(GRID, product(TMP, 6, HEIGHT_ABOVE_GROUND, 2),
+                               complex_packing(values, 1, order=order)))
+    np.testing.assert_allclose(field.values, values, atol=1e-4)
+    np.testing.assert_array_equal(np.isnan(field.values), np.isnan(values))
+
+
+def test_bitmap_expands_to_grid():
+    present = np.ones(30, dtype=bool)
+    present[[2, 11, 29]] = False
+    values = temperatures(30)
+    field = decode_one(message(GRID, product(TMP, 6, HEIGHT_ABOVE_GROUND, 2),
+                               simple_packing(values[present], 1, 16), bitmap=present))
+    np.testing.assert_allclose(field.values[present], values[present], atol=1e-4)
+    assert np.isnan(field.values[~present]).all()
+
+
+def test_accumulation_valid_time_is_window_end():
+    end = datetime(2024, 5, 6, 12)
+    values = np.round(np.linspace(0.0, 12.5, 30), 1)
+    field = decode_one(message(GRID, product(APCP, 6, SURFACE, 0, accumulation_end=end),
+                               simple_packing(values, 1, 8)))
+    assert (field.variable, field.level, field.valid_time) == ('APCP', 'surface', end)
+
+
+def lambert_xy(latitudes, longitudes, lov, latin, radius=DEFAULT_EARTH_RADIUS_M):
+    """Forward tangent Lambert conformal projection (metres)"""
+    phi0 = np.radians(latin)
+    n = np.sin(phi0)
+    f = np.cos(phi0) * np.tan(np.pi / 4 + phi0 / 2) ** n / n
+    rho = radius * f / np.tan(np.pi / 4 + np.radians(latitudes) / 2) ** n
+    theta = n * np.radians(longitudes - lov)
+    return rho * np.sin(theta), -rho * np.cos(theta)
+
+
+def test_lambert_grid_points_are_dx_apart_in_projection():
+    nx, ny, dx = 7, 5, 3000.0
+    lat1, lon1, lov, latin = 38.0, 262.0, 262.5, 38.5
+    grid_section = lambert_grid(nx, ny, lat1, lon1, lov, dx, latin, latin)
+    field = decode_one(message(grid_section, product(UGRD, 1, HEIGHT_ABOVE_GROUND, 10),
+                               simple_packing(temperatures(nx * ny), 1, 16)))
+    grid = field.grid
+
+    assert grid.latitudes[0] == pytest.approx(lat1, abs=1e-6)
+    assert grid.longitudes[0] == pytest.approx(lon1 - 360.0, abs=1e-6)
+    x, y = lambert_xy(grid.latitudes, grid.longitudes, lov - 360.0, latin)
+    i, j = np.tile(np.arange(nx), ny), np.repeat(np.arange(ny), nx)
+    # Scan mode 0x40: west to east, then south to north
+    np.testing.assert_allclose(x - x[0], i * dx, atol=1e-3)
+    np.testing.assert_allclose(y - y[0], j * dx, atol=1e-3)
+    assert grid.crs == '+proj=lcc +lat_1=38.5 +lat_2=38.5 +lon_0=262.5 +R=6371229'
+
+    # Grid-relative winds turn by the cone angle, zero on the central meridian
+    cone = np.sin(np.radians(latin))
+    np.testing.assert_allclose(grid.wind_rotation, cone * np.radians(grid.longitudes - (lov - 360.0)), atol=1e-9)
+
+
+def test_earth_relative_lambert_grid_has_no_rotation():
+    grid_section = lambert_grid(3, 3, 38.0, 262.0, 262.5, 3000.0, 38.5, 38.5, grid_relative=False)
+    field = decode_one(message(grid_section, product(TMP, 1, HEIGHT_ABOVE_GROUND, 2),
+                               simple_packing(temperatures(9), 1, 16)))
+    assert field.grid.wind_rotation is None
+
+
+def test_unsupported_packing_and_truncation():
+    data = message(GRID, product(TMP, 6, HEIGHT_ABOVE_GROUND, 2), simple_packing(temperatures(30), 1, 16))
+    jpeg = bytearray(data)
+    representation = jpeg.index(b'\x05\x00\x00\x00\x1e\x00\x00', 16)
+    jpeg[representation + 5:representation + 7] = octets(40, 2)
+    with pytest.raises(GribDecodeError, match='5.40'):
+        list(GribDecoder().decode(bytes(jpeg)))
+    with pytest.raises(GribDecodeError, match='Truncated'):
+        list(iter_messages(data[:-10]))
+
+
+def test_loader_converts_and_subsets_to_us_bounds():
+    # Three columns of this grid lie east of US_BOUNDS (-66)
+    grid_section = latlon_grid(ni=6, nj=2, lat1=40.0, lon1=293.5, di=0.25, dj=0.25)
+    values = temperatures(12)
+    data = message(grid_section, product(TMP, 6, HEIGHT_ABOVE_GROUND, 2), simple_packing(values, 1, 16))
+    loader = Grib2ForecastLoader(['Temperature'])
+    blocks = list(loader.blocks_for(data + data, 'gfs', 'gfs.t00z.pgrb2.0p25.f006'))
+
+    grid = next(iter(loader.decoder.grids.values()))
+    np.testing.assert_array_equal(grid.bounded_cells(), [0, 1, 2, 6, 7, 8])
+    # The repeated message is the same field and adds no rows
+    assert loader.rows == 6 and len(blocks) == 1
+
+
+class FakePostgres:
+    """Enough of a psycopg2 connection for Grib2ForecastLoader: binary COPY into the
+    stage table, the merge into grib2_forecasts keyed on forecast_id, and transactions"""
+
+    def __init__(self, columns):
+        self.key = columns.index('forecast_id')
+        self.forecasts = {}
+        self.stage = []
+        self.committed = {}
+        self.commits = self.rollbacks = 0
+        self.statements = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql):
+        self.statements.append(sql)
+        if sql.startswith('INSERT INTO grib2_forecasts'):
+            assert 'ON CONFLICT (forecast_id) DO UPDATE' in sql
+            self.forecasts.update((row[self.key], row) for row in self.stage)
+
+    def copy_expert(self, sql, stream, size):
+        self.statements.append(sql)
+        data = b''
+        chunk = stream.read(size)
+        while chunk:
+            data += chunk
+            chunk = stream.read(size)
+        position = 19  # signature, flags, header extension length
+        while True:
+            (count,) = struct.unpack_from('!h', data, position)
+            position += 2
+            if count < 0:
+                break
+            row = []
+            for _ in range(count):
+                (length,) = struct.unpack_from('!i', data, position)
+                position += 4
+                row.append(None if length < 0 else data[position:position + length])
+                position += max(length, 0)
+            self.stage.append(row)
+
+    def commit(self):
+        self.commits += 1
+        self.stage = []
+        self.committed = dict(self.forecasts)
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.stage = []
+        self.forecasts = dict(self.committed)
+
+    def close(self):
+        pass
+
+
+def test_loader_commits_per_file_and_reloads_idempotently(tmp_path):
+    grid_section = latlon_grid(ni=4, nj=3, lat1=40.0, lon1=260.0, di=0.25, dj=0.25)
+    data = message(grid_section, product(TMP, 6, HEIGHT_ABOVE_GROUND, 2), simple_packing(temperatures(12), 1, 16))
+    full, subset, broken = tmp_path / 'full.grib2', tmp_path / 'subset.grib2', tmp_path / 'broken.grib2'
+    full.write_bytes(data)
+    subset.write_bytes(data)
+    broken.write_bytes(data + data[:40])
+    loader = Grib2ForecastLoader(['Temperature'])
+    conn = FakePostgres(loader.encoder.column_names)
+
+    assert loader.load_file(conn, full, 'gfs', 'gfs.t00z.pgrb2.0p25.f006') == 12
+    with pytest.raises(GribDecodeError):
+        loader.load_file(conn, broken, 'gfs', 'broken')
+    # The same cycle again as an .idx subset replaces the rows instead of failing on forecast_id
+    assert loader.load(conn, [(subset, 'gfs', 'gfs.t00z.pgrb2.0p25.f006.subset')]) == 12
+
+    assert (conn.commits, conn.rollbacks) == (2, 1)
+    assert len(conn.forecasts) == 12
+    source = loader.encoder.column_names.index('source_file')
+    assert {row[source] for row in conn.forecasts.values()} == {b'gfs.t00z.pgrb2.0p25.f006.subset'}
+    assert all(sql.startswith(('CREATE TEMP TABLE', 'COPY grib2_forecasts_stage', 'INSERT INTO grib2_forecasts'))
+               for sql in conn.statements)
+    # The failed file's rows are not counted
+    assert loader.rows == 24
+
+
+def test_load_grib2_subsets_skips_files_that_fail(tmp_path):
+    pytest.importorskip('boto3')
+    from grib2_fetch import RangeFetchResult
+    from ingest_aws_opendata import AWSDataIngester
+
+    bucket = 'noaa-gfs-bdp-pds'
+    grid_section = latlon_grid(ni=4, nj=3, lat1=40.0, lon1=260.0, di=0.25, dj=0.25)
+    data = message(grid_section, product(TMP, 6, HEIGHT_ABOVE_GROUND, 2), simple_packing(temperatures(12), 1, 16))
+    keys = [f"gfs.20240506/00/atmos/gfs.t00z.pgrb2.0p25.f00{hour}" for hour in (6, 7, 8)]
+    for key, payload in zip(keys, [data, b'GRIB' + data[4:60], data]):
+        path = tmp_path / bucket / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(payload)
+    results = [RangeFetchResult(bucket, key, [], [], [], 0, None) for key in keys]
+    conn = FakePostgres(Grib2ForecastLoader().encoder.column_names)
+
+    loaded = AWSDataIngester('postgresql', s3_client=object()).load_grib2_subsets(conn, results, tmp_path)
+    assert loaded == [keys[0], keys[2]]
+    assert (conn.commits, conn.rollbacks) == (2, 1)
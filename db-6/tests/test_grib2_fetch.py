@@ -0,0 +1,120 @@
+"""GRIB2 .idx range fetches against a LocalS3Client mirror of a model bucket"""
+
+import pytest
+
+from async_s3 import AsyncS3Fetcher, ThreadedS3Transport
+from grib2_fetch import GribRangeFetcher, coalesce_ranges, fetch_async, parse_idx, select_messages
+from local_s3 import LocalS3Client
+
+BUCKET = 'noaa-hrrr-bdp-pds'
+KEY = 'hrrr.20240506/conus/hrrr.t00z.wrfsfcf01.grib2'
+
+# (message, variable, level, size); 3.1/3.2 are sub-messages sharing one offset
+# (the size goes on the last of them), REFC is a large message the fetch should skip
+MESSAGES = [
+    ('1', 'TMP', '2 m above ground', 1000),
+    ('2', 'REFC', 'entire atmosphere', 100_000),
+    ('3.1', 'UGRD', '10 m above ground', 0),
+    ('3.2', 'VGRD', '10 m above ground', 1500),
+    ('4', 'RH', '2 m above ground', 800),
+    ('5', 'APCP', 'surface', 600)
+]
+
+
+def grib_file():
+    """Opaque stand-in messages plus the .idx inventory describing them"""
+    data = b''
+    lines = []
+    for number, (message, variable, level, size) in enumerate(MESSAGES):
+        lines.append(f"{message}:{len(data)}:d=2024050600:{variable}:{level}:1 hour fcst:")
+        if size:
+            body = bytes([number]) * (size - 8)
+            data += b'GRIB' + body + b'7777'
+    return data, '\n'.join(lines) + '\n'
+
+
+def offsets():
+    data, index = grib_file()
+    return {entry.message: entry.offset for entry in parse_idx(index)}, len(data)
+
+
+class CountingS3Client:
+    """LocalS3Client recording the Range of every get_object"""
+
+    def __init__(self, client: LocalS3Client):
+        self.client = client
+        self.ranges = []
+
+    def get_object(self, Bucket, Key, Range=None):
+        if not Key.endswith('.idx'):
+            self.ranges.append(Range)
+        return self.client.get_object(Bucket=Bucket, Key=Key, Range=Range)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    data, index = grib_file()
+    path = tmp_path / 's3' / BUCKET / KEY
+    path.parent.mkdir(parents=True)
+    path.write_bytes(data)
+    path.with_name(path.name + '.idx').write_text(index)
+    return LocalS3Client(tmp_path / 's3')
+
+
+def test_sub_messages_sharing_an_offset_are_all_selected():
+    entries = parse_idx(grib_file()[1])
+    selected, missing = select_messages(entries, ['WindSpeed', 'WindDirection'])
+
+    assert [(entry.message, entry.variable) for entry in selected] == [('3.1', 'UGRD'), ('3.2', 'VGRD')]
+    assert selected[0].offset == selected[1].offset and selected[0].end == selected[1].end
+    assert missing == []
+    assert coalesce_ranges(selected) == [(selected[0].offset, selected[0].end)]
+
+
+def test_fetch_skips_unselected_messages(mirror, tmp_path):
+    client = CountingS3Client(mirror)
+    data, _ = grib_file()
+    starts, size = offsets()
+    result = GribRangeFetcher(client).fetch(BUCKET, KEY, ['WindChill', 'Precipitation', 'CloudBase'],
+                                            tmp_path / 'out.grib2')
+
+    assert [entry.message for entry in result.entries] == ['1', '3.1', '3.2', '5']
+    assert result.missing == ['CloudBase']
+    # RH sits in a gap under max_gap, so UGRD/VGRD through APCP is one request to end of file
+    assert result.ranges == [(0, starts['2'] - 1), (starts['3.1'], None)]
+    assert sorted(client.ranges) == [f"bytes=0-{starts['2'] - 1}", f"bytes={starts['3.1']}-"]
+    assert (tmp_path / 'out.grib2').read_bytes() == data[:starts['2']] + data[starts['3.1']:]
+    assert result.bytes_fetched == size - (starts['3.1'] - starts['2'])
+    assert result.file_size == size
+    assert list(tmp_path.glob('*.part')) == []
+
+
+def test_fetch_without_coalescing_requests_each_message(mirror, tmp_path):
+    client = CountingS3Client(mirror)
+    data, _ = grib_file()
+    starts, _ = offsets()
+    data_out, result = GribRangeFetcher(client, max_gap=0).fetch_bytes(BUCKET, KEY, ['Temperature', 'WindSpeed',
+                                                                                      'Precipitation'])
+
+    assert result.ranges == [(0, starts['2'] - 1), (starts['3.1'], starts['4'] - 1), (starts['5'], None)]
+    assert len(client.ranges) == 3
+    assert data_out == data[:starts['2']] + data[starts['3.1']:starts['4']] + data[starts['5']:]
+    assert result.file_size is not None
+
+
+def test_fetch_async_matches_threaded_fetch(mirror, tmp_path):
+    engine = AsyncS3Fetcher(ThreadedS3Transport(mirror, workers=4))
+    parameters = ['ApparentTemperature', 'Pressure']
+    try:
+        result = engine.run(fetch_async(engine, BUCKET, KEY, parameters, tmp_path / 'async.grib2'))
+    finally:
+        engine.close()
+    expected, threaded = GribRangeFetcher(mirror).fetch_bytes(BUCKET, KEY, parameters)
+
+    assert (tmp_path / 'async.grib2').read_bytes() == expected
+    assert result.entries == threaded.entries and result.ranges == threaded.ranges
+    assert result.missing == ['Pressure']
+    assert engine.metrics.requests == 1 + len(result.ranges)
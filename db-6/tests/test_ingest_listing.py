@@ -0,0 +1,81 @@
+"""Paginated, concurrent cycle listings of AWSDataIngester against a LocalS3Client mirror"""
+
+import threading
+from collections import Counter
+
+import pytest
+
+from local_s3 import LocalS3Client
+
+pytest.importorskip('boto3')
+from ingest_aws_opendata import LISTING_PAGE_SIZE, AWSDataIngester  # noqa: E402
+
+DATE = '20240506'
+FILES_PER_CYCLE = {('noaa_gfs', '00'): 1203, ('noaa_gfs', '06'): 1001, ('noaa_hrrr', '12'): 1500}
+
+
+class CountingS3Client(LocalS3Client):
+    """LocalS3Client counting list_objects_v2 pages per prefix"""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.pages = Counter()
+        self._lock = threading.Lock()
+
+    def list_objects_v2(self, Bucket, Prefix='', **kwargs):
+        with self._lock:
+            self.pages[Prefix] += 1
+        return super().list_objects_v2(Bucket=Bucket, Prefix=Prefix, **kwargs)
+
+
+def cycle_keys(ingester, source_key, cycle, count):
+    prefix = ingester.cycle_prefix(source_key, DATE, cycle)
+    if source_key == 'noaa_gfs':
+        return [f"{prefix}gfs.t{cycle}z.pgrb2.0p25.f{hour:04d}" for hour in range(count)]
+    return [f"{prefix}wrfprsf{hour:04d}.grib2" for hour in range(count)]
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    root = tmp_path / 's3'
+    ingester = AWSDataIngester(s3_client=object())
+    for (source_key, cycle), count in FILES_PER_CYCLE.items():
+        bucket = root / AWSDataIngester.DATA_SOURCES[source_key]['bucket']
+        for key in cycle_keys(ingester, source_key, cycle, count):
+            path = bucket / key
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b'GRIB')
+            # Inventories and other HRRR products share the prefix but are not listed
+            path.with_name(path.name + '.idx').write_bytes(b'')
+            if source_key == 'noaa_hrrr':
+                path.with_name(path.name.replace('wrfprs', 'wrfsfc')).write_bytes(b'GRIB')
+    return CountingS3Client(root)
+
+
+def test_pagination_returns_every_key(mirror):
+    ingester = AWSDataIngester(s3_client=mirror)
+    prefix = ingester.cycle_prefix('noaa_gfs', DATE, '00')
+    objects = list(ingester.iter_objects('noaa-gfs-bdp-pds', prefix))
+
+    # Objects and their .idx files
+    assert len(objects) == 2 * 1203
+    assert len({obj['Key'] for obj in objects}) == len(objects)
+    assert mirror.pages[prefix] == -(-len(objects) // LISTING_PAGE_SIZE)
+
+
+def test_list_inventory_files_objects_under_their_request(mirror, capsys):
+    ingester = AWSDataIngester(s3_client=mirror)
+    requests = ingester.inventory_requests(['noaa_gfs'], [DATE]) + [('noaa_hrrr', DATE, '12'),
+                                                                    ('noaa_rap', DATE, '00')]
+    inventory = ingester.list_inventory(requests, workers=4)
+
+    assert list(inventory) == requests
+    for (source_key, date_str, cycle), objects in inventory.items():
+        expected = cycle_keys(ingester, source_key, cycle, FILES_PER_CYCLE.get((source_key, cycle), 0))
+        assert sorted(obj['Key'] for obj in objects) == sorted(expected)
+    assert [len(inventory[('noaa_gfs', DATE, cycle)]) for cycle in ('00', '06', '12', '18')] == [1203, 1001, 0, 0]
+    # 1500 products, their .idx files and 1500 wrfsfc files
+    assert mirror.pages[ingester.cycle_prefix('noaa_hrrr', DATE, '12')] == 5
+    # The RAP bucket is not mirrored: reported, and an empty listing
+    assert inventory[('noaa_rap', DATE, '00')] == []
+    assert 'Error listing noaa_rap/20240506/00' in capsys.readouterr().out
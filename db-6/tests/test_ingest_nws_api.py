@@ -0,0 +1,73 @@
+"""Observation parsing and the row-by-row load path of NWSAPIIngester"""
+
+import pytest
+
+from ingest_nws_api import NWSAPIIngester
+
+
+def quantity(value, unit):
+    return {'value': value, 'unitCode': f"wmoUnit:{unit}", 'qualityControl': 'V'}
+
+
+OBSERVATION = {
+    'geometry': {'type': 'Point', 'coordinates': [-97.60056, 35.38889]},
+    'properties': {
+        'station': 'https://api.weather.gov/stations/KOKC',
+        'timestamp': '2024-05-06T23:00:00+00:00',
+        'temperature': quantity(26.0, 'degC'),
+        'dewpoint': quantity(-40.0, 'degC'),
+        'relativeHumidity': quantity(55.1, 'percent'),
+        'windSpeed': quantity(36.0, 'km_h-1'),
+        'windDirection': quantity(180, 'degree_(angle)'),
+        'barometricPressure': quantity(101325.0, 'Pa'),
+        'visibility': quantity(16090.0, 'm'),
+        'precipitationLastHour': quantity(None, 'mm')
+    }
+}
+
+
+def test_observation_record_converts_to_stored_units():
+    record = NWSAPIIngester.observation_record('KOKC', OBSERVATION)
+
+    assert record['observation_id'] == 'KOKC_2024-05-06T23:00:00+00:00'
+    assert (record['station_latitude'], record['station_longitude']) == (35.38889, -97.60056)
+    assert record['temperature'] == pytest.approx(78.8)
+    assert record['dewpoint'] == pytest.approx(-40.0)
+    assert record['humidity'] == 55.1
+    assert record['wind_speed'] == pytest.approx(22.369, abs=1e-3)
+    assert record['wind_direction'] == 180
+    assert record['pressure'] == pytest.approx(29.921, abs=1e-3)
+    assert record['visibility'] == pytest.approx(9.998, abs=1e-3)
+    assert record['precipitation_amount'] is None
+
+
+def test_observation_record_in_m_s_and_mm():
+    props = dict(OBSERVATION['properties'], windSpeed=quantity(10.0, 'm_s-1'),
+                 precipitationLastHour=quantity(25.4, 'mm'), temperature=None)
+    record = NWSAPIIngester.observation_record('KOKC', {'geometry': OBSERVATION['geometry'], 'properties': props})
+    assert record['wind_speed'] == pytest.approx(22.369, abs=1e-3)
+    assert record['precipitation_amount'] == pytest.approx(1.0)
+    assert record['temperature'] is None
+
+
+@pytest.fixture
+def ingester():
+    ingester = NWSAPIIngester(db_type='databricks')
+    yield ingester
+    ingester.client.close()
+
+
+def test_a_failing_row_keeps_the_rows_before_it(ingester, warehouse, capsys):
+    warehouse.create_table('weather_observations', checks=["station_id <> 'KBAD'"])
+    records = [
+        NWSAPIIngester.observation_record(station_id, OBSERVATION) for station_id in ('KOKC', 'KBAD', 'KTUL')
+    ] + [dict(NWSAPIIngester.observation_record('KLAW', OBSERVATION), station_latitude=None)]
+    accepted = []
+
+    assert ingester.load_records(warehouse, 'weather_observations', records, 'observations', accepted) == 2
+    assert [record['station_id'] for record in accepted] == ['KOKC', 'KTUL']
+    assert warehouse.rows("SELECT station_id, temperature FROM weather_observations ORDER BY station_id") == \
+        [('KOKC', 78.8), ('KTUL', 78.8)]
+    out = capsys.readouterr().out
+    assert 'Error inserting observations KBAD_' in out
+    assert 'Skipping observations KLAW_2024-05-06T23:00:00+00:00: station_latitude: missing required value' in out
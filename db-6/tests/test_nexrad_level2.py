@@ -0,0 +1,224 @@
+"""nexrad_level2 decoding of synthetic Archive II volumes"""
+
+import bz2
+import gzip
+import struct
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from nexrad_level2 import (ARCHIVE_EPOCH, FRAME_SIZE, MESSAGE_HEADER, MOMENT_HEADER, MSG31_HEADER, RADIAL_BLOCK,
+                           SPEED_OF_LIGHT_MS, VOLUME_HEADER, Level2Decoder, NexradDecodeError, NexradLevel2Loader)
+
+SITE = 'KTLX'
+LATITUDE, LONGITUDE = 35.333, -97.278
+VOLUME_TIME = datetime(2024, 5, 6, 23, 0)
+UNAMBIGUOUS_RANGE_TENTHS_KM = 1175
+NYQUIST_HUNDREDTHS = 2650
+RADIALS_PER_SWEEP = 8
+RADIALS_PER_RECORD = 6
+
+# Moment layout: (first gate m, gate spacing m, gates, scale, offset)
+REF = (2125, 250, 40, 2.0, 66.0)
+VEL = (2125, 250, 30, 2.0, 129.0)
+VEL_SHIFTED = (2375, 250, 30, 2.0, 129.0)
+
+# (elevation number, elevation angle, {moment name: layout}); 1 and 2 are a split cut
+CUTS = [
+    (1, 0.5, {b'REF': REF}),
+    (2, 0.5, {b'VEL': VEL, b'SW ': VEL}),
+    (3, 1.5, {b'REF': REF, b'VEL': VEL_SHIFTED, b'SW ': VEL_SHIFTED})
+]
+
+
+def raw_codes(name: bytes, radial: int, gates: int) -> np.ndarray:
+    """Deterministic codes covering below threshold (0) and range folded (1)"""
+    step = {b'REF': 3, b'VEL': 5, b'SW ': 7}[name]
+    return ((np.arange(gates) * step + radial) % 200).astype(np.uint8)
+
+
+def physical(name: bytes, radial: int, layout) -> np.ndarray:
+    _, _, gates, scale, offset = layout
+    codes = raw_codes(name, radial, gates)
+    return np.where(codes <= 1, np.nan, (codes - offset) / scale)
+
+
+def message_31(radial: int, elevation_number: int, elevation: float, moments, julian_date: int,
+               milliseconds: int) -> bytes:
+    """One message 31 radial, with its CTM and message headers"""
+    volume = struct.pack('>1s3sHBBffhHfffffHH', b'R', b'VOL', 44, 1, 0, LATITUDE, LONGITUDE,
+                         370, 20, 0, 0, 0, 0, 0, 212, 0)
+    elevation_block = struct.pack('>1s3sHhf', b'R', b'ELV', 12, 0, 0)
+    radial_block = RADIAL_BLOCK.pack(b'R', b'RAD', 20, UNAMBIGUOUS_RANGE_TENTHS_KM, 0, 0, NYQUIST_HUNDREDTHS, 0)
+    blocks = [volume, elevation_block, radial_block]
+    for name, (first_gate, spacing, gates, scale, offset) in moments.items():
+        header = MOMENT_HEADER.pack(b'D', name, 0, gates, first_gate, spacing, 0, 0, 0, 8, scale, offset)
+        blocks.append(header + raw_codes(name, radial, gates).tobytes())
+
+    pointers, position = [], MSG31_HEADER.size + 4 * len(blocks)
+    for block in blocks:
+        pointers.append(position)
+        position += len(block)
+    azimuth = (radial + 0.5) * 360.0 / RADIALS_PER_SWEEP
+    header = MSG31_HEADER.pack(SITE.encode(), milliseconds, julian_date, radial + 1, azimuth, 0, 0, position,
+                               1, 0, elevation_number, 0, elevation, 0, 0, len(blocks))
+    body = header + struct.pack(f'>{len(pointers)}I', *pointers) + b''.join(blocks)
+    body += b'\0' * (len(body) % 2)
+    size = (MESSAGE_HEADER.size + len(body)) // 2
+    return b'\0' * 12 + MESSAGE_HEADER.pack(size, 0, 31, 0, julian_date, milliseconds, 1, 1) + body
+
+
+def archive_volume(cuts=CUTS) -> bytes:
+    """Archive II volume: header, a metadata record of fixed frames, then bzip2 records of radials"""
+    julian_date = (VOLUME_TIME - ARCHIVE_EPOCH).days
+    milliseconds = (VOLUME_TIME.hour * 3600 + VOLUME_TIME.minute * 60) * 1000
+    frame = b'\0' * 12 + MESSAGE_HEADER.pack(1208, 0, 2, 0, julian_date, 0, 1, 1)
+    records = [(frame + b'\0' * (FRAME_SIZE - len(frame))) * 3]
+    radials = [message_31(radial, number, elevation, moments, julian_date, milliseconds + radial * 30)
+               for number, elevation, moments in cuts for radial in range(RADIALS_PER_SWEEP)]
+    records += [b''.join(radials[start:start + RADIALS_PER_RECORD])
+                for start in range(0, len(radials), RADIALS_PER_RECORD)]
+
+    data = VOLUME_HEADER.pack(b'AR2V0006.', b'042', julian_date, milliseconds, SITE.encode())
+    for index, record in enumerate(records):
+        compressed = bz2.compress(record)
+        size = -len(compressed) if index == len(records) - 1 else len(compressed)
+        data += struct.pack('>i', size) + compressed
+    return data
+
+
+@pytest.fixture(scope='module')
+def volume():
+    with Level2Decoder(workers=1) as decoder:
+        return decoder.decode(archive_volume())
+
+
+def test_decode_header_and_site(volume):
+    assert volume.header.site_id == SITE
+    assert volume.header.volume_time == VOLUME_TIME
+    assert volume.header.volume_number == 42
+    assert volume.compression_type == 'bzip2'
+    assert volume.decompression_status == 'Success'
+    assert volume.radials == RADIALS_PER_SWEEP * len(CUTS)
+    assert volume.latitude == pytest.approx(LATITUDE)
+    assert volume.longitude == pytest.approx(LONGITUDE)
+    assert volume.height_m == 390.0
+    assert volume.vcp == 212
+
+
+def test_sweeps_follow_scan_order_and_range_axis(volume):
+    sweeps = list(volume.sweeps())
+    assert [sweep.elevation_number for sweep in sweeps] == [1, 2, 3]
+
+    surveillance, doppler, upper = sweeps
+    np.testing.assert_allclose(surveillance.ranges_m, REF[0] + REF[1] * np.arange(REF[2]))
+    # A cut without reflectivity takes velocity's gates
+    np.testing.assert_allclose(doppler.ranges_m, VEL[0] + VEL[1] * np.arange(VEL[2]))
+    np.testing.assert_allclose(surveillance.azimuth, (np.arange(RADIALS_PER_SWEEP) + 0.5) * 45.0)
+
+    for radial in range(RADIALS_PER_SWEEP):
+        np.testing.assert_allclose(surveillance.moments['reflectivity'][radial], physical(b'REF', radial, REF))
+        np.testing.assert_allclose(doppler.moments['velocity'][radial], physical(b'VEL', radial, VEL))
+        assert np.isnan(surveillance.moments['velocity'][radial]).all()
+        assert np.isnan(doppler.moments['reflectivity'][radial]).all()
+        np.testing.assert_array_equal(doppler.range_folded[radial],
+                                      raw_codes(b'VEL', radial, VEL[2]) == 1)
+
+    # Velocity starting one gate further out is mapped onto reflectivity's gates
+    velocity = upper.moments['velocity']
+    assert np.isnan(velocity[:, 0]).all()
+    np.testing.assert_allclose(velocity[0, 1:VEL_SHIFTED[2] + 1], physical(b'VEL', 0, VEL_SHIFTED))
+    assert np.isnan(velocity[:, VEL_SHIFTED[2] + 1:]).all()
+
+    prf = round(SPEED_OF_LIGHT_MS / (2.0 * UNAMBIGUOUS_RANGE_TENTHS_KM * 100.0))
+    assert (surveillance.prf_hz == prf).all()
+    np.testing.assert_allclose(surveillance.nyquist_ms, NYQUIST_HUNDREDTHS * 0.01, rtol=1e-6)
+
+
+def test_gate_locations_move_out_along_azimuth(volume):
+    sweep = next(volume.sweeps())
+    # Radial 1 points north-east (67.5 degrees)
+    latitudes, longitudes, heights = volume.gate_locations(sweep, np.array([1, 1]), np.array([0, 39]))
+    assert latitudes[1] > latitudes[0] > LATITUDE
+    assert longitudes[1] > longitudes[0] > LONGITUDE
+    assert heights[1] > heights[0] > volume.height_m
+
+
+def test_outer_gzip_and_process_pool_decode_the_same():
+    with Level2Decoder(workers=2) as decoder:
+        pooled = decoder.decode(gzip.compress(archive_volume()))
+    with Level2Decoder(workers=1) as decoder:
+        serial = decoder.decode(archive_volume())
+    assert pooled.compression_type == 'gzip+bzip2'
+    for a, b in zip(pooled.sweeps(), serial.sweeps()):
+        for key in a.moments:
+            np.testing.assert_array_equal(a.moments[key], b.moments[key])
+
+
+def test_corrupt_record_is_partial():
+    data = bytearray(archive_volume())
+    # Damage the bzip2 stream of the first radial record, after the metadata record
+    metadata_size = struct.unpack_from('>i', data, VOLUME_HEADER.size)[0]
+    damaged = VOLUME_HEADER.size + 4 + metadata_size + 4 + 40
+    data[damaged:damaged + 8] = b'\xff' * 8
+    with Level2Decoder(workers=1) as decoder:
+        volume = decoder.decode(bytes(data))
+    assert volume.decompression_status == 'Partial'
+    assert volume.records_decoded == volume.records_total - 1
+
+
+def test_not_archive_ii():
+    with Level2Decoder(workers=1) as decoder, pytest.raises(NexradDecodeError):
+        decoder.decode(b'not a radar volume' * 4)
+
+
+def copy_rows(blocks):
+    """Fields of every binary COPY tuple in blocks, None for NULL"""
+    rows = []
+    for block in blocks:
+        position = 0
+        while position < len(block):
+            (count,) = struct.unpack_from('!h', block, position)
+            position += 2
+            fields = []
+            for _ in range(count):
+                (length,) = struct.unpack_from('!i', block, position)
+                position += 4
+                fields.append(None if length < 0 else block[position:position + length])
+                position += max(length, 0)
+            rows.append(fields)
+    return rows
+
+
+def valid_gates(volume, min_reflectivity=None):
+    total = 0
+    for sweep in volume.sweeps():
+        reflectivity = sweep.moments['reflectivity']
+        if min_reflectivity is not None:
+            reflectivity = np.where(reflectivity >= min_reflectivity, reflectivity, np.nan)
+        total += int((np.isfinite(reflectivity) | np.isfinite(sweep.moments['velocity'])).sum())
+    return total
+
+
+def test_blocks_for_encodes_every_valid_gate(volume):
+    loader = NexradLevel2Loader(block_rows=50)
+    blocks = list(loader.blocks_for(volume, 's3://noaa-nexrad-level2/KTLX20240506_230000_V06',
+                                    'noaa-nexrad-level2', 'KTLX20240506_230000_V06'))
+    rows = copy_rows(blocks)
+    assert len(rows) == loader.rows == valid_gates(volume)
+    assert loader.blocks == len(blocks) > 1
+    assert all(len(row) == len(loader.encoder.columns) for row in rows)
+
+    columns = loader.encoder.column_names
+    ids = [row[columns.index('radar_data_id')].decode() for row in rows]
+    assert len(set(ids)) == len(ids)
+    assert ids[0].startswith('KTLX-20240506230000-e01-001-')
+    assert {row[columns.index('data_type')] for row in rows} == {b'Reflectivity', b'Velocity'}
+    assert {row[columns.index('site_id')] for row in rows} == {b'KTLX'}
+
+
+def test_blocks_for_min_reflectivity_keeps_velocity_gates(volume):
+    loader = NexradLevel2Loader(min_reflectivity=20.0)
+    rows = copy_rows(loader.blocks_for(volume, 'local'))
+    assert len(rows) == valid_gates(volume, 20.0) < valid_gates(volume)
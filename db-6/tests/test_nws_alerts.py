@@ -0,0 +1,116 @@
+"""Alert parsing, the alert watermark and the weather_alerts upsert"""
+
+from datetime import datetime
+
+import pytest
+
+from ingest_manifest import IngestManifest
+from ingest_nws_api import NWSAPIIngester
+from nws_alerts import alert_record, latest_sent, unseen_alerts
+
+POLYGON = {'type': 'Polygon', 'coordinates': [[[-97.5, 35.1], [-97.0, 35.1], [-97.0, 35.6], [-97.5, 35.1]]]}
+
+
+def alert(alert_id: str, sent: str, event: str = 'Severe Thunderstorm Warning', **properties):
+    props = {'id': alert_id, 'sent': sent, 'event': event, 'severity': 'Severe', **properties}
+    return {'id': f"https://api.weather.gov/alerts/{alert_id}", 'geometry': None, 'properties': props}
+
+
+def test_alert_record_slices_geocodes_and_bbox():
+    feature = alert('urn:oid:1', '2024-05-06T18:05:00-05:00', headline='h' * 600,
+                    geocode={'UGC': ['OKC109', 'OKC027'], 'SAME': ['040109', '040027']},
+                    parameters={'AWIPSidentifier': ['SVROUN']}, onset='2024-05-06T18:05:00-05:00')
+    feature['geometry'] = POLYGON
+    record = alert_record(feature)
+
+    assert record['alert_id'] == 'urn:oid:1'
+    assert (record['geocode_type'], record['geocode_value'], record['state_code']) == ('UGC', 'OKC109', 'OK')
+    assert record['county_code'] == '40109'
+    assert record['cwa_code'] == 'OUN'
+    assert (record['bbox_west'], record['bbox_south'], record['bbox_east'], record['bbox_north']) == \
+        (-97.5, 35.1, -97.0, 35.6)
+    assert record['alert_geometry'].startswith('POLYGON((-97.5 35.1, -97.0 35.1')
+    assert record['alert_sent'] == record['onset_time'] == datetime(2024, 5, 6, 23, 5)
+    assert len(record['headline']) == 500
+
+
+def test_alert_record_without_polygon_or_properties():
+    zone_alert = alert_record(alert('urn:oid:2', '2024-05-06T23:00:00Z', geocode={'SAME': ['40109']},
+                                    parameters={'AWIPSidentifier': ['SVR']}))
+    assert zone_alert['alert_geometry'] is None and zone_alert['bbox_west'] is None
+    assert zone_alert['county_code'] is None and zone_alert['cwa_code'] is None
+    assert zone_alert['geocode_type'] is None
+
+    bare = alert_record({'id': 'urn:oid:3', 'properties': None})
+    assert bare['alert_id'] == 'urn:oid:3'
+    assert bare['alert_sent'] is None and bare['headline'] == ''
+
+
+def test_latest_sent_compares_in_utc():
+    features = [
+        alert('a', '2024-05-06T18:00:00-05:00'),
+        alert('b', '2024-05-06T23:00:00Z'),
+        alert('c', '2024-05-06T22:59:00Z'),
+        alert('d', None),
+        {'properties': None}
+    ]
+    assert latest_sent(features) == ('2024-05-06T18:00:00-05:00', ['a', 'b'])
+    assert latest_sent([{'properties': None}]) is None
+
+
+def test_unseen_alerts_drops_ids_already_loaded_at_the_watermark():
+    features = [
+        alert('a', '2024-05-06T23:00:00Z'),
+        alert('b', '2024-05-06T18:00:00-05:00'),
+        alert('c', '2024-05-06T23:00:00Z'),
+        alert('a', '2024-05-06T23:30:00Z'),  # a new version of a
+        {'properties': None}
+    ]
+    unseen = unseen_alerts(features, ('2024-05-06T23:00:00+00:00', ['a', 'b']))
+    assert [((f['properties'] or {}).get('id'), (f['properties'] or {}).get('sent')) for f in unseen] == [
+        ('c', '2024-05-06T23:00:00Z'), ('a', '2024-05-06T23:30:00Z'), (None, None)
+    ]
+    assert unseen_alerts(features, None) == features
+
+
+@pytest.fixture
+def ingester():
+    ingester = NWSAPIIngester(db_type='databricks')
+    yield ingester
+    ingester.client.close()
+
+
+def poll(ingester, warehouse, manifest, features):
+    async def alerts_since(since, area=None):
+        return features
+    ingester.alerts_since = alerts_since
+    return ingester.ingest_alerts(warehouse, manifest)
+
+
+def stored_alerts(warehouse):
+    return dict(warehouse.rows("SELECT alert_id, event_type FROM weather_alerts ORDER BY alert_id"))
+
+
+def test_only_newer_versions_replace_stored_alerts(ingester, warehouse, tmp_path):
+    warehouse.create_table('weather_alerts')
+    with IngestManifest(tmp_path / 'manifest.sqlite') as manifest:
+        poll(ingester, warehouse, manifest, [alert('a', '2024-05-06T23:00:00Z'),
+                                             alert('b', '2024-05-06T23:00:00Z')])
+        poll(ingester, warehouse, manifest, [alert('a', '2024-05-06T22:00:00Z', event='Stale'),
+                                             alert('b', '2024-05-06T23:30:00Z', event='Updated')])
+        assert stored_alerts(warehouse) == {'a': 'Severe Thunderstorm Warning', 'b': 'Updated'}
+        assert manifest.alert_watermark('all') == ('2024-05-06T23:30:00Z', ['b'])
+
+
+def test_watermark_only_covers_committed_alerts(ingester, warehouse, tmp_path):
+    warehouse.create_table('weather_alerts', checks=["event_type <> 'Rejected'"])
+    features = [alert('a', '2024-05-06T23:00:00Z'), alert('b', '2024-05-06T23:10:00Z'),
+                alert('c', '2024-05-06T23:20:00Z', event='Rejected')]
+    with IngestManifest(tmp_path / 'manifest.sqlite') as manifest:
+        poll(ingester, warehouse, manifest, features)
+        stored = stored_alerts(warehouse)
+        watermark = manifest.alert_watermark('all')
+
+    # c failed; a and b stay committed and the watermark stops at b, so c is fetched again
+    assert stored == {'a': 'Severe Thunderstorm Warning', 'b': 'Severe Thunderstorm Warning'}
+    assert watermark == ('2024-05-06T23:10:00Z', ['b'])
@@ -0,0 +1,84 @@
+"""Value validation shared by the bulk and row-by-row NWS loaders"""
+
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from nws_bulk import validate_record, validate_value
+
+
+@pytest.mark.parametrize('value, column_type, expected', [
+    (72.456, 'numeric(6,2)', Decimal('72.46')),
+    (-9999.994, 'numeric(6,2)', Decimal('-9999.99')),
+    ('38.8977123', 'numeric(10,7)', Decimal('38.8977123')),
+    (270.4, 'integer', 270),
+    ('KOKC', 'varchar(4)', 'KOKC'),
+    ('2024-05-06T18:00:00-05:00', 'timestamp', datetime(2024, 5, 6, 23, 0)),
+    ('2024-05-06T23:00:00Z', 'timestamp', datetime(2024, 5, 6, 23, 0)),
+    (datetime(2024, 5, 6, 23, 0), 'timestamp', datetime(2024, 5, 6, 23, 0)),
+    ('2024-05-06', 'date', date(2024, 5, 6)),
+    (1, 'boolean', True)
+])
+def test_validate_value_converts(value, column_type, expected):
+    assert validate_value(value, column_type, nullable=False) == expected
+
+
+@pytest.mark.parametrize('value, column_type', [
+    (10000.0, 'numeric(6,2)'),
+    (9999.995, 'numeric(6,2)'),  # rounds up out of range
+    (float('nan'), 'numeric(6,2)'),
+    (float('inf'), 'numeric(8,2)'),
+    ('calm', 'numeric(6,2)'),
+    (2 ** 31, 'integer'),
+    ('KOKCX', 'varchar(4)'),
+    ('yesterday', 'timestamp')
+])
+def test_validate_value_rejects(value, column_type):
+    with pytest.raises(ValueError):
+        validate_value(value, column_type, nullable=True)
+
+
+@pytest.mark.parametrize('value', [None, ''])
+def test_missing_values(value):
+    assert validate_value(value, 'numeric(6,2)', nullable=True) is None
+    with pytest.raises(ValueError, match='missing required value'):
+        validate_value(value, 'varchar(50)', nullable=False)
+
+
+def observation(**overrides):
+    record = {
+        'observation_id': 'KOKC_2024-05-06T23:00:00+00:00', 'station_id': 'KOKC', 'station_name': 'Oklahoma City',
+        'observation_time': '2024-05-06T23:00:00+00:00', 'station_latitude': 35.38889,
+        'station_longitude': -97.60056, 'temperature': 78.8, 'humidity': 55.1, 'wind_direction': 180.0
+    }
+    record.update(overrides)
+    return record
+
+
+def test_validate_record_nulls_out_of_range_measurements():
+    nulled = {}
+    values, reason = validate_record('weather_observations', observation(temperature=12345.0, humidity=1000.0),
+                                     nulled)
+    assert reason is None
+    row = dict(zip(['observation_id', 'station_id', 'station_name', 'observation_time', 'station_latitude',
+                    'station_longitude', 'temperature', 'dewpoint', 'humidity', 'wind_speed', 'wind_direction'],
+                   values))
+    assert row['temperature'] is None and row['humidity'] is None and row['dewpoint'] is None
+    assert row['observation_time'] == datetime(2024, 5, 6, 23, 0)
+    assert row['station_latitude'] == Decimal('35.3888900')
+    assert row['wind_direction'] == 180
+    assert nulled == {'temperature': 1, 'humidity': 1}
+
+
+@pytest.mark.parametrize('overrides, reason', [
+    ({'station_latitude': 1000.0}, 'station_latitude'),
+    ({'observation_time': None}, 'observation_time: missing required value'),
+    ({'station_id': 'K' * 51}, 'station_id: longer than 50 characters'),
+    ({'observation_time': 'not a time'}, 'observation_time')
+])
+def test_validate_record_rejects_unstorable_required_values(overrides, reason):
+    nulled = {}
+    values, message = validate_record('weather_observations', observation(**overrides), nulled)
+    assert values is None and message.startswith(reason)
+    assert nulled == {}
@@ -0,0 +1,147 @@
+"""AsyncNWSClient rate limiting and retries against a local fake of api.weather.gov"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import nws_client
+from nws_client import RATE_RECOVERY_STEP, AsyncNWSClient, TokenBucket, retry_after_seconds
+
+RETRY_AFTER_SECONDS = 0.3
+
+
+class FakeNWS(ThreadingHTTPServer):
+    """Serves scripted statuses per path, then 200 with a small JSON body; records request times"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeNWSHandler)
+        self.script = defaultdict(list)
+        self.hits = defaultdict(list)
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class FakeNWSHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path].append(time.monotonic())
+            scripted = server.script[self.path].pop(0) if server.script[self.path] else None
+        status, headers = scripted or (200, {})
+        body = json.dumps({'path': self.path} if status == 200 else {'status': status}).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/geo+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = FakeNWS()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Keep 5xx backoff short; the 429 wait comes from Retry-After, not backoff
+    monkeypatch.setattr(nws_client, 'backoff_delay', lambda attempt: 0.01)
+    client = AsyncNWSClient(requests.Session, rate=20.0, burst=5, concurrency=4, max_attempts=3)
+    yield client
+    client.close()
+
+
+def test_429_pauses_for_retry_after_and_halves_the_rate(server, client):
+    server.script['/throttled'] = [(429, {'Retry-After': str(RETRY_AFTER_SECONDS)})]
+
+    async def sweep():
+        first = await client.get_json(f"{server.base_url}/throttled")
+        return first, [await client.get_json(f"{server.base_url}/stations/{n}") for n in range(5)]
+
+    first, rest = client.run(sweep())
+    assert first == {'path': '/throttled'}
+    assert all(body for body in rest)
+
+    throttled_at, retried_at = server.hits['/throttled']
+    assert retried_at - throttled_at >= RETRY_AFTER_SECONDS
+    stats = client.stats()
+    assert (stats['requests'], stats['retries'], stats['throttled']) == (7, 1, 1)
+    # Halved to 10/s by the 429, then one step back per success (the retry and five more)
+    assert stats['rate'] == pytest.approx(10.0 + 6 * RATE_RECOVERY_STEP)
+
+
+def test_5xx_are_retried_until_max_attempts(server, client):
+    server.script['/flaky'] = [(503, {}), (502, {})]
+    server.script['/down'] = [(500, {})] * 3
+    server.script['/missing'] = [(404, {})]
+
+    flaky, down, missing, ok = client.run(client.get_many(
+        [(f"{server.base_url}/{path}", None) for path in ('flaky', 'down', 'missing', 'ok')], 'test'
+    ))
+    assert flaky == {'path': '/flaky'} and ok == {'path': '/ok'}
+    assert down is None and missing is None
+    assert [len(server.hits[f'/{path}']) for path in ('flaky', 'down', 'missing', 'ok')] == [3, 3, 1, 1]
+
+    stats = client.stats()
+    assert (stats['retries'], stats['throttled'], stats['failures']) == (4, 0, 2)
+    # 5xx responses do not slow the bucket down
+    assert stats['rate'] == 20.0
+
+
+def test_concurrent_429s_halve_the_rate_once(server, client):
+    for n in range(4):
+        server.script[f'/burst/{n}'] = [(429, {'Retry-After': str(RETRY_AFTER_SECONDS)})]
+    start = time.monotonic()
+    bodies = client.run(client.get_many([(f"{server.base_url}/burst/{n}", None) for n in range(4)], 'burst'))
+    assert all(bodies)
+    assert time.monotonic() - start >= RETRY_AFTER_SECONDS
+    stats = client.stats()
+    assert stats['throttled'] == 4
+    assert stats['rate'] == pytest.approx(10.0 + 4 * RATE_RECOVERY_STEP)
+
+
+def test_token_bucket_pause_and_recovery():
+    bucket = TokenBucket(rate=100.0, burst=2)
+
+    async def pause_then_acquire():
+        await bucket.acquire()
+        bucket.throttle(0.2)
+        bucket.throttle(0.1)
+        start = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(pause_then_acquire()) >= 0.2
+    assert bucket.rate == 50.0
+    for _ in range(600):
+        bucket.succeeded()
+    assert bucket.rate == 100.0
+
+
+@pytest.mark.parametrize('header, seconds', [('2', 2.0), ('0.5', 0.5), ('-3', 0.0),
+                                             ('Wed, 21 Oct 2026 07:28:00 GMT', None), (None, None)])
+def test_retry_after_seconds(header, seconds):
+    response = requests.Response()
+    if header is not None:
+        response.headers['Retry-After'] = header
+    assert retry_after_seconds(response) == seconds
@@ -0,0 +1,76 @@
+"""Point keys, grid cell grouping, the gridpoint index and gridpoint forecast records"""
+
+from datetime import datetime
+
+import pytest
+
+from nws_gridpoints import GridCell, GridpointIndex, forecast_records, group_by_cell, point_key
+
+OKC = GridCell('OUN', 97, 94)
+TUL = GridCell('TSA', 44, 61)
+
+FORECAST = {
+    'geometry': {'type': 'Polygon', 'coordinates': [[[-97.52, 35.46], [-97.49, 35.46], [-97.49, 35.48],
+                                                     [-97.52, 35.48], [-97.52, 35.46]]]},
+    'properties': {
+        'updateTime': '2024-05-06T20:41:12+00:00',
+        'periods': [
+            # Current period, already under way at the update time
+            {'number': 1, 'startTime': '2024-05-06T15:00:00-05:00', 'temperature': 84, 'temperatureUnit': 'F',
+             'windSpeed': '10 to 15 mph', 'windDirection': 'SSW', 'relativeHumidity': {'value': 48},
+             'dewpoint': {'unitCode': 'wmoUnit:degC', 'value': 20.0}},
+            {'number': 2, 'startTime': '2024-05-06T18:00:00-05:00', 'temperature': 66, 'temperatureUnit': 'F',
+             'windSpeed': None, 'windDirection': 'Variable'}
+        ]
+    }
+}
+
+
+@pytest.mark.parametrize('latitude, longitude, key', [
+    (35.4676, -97.5164, '35.4676,-97.5164'),
+    (35.467649, -97.516449, '35.4676,-97.5164'),
+    ('40.7128', '-74.0060', '40.7128,-74.006'),
+    (40.0, -74.0, '40,-74')
+])
+def test_point_key_rounds_to_four_decimals(latitude, longitude, key):
+    assert point_key(latitude, longitude) == key
+
+
+def test_group_by_cell_drops_unresolved_locations():
+    cells = {'KOKC': OKC, 'policy-1': OKC, 'KTUL': TUL, 'offshore': None}
+    assert group_by_cell(cells) == {OKC: ['KOKC', 'policy-1'], TUL: ['KTUL']}
+
+
+def test_forecast_records_use_period_numbers_and_utc():
+    records = forecast_records(OKC, FORECAST, 'https://api.weather.gov/gridpoints/OUN/97,94/forecast')
+
+    assert [record['forecast_id'] for record in records] == [
+        'nws-temperature-2024050620-p001-OUN-97-94',
+        'nws-dewpoint-2024050620-p001-OUN-97-94',
+        'nws-relativehumidity-2024050620-p001-OUN-97-94',
+        'nws-windspeed-2024050620-p001-OUN-97-94',
+        'nws-winddirection-2024050620-p001-OUN-97-94',
+        'nws-temperature-2024050620-p002-OUN-97-94'
+    ]
+    first = {record['parameter_name']: record for record in records[:5]}
+    assert first['Temperature']['forecast_time'] == datetime(2024, 5, 6, 20, 0)
+    assert first['Dewpoint']['parameter_value'] == pytest.approx(68.0)
+    assert first['WindSpeed']['parameter_value'] == 15.0
+    assert first['WindDirection']['parameter_value'] == 202.5
+    assert records[-1]['forecast_time'] == datetime(2024, 5, 6, 23, 0)
+    assert records[0]['grid_cell_latitude'] == pytest.approx(35.47)
+    assert records[0]['grid_cell_longitude'] == pytest.approx(-97.505)
+    assert (records[0]['spatial_extent_west'], records[0]['spatial_extent_north']) == (-97.52, 35.48)
+
+
+def test_forecast_records_without_geometry():
+    assert forecast_records(OKC, {'properties': FORECAST['properties']}, 'url') == []
+
+
+def test_index_lookup_spans_several_chunks(tmp_path):
+    cells = {point_key(30 + n / 1000, -97.0): GridCell('OUN', n, n) for n in range(1200)}
+    cells['25.0,-60.0'] = None
+    with GridpointIndex(tmp_path / 'gridpoints.sqlite') as index:
+        assert index.store(cells) == 1201
+        assert index.lookup(list(cells) + ['1,1']) == cells
+        assert index.count() == 1200
@@ -0,0 +1,42 @@
+"""NUMERIC binary COPY encoding"""
+
+import struct
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from pg_binary_copy import encode_numeric
+
+
+def decode_numeric(field: bytes) -> Decimal:
+    """PostgreSQL's numeric_recv for one length-prefixed field"""
+    length, = struct.unpack('!i', field[:4])
+    ndigits, weight, sign, dscale = struct.unpack('!hhHh', field[4:12])
+    digits = struct.unpack(f'!{ndigits}h', field[12:4 + length])
+    value = sum(Decimal(digit) * Decimal(10000) ** (weight - n) for n, digit in enumerate(digits))
+    return (-value if sign else value).quantize(Decimal(1).scaleb(-dscale))
+
+
+@pytest.mark.parametrize('precision, scale, values', [
+    (10, 7, [38.8977, -77.0365, 0.0, 179.9999999, -0.0000001]),
+    (6, 2, [72.5, -40.25, 9999.99, 0.01]),
+    (8, 2, [101325.0, 0.0, -999999.99])
+])
+def test_numeric_round_trips(precision, scale, values):
+    column = encode_numeric(np.array(values), precision, scale)
+    decoded = [decode_numeric(row) for row in column.row_bytes()]
+    assert decoded == [Decimal(f"{value:.{scale}f}") for value in values]
+
+
+def test_nan_is_null():
+    column = encode_numeric(np.array([1.5, np.nan]), 6, 2)
+    assert column.row_bytes()[1] == struct.pack('!i', -1)
+
+
+@pytest.mark.parametrize('precision, scale, value', [
+    (6, 2, 10000.0), (6, 2, -10000.0), (6, 2, 9999.995), (10, 7, 1000.0), (5, 2, np.inf)
+])
+def test_numeric_overflow_raises(precision, scale, value):
+    with pytest.raises(ValueError, match='overflow'):
+        encode_numeric(np.array([1.0, value]), precision, scale)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Compressed streaming I/O for generated SQL and COPY files
+Writes gzip or zstd streams with a selectable level, and opens .gz/.zst files
+transparently for reading so loaders can stream compressed datasets.
+"""
+
+import io
+import gzip
+from pathlib import Path
+from typing import Iterator, Optional
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Codec name -> file suffix appended to the uncompressed file name
+CODECS = {
+    'none': '',
+    'gzip': '.gz',
+    'zstd': '.zst'
+}
+
+DEFAULT_LEVELS = {
+    'gzip': 6,
+    'zstd': 3
+}
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Characters read per chunk when splitting a SQL stream into statements
+STATEMENT_READ_CHARS = 1024 * 1024
+
+
+def compressed_path(path: Path, codec: str) -> Path:
+    """File name used for path when written with codec"""
+    return path.with_name(path.name + CODECS[codec])
+
+
+def detect_codec(path: Path) -> str:
+    """Codec of an existing file, from its magic bytes"""
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if magic == ZSTD_MAGIC:
+        return 'zstd'
+    return 'none'
+
+
+def find_data_file(path: Path) -> Path:
+    """path itself, or its .gz/.zst variant if only a compressed copy exists"""
+    for suffix in CODECS.values():
+        candidate = path.with_name(path.name + suffix)
+        if candidate.exists():
+            return candidate
+    return path
+
+
+def _require_zstd():
+    if not ZSTD_AVAILABLE:
+        raise RuntimeError("zstd compression needs the zstandard package (pip install zstandard)")
+
+
+def open_compressed(path: Path, mode: str = 'r', codec: Optional[str] = None, level: Optional[int] = None,
+                    encoding: str = 'utf-8', newline: Optional[str] = None, buffering: int = -1):
+    """Open a plain, gzip or zstd file as a text or binary stream
+
+    mode is 'r', 'w' or 'a', plus 'b' for bytes. When reading, codec defaults to
+    the one detected from the file; when writing it defaults to 'none'. Appending
+    starts a new gzip member / zstd frame, which both formats read back as one
+    stream. gzip headers are written with mtime 0, so output is reproducible.
+    """
+    binary = 'b' in mode
+    raw_mode = mode.replace('b', '').replace('t', '') + 'b'
+    reading = raw_mode == 'rb'
+    if codec is None:
+        codec = detect_codec(path) if reading else 'none'
+
+    if codec == 'none':
+        if binary:
+            return open(path, raw_mode, buffering=buffering)
+        return open(path, raw_mode[0], encoding=encoding, newline=newline, buffering=buffering)
+
+    if codec == 'gzip':
+        stream = gzip.GzipFile(filename=str(path), mode=raw_mode, mtime=0,
+                               compresslevel=DEFAULT_LEVELS['gzip'] if level is None else level)
+    elif codec == 'zstd':
+        _require_zstd()
+        fileobj = open(path, raw_mode, buffering=buffering)
+        if reading:
+            stream = zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True, closefd=True)
+        else:
+            compressor = zstandard.ZstdCompressor(level=DEFAULT_LEVELS['zstd'] if level is None else level)
+            stream = compressor.stream_writer(fileobj, closefd=True)
+    else:
+        raise ValueError(f"Unknown compression codec: {codec}")
+
+    if binary:
+        return stream
+    return io.TextIOWrapper(stream, encoding=encoding, newline=newline)
+
+
+def iter_sql_statements(f, chunk_chars: int = STATEMENT_READ_CHARS) -> Iterator[str]:
+    """Yield stripped, non-empty ';'-separated statements from a text stream
+
+    Gives the same statements as splitting the whole file on ';', without
+    holding the file in memory.
+    """
+    pending = ''
+    while True:
+        chunk = f.read(chunk_chars)
+        if not chunk:
+            break
+        parts = (pending + chunk).split(';')
+        pending = parts.pop()
+        for part in parts:
+            part = part.strip()
+            if part:
+                yield part
+    pending = pending.strip()
+    if pending:
+        yield pending
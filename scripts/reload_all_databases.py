@@ -14,6 +14,8 @@ from typing import Dict, Tuple
 root_scripts = Path(__file__).parent
 sys.path.insert(0, str(root_scripts))
 
+from compressed_io import find_data_file, iter_sql_statements, open_compressed
+
 try:
     from timestamp_utils import get_est_timestamp
 except ImportError:
@@ -162,7 +164,7 @@ class DatabaseReloader:
         return load_schema_postgresql(db_name, schema_file, enable_postgis=False)
     
     def load_data(self, db_name: str, data_file: Path) -> Tuple[bool, str]:
-        """Load data SQL file into database"""
+        """Load data SQL file (plain, .gz or .zst) into database, streaming statements"""
         if not data_file.exists():
             return False, f"Data file not found: {data_file}"
         
@@ -178,30 +180,22 @@ class DatabaseReloader:
             
             cursor = conn.cursor()
             
-            # Read and execute data file
-            with open(data_file, 'r', encoding='utf-8') as f:
-                data_sql = f.read()
-            
-            # Convert to PostgreSQL syntax
             from postgresql_schema_loader import convert_to_postgresql
-            data_sql = convert_to_postgresql(data_sql)
-            
-            # Split by semicolons and execute each statement
-            statements = [s.strip() for s in data_sql.split(';') if s.strip()]
             
+            # Stream the data file statement by statement (split on semicolons),
+            # converting each to PostgreSQL syntax
             errors = []
             executed = 0
-            for i, statement in enumerate(statements):
-                if not statement.strip():
-                    continue
-                try:
-                    cursor.execute(statement)
-                    executed += 1
-                except Exception as e:
-                    error_msg = str(e)
-                    # Skip duplicate key errors (expected with sample data)
-                    if 'duplicate key' not in error_msg.lower() and 'already exists' not in error_msg.lower():
-                        errors.append(f"Statement {i+1}: {error_msg[:100]}")
+            with open_compressed(data_file, 'r', encoding='utf-8') as f:
+                for i, statement in enumerate(iter_sql_statements(f)):
+                    try:
+                        cursor.execute(convert_to_postgresql(statement))
+                        executed += 1
+                    except Exception as e:
+                        error_msg = str(e)
+                        # Skip duplicate key errors (expected with sample data)
+                        if 'duplicate key' not in error_msg.lower() and 'already exists' not in error_msg.lower():
+                            errors.append(f"Statement {i+1}: {error_msg[:100]}")
             
             cursor.close()
             conn.close()
@@ -219,7 +213,7 @@ def reload_database(db_num: int, root_dir: Path, force_reload: bool = True) -> D
     db_name = f'db{db_num}'
     db_dir = root_dir / f'db-{db_num}'
     schema_file = db_dir / 'data' / 'schema.sql'
-    data_file = db_dir / 'data' / 'data.sql'
+    data_file = find_data_file(db_dir / 'data' / 'data.sql')
     
     reloader = DatabaseReloader()
     result = {
@@ -15,6 +15,8 @@ from typing import Dict, List, Tuple
 # Add root scripts directory to path
 root_scripts = Path(__file__).parent
 sys.path.insert(0, str(root_scripts))
+from compressed_io import find_data_file, iter_sql_statements, open_compressed
+
 try:
     from timestamp_utils import get_est_timestamp
 except ImportError:
@@ -115,7 +117,7 @@ class DatabaseSetup:
         return load_schema_postgresql(db_name, schema_file, enable_postgis=enable_postgis)
     
     def load_data(self, db_name: str, data_file: Path) -> Tuple[bool, str]:
-        """Load data SQL file into database"""
+        """Load data SQL file (plain, .gz or .zst) into database, streaming statements"""
         if not data_file.exists():
             return False, f"Data file not found: {data_file}"
         
@@ -131,24 +133,19 @@ class DatabaseSetup:
             
             cursor = conn.cursor()
             
-            # Read and execute data file
-            with open(data_file, 'r', encoding='utf-8') as f:
-                data_sql = f.read()
-            
-            # Split by semicolons and execute each statement
-            statements = [s.strip() for s in data_sql.split(';') if s.strip()]
-            
+            # Stream the data file and execute each statement (split on semicolons)
             errors = []
             executed = 0
-            for i, statement in enumerate(statements):
-                try:
-                    cursor.execute(statement)
-                    executed += 1
-                except Exception as e:
-                    error_msg = str(e)
-                    # Skip duplicate key errors (expected with sample data)
-                    if 'duplicate key' not in error_msg.lower() and 'already exists' not in error_msg.lower():
-                        errors.append(f"Statement {i+1}: {error_msg[:100]}")
+            with open_compressed(data_file, 'r', encoding='utf-8') as f:
+                for i, statement in enumerate(iter_sql_statements(f)):
+                    try:
+                        cursor.execute(statement)
+                        executed += 1
+                    except Exception as e:
+                        error_msg = str(e)
+                        # Skip duplicate key errors (expected with sample data)
+                        if 'duplicate key' not in error_msg.lower() and 'already exists' not in error_msg.lower():
+                            errors.append(f"Statement {i+1}: {error_msg[:100]}")
             
             cursor.close()
             conn.close()
@@ -166,7 +163,7 @@ def setup_database(db_num: int, root_dir: Path) -> Dict:
     db_name = f'db{db_num}'
     db_dir = root_dir / f'db-{db_num}'
     schema_file = db_dir / 'data' / 'schema.sql'
-    data_file = db_dir / 'data' / 'data.sql'
+    data_file = find_data_file(db_dir / 'data' / 'data.sql')
     
     setup = DatabaseSetup()
     result = {
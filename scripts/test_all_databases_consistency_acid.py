@@ -20,6 +20,8 @@ from datetime import datetime
 
 BASE = Path(__file__).parent.parent
 sys.path.insert(0, str(BASE / "scripts"))
+from compressed_io import find_data_file, iter_sql_statements, open_compressed
+
 try:
     from timestamp_utils import get_est_timestamp
 except ImportError:
@@ -207,22 +209,21 @@ def load_data(db_name: str, data_file: Path) -> Tuple[bool, str]:
         )
         conn.autocommit = True
         cur = conn.cursor()
-        with open(data_file) as f:
-            content = f.read()
         # Convert CURRENT_TIMESTAMP() to CURRENT_TIMESTAMP for PostgreSQL
         import re
-        content = re.sub(r'\bCURRENT_TIMESTAMP\s*\(\s*\)', 'CURRENT_TIMESTAMP', content, flags=re.IGNORECASE)
-        statements = [s.strip() for s in content.split(';') if s.strip()]
         errs = []
         ok = 0
-        for stmt in statements:
-            try:
-                cur.execute(stmt)
-                ok += 1
-            except Exception as e:
-                msg = str(e).lower()
-                if 'duplicate key' not in msg and 'already exists' not in msg:
-                    errs.append(str(e)[:100])
+        # Stream statements from the (possibly .gz/.zst) data file
+        with open_compressed(data_file) as f:
+            for stmt in iter_sql_statements(f):
+                stmt = re.sub(r'\bCURRENT_TIMESTAMP\s*\(\s*\)', 'CURRENT_TIMESTAMP', stmt, flags=re.IGNORECASE)
+                try:
+                    cur.execute(stmt)
+                    ok += 1
+                except Exception as e:
+                    msg = str(e).lower()
+                    if 'duplicate key' not in msg and 'already exists' not in msg:
+                        errs.append(str(e)[:100])
         cur.close()
         conn.close()
         if errs and len(errs) > ok * 0.5:
@@ -376,10 +377,10 @@ def test_database(db_num: int) -> Dict:
     db_name = f'db{db_num}'
     db_dir = BASE / f'db-{db_num}'
     schema_file = db_dir / 'data' / 'schema.sql'
-    data_file = db_dir / 'data' / 'data.sql'
+    data_file = find_data_file(db_dir / 'data' / 'data.sql')
     # Use sample data for db-16 (full data is 2.5GB)
     if db_num == 16:
-        sample_file = db_dir / 'package' / 'data.sql'
+        sample_file = find_data_file(db_dir / 'package' / 'data.sql')
         if sample_file.exists() and data_file.exists():
             data_size_mb = data_file.stat().st_size / (1024 * 1024)
             if data_size_mb > 500: